@@ -0,0 +1 @@
+# Self-benchmarks of the DEnode pipeline
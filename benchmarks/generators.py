@@ -0,0 +1,286 @@
+import random
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Largest number of distinct statement templates in a generated log
+MAX_LOG_TEMPLATES = 2000
+
+# Statement templates generated per table, before the cap above
+LOG_TEMPLATES_PER_TABLE = 5
+
+# Zipf exponent of table and template popularity in generated logs
+LOG_POPULARITY_SKEW = 1.1
+
+# Log lines formatted per write
+LOG_WRITE_CHUNK = 10000
+
+# Rows inserted per table of a generated SQLite database
+DEFAULT_SQLITE_ROWS = 20
+
+# Relative weights of the statement shapes in a generated log
+STATEMENT_MIX = (
+    ("point", 35), ("fk_lookup", 15), ("filter", 10), ("join", 15), ("aggregate", 5),
+    ("insert", 10), ("update", 7), ("delete", 3)
+)
+
+STATUSES = ("pending", "active", "shipped", "cancelled", "archived")
+
+EXTRA_COLUMN_TYPES = ("INTEGER", "VARCHAR(64)", "BIGINT", "TEXT", "DATE", "NUMERIC(12, 2)")
+
+LOG_START = datetime(2025, 1, 1)
+
+def _column(name, col_type, nullable=True, is_primary_key=False):
+    """Column dict in the format of extract_schema"""
+    return {"name": name, "type": col_type, "nullable": nullable, "default": "None", "is_primary_key": is_primary_key}
+
+def _bounds(low, high, buckets=10):
+    """Evenly spaced histogram bounds between two integers, as text"""
+    return [str(low + (high - low) * i // buckets) for i in range(buckets + 1)]
+
+def generate_schema(table_count, seed=0):
+    """
+    Synthetic schema snapshot in the format of extract_schema.
+    
+    Every table has an integer primary key, status, timestamp, amount and
+    name columns and a few extra columns, and refers to up to two earlier
+    tables through indexed or unindexed foreign keys. Row counts span 100
+    to 10M and column statistics are consistent with them, so the
+    heuristics have selectivities and sizes to work with.
+    
+    Args:
+        table_count (int): Number of tables
+        seed (int): Random seed; the same seed always gives the same schema
+    
+    Returns:
+        dict: Database schema information
+    """
+    rng = random.Random(seed)
+    schema = {}
+    names = [f"t{i:05d}" for i in range(table_count)]
+    
+    for position, table in enumerate(names):
+        row_count = int(10 ** rng.uniform(2, 7))
+        columns = [_column("id", "INTEGER", False, True)]
+        foreign_keys = []
+        indexes = []
+        column_stats = {
+            "id": {"null_frac": 0.0, "n_distinct": -1.0, "histogram_bounds": _bounds(1, row_count),
+                   "most_common_vals": [], "most_common_freqs": []}
+        }
+        
+        targets = sorted({names[rng.randrange(position)] for _ in range(rng.randint(0, 2))}) if position else []
+        for target in targets:
+            column = f"{target}_id"
+            columns.append(_column(column, "INTEGER", False))
+            foreign_keys.append({"name": f"fk_{table}_{target}", "constrained_columns": [column],
+                                 "referred_schema": None, "referred_table": target, "referred_columns": ["id"],
+                                 "options": {}})
+            if rng.random() < 0.5:
+                indexes.append({"name": f"ix_{table}_{column}", "column_names": [column], "unique": False})
+            target_rows = schema[target]["row_count"]
+            column_stats[column] = {"null_frac": 0.0, "n_distinct": float(min(target_rows, row_count)),
+                                    "histogram_bounds": _bounds(1, target_rows), "most_common_vals": [],
+                                    "most_common_freqs": []}
+        
+        columns.extend([
+            _column("status", "VARCHAR(20)", False),
+            _column("created_at", "TIMESTAMP", False),
+            _column("amount", "NUMERIC(10, 2)"),
+            _column("name", "VARCHAR(255)")
+        ])
+        freqs = sorted((rng.random() for _ in STATUSES), reverse=True)
+        column_stats["status"] = {"null_frac": 0.0, "n_distinct": float(len(STATUSES)), "histogram_bounds": [],
+                                  "most_common_vals": list(STATUSES),
+                                  "most_common_freqs": [round(f / sum(freqs), 4) for f in freqs]}
+        column_stats["created_at"] = {"null_frac": 0.0, "n_distinct": -0.9, "histogram_bounds": [],
+                                      "most_common_vals": [], "most_common_freqs": [],
+                                      "min": "2020-01-01 00:00:00", "max": "2025-06-30 23:59:59"}
+        column_stats["amount"] = {"null_frac": 0.05, "n_distinct": -0.5, "histogram_bounds": _bounds(1, 500),
+                                  "most_common_vals": [], "most_common_freqs": []}
+        
+        for extra in range(rng.randint(0, 6)):
+            columns.append(_column(f"c{extra}", EXTRA_COLUMN_TYPES[extra % len(EXTRA_COLUMN_TYPES)]))
+        
+        schema[table] = {
+            "columns": columns,
+            "primary_key": {"constrained_columns": ["id"], "name": None},
+            "foreign_keys": foreign_keys,
+            "indexes": indexes,
+            "unique_constraints": [],
+            "column_count": len(columns),
+            "row_count": row_count,
+            "index_usage": {},
+            "column_stats": column_stats
+        }
+    
+    return schema
+
+def _zipf_weights(count, skew=LOG_POPULARITY_SKEW):
+    """Cumulative Zipf weights of count ranks, for random.choices"""
+    weights = []
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** skew
+        weights.append(total)
+    return weights
+
+def _log_templates(schema, rng):
+    """
+    Statement templates of a generated log: (SQL with {} for each literal, literal kinds).
+    
+    Tables are drawn by Zipf popularity, so a few tables dominate the log
+    the way they do in production workloads.
+    """
+    tables = list(schema)
+    table_weights = _zipf_weights(len(tables))
+    shapes, shape_weights = zip(*STATEMENT_MIX)
+    count = min(MAX_LOG_TEMPLATES, LOG_TEMPLATES_PER_TABLE * len(tables))
+    templates = []
+    
+    for table in rng.choices(tables, cum_weights=table_weights, k=count):
+        fks = schema[table]["foreign_keys"]
+        shape = rng.choices(shapes, weights=shape_weights)[0]
+        if shape in ("fk_lookup", "join") and not fks:
+            shape = "point"
+        
+        if shape == "point":
+            templates.append((f"SELECT * FROM {table} WHERE id = {{}}", ("id",)))
+        elif shape == "fk_lookup":
+            column = rng.choice(fks)["constrained_columns"][0]
+            templates.append((f"SELECT id, status, amount FROM {table} WHERE {column} = {{}} "
+                              f"ORDER BY created_at DESC LIMIT 20", ("id",)))
+        elif shape == "filter":
+            templates.append((f"SELECT id, name, amount FROM {table} WHERE status = '{{}}' "
+                              f"AND created_at >= '{{}}' ORDER BY created_at DESC LIMIT 50", ("status", "date")))
+        elif shape == "join":
+            fk = rng.choice(fks)
+            templates.append((f"SELECT a.id, a.amount, b.name FROM {table} a JOIN {fk['referred_table']} b "
+                              f"ON a.{fk['constrained_columns'][0]} = b.id WHERE a.status = '{{}}'", ("status",)))
+        elif shape == "aggregate":
+            templates.append((f"SELECT status, COUNT(*), SUM(amount) FROM {table} WHERE created_at >= '{{}}' "
+                              f"GROUP BY status", ("date",)))
+        elif shape == "insert":
+            templates.append((f"INSERT INTO {table} (name, status, amount, created_at) "
+                              f"VALUES ('{{}}', '{{}}', {{}}, CURRENT_TIMESTAMP)", ("name", "status", "amount")))
+        elif shape == "update":
+            templates.append((f"UPDATE {table} SET status = '{{}}' WHERE id = {{}}", ("status", "id")))
+        else:
+            templates.append((f"DELETE FROM {table} WHERE id = {{}}", ("id",)))
+    
+    return templates
+
+def write_query_log(path, schema, line_count, seed=0):
+    """
+    Write a synthetic Postgres-style query log for a schema.
+    
+    Lines carry a timestamp, backend pid and duration prefix and are
+    streamed to the file in chunks, so logs of any length are written in
+    constant memory. Template popularity is Zipf-distributed and literals
+    vary per line, so fingerprinting does real work.
+    
+    Args:
+        path (str): Log file to write
+        schema (dict): Schema the statements refer to
+        line_count (int): Number of log lines
+        seed (int): Random seed; the same seed always gives the same log
+    
+    Returns:
+        dict: lines written and distinct templates used
+    """
+    rng = random.Random(seed)
+    templates = _log_templates(schema, rng)
+    template_weights = _zipf_weights(len(templates))
+    literals = {
+        "id": lambda: rng.randrange(1, 1000000),
+        "status": lambda: rng.choice(STATUSES),
+        "date": lambda: f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "name": lambda: f"name_{rng.randrange(100000)}",
+        "amount": lambda: f"{rng.uniform(1, 500):.2f}"
+    }
+    
+    written = 0
+    second = None
+    prefix = ""
+    with open(path, "w") as f:
+        while written < line_count:
+            chunk = min(LOG_WRITE_CHUNK, line_count - written)
+            lines = []
+            for offset, template_id in enumerate(rng.choices(range(len(templates)), cum_weights=template_weights,
+                                                             k=chunk)):
+                line_number = written + offset
+                # One statement per millisecond; the second's text is formatted once
+                if line_number // 1000 != second:
+                    second = line_number // 1000
+                    prefix = (LOG_START + timedelta(seconds=second)).strftime("%Y-%m-%d %H:%M:%S")
+                sql, kinds = templates[template_id]
+                lines.append(f"{prefix}.{line_number % 1000:03d} UTC [{10000 + template_id % 64}] LOG:  "
+                             f"duration: {rng.expovariate(1.0):.3f} ms  statement: "
+                             f"{sql.format(*(literals[kind]() for kind in kinds))};\n")
+            f.writelines(lines)
+            written += chunk
+    
+    logger.info(f"Wrote {written} log lines from {len(templates)} templates to {path}")
+    return {"lines": written, "templates": len(templates)}
+
+def create_sqlite_database(path, schema, rows_per_table=DEFAULT_SQLITE_ROWS, seed=0):
+    """
+    Create a SQLite database with the tables, foreign keys and indexes of a schema.
+    
+    A few rows per table give extract_schema statistics to sample.
+    
+    Args:
+        path (str): Database file to create
+        schema (dict): Schema to create, e.g. from generate_schema
+        rows_per_table (int): Rows inserted into every table
+        seed (int): Random seed of the row values
+    
+    Returns:
+        str: SQLAlchemy connection URL of the database
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        for table, table_info in schema.items():
+            definitions = []
+            for col in table_info["columns"]:
+                definition = f'"{col["name"]}" {col["type"]}'
+                if col["is_primary_key"]:
+                    definition += " PRIMARY KEY"
+                elif not col["nullable"]:
+                    definition += " NOT NULL"
+                definitions.append(definition)
+            for fk in table_info["foreign_keys"]:
+                definitions.append(f'FOREIGN KEY ("{fk["constrained_columns"][0]}") '
+                                   f'REFERENCES "{fk["referred_table"]}" ("{fk["referred_columns"][0]}")')
+            conn.execute(f'CREATE TABLE "{table}" ({", ".join(definitions)})')
+            for index in table_info["indexes"]:
+                columns = ", ".join(f'"{c}"' for c in index["column_names"])
+                conn.execute(f'CREATE INDEX "{index["name"]}" ON "{table}" ({columns})')
+            
+            names = [col["name"] for col in table_info["columns"]]
+            rows = []
+            for row_id in range(1, rows_per_table + 1):
+                row = []
+                for name in names:
+                    if name == "id" or name.endswith("_id"):
+                        row.append(row_id)
+                    elif name == "status":
+                        row.append(rng.choice(STATUSES))
+                    elif name == "created_at":
+                        row.append((LOG_START + timedelta(minutes=rng.randrange(525600))).isoformat(sep=" "))
+                    elif name == "name":
+                        row.append(f"name_{row_id}")
+                    else:
+                        row.append(rng.randrange(1000))
+                rows.append(row)
+            placeholders = ", ".join("?" for _ in names)
+            conn.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', rows)
+        conn.commit()
+    finally:
+        conn.close()
+    
+    logger.info(f"Created SQLite database with {len(schema)} tables at {path}")
+    return f"sqlite:///{path}"
@@ -0,0 +1,284 @@
+import gc
+import os
+import time
+import shutil
+import logging
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from db.schema_extractor import extract_schema
+from db.schema_index import SchemaIndex
+from db.query_log_analyzer import parse_query_logs, analyze_query_patterns
+from engine.heuristics import recommend_changes
+from engine.plan_generator import generate_sql
+from storage.metadata_store import MetadataStore
+from benchmarks.generators import generate_schema, write_query_log, create_sqlite_database
+
+logger = logging.getLogger(__name__)
+
+# Version of the result format, bumped when cases or their inputs change meaning
+SUITE_VERSION = 1
+
+# Input sizes and timed repeats per scale tier
+TIERS = {
+    "small": {"log_lines": 1000, "tables": 10, "repeats": 5},
+    "medium": {"log_lines": 100000, "tables": 1000, "repeats": 3},
+    "large": {"log_lines": 10000000, "tables": 10000, "repeats": 1}
+}
+
+# Cases in pipeline order; each one feeds the next
+CASES = ("parse_query_logs", "analyze_query_patterns", "recommend_changes", "generate_sql", "extract_schema",
+         "metadata_store_sqlite", "metadata_store_json")
+
+# Case whose output each case consumes
+CASE_INPUTS = {
+    "analyze_query_patterns": "parse_query_logs",
+    "recommend_changes": "analyze_query_patterns",
+    "generate_sql": "recommend_changes",
+    "metadata_store_sqlite": "recommend_changes",
+    "metadata_store_json": "recommend_changes"
+}
+
+# Median slowdown, in percent, that compare_results reports as a regression
+DEFAULT_SLOWDOWN_THRESHOLD_PCT = 10.0
+
+def _measure(func, repeats, profile_memory):
+    """
+    Time a function over several runs, then profile its memory in one more.
+    
+    Memory is traced in a separate run, so tracemalloc's overhead never
+    shows up in the timings.
+    
+    Returns:
+        tuple: (result of the last run, measurement dict)
+    """
+    seconds = []
+    for _ in range(max(1, repeats)):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - started)
+    
+    measurement = {
+        "seconds": seconds,
+        "min_seconds": min(seconds),
+        "median_seconds": statistics.median(seconds),
+        "peak_memory_bytes": None
+    }
+    
+    if profile_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            measurement["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    
+    return result, measurement
+
+def _metadata_round_trip(base_path, use_sqlite, schema, query_data, recommendations):
+    """Save a schema, query analysis and recommendations to a fresh store and load them back"""
+    shutil.rmtree(base_path, ignore_errors=True)
+    store = MetadataStore(base_path=base_path, use_sqlite=use_sqlite)
+    store.save_schema(schema, "bench")
+    store.save_query_analysis(query_data, "bench")
+    store.save_recommendations(recommendations, "bench")
+    return (store.load_latest_schema("bench"), store.load_latest_query_analysis("bench"),
+            store.load_latest_recommendations("bench"))
+
+def _revision():
+    """Git revision of the working tree, or None outside a git checkout"""
+    try:
+        revision = subprocess.run(["git", "describe", "--always", "--dirty"],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  capture_output=True, text=True, timeout=10, check=True).stdout
+        return revision.strip() or None
+    except Exception:
+        return None
+
+def run_suite(tier="small", log_lines=None, tables=None, repeats=None, seed=0, profile_memory=True,
+              cases=None, label=None, work_dir=None):
+    """
+    Benchmark DEnode's own pipeline on synthetic inputs.
+    
+    A schema and a query log of the tier's size are generated from the
+    seed, so two runs with the same parameters process identical inputs
+    and their results can be compared across versions. Each case is timed
+    over several repeats, and its peak Python heap is measured in one extra
+    run under tracemalloc. A case whose input comes from an unselected
+    case runs that case untimed first.
+    
+    Args:
+        tier (str): Scale tier, see TIERS
+        log_lines (int, optional): Override the tier's log line count
+        tables (int, optional): Override the tier's table count
+        repeats (int, optional): Override the tier's timed repeats
+        seed (int): Seed of the generated inputs
+        profile_memory (bool): Measure peak memory per case
+        cases (list, optional): Names of the cases to time, default all of CASES
+        label (str, optional): Free-form label stored with the results
+        work_dir (str, optional): Directory for generated files, a temporary one by default
+    
+    Returns:
+        dict: Suite metadata, parameters, environment, setup timing and
+              per-case measurements
+    """
+    parameters = dict(TIERS[tier])
+    parameters.update({key: value for key, value in
+                       (("log_lines", log_lines), ("tables", tables), ("repeats", repeats)) if value is not None})
+    parameters["seed"] = seed
+    selected = set(cases or CASES)
+    unknown = selected - set(CASES)
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {', '.join(sorted(unknown))}")
+    
+    # Cases run untimed because a selected case consumes their output
+    required = set(selected)
+    for name in reversed(CASES):
+        if name in required and name in CASE_INPUTS:
+            required.add(CASE_INPUTS[name])
+    
+    results = {
+        "suite": "denode-self-benchmark",
+        "version": SUITE_VERSION,
+        "label": label,
+        "tier": tier,
+        "parameters": parameters,
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "revision": _revision()
+        },
+        "started_at": datetime.now().isoformat(),
+        "profile_memory": profile_memory,
+        "setup": {},
+        "cases": {}
+    }
+    
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="denode-bench-")
+    try:
+        logger.info(f"Running {tier} self-benchmark: {parameters['log_lines']} log lines, "
+                    f"{parameters['tables']} tables, {parameters['repeats']} repeats")
+        
+        started = time.perf_counter()
+        schema = generate_schema(parameters["tables"], seed)
+        results["setup"]["generate_schema_seconds"] = time.perf_counter() - started
+        
+        log_path = os.path.join(work_dir, "query.log")
+        if "parse_query_logs" in required:
+            started = time.perf_counter()
+            log_info = write_query_log(log_path, schema, parameters["log_lines"], seed)
+            results["setup"]["write_query_log_seconds"] = time.perf_counter() - started
+            results["setup"]["log_templates"] = log_info["templates"]
+            results["setup"]["log_bytes"] = os.path.getsize(log_path)
+        
+        def run_case(name, func, items):
+            """Time a selected case, or just run it when a later case needs its output"""
+            if name not in selected:
+                return func()
+            logger.info(f"Benchmarking {name}")
+            output, measurement = _measure(func, parameters["repeats"], profile_memory)
+            measurement["items"] = items
+            median = measurement["median_seconds"]
+            measurement["items_per_second"] = items / median if median else None
+            results["cases"][name] = measurement
+            return output
+        
+        query_data = None
+        recommendations = []
+        if "parse_query_logs" in required:
+            query_data = run_case("parse_query_logs", lambda: parse_query_logs(log_path), parameters["log_lines"])
+        if "analyze_query_patterns" in required:
+            query_data["advanced_analysis"] = run_case(
+                "analyze_query_patterns", lambda: analyze_query_patterns(query_data, schema), len(schema))
+        if "recommend_changes" in required:
+            recommendations = run_case("recommend_changes", lambda: recommend_changes(schema, query_data), len(schema))
+        if "generate_sql" in required:
+            def generate_plans():
+                """Plans of every recommendation, indexing the schema once as generate_all does"""
+                schema_index = SchemaIndex(schema)
+                return [generate_sql(rec, schema, "postgresql", None, schema_index) for rec in recommendations]
+            run_case("generate_sql", generate_plans, len(recommendations))
+        if "extract_schema" in required:
+            started = time.perf_counter()
+            database_url = create_sqlite_database(os.path.join(work_dir, "schema.db"), schema, seed=seed)
+            results["setup"]["create_sqlite_database_seconds"] = time.perf_counter() - started
+            run_case("extract_schema", lambda: extract_schema(database_url), len(schema))
+        for name, use_sqlite in (("metadata_store_sqlite", True), ("metadata_store_json", False)):
+            if name in required:
+                store_path = os.path.join(work_dir, name)
+                run_case(name, lambda: _metadata_round_trip(store_path, use_sqlite, schema, query_data,
+                                                            recommendations), 1)
+        
+        results["finished_at"] = datetime.now().isoformat()
+        return results
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def _change_pct(before, after):
+    """Relative change in percent, or None when either value is missing or the baseline is 0"""
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+def compare_results(baseline, candidate, threshold_pct=DEFAULT_SLOWDOWN_THRESHOLD_PCT):
+    """
+    Compare two suite results case by case.
+    
+    Args:
+        baseline (dict): Earlier run_suite result
+        candidate (dict): Later run_suite result
+        threshold_pct (float): Median slowdown, in percent, that is a regression
+    
+    Returns:
+        dict: Per-case time and memory changes, regressed case names and
+              warnings when the runs are not like for like
+    """
+    warnings = []
+    if baseline.get("version") != candidate.get("version"):
+        warnings.append("Results come from different suite versions")
+    if baseline.get("parameters") != candidate.get("parameters"):
+        warnings.append("Runs used different input sizes, repeats or seeds")
+    for field in ("python", "implementation", "machine"):
+        if baseline.get("environment", {}).get(field) != candidate.get("environment", {}).get(field):
+            warnings.append(f"Runs used a different {field}")
+    
+    cases = {}
+    regressions = []
+    for name, after in candidate["cases"].items():
+        before = baseline["cases"].get(name)
+        if not before:
+            continue
+        time_change = _change_pct(before["median_seconds"], after["median_seconds"])
+        memory_change = _change_pct(before.get("peak_memory_bytes"), after.get("peak_memory_bytes"))
+        regression = time_change is not None and time_change > threshold_pct
+        cases[name] = {
+            "before_seconds": before["median_seconds"],
+            "after_seconds": after["median_seconds"],
+            "time_change_pct": time_change,
+            "before_memory_bytes": before.get("peak_memory_bytes"),
+            "after_memory_bytes": after.get("peak_memory_bytes"),
+            "memory_change_pct": memory_change,
+            "regression": regression
+        }
+        if regression:
+            regressions.append(name)
+    
+    return {
+        "baseline_revision": baseline.get("environment", {}).get("revision"),
+        "candidate_revision": candidate.get("environment", {}).get("revision"),
+        "threshold_pct": threshold_pct,
+        "cases": cases,
+        "regressions": regressions,
+        "warnings": warnings
+    }
@@ -1,4 +1,5 @@
 import click
+import asyncio
 import logging
 import os
 import sys
@@ -8,12 +9,25 @@ from tabulate import tabulate
 # Add the parent directory to the path so we can import modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from db.schema_extractor import extract_schema
+from db.schema_extractor import extract_schema, detect_database_type, refresh_partition_bounds
 from db.query_log_analyzer import parse_query_logs, analyze_query_patterns
-from engine.simulator import run_explain, simulate_performance
+from engine.simulator import (run_explain, simulate_performance, simulate_performance_async,
+                              simulate_parameterized, detect_plan_regressions, set_explain_concurrency,
+                              DEFAULT_STATEMENT_TIMEOUT_MS)
 from engine.heuristics import recommend_changes
-from engine.plan_generator import generate_sql
+from engine.workload import build_workload_cost_model
+from engine.plan_generator import generate_all, DEFAULT_ROWS_PER_PARTITION, DEFAULT_BATCH_SIZE, DEFAULT_THROTTLE_MS
+from engine.plan_executor import execute_plans, DEFAULT_EXECUTION_CONCURRENCY
+from engine.experiment import (measure_recommendations, DEFAULT_SAMPLE_ROWS, DEFAULT_REPLAY_TOP,
+                               DEFAULT_REPLAY_ITERATIONS)
+from engine.benchmark import (PerformanceBenchmark, load_replay_schedule, synthesize_replay_schedule,
+                              DEFAULT_REPLAY_SESSIONS, FETCH_MODES, DEFAULT_FETCH_MODE)
+from engine.data_generator import generate_data, DEFAULT_ZIPF_SKEW
+from engine.resource_sampler import HEADLINE_COUNTERS
+from engine.benchmark_history import (benchmark_run_record, compare_benchmark_runs, DEFAULT_SIGNIFICANCE,
+                                      DEFAULT_REGRESSION_THRESHOLD_PCT)
 from storage.metadata_store import MetadataStore
+from benchmarks.suite import run_suite, compare_results, TIERS, CASES, DEFAULT_SLOWDOWN_THRESHOLD_PCT
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -37,12 +51,14 @@ def cli(ctx, verbose):
 @click.option('--db-url', required=True, help='Database connection URL')
 @click.option('--output', '-o', help='Output file for schema (JSON)')
 @click.option('--db-name', help='Name identifier for the database', default='default')
+@click.option('--skip-column-stats', is_flag=True,
+              help='Do not collect column value statistics (histograms, distinct counts, null fractions)')
 @click.pass_context
-def extract(ctx, db_url, output, db_name):
+def extract(ctx, db_url, output, db_name, skip_column_stats):
     """Extract database schema information"""
     try:
         logger.info(f"Extracting schema from {db_url}")
-        schema = extract_schema(db_url)
+        schema = extract_schema(db_url, column_stats=not skip_column_stats)
         
         if schema:
             # Print summary
@@ -67,8 +83,9 @@ def extract(ctx, db_url, output, db_name):
                     json.dump(schema, f, indent=2)
                 print(f"\nSchema saved to {output}")
             
-            # Save to metadata store
+            # Save to metadata store, with the database type plans are generated for
             if ctx.obj['metadata_store'].save_schema(schema, db_name):
+                ctx.obj['metadata_store'].save_database_info({"db_type": detect_database_type(db_url)}, db_name)
                 print(f"\nSchema saved to metadata store with ID '{db_name}'")
             
             return schema
@@ -156,8 +173,9 @@ def analyze(ctx, log_file, schema_file, output, db_name):
 @click.option('--query', help='SQL query to explain')
 @click.option('--query-file', help='File containing SQL query')
 @click.option('--analyze', is_flag=True, default=True, help='Execute query for actual statistics')
+@click.option('--timeout-ms', default=DEFAULT_STATEMENT_TIMEOUT_MS, help='Statement timeout (0 for none)')
 @click.pass_context
-def explain(ctx, db_url, query, query_file, analyze):
+def explain(ctx, db_url, query, query_file, analyze, timeout_ms):
     """Run EXPLAIN on a SQL query"""
     try:
         if not query and not query_file:
@@ -171,12 +189,14 @@ def explain(ctx, db_url, query, query_file, analyze):
                 query = f.read()
         
         logger.info(f"Running EXPLAIN on query")
-        explain_result = run_explain(db_url, query, analyze=analyze)
+        explain_result = run_explain(db_url, query, analyze=analyze, timeout_ms=timeout_ms)
         
         print("\nQuery Execution Plan:")
         
         if 'error' in explain_result:
             print(f"Error: {explain_result['error']}")
+        elif explain_result.get('timed_out'):
+            print(f"Timed out after {explain_result['timeout_ms']}ms")
         else:
             # Print the metrics
             if explain_result.get('metrics'):
@@ -195,17 +215,169 @@ def explain(ctx, db_url, query, query_file, analyze):
         logger.error(f"Error running EXPLAIN: {str(e)}")
         raise click.ClickException(f"EXPLAIN failed: {str(e)}")
 
+@cli.command()
+@click.option('--db-url', required=True, help='Database connection URL')
+@click.option('--log-file', help='SQL query log file (defaults to the stored query analysis)')
+@click.option('--db-name', help='Name identifier for the database', default='default')
+@click.option('--top', default=20, help='Number of most frequent fingerprints to simulate')
+@click.option('--param-samples', default=0, help='Replay each fingerprint over this many logged parameter sets')
+@click.option('--concurrency', default=0, help='Pipeline EXPLAINs over async connections with this many in flight')
+@click.option('--timeout-ms', default=DEFAULT_STATEMENT_TIMEOUT_MS, help='Statement timeout per EXPLAIN (0 for none)')
+@click.option('--max-concurrent-explains', default=0, help='Global budget of EXPLAINs running at once')
+@click.option('--output', '-o', help='Output file for performance data (JSON)')
+@click.pass_context
+def simulate(ctx, db_url, log_file, db_name, top, param_samples, concurrency, timeout_ms,
+             max_concurrent_explains, output):
+    """Simulate the most frequent query fingerprints and report where the time goes"""
+    try:
+        if log_file:
+            query_analysis = parse_query_logs(log_file)
+        else:
+            query_analysis = ctx.obj['metadata_store'].load_latest_query_analysis(db_name)
+            if not query_analysis:
+                raise click.ClickException("No query analysis found. Please provide a log file or run analyze first.")
+        
+        fingerprints = query_analysis.get("fingerprints", {})
+        if not fingerprints:
+            raise click.ClickException("Query analysis has no fingerprints. Please re-run analyze.")
+        
+        # Simulate one example statement per fingerprint, most frequent first
+        ranked = sorted(fingerprints.items(), key=lambda x: x[1]["count"], reverse=True)[:top]
+        queries = [fp["example"] for _, fp in ranked if fp["type"] in ("select", "with")]
+        
+        if max_concurrent_explains:
+            set_explain_concurrency(max_concurrent_explains)
+        
+        logger.info(f"Simulating {len(queries)} query fingerprints")
+        if concurrency:
+            performance_data = asyncio.run(simulate_performance_async(db_url, queries, concurrency=concurrency,
+                                                                      timeout_ms=timeout_ms))
+        else:
+            performance_data = simulate_performance(db_url, queries, timeout_ms=timeout_ms)
+        
+        timed_out = sum(1 for perf in performance_data.values() if perf.get("timed_out"))
+        if timed_out:
+            print(f"\n{timed_out} of {len(queries)} queries hit the {timeout_ms}ms statement timeout")
+        
+        if param_samples:
+            replays = simulate_parameterized(db_url, dict(ranked), sample_size=param_samples, timeout_ms=timeout_ms)
+            for perf in performance_data.values():
+                if perf.get("fingerprint_id") in replays:
+                    perf["parameter_replay"] = replays[perf["fingerprint_id"]]
+            
+            print("\nParameter-sampled replay:\n")
+            print(tabulate([[r["fingerprint"][:60], r.get("samples", 0),
+                             f"{r.get('p50_cost', 0):.2f}", f"{r.get('p95_cost', 0):.2f}",
+                             len(r.get("plan_shapes", {})),
+                             "YES" if r.get("generic_plan_regression") else "",
+                             r.get("error", "")]
+                            for r in replays.values()],
+                           headers=['Fingerprint', 'Samples', 'p50 Cost', 'p95 Cost', 'Plans',
+                                    'Generic Regression', 'Error'],
+                           tablefmt='grid'))
+        model = build_workload_cost_model(query_analysis, performance_data)
+        unit = "ms" if model["basis"] == "time_ms" else "cost"
+        
+        print(f"\nWhere the time goes (total {model['total']:.2f} {unit}):\n")
+        print(tabulate([[fp["fingerprint"][:70], fp["count"], f"{fp['total']:.2f}", f"{fp['share']:.1f}%"]
+                        for fp in model["fingerprints"][:10]],
+                       headers=['Fingerprint', 'Count', f'Total ({unit})', 'Share'],
+                       tablefmt='grid'))
+        print()
+        print(tabulate([[t["table"], t["fingerprints"], f"{t['total']:.2f}", f"{t['share']:.1f}%"]
+                        for t in model["by_table"]],
+                       headers=['Table', 'Fingerprints', f'Total ({unit})', 'Share'],
+                       tablefmt='grid'))
+        print()
+        print(tabulate([[n["node_type"], f"{n['total']:.2f}", f"{n['share']:.1f}%"]
+                        for n in model["by_node_type"]],
+                       headers=['Plan Node', f'Total ({unit})', 'Share'],
+                       tablefmt='grid'))
+        
+        if output:
+            with open(output, 'w') as f:
+                json.dump(performance_data, f, indent=2, default=str)
+            print(f"\nPerformance data saved to {output}")
+        
+        if ctx.obj['metadata_store'].save_performance_data(performance_data, db_name):
+            print(f"\nPerformance data saved to metadata store with ID '{db_name}'")
+        
+        # Record plan fingerprints against the current schema snapshot for plan-diff
+        plans = [dict(perf["plan_summary"], query_fingerprint=perf["fingerprint_id"], query=perf["query"])
+                 for perf in performance_data.values() if perf.get("plan_summary")]
+        if plans and ctx.obj['metadata_store'].save_plan_fingerprints(plans, db_name):
+            print(f"Recorded {len(plans)} plan fingerprints for '{db_name}'")
+        
+        return performance_data
+        
+    except Exception as e:
+        logger.error(f"Error simulating queries: {str(e)}")
+        raise click.ClickException(f"Simulation failed: {str(e)}")
+
+@cli.command(name='plan-diff')
+@click.option('--db-name', help='Name identifier for the database', default='default')
+@click.option('--from-snapshot', help='Baseline schema snapshot ID')
+@click.option('--to-snapshot', help='Candidate schema snapshot ID')
+@click.option('--from-date', help='Baseline: plans recorded up to this date (YYYY-MM-DD)')
+@click.option('--to-date', help='Candidate: plans recorded up to this date (YYYY-MM-DD)')
+@click.option('--cost-threshold', default=1.5, help='Cost ratio above which a plan change is a regression')
+@click.option('--fail-on-regression', is_flag=True, help='Exit with an error if any regression is found')
+@click.pass_context
+def plan_diff(ctx, db_name, from_snapshot, to_snapshot, from_date, to_date, cost_threshold, fail_on_regression):
+    """Diff query plans between two schema snapshots or dates"""
+    try:
+        store = ctx.obj['metadata_store']
+        
+        # Default to the two most recent snapshots that have plans recorded
+        if not any([from_snapshot, to_snapshot, from_date, to_date]):
+            with_plans = [s["snapshot_id"] for s in store.list_schema_snapshots(db_name)
+                          if store.load_plan_fingerprints(db_name, snapshot_id=s["snapshot_id"])]
+            if len(with_plans) < 2:
+                raise click.ClickException("Need plans recorded for at least two snapshots. Run simulate after each extract.")
+            from_snapshot, to_snapshot = with_plans[-2], with_plans[-1]
+        
+        before = store.load_plan_fingerprints(db_name, snapshot_id=from_snapshot, on_date=from_date)
+        after = store.load_plan_fingerprints(db_name, snapshot_id=to_snapshot, on_date=to_date)
+        if not before or not after:
+            raise click.ClickException("No plan fingerprints found for one of the requested snapshots or dates.")
+        
+        changes = detect_plan_regressions(before, after, cost_threshold=cost_threshold)
+        regressions = [c for c in changes if c["regression"]]
+        
+        print(f"\nCompared {len(after)} query plans: {len(changes)} changed, {len(regressions)} regressions\n")
+        if changes:
+            print(tabulate([[(c["query"] or c["query_fingerprint"])[:60], f"{c['before_cost']:.2f}",
+                             f"{c['after_cost']:.2f}", "YES" if c["regression"] else "",
+                             "; ".join(c["reasons"]) or "plan shape changed"]
+                            for c in changes],
+                           headers=['Query', 'Before Cost', 'After Cost', 'Regression', 'Reason'],
+                           tablefmt='grid'))
+        
+        if regressions and fail_on_regression:
+            raise click.ClickException(f"{len(regressions)} plan regressions detected")
+        
+        return changes
+        
+    except Exception as e:
+        logger.error(f"Error diffing plans: {str(e)}")
+        raise click.ClickException(f"Plan diff failed: {str(e)}")
+
 @cli.command()
 @click.option('--schema-file', help='Schema file (JSON)')
 @click.option('--analysis-file', help='Query analysis file (JSON)')
+@click.option('--perf-file', help='Performance data file (JSON) from simulate')
 @click.option('--db-name', help='Name identifier for the database to load data from store', default='default')
+@click.option('--storage-budget-mb', type=float, help='Disk budget for new indexes in MB')
+@click.option('--max-write-amplification', type=float,
+              help='Maximum ratio of index structures maintained per write, after vs. before, per table')
 @click.option('--output', '-o', help='Output file for recommendations (JSON)')
 @click.pass_context
-def recommend(ctx, schema_file, analysis_file, db_name, output):
+def recommend(ctx, schema_file, analysis_file, perf_file, db_name, storage_budget_mb, max_write_amplification, output):
     """Generate optimization recommendations"""
     try:
         schema = None
         query_analysis = None
+        performance_data = None
         
         # Load schema
         if schema_file:
@@ -227,8 +399,18 @@ def recommend(ctx, schema_file, analysis_file, db_name, output):
             if not query_analysis:
                 raise click.ClickException("No query analysis found. Please provide an analysis file or ensure it exists in the store.")
         
+        # Load performance data (optional, enables workload-weighted prioritization)
+        if perf_file:
+            with open(perf_file, 'r') as f:
+                performance_data = json.load(f)
+        else:
+            performance_data = ctx.obj['metadata_store'].load_latest_performance_data(db_name)
+        
         logger.info("Generating optimization recommendations")
-        recommendations = recommend_changes(schema, query_analysis)
+        storage_budget_bytes = int(storage_budget_mb * 1048576) if storage_budget_mb is not None else None
+        recommendations = recommend_changes(schema, query_analysis, performance_data,
+                                            storage_budget_bytes=storage_budget_bytes,
+                                            max_write_amplification=max_write_amplification)
         
         # Print recommendations
         print("\nOptimization Recommendations:\n")
@@ -238,7 +420,14 @@ def recommend(ctx, schema_file, analysis_file, db_name, output):
         else:
             for i, rec in enumerate(recommendations, 1):
                 print(f"{i}. {rec['action']} table '{rec['table']}' - {rec['confidence']}% confidence")
+                if 'estimated_savings' in rec:
+                    print(f"   Estimated savings: {rec['estimated_savings']:.2f} {rec['savings_unit']}")
                 print(f"   Reason: {rec['reason']}")
+                for index in rec.get('indexes', []) if rec['action'] == 'INDEX' else []:
+                    include = f" INCLUDE ({', '.join(index['include'])})" if index['include'] else ""
+                    print(f"   - {index['name']} ({', '.join(index['columns'])}){include}: "
+                          f"benefit {index['benefit']:.0f}, write cost {index['write_cost']:.0f}, "
+                          f"{index['size_bytes'] / 1048576:.1f} MB")
                 print()
         
         # Save recommendations if output file is specified
@@ -263,10 +452,20 @@ def recommend(ctx, schema_file, analysis_file, db_name, output):
 @click.option('--db-name', help='Name identifier for the database to load data from store', default='default')
 @click.option('--table', help='Specific table to generate SQL for')
 @click.option('--action', help='Specific action to generate SQL for', 
-             type=click.Choice(['DENORMALIZE', 'NORMALIZE', 'INDEX', 'PARTITION'], case_sensitive=False))
+             type=click.Choice(['DENORMALIZE', 'NORMALIZE', 'INDEX', 'PARTITION', 'DROP_INDEX', 'MATERIALIZE'], case_sensitive=False))
+@click.option('--dialect', help='Target database type for generated SQL [default: type of the source database]',
+              type=click.Choice(['postgresql', 'mysql', 'sqlite'], case_sensitive=False))
+@click.option('--rows-per-partition', type=int, default=DEFAULT_ROWS_PER_PARTITION, show_default=True,
+              help='Target rows per partition for PARTITION plans')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, show_default=True,
+              help='Rows per batch in data migrations')
+@click.option('--throttle-ms', type=int, default=DEFAULT_THROTTLE_MS, show_default=True,
+              help='Pause between data migration batches in milliseconds')
 @click.option('--output-dir', help='Directory to save SQL files')
+@click.option('--db-url', help='Database connection URL to read exact partition column bounds from')
 @click.pass_context
-def generate(ctx, schema_file, rec_file, db_name, table, action, output_dir):
+def generate(ctx, schema_file, rec_file, db_name, table, action, dialect, rows_per_partition, batch_size,
+             throttle_ms, output_dir, db_url):
     """Generate SQL implementation plan for recommendations"""
     try:
         schema = None
@@ -304,13 +503,27 @@ def generate(ctx, schema_file, rec_file, db_name, table, action, output_dir):
             print("No matching recommendations found.")
             return []
         
-        # Generate SQL for each recommendation
-        sql_plans = []
-        for rec in filtered_recs:
-            logger.info(f"Generating SQL plan for {rec['action']} on {rec['table']}")
-            plan = generate_sql(rec, schema)
-            sql_plans.append(plan)
-            
+        # Generate for the source database unless told otherwise, as apply does
+        if not dialect:
+            if db_url:
+                dialect = detect_database_type(db_url)
+            else:
+                dialect = (ctx.obj['metadata_store'].load_database_info(db_name) or {}).get("db_type")
+            if dialect not in ('postgresql', 'mysql', 'sqlite'):
+                raise click.ClickException(
+                    f"Unknown database type for '{db_name}'. Pass --dialect, or --db-url of the source database."
+                )
+            print(f"Generating SQL for {dialect}")
+        
+        # Partition ranges should cover the real data, not just the sampled statistics
+        if db_url:
+            refresh_partition_bounds(db_url, schema, filtered_recs)
+        
+        # Generate SQL for all recommendations in one pass
+        sql_plans = generate_all(filtered_recs, schema, dialect=dialect.lower(),
+                                 options={"rows_per_partition": rows_per_partition,
+                                          "batch_size": batch_size, "throttle_ms": throttle_ms})
+        for plan in sql_plans:
             # Print the plan
             print(f"\n{'='*80}")
             print(f"SQL PLAN: {plan['action']} for table '{plan['table']}'")
@@ -325,9 +538,16 @@ def generate(ctx, schema_file, rec_file, db_name, table, action, output_dir):
             if plan['caution']:
                 print(f"\nCaution: {plan['caution']}")
             
+            if plan.get('estimated_size_bytes') is not None:
+                print(f"\nEstimated index size: {plan['estimated_size_bytes'] / (1024 * 1024):.1f} MB, "
+                      f"build time: {plan['estimated_build_seconds']:.1f}s")
+            
             print("\nSQL Statements:")
             for i, stmt in enumerate(plan['statements'], 1):
                 print(f"\n-- Statement {i}: {stmt['type']}")
+                if stmt.get('estimated_size_bytes') is not None:
+                    print(f"-- Estimated size: {stmt['estimated_size_bytes'] / (1024 * 1024):.1f} MB, "
+                          f"build time: {stmt['estimated_build_seconds']:.1f}s")
                 print(stmt['sql'])
             
             # Save SQL to file if output directory is specified
@@ -360,6 +580,486 @@ def generate(ctx, schema_file, rec_file, db_name, table, action, output_dir):
         logger.error(f"Error generating SQL: {str(e)}")
         raise click.ClickException(f"SQL generation failed: {str(e)}")
 
+@cli.command()
+@click.option('--db-url', required=True, help='Database connection URL to apply the plans to')
+@click.option('--schema-file', help='Schema file (JSON)')
+@click.option('--rec-file', help='Recommendations file (JSON)')
+@click.option('--db-name', help='Name identifier for the database to load data from store', default='default')
+@click.option('--table', help='Specific table to apply plans for')
+@click.option('--action', help='Specific action to apply plans for',
+             type=click.Choice(['DENORMALIZE', 'NORMALIZE', 'INDEX', 'PARTITION', 'DROP_INDEX', 'MATERIALIZE'], case_sensitive=False))
+@click.option('--concurrency', type=int, default=DEFAULT_EXECUTION_CONCURRENCY, show_default=True,
+              help='Maximum number of independent steps running at once')
+@click.option('--rows-per-partition', type=int, default=DEFAULT_ROWS_PER_PARTITION, show_default=True,
+              help='Target rows per partition for PARTITION plans')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, show_default=True,
+              help='Rows per batch in data migrations')
+@click.option('--throttle-ms', type=int, default=DEFAULT_THROTTLE_MS, show_default=True,
+              help='Pause between data migration batches in milliseconds')
+@click.option('--resume', 'run_id', help='Run ID of an interrupted run to resume')
+@click.option('--dry-run', is_flag=True, help='Show the execution order without running anything')
+@click.pass_context
+def apply(ctx, db_url, schema_file, rec_file, db_name, table, action, concurrency, rows_per_partition,
+          batch_size, throttle_ms, run_id, dry_run):
+    """Apply SQL plans for recommendations, running independent steps in parallel"""
+    try:
+        store = ctx.obj['metadata_store']
+        
+        if schema_file:
+            with open(schema_file, 'r') as f:
+                schema = json.load(f)
+        else:
+            schema = store.load_latest_schema(db_name)
+            if not schema:
+                raise click.ClickException("No schema found. Please provide a schema file or ensure it exists in the store.")
+        
+        if rec_file:
+            with open(rec_file, 'r') as f:
+                recommendations = json.load(f)
+        else:
+            recommendations = store.load_latest_recommendations(db_name)
+            if not recommendations:
+                raise click.ClickException("No recommendations found. Please provide a recommendations file or ensure it exists in the store.")
+        
+        if table:
+            recommendations = [r for r in recommendations if r['table'] == table]
+        if action:
+            recommendations = [r for r in recommendations if r['action'] == action.upper()]
+        
+        dialect = detect_database_type(db_url)
+        refresh_partition_bounds(db_url, schema, recommendations)
+        options = {"rows_per_partition": rows_per_partition, "batch_size": batch_size, "throttle_ms": throttle_ms}
+        plans = generate_all(recommendations, schema, dialect=dialect, options=options)
+        for plan in plans:
+            if 'error' in plan:
+                print(f"Skipping {plan.get('action')} on '{plan.get('table')}': {plan['error']}")
+        
+        result = execute_plans(db_url, plans, schema=schema, store=store, db_name=db_name, run_id=run_id,
+                               concurrency=concurrency, dry_run=dry_run)
+        
+        table_rows = [[step["id"], step["status"], ", ".join(step["depends_on"]) or "-",
+                       step.get("elapsed_seconds", step["estimated_seconds"]), step.get("error", "")]
+                      for step in result["steps"]]
+        print(tabulate(table_rows, headers=["Step", "Status", "Depends on", "Seconds", "Error"], tablefmt="grid"))
+        
+        estimate = result["estimate"]
+        print(f"\nEstimated build time: {estimate['critical_path_seconds']}s on the critical path, "
+              f"{estimate['serial_seconds']}s if run serially")
+        if dry_run:
+            print(f"Dry run {result['run_id']}: nothing was executed")
+        else:
+            print(f"Run {result['run_id']}: {result['done']} done, {result['failed']} failed, "
+                  f"{result['skipped']} skipped in {result['elapsed_seconds']}s")
+            if result['failed'] or result['skipped']:
+                print(f"Fix the failure and resume with --resume {result['run_id']}")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error applying plans: {str(e)}")
+        raise click.ClickException(f"Plan execution failed: {str(e)}")
+
+@cli.command()
+@click.option('--db-url', required=True, help='Source database connection URL to sample data from')
+@click.option('--scratch-url', help='Scratch database URL, wiped on every run (default: temporary SQLite file)')
+@click.option('--schema-file', help='Schema file (JSON)')
+@click.option('--rec-file', help='Recommendations file (JSON)')
+@click.option('--log-file', help='SQL query log file (default: latest stored query analysis)')
+@click.option('--db-name', help='Name identifier for the database to load data from store', default='default')
+@click.option('--table', help='Specific table to measure recommendations for')
+@click.option('--action', help='Specific action to measure',
+             type=click.Choice(['DENORMALIZE', 'NORMALIZE', 'INDEX', 'PARTITION', 'DROP_INDEX', 'MATERIALIZE'], case_sensitive=False))
+@click.option('--top', type=int, default=DEFAULT_REPLAY_TOP, show_default=True,
+              help='Number of most frequent fingerprints to replay')
+@click.option('--iterations', type=int, default=DEFAULT_REPLAY_ITERATIONS, show_default=True,
+              help='Timed executions per fingerprint')
+@click.option('--sample-rows', type=int, default=DEFAULT_SAMPLE_ROWS, show_default=True,
+              help='Rows sampled from each table into the scratch database')
+@click.pass_context
+def measure(ctx, db_url, scratch_url, schema_file, rec_file, log_file, db_name, table, action, top, iterations,
+            sample_rows):
+    """Measure recommendations by applying them to a scratch copy and replaying the workload"""
+    try:
+        store = ctx.obj['metadata_store']
+        
+        if schema_file:
+            with open(schema_file, 'r') as f:
+                schema = json.load(f)
+        else:
+            schema = store.load_latest_schema(db_name)
+            if not schema:
+                raise click.ClickException("No schema found. Please provide a schema file or ensure it exists in the store.")
+        
+        if rec_file:
+            with open(rec_file, 'r') as f:
+                recommendations = json.load(f)
+        else:
+            recommendations = store.load_latest_recommendations(db_name)
+            if not recommendations:
+                raise click.ClickException("No recommendations found. Please provide a recommendations file or ensure it exists in the store.")
+        
+        query_analysis = parse_query_logs(log_file) if log_file else store.load_latest_query_analysis(db_name)
+        if not query_analysis:
+            raise click.ClickException("No query analysis found. Please provide a log file or run analyze first.")
+        
+        if table:
+            recommendations = [r for r in recommendations if r['table'] == table]
+        if action:
+            recommendations = [r for r in recommendations if r['action'] == action.upper()]
+        
+        measurements = measure_recommendations(recommendations, schema, query_analysis, db_url, scratch_url,
+                                               store=store, db_name=db_name, top=top, iterations=iterations,
+                                               sample_rows=sample_rows)
+        
+        def _fmt(value, pattern):
+            return pattern.format(value) if value is not None else "-"
+        
+        def _range(values, pattern):
+            return f"{pattern.format(values[0])} .. {pattern.format(values[1])}" if values else "-"
+        
+        def _p(value, significant):
+            return _fmt(value, "{:.3f}") + (" *" if significant else "")
+        
+        table_rows = []
+        for m in measurements:
+            if m.get("error"):
+                table_rows.append([m["action"], m["table"], m["error"], "", "", "", "", ""])
+                continue
+            table_rows.append([m["action"], m["table"],
+                               _fmt(m.get("read_speedup"), "{:.2f}x"),
+                               _range(m.get("read_speedup_range"), "{:.2f}x"),
+                               _p(m.get("read_speedup_p_value"), m.get("read_speedup_significant")),
+                               _fmt(m.get("write_overhead_pct"), "{:+.1f}%"),
+                               _range(m.get("write_overhead_range_pct"), "{:+.1f}%"),
+                               _p(m.get("write_overhead_p_value"), m.get("write_overhead_significant"))])
+        print(tabulate(table_rows, headers=["Action", "Table", "Read speedup", "Range", "p", "Write overhead",
+                                            "Range", "p"], tablefmt="grid"))
+        print("* significant change")
+        
+        return measurements
+        
+    except Exception as e:
+        logger.error(f"Error measuring recommendations: {str(e)}")
+        raise click.ClickException(f"Measurement failed: {str(e)}")
+
+@cli.command()
+@click.option('--db-url', required=True, help='Database connection URL to replay the workload against')
+@click.option('--log-file', help='SQL query log to replay with its original timing')
+@click.option('--db-name', help='Name identifier for the database to load data from store', default='default')
+@click.option('--speedup', type=float, default=1.0, show_default=True,
+              help='Compress the logged timing by this factor')
+@click.option('--limit', type=int, help='Replay at most this many logged statements')
+@click.option('--qps', type=float, default=100.0, show_default=True,
+              help='Statement rate when replaying the stored fingerprint mix instead of a log')
+@click.option('--duration', type=float, default=30.0, show_default=True,
+              help='Seconds to replay the stored fingerprint mix for')
+@click.option('--sessions', type=int, default=DEFAULT_REPLAY_SESSIONS, show_default=True,
+              help='Concurrent database sessions')
+@click.option('--commit-writes', is_flag=True, help='Commit replayed writes instead of rolling them back')
+@click.option('--output', '-o', help='Output file for replay results (JSON)')
+@click.pass_context
+def replay(ctx, db_url, log_file, db_name, speedup, limit, qps, duration, sessions, commit_writes, output):
+    """Replay the logged workload mix open-loop and report latency per fingerprint"""
+    try:
+        if log_file:
+            schedule = load_replay_schedule(log_file, speedup=speedup, limit=limit)
+        else:
+            query_analysis = ctx.obj['metadata_store'].load_latest_query_analysis(db_name)
+            if not query_analysis:
+                raise click.ClickException("No query analysis found. Please provide a log file or run analyze first.")
+            schedule = synthesize_replay_schedule(query_analysis.get("fingerprints", {}), qps, duration)
+        
+        if not schedule["events"]:
+            raise click.ClickException("No statements to replay.")
+        
+        result = PerformanceBenchmark(db_url).replay_workload(schedule, concurrent_sessions=sessions,
+                                                              rollback_writes=not commit_writes)
+        
+        print(f"Replayed {result['completed']} of {result['statements']} statements in "
+              f"{result['elapsed_seconds']:.1f}s ({result['achieved_qps']:.1f} QPS), "
+              f"{result['failed']} failed, {result['abandoned']} abandoned")
+        if result['skipped_statements']:
+            print(f"Skipped {result['skipped_statements']} logged statements that are not queries or writes "
+                  f"(DDL, SET, transaction control)")
+        table_rows = [[fp["fingerprint"][:60], fp["type"], fp["completed"], f"{fp['latency']['p50']:.2f}",
+                       f"{fp['latency']['p99']:.2f}", f"{fp['latency']['p99_9']:.2f}", fp["failed"]]
+                      for fp in result["fingerprints"].values()]
+        print(tabulate(table_rows, headers=["Fingerprint", "Type", "Executed", "p50 ms", "p99 ms", "p99.9 ms", "Failed"],
+                       tablefmt="grid"))
+        
+        if output:
+            with open(output, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f"\nReplay results saved to {output}")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error replaying workload: {str(e)}")
+        raise click.ClickException(f"Replay failed: {str(e)}")
+
+@cli.command(name='generate-data')
+@click.option('--db-url', required=True, help='Database connection URL to fill with synthetic data')
+@click.option('--schema-file', help='Schema file (JSON)')
+@click.option('--db-name', help='Name identifier for the database to load the schema from store', default='default')
+@click.option('--scale', type=float, default=1.0, show_default=True,
+              help='Multiple of each table\'s extracted row count')
+@click.option('--rows', multiple=True, help='Explicit row count for a table as TABLE=N (repeatable)')
+@click.option('--skew', type=float, default=DEFAULT_ZIPF_SKEW, show_default=True,
+              help='Zipf exponent for foreign keys and columns without statistics (0 for uniform)')
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed')
+@click.option('--create-tables', is_flag=True, help='Create the tables before loading them')
+@click.pass_context
+def generate_data_command(ctx, db_url, schema_file, db_name, scale, rows, skew, seed, create_tables):
+    """Generate foreign-key-consistent synthetic data shaped like a schema"""
+    try:
+        if schema_file:
+            with open(schema_file, 'r') as f:
+                schema = json.load(f)
+        else:
+            schema = ctx.obj['metadata_store'].load_latest_schema(db_name)
+            if not schema:
+                raise click.ClickException("No schema found. Please provide a schema file or ensure it exists in the store.")
+        
+        row_overrides = {}
+        for entry in rows:
+            table, _, count = entry.partition('=')
+            row_overrides[table] = int(count)
+        
+        result = generate_data(db_url, schema, scale_factor=scale, rows=row_overrides, seed=seed, skew=skew,
+                               create_tables=create_tables)
+        
+        table_rows = [[table, stats.get("error") or stats["rows"], stats.get("method", ""),
+                       f"{stats['rows_per_second']:.0f}" if "rows_per_second" in stats else ""]
+                      for table, stats in result["tables"].items()]
+        print(tabulate(table_rows, headers=["Table", "Rows", "Method", "Rows/s"], tablefmt="grid"))
+        print(f"\nGenerated {result['rows']} rows in {result['seconds']:.1f}s ({result['rows_per_second']:.0f} rows/s)")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error generating data: {str(e)}")
+        raise click.ClickException(f"Data generation failed: {str(e)}")
+
+@cli.command()
+@click.option('--db-url', required=True, help='Database connection URL to benchmark')
+@click.option('--query', required=True, help='SQL query to benchmark')
+@click.option('--mode', type=click.Choice(['quick', 'throughput']), default='quick', show_default=True,
+              help='Time repeated runs of the query, or measure throughput under concurrent load')
+@click.option('--iterations', type=int, default=100, show_default=True, help='Timed runs in quick mode')
+@click.option('--duration', type=int, default=10, show_default=True, help='Seconds of load in throughput mode')
+@click.option('--clients', type=int, default=5, show_default=True, help='Concurrent clients in throughput mode')
+@click.option('--processes', is_flag=True, help='Run each throughput client in its own process')
+@click.option('--fetch', type=click.Choice(FETCH_MODES), default=DEFAULT_FETCH_MODE, show_default=True,
+              help='Execute only, fetch all rows, stream them through a server-side cursor, '
+                   'or stream them and count their bytes')
+@click.option('--label', help='Label stored with the run, e.g. a commit or release name')
+@click.option('--db-name', help='Name identifier for the database', default='default')
+@click.pass_context
+def benchmark(ctx, db_url, query, mode, iterations, duration, clients, processes, fetch, label, db_name):
+    """Benchmark a query and store the run for later comparison"""
+    try:
+        store = ctx.obj['metadata_store']
+        bench = PerformanceBenchmark(db_url)
+        if mode == 'quick':
+            result = bench.time_query(query, iterations=iterations, fetch=fetch)
+        else:
+            result = bench.run_throughput_test(query, duration=duration, concurrent_clients=clients,
+                                               use_processes=processes, fetch=fetch)
+        
+        run = benchmark_run_record(result, mode, query=query, label=label, schema=store.load_latest_schema(db_name),
+                                   connection_url=db_url)
+        run_id = store.save_benchmark_run(run, db_name)
+        
+        if mode == 'throughput':
+            print(f"Throughput: {result['queries_per_second']:.1f} QPS with {clients} clients")
+            latency = [result['median_latency_ms'], result['p90_latency_ms'], result['p99_latency_ms'],
+                       result['p99_9_latency_ms']]
+        else:
+            latency = [result['median'], result['p90'], result['p99'], result['p99_9']]
+        print(tabulate([[f"{value:.3f}" for value in latency]],
+                       headers=['p50 ms', 'p90 ms', 'p99 ms', 'p99.9 ms'], tablefmt='grid'))
+        if mode == 'quick' and fetch != 'execute':
+            first_row = f"{result['first_row']['median']:.3f}ms" if result['first_row'] else "n/a"
+            transfer = f", {result['bytes_per_query'] / 1024:.1f} KiB" if result['bytes_per_query'] is not None else ""
+            print(f"Median execute {result['execute']['median']:.3f}ms, first row {first_row}, "
+                  f"full fetch {result['median']:.3f}ms; {result['rows_per_query']:.0f} rows per query{transfer}")
+        resources = result.get('resources')
+        if resources:
+            hit_ratio = f"{resources['buffer_hit_ratio']:.2%}" if resources['buffer_hit_ratio'] is not None else "n/a"
+            print(f"\nServer resources over {resources['duration_seconds']:.1f}s (buffer hit ratio {hit_ratio}):")
+            print(tabulate([[name, f"{resources['totals'][name]:.0f}", f"{resources['per_query'][name]:.2f}"]
+                            for name in HEADLINE_COUNTERS[resources['dialect']] if name in resources['totals']],
+                           headers=['Counter', 'Total', 'Per Query'], tablefmt='grid'))
+        if run_id:
+            print(f"\nStored benchmark run {run_id}" + (f" ({label})" if label else ""))
+        
+        return run
+        
+    except Exception as e:
+        logger.error(f"Error running benchmark: {str(e)}")
+        raise click.ClickException(f"Benchmark failed: {str(e)}")
+
+@cli.command(name='benchmark-history')
+@click.option('--db-name', help='Name identifier for the database', default='default')
+@click.option('--label', help='Only list runs with this label')
+@click.pass_context
+def benchmark_history(ctx, db_name, label):
+    """List stored benchmark runs"""
+    runs = ctx.obj['metadata_store'].list_benchmark_runs(db_name, label=label)
+    if not runs:
+        print(f"No benchmark runs stored for '{db_name}'")
+        return runs
+    
+    table_rows = []
+    for run in runs:
+        result = run["result"]
+        p99 = result.get("p99", result.get("p99_latency_ms"))
+        qps = result.get("queries_per_second")
+        table_rows.append([run["run_id"], run["timestamp"][:19], run.get("label") or "", run["mode"],
+                           run.get("concurrent_clients"), (run.get("schema_fingerprint") or "")[:12],
+                           f"{p99:.3f}" if p99 is not None else "", f"{qps:.1f}" if qps is not None else ""])
+    print(tabulate(table_rows, headers=['Run', 'Timestamp', 'Label', 'Mode', 'Clients', 'Schema', 'p99 ms', 'QPS'],
+                   tablefmt='grid'))
+    return runs
+
+@cli.command(name='benchmark-compare')
+@click.option('--db-name', help='Name identifier for the database', default='default')
+@click.option('--baseline', help='Baseline run ID (defaults to the latest run with --baseline-label, '
+                                 'or the second most recent run)')
+@click.option('--candidate', help='Candidate run ID (defaults to the latest run with --candidate-label, '
+                                  'or the most recent run)')
+@click.option('--baseline-label', help='Use the latest run with this label as the baseline')
+@click.option('--candidate-label', help='Use the latest run with this label as the candidate')
+@click.option('--alpha', type=float, default=DEFAULT_SIGNIFICANCE, show_default=True,
+              help='Significance level of the latency shift test')
+@click.option('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD_PCT, show_default=True,
+              help='Median or p99 latency increase (%) that counts as a regression')
+@click.option('--fail-on-regression', is_flag=True, help='Exit with an error if the candidate regressed')
+@click.option('--output', '-o', help='Output file for the comparison (JSON)')
+@click.pass_context
+def benchmark_compare(ctx, db_name, baseline, candidate, baseline_label, candidate_label, alpha, threshold,
+                      fail_on_regression, output):
+    """Compare two benchmark runs and test the latency change for significance"""
+    try:
+        store = ctx.obj['metadata_store']
+        
+        def pick_run(run_id, label, position):
+            """Run by ID, else the latest run with a label, else by position in the history"""
+            if run_id:
+                return store.load_benchmark_run(run_id, db_name)
+            runs = store.list_benchmark_runs(db_name, label=label)
+            if label:
+                return runs[-1] if runs else None
+            return runs[position] if len(runs) >= -position else None
+        
+        before = pick_run(baseline, baseline_label, -2)
+        after = pick_run(candidate, candidate_label, -1)
+        if not before or not after:
+            raise click.ClickException("Could not find both benchmark runs. Run benchmark to record them.")
+        
+        comparison = compare_benchmark_runs(before, after, alpha=alpha, threshold_pct=threshold)
+        test = comparison["mann_whitney"]
+        
+        print(f"\nBaseline run {before['run_id']} ({before.get('label') or 'unlabelled'}) vs "
+              f"candidate run {after['run_id']} ({after.get('label') or 'unlabelled'})\n")
+        table_rows = [[key, f"{change['before_ms']:.3f}", f"{change['after_ms']:.3f}",
+                       f"{change['change_pct']:+.1f}%" if change['change_pct'] is not None else ""]
+                      for key, change in comparison["latency"].items()
+                      if change['before_ms'] is not None and change['after_ms'] is not None]
+        if "throughput" in comparison:
+            throughput = comparison["throughput"]
+            table_rows.append(["qps", f"{throughput['before_qps']:.1f}", f"{throughput['after_qps']:.1f}",
+                               f"{throughput['change_pct']:+.1f}%" if throughput['change_pct'] is not None else ""])
+        print(tabulate(table_rows, headers=['Metric', 'Baseline', 'Candidate', 'Change'], tablefmt='grid'))
+        
+        if "resources" in comparison:
+            print("\nServer resources per query:")
+            print(tabulate([[name, f"{change['before']:.2f}", f"{change['after']:.2f}",
+                             f"{change['change_pct']:+.1f}%" if change['change_pct'] is not None else ""]
+                            for name, change in comparison["resources"]["per_query"].items()],
+                           headers=['Counter', 'Baseline', 'Candidate', 'Change'], tablefmt='grid'))
+        
+        if test["p_value"] is not None:
+            print(f"\nMann-Whitney U: p={test['p_value']:.4f}, P(candidate slower)={test['probability_slower']:.2f} "
+                  f"({test['baseline_samples']} vs {test['candidate_samples']} samples)")
+        for warning in comparison["warnings"]:
+            print(f"Warning: {warning}")
+        print(f"Regression: {'YES - ' + '; '.join(comparison['reasons']) if comparison['regression'] else 'no'}")
+        
+        if output:
+            with open(output, 'w') as f:
+                json.dump(comparison, f, indent=2)
+            print(f"\nComparison saved to {output}")
+        
+        if comparison["regression"] and fail_on_regression:
+            raise click.ClickException("Benchmark regression detected")
+        
+        return comparison
+        
+    except Exception as e:
+        logger.error(f"Error comparing benchmark runs: {str(e)}")
+        raise click.ClickException(f"Benchmark comparison failed: {str(e)}")
+
+@cli.command(name='self-benchmark')
+@click.option('--tier', type=click.Choice(list(TIERS)), default='small', show_default=True,
+              help='Scale tier: small (1K log lines, 10 tables), medium (100K, 1K) or large (10M, 10K)')
+@click.option('--log-lines', type=int, help='Override the tier\'s number of log lines')
+@click.option('--tables', type=int, help='Override the tier\'s number of tables')
+@click.option('--repeat', type=int, help='Override the tier\'s number of timed runs per case')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed of the generated schema and log')
+@click.option('--case', 'cases', multiple=True, type=click.Choice(CASES), help='Only time this case (repeatable)')
+@click.option('--no-memory', is_flag=True, help='Skip the peak memory measurement')
+@click.option('--label', help='Label stored with the results, e.g. a version')
+@click.option('--output', '-o', help='Output file for the results (JSON)')
+@click.option('--compare', 'baseline_file', help='Earlier results file (JSON) to compare against')
+@click.option('--threshold', type=float, default=DEFAULT_SLOWDOWN_THRESHOLD_PCT, show_default=True,
+              help='Median slowdown (%) that counts as a regression')
+@click.option('--fail-on-regression', is_flag=True, help='Exit with an error if any case regressed')
+@click.pass_context
+def self_benchmark(ctx, tier, log_lines, tables, repeat, seed, cases, no_memory, label, output, baseline_file,
+                   threshold, fail_on_regression):
+    """Benchmark DEnode's own pipeline on generated schemas and query logs"""
+    try:
+        results = run_suite(tier, log_lines=log_lines, tables=tables, repeats=repeat, seed=seed,
+                            profile_memory=not no_memory, cases=list(cases) or None, label=label)
+        
+        table_rows = [[name, case["items"], f"{case['median_seconds']:.4f}", f"{case['min_seconds']:.4f}",
+                       f"{case['items_per_second']:.0f}" if case["items_per_second"] else "",
+                       f"{case['peak_memory_bytes'] / 1048576:.1f}" if case["peak_memory_bytes"] is not None else ""]
+                      for name, case in results["cases"].items()]
+        print(tabulate(table_rows, headers=['Case', 'Items', 'Median s', 'Min s', 'Items/s', 'Peak MiB'],
+                       tablefmt='grid'))
+        
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"\nBenchmark results saved to {output}")
+        
+        if baseline_file:
+            with open(baseline_file, 'r') as f:
+                baseline = json.load(f)
+            comparison = compare_results(baseline, results, threshold_pct=threshold)
+            
+            print(f"\nCompared with {baseline_file} (revision {comparison['baseline_revision'] or 'unknown'}):")
+            print(tabulate([[name, f"{case['before_seconds']:.4f}", f"{case['after_seconds']:.4f}",
+                             f"{case['time_change_pct']:+.1f}%" if case['time_change_pct'] is not None else "",
+                             f"{case['memory_change_pct']:+.1f}%" if case['memory_change_pct'] is not None else "",
+                             "YES" if case['regression'] else ""]
+                            for name, case in comparison["cases"].items()],
+                           headers=['Case', 'Before s', 'After s', 'Time', 'Memory', 'Regression'], tablefmt='grid'))
+            for warning in comparison["warnings"]:
+                print(f"Warning: {warning}")
+            
+            if comparison["regressions"] and fail_on_regression:
+                raise click.ClickException(f"{len(comparison['regressions'])} benchmark cases regressed")
+        
+        return results
+        
+    except Exception as e:
+        logger.error(f"Error running self-benchmark: {str(e)}")
+        raise click.ClickException(f"Self-benchmark failed: {str(e)}")
+
 @cli.command()
 @click.option('--db-url', required=True, help='Database connection URL')
 @click.option('--log-file', required=True, help='SQL query log file')
@@ -399,7 +1099,7 @@ def full_analyze(ctx, db_url, log_file, db_name, output_dir):
         print("\n=== Step 4: Generating SQL Implementation Plans ===\n")
         sql_plans = ctx.invoke(generate, 
                              output_dir=os.path.join(output_dir, "sql") if output_dir else None,
-                             db_name=db_name)
+                             db_name=db_name, db_url=db_url)
         
         print(f"\n=== Analysis Pipeline Complete for '{db_name}' ===")
         print(f"Found {len(schema)} tables")
@@ -1,10 +1,410 @@
 import re
 import os
+import random
+import hashlib
 import logging
 from collections import defaultdict, Counter
 
 logger = logging.getLogger(__name__)
 
+# Postgres-style log prefix: "2025-04-20 10:15:32.456 UTC [12345] LOG:  EXECUTE: ..."
+LOG_PREFIX_PATTERN = re.compile(
+    r'^(?P<timestamp>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?)'
+    r'(?:\s+[A-Z]{2,5})?(?:\s+\[\d+\])?\s+(?:LOG|STATEMENT):\s+'
+    r'(?:duration:\s+(?P<duration>[0-9.]+)\s+ms\s*)?'
+    r'(?:(?:statement|execute(?:\s+[^:]+)?):\s+)?',
+    re.IGNORECASE
+)
+
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_PATTERN = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+IN_LIST_PATTERN = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TABLE_PATTERN = re.compile(r'(?:FROM|JOIN|INTO|UPDATE)\s+([a-zA-Z0-9_]+)', re.IGNORECASE)
+STATEMENT_TYPE_PATTERN = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+LITERAL_PATTERN = re.compile(r"(?P<string>'(?:[^']|'')*')|(?P<number>(?<![\w.:$])-?\d+(?:\.\d+)?(?![\w.]))")
+# Colons of a template that are not one of its :pN placeholders
+NON_PLACEHOLDER_COLON_PATTERN = re.compile(r':(?!p\d+\b)')
+
+# Number of concrete parameter sets kept per fingerprint for replay
+PARAMETER_SAMPLE_SIZE = 20
+
+CLAUSE_KEYWORDS = ["SELECT", "FROM", "WHERE", "GROUP BY", "HAVING", "ORDER BY", "LIMIT", "OFFSET",
+                   "UPDATE", "SET", "DELETE", "INSERT INTO", "VALUES", "RETURNING", "ON CONFLICT"]
+CLAUSE_PATTERN = re.compile(r'\b(' + '|'.join(k.replace(' ', r'\s+') for k in CLAUSE_KEYWORDS) + r')\b', re.IGNORECASE)
+TABLE_REF_PATTERN = re.compile(
+    r'(?:^|,|\bJOIN)\s+([a-zA-Z_][\w.]*)'
+    r'(?:\s+(?:AS\s+)?(?!(?:ON|JOIN|LEFT|RIGHT|INNER|OUTER|FULL|CROSS|NATURAL|USING|WHERE)\b)([a-zA-Z_]\w*))?',
+    re.IGNORECASE
+)
+JOIN_CONDITION_PATTERN = re.compile(r'\bON\s+(.+?)(?=\b(?:LEFT|RIGHT|INNER|FULL|CROSS|NATURAL|JOIN)\b|$)', re.IGNORECASE)
+COLUMN_REF = r'(?:[a-zA-Z_]\w*\.)?[a-zA-Z_]\w*'
+PREDICATE_PATTERN = re.compile(
+    r'(?<![\w.\'])(' + COLUMN_REF + r')\s*(=|<>|!=|<=|>=|<|>|\bNOT\s+LIKE\b|\bLIKE\b|\bILIKE\b|'
+    r'\bNOT\s+IN\b|\bIN\b|\bBETWEEN\b|\bIS\s+NOT\b|\bIS\b)\s*(' + COLUMN_REF + r'(?!\s*\()|\'(?:[^\']|\'\')*\'|\S+)?',
+    re.IGNORECASE
+)
+AGGREGATE_PATTERN = re.compile(r'\b(COUNT|SUM|AVG|MIN|MAX)\s*\(\s*(DISTINCT\s+)?([^()]*?)\s*\)(?:\s+(?:AS\s+)?([a-zA-Z_]\w*))?',
+                               re.IGNORECASE)
+SQL_WORDS = {"and", "or", "not", "null", "true", "false", "select", "from", "where", "case", "when", "then",
+             "else", "end", "as", "on", "in", "is", "like", "between", "distinct", "current_timestamp",
+             "current_date", "interval", "exists", "asc", "desc", "nulls", "first", "last"}
+
+def fingerprint_query(query):
+    """
+    Normalize a query so that statements differing only in literal values
+    collapse to the same fingerprint.
+    
+    Args:
+        query (str): SQL statement
+        
+    Returns:
+        str: Normalized query text with literals replaced by '?'
+    """
+    normalized = re.sub(r'--[^\n]*', ' ', query)
+    normalized = STRING_LITERAL_PATTERN.sub('?', normalized)
+    normalized = NUMBER_LITERAL_PATTERN.sub('?', normalized)
+    normalized = IN_LIST_PATTERN.sub('(?)', normalized)
+    normalized = WHITESPACE_PATTERN.sub(' ', normalized).strip().rstrip(';').strip()
+    return normalized.lower()
+
+def fingerprint_id(query):
+    """
+    Short stable identifier for the fingerprint of a query.
+    
+    Args:
+        query (str): SQL statement
+        
+    Returns:
+        str: 16 character hex digest of the normalized query
+    """
+    return hashlib.md5(fingerprint_query(query).encode('utf-8')).hexdigest()[:16]
+
+def parameterize_query(query):
+    """
+    Replace every literal in a query with a named bind parameter.
+    
+    Args:
+        query (str): SQL statement with concrete literals
+        
+    Returns:
+        tuple: (template with :p1..:pN placeholders, list of literal values)
+    """
+    params = []
+    
+    def _replace(match):
+        if match.group('string') is not None:
+            params.append(match.group('string')[1:-1].replace("''", "'"))
+        else:
+            number = match.group('number')
+            params.append(float(number) if '.' in number else int(number))
+        return f":p{len(params)}"
+    
+    template = LITERAL_PATTERN.sub(_replace, query.strip().rstrip(';'))
+    return template, params
+
+def bindable_template(template):
+    """
+    Template from parameterize_query in the form SQLAlchemy's text() binds.
+    
+    text() does not read :p1 as a parameter when a Postgres cast follows
+    (:p1::date), and would send it to the server as is. Every colon that
+    is not a placeholder is escaped, which text() turns back into a colon.
+    
+    Args:
+        template (str): Query with :p1..:pN placeholders
+        
+    Returns:
+        str: Template to pass to text()
+    """
+    return NON_PLACEHOLDER_COLON_PATTERN.sub(r'\\:', template)
+
+def _split_clauses(sql):
+    """Split a statement into its top-level clauses, ignoring subqueries and literals"""
+    depth = 0
+    in_string = False
+    masked = []
+    for char in sql:
+        if char == "'":
+            in_string = not in_string
+        elif not in_string and char == '(':
+            depth += 1
+        elif not in_string and char == ')':
+            depth -= 1
+        # Keep text at the top level only so keywords inside subqueries are skipped
+        masked.append(char if depth == 0 and not in_string else ' ')
+    masked = ''.join(masked)
+    
+    clauses = {}
+    matches = list(CLAUSE_PATTERN.finditer(masked))
+    for i, match in enumerate(matches):
+        keyword = ' '.join(match.group(1).upper().split())
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(sql)
+        clauses.setdefault(keyword, sql[match.end():end].strip())
+    return clauses
+
+def _split_top_level(text_value, separator=','):
+    """Split on a separator outside parentheses"""
+    parts, depth, current = [], 0, []
+    for char in text_value:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == separator and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+def extract_query_structure(query):
+    """
+    Extract the tables, predicates, joins and column lists of a statement.
+    
+    Column references are resolved to tables through the aliases in the FROM
+    clause. Unqualified columns in multi-table statements keep table None and
+    are resolved against the schema by the consumer.
+    
+    Args:
+        query (str): SQL statement
+        
+    Returns:
+        dict: Statement structure with tables, aliases (lower-cased alias or
+              table name -> table), predicates, join_columns, select_columns,
+              order_by, group_by, aggregates, set_columns and the raw FROM
+              clause and GROUP BY expressions
+    """
+    sql = WHITESPACE_PATTERN.sub(' ', re.sub(r'--[^\n]*', ' ', query)).strip().rstrip(';')
+    clauses = _split_clauses(sql)
+    aliases = {}
+    
+    def _add_table(name, alias=None):
+        table = name.split('.')[-1]
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in SQL_WORDS:
+            aliases[alias.lower()] = table
+    
+    from_clause = clauses.get("FROM", "")
+    join_conditions = []
+    if from_clause:
+        for match in TABLE_REF_PATTERN.finditer(' ' + from_clause):
+            _add_table(match.group(1), match.group(2))
+        join_conditions = [m.group(1) for m in JOIN_CONDITION_PATTERN.finditer(from_clause)]
+    if "UPDATE" in clauses:
+        ref = clauses["UPDATE"].split()
+        if ref:
+            _add_table(ref[0], ref[-1] if len(ref) > 1 else None)
+    if "INSERT INTO" in clauses:
+        ref = clauses["INSERT INTO"].split('(')[0].split()
+        if ref:
+            _add_table(ref[0])
+    
+    tables = sorted(set(aliases.values()))
+    
+    def _resolve(ref):
+        if '.' in ref:
+            qualifier, column = ref.rsplit('.', 1)
+            return aliases.get(qualifier.lower(), qualifier), column
+        return (tables[0] if len(tables) == 1 else None), ref
+    
+    def _column_refs(expression):
+        refs = []
+        for ref in re.findall(COLUMN_REF + r'(?!\s*\()', re.sub(r"'(?:[^']|'')*'", ' ', expression)):
+            if ref.lower() not in SQL_WORDS and not ref.lower() in aliases:
+                refs.append(_resolve(ref))
+        return refs
+    
+    def _column_list(clause):
+        columns = []
+        for item in _split_top_level(clause or ""):
+            item = re.sub(r'\s+(ASC|DESC)(\s+NULLS\s+(FIRST|LAST))?$', '', item, flags=re.IGNORECASE)
+            if re.fullmatch(COLUMN_REF, item.strip()):
+                columns.append(_resolve(item.strip()))
+        return columns
+    
+    predicates = []
+    join_columns = []
+    for condition_text, is_join in [(c, True) for c in join_conditions] + [(clauses.get("WHERE", ""), False)]:
+        for match in PREDICATE_PATTERN.finditer(condition_text):
+            left, operator, right = match.group(1), ' '.join(match.group(2).upper().split()), match.group(3) or ''
+            if left.lower() in SQL_WORDS:
+                continue
+            table, column = _resolve(left)
+            right_is_column = bool(re.fullmatch(COLUMN_REF, right)) and right.lower() not in SQL_WORDS
+            if right_is_column and operator == '=':
+                join_columns.append({"table": table, "column": column})
+                join_columns.append(dict(zip(("table", "column"), _resolve(right))))
+                continue
+            if operator in ('=', 'IN', 'IS'):
+                kind = "eq"
+            elif operator in ('<', '>', '<=', '>=', 'BETWEEN'):
+                kind = "range"
+            elif operator in ('LIKE', 'ILIKE') and right.startswith("'") and not right.startswith("'%"):
+                kind = "range"
+            else:
+                kind = "other"
+            predicates.append({"table": table, "column": column, "op": kind, "join": is_join, "expression": left})
+    
+    select_columns = []
+    aggregates = []
+    select_star = False
+    select_clause = clauses.get("SELECT", "")
+    for item in _split_top_level(re.sub(r'^DISTINCT\s+', '', select_clause, flags=re.IGNORECASE)):
+        if item == '*' or item.endswith('.*'):
+            select_star = True
+            continue
+        aggregate = AGGREGATE_PATTERN.fullmatch(item)
+        if aggregate:
+            argument = aggregate.group(3).strip()
+            aggregates.append({
+                "function": aggregate.group(1).upper(),
+                "distinct": bool(aggregate.group(2)),
+                "argument": argument,
+                "columns": [dict(zip(("table", "column"), ref)) for ref in _column_refs(argument)],
+                "alias": aggregate.group(4)
+            })
+            select_columns.extend(_column_refs(argument))
+            continue
+        item = re.sub(r'\s+(?:AS\s+)?[a-zA-Z_]\w*$', '', item, flags=re.IGNORECASE) \
+            if not re.fullmatch(COLUMN_REF, item) else item
+        select_columns.extend(_column_refs(item))
+    
+    set_columns = []
+    if "SET" in clauses:
+        for assignment in _split_top_level(clauses["SET"]):
+            target = assignment.split('=')[0].strip()
+            if re.fullmatch(COLUMN_REF, target):
+                set_columns.append(_resolve(target)[1])
+    
+    def _as_dicts(refs):
+        unique = []
+        for table, column in refs:
+            ref = {"table": table, "column": column}
+            if ref not in unique:
+                unique.append(ref)
+        return unique
+    
+    return {
+        "tables": tables,
+        "aliases": aliases,
+        "predicates": predicates,
+        "join_columns": _as_dicts((c["table"], c["column"]) for c in join_columns),
+        "select_columns": _as_dicts(select_columns),
+        "select_star": select_star,
+        "aggregates": aggregates,
+        "group_by": _as_dicts(_column_list(clauses.get("GROUP BY"))),
+        "group_by_expressions": _split_top_level(clauses.get("GROUP BY") or ""),
+        "from_clause": from_clause,
+        "order_by": _as_dicts(_column_list(clauses.get("ORDER BY"))),
+        "set_columns": set_columns
+    }
+
+def iter_log_statements(lines):
+    """
+    Assemble complete SQL statements from raw log lines.
+    
+    Statements may span several lines and are terminated by ';' or by the
+    next line carrying a log prefix. Timestamps and 'duration: N ms' values
+    from Postgres-style log prefixes are kept alongside the statement.
+    
+    Args:
+        lines (iterable): Raw log lines
+        
+    Yields:
+        dict: Statement text with optional timestamp and duration_ms
+    """
+    pending = None
+    
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line or line.startswith('--'):
+            continue
+        
+        prefix = LOG_PREFIX_PATTERN.match(line)
+        if prefix:
+            if pending and pending["sql"]:
+                yield pending
+            duration = prefix.group('duration')
+            pending = {
+                "sql": line[prefix.end():].strip(),
+                "timestamp": prefix.group('timestamp'),
+                "duration_ms": float(duration) if duration else None
+            }
+        elif pending is None:
+            pending = {"sql": line, "timestamp": None, "duration_ms": None}
+        else:
+            pending["sql"] = f"{pending['sql']} {line}".strip()
+        
+        if pending["sql"].endswith(';'):
+            yield pending
+            pending = None
+    
+    if pending and pending["sql"]:
+        yield pending
+
+def build_fingerprints(statements, sample_size=PARAMETER_SAMPLE_SIZE, seed=0):
+    """
+    Group statements by fingerprint and count their frequency.
+    
+    A reservoir sample of the literal values seen for each fingerprint is
+    kept so the statement can later be replayed as a prepared statement.
+    
+    Args:
+        statements (iterable): Statements from iter_log_statements
+        sample_size (int): Maximum parameter sets kept per fingerprint
+        seed (int): Seed for the reservoir sampler
+        
+    Returns:
+        dict: Fingerprint id -> frequency, example, timing and parameter samples
+    """
+    fingerprints = {}
+    rng = random.Random(seed)
+    
+    for statement in statements:
+        sql = statement["sql"]
+        fp_id = fingerprint_id(sql)
+        entry = fingerprints.get(fp_id)
+        
+        template, params = parameterize_query(sql)
+        
+        if entry is None:
+            statement_type = STATEMENT_TYPE_PATTERN.match(sql)
+            entry = {
+                "fingerprint": fingerprint_query(sql),
+                "example": sql,
+                "template": template,
+                "parameter_count": len(params),
+                "type": statement_type.group(1).lower() if statement_type else "other",
+                "tables": sorted(set(TABLE_PATTERN.findall(sql))),
+                "count": 0,
+                "timed_count": 0,
+                "total_duration_ms": 0.0,
+                "parameter_samples": [],
+                "sampled_from": 0,
+                "structure": extract_query_structure(sql)
+            }
+            fingerprints[fp_id] = entry
+        
+        entry["count"] += 1
+        if statement.get("duration_ms") is not None:
+            entry["timed_count"] += 1
+            entry["total_duration_ms"] += statement["duration_ms"]
+        
+        # IN lists of different lengths share a fingerprint but not a template
+        if params and len(params) == entry["parameter_count"]:
+            entry["sampled_from"] += 1
+            if len(entry["parameter_samples"]) < sample_size:
+                entry["parameter_samples"].append(params)
+            else:
+                slot = rng.randrange(entry["sampled_from"])
+                if slot < sample_size:
+                    entry["parameter_samples"][slot] = params
+    
+    return fingerprints
+
 def parse_query_logs(log_path):
     """
     Parse SQL query logs to identify patterns and frequencies.
@@ -23,6 +423,9 @@ def parse_query_logs(log_path):
         with open(log_path, 'r') as f:
             logs = f.read().splitlines()
         
+        # Group complete statements by fingerprint before line filtering
+        fingerprints = build_fingerprints(iter_log_statements(logs))
+        
         # Filter out empty lines and comments
         logs = [line.strip() for line in logs if line.strip() and not line.strip().startswith('--')]
         
@@ -78,6 +481,7 @@ def parse_query_logs(log_path):
             },
             "table_access": dict(table_counts),
             "read_write_ratio": read_write_ratio,
+            "fingerprints": fingerprints,
             "examples": {
                 "joins": joins[:5] if joins else [],
                 "selects": selects[:5] if selects else [],
@@ -1,14 +1,404 @@
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, inspect, text
+import re
+import json
+import base64
+import random
 import logging
 
 logger = logging.getLogger(__name__)
 
-def extract_schema(connection_url):
+# Rows read by the sampled statistics query on databases without catalog histograms,
+# in this many key ranges found with an index seek each
+STATS_SAMPLE_ROWS = 10000
+STATS_SAMPLE_BLOCKS = 10
+HISTOGRAM_BUCKETS = 100
+
+def detect_database_type(connection_url):
+    """
+    Detect the database dialect from a connection URL.
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL
+        
+    Returns:
+        str: 'postgresql', 'mysql', 'sqlite' or 'unknown'
+    """
+    if 'postgresql' in connection_url or 'postgres' in connection_url:
+        return 'postgresql'
+    elif 'mysql' in connection_url:
+        return 'mysql'
+    elif 'sqlite' in connection_url:
+        return 'sqlite'
+    return 'unknown'
+
+def estimate_row_count(conn, db_type, table_name):
+    """
+    Estimate the number of rows in a table, preferring catalog statistics
+    over a full count.
+    
+    Args:
+        conn: SQLAlchemy connection
+        db_type (str): Database type (postgresql, mysql, sqlite)
+        table_name (str): Table to estimate
+        
+    Returns:
+        int: Estimated row count, or None if unavailable
+    """
+    try:
+        if db_type == 'postgresql':
+            row = conn.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+                               {"t": table_name}).fetchone()
+        elif db_type == 'mysql':
+            row = conn.execute(text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t"
+            ), {"t": table_name}).fetchone()
+        elif db_type == 'sqlite':
+            row = conn.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).fetchone()
+        else:
+            return None
+        
+        # Postgres reports -1 for tables that were never analyzed
+        return max(0, int(row[0])) if row and row[0] is not None and int(row[0]) >= 0 else None
+    except Exception as e:
+        logger.debug(f"Could not estimate row count for {table_name}: {str(e)}")
+        conn.rollback()
+        return None
+
+def extract_index_usage(conn, db_type):
+    """
+    Read index usage counters from the database statistics views.
+    
+    PostgreSQL reports scans per index since the last statistics reset in
+    pg_stat_user_indexes. MySQL only exposes indexes without any recorded use
+    since server start through sys.schema_unused_indexes, so their scan count
+    is reported as 0 and other indexes are omitted. SQLite keeps no counters.
+    
+    Args:
+        conn: SQLAlchemy connection
+        db_type (str): Database type (postgresql, mysql, sqlite)
+        
+    Returns:
+        dict: {table: {index_name: {"scans": int, "size_bytes": int or None}}}
+    """
+    usage = {}
+    try:
+        if db_type == 'postgresql':
+            rows = conn.execute(text(
+                "SELECT relname, indexrelname, idx_scan, pg_relation_size(indexrelid) "
+                "FROM pg_stat_user_indexes WHERE schemaname = current_schema()"
+            )).fetchall()
+            for table_name, index_name, scans, size_bytes in rows:
+                usage.setdefault(table_name, {})[index_name] = {"scans": scans, "size_bytes": size_bytes}
+        elif db_type == 'mysql':
+            rows = conn.execute(text(
+                "SELECT object_name, index_name FROM sys.schema_unused_indexes "
+                "WHERE object_schema = DATABASE()"
+            )).fetchall()
+            for table_name, index_name in rows:
+                usage.setdefault(table_name, {})[index_name] = {"scans": 0, "size_bytes": None}
+    except Exception as e:
+        logger.warning(f"Could not read index usage statistics: {str(e)}")
+        conn.rollback()
+    
+    return usage
+
+def is_range_type(col_type):
+    """Whether a column type has a meaningful order for range predicates and partitioning"""
+    col_type = str(col_type).lower()
+    return any(word in col_type for word in ("date", "time", "int", "numeric", "decimal", "float", "double", "real"))
+
+def is_temporal_type(col_type):
+    """Whether a column type holds dates or timestamps"""
+    col_type = str(col_type).lower()
+    return "date" in col_type or "time" in col_type
+
+def estimate_column_width(col_type):
+    """Approximate on-disk width in bytes of a column type"""
+    col_type = str(col_type).lower()
+    length = re.search(r'\((\d+)', col_type)
+    if "bigint" in col_type or "timestamp" in col_type or "double" in col_type or "float" in col_type:
+        return 8
+    if "bool" in col_type or "tinyint" in col_type:
+        return 1
+    if "smallint" in col_type:
+        return 2
+    if "int" in col_type or col_type == "date" or "real" in col_type:
+        return 4
+    if "uuid" in col_type:
+        return 16
+    if "numeric" in col_type or "decimal" in col_type:
+        return 8
+    if "char" in col_type and length:
+        return min(int(length.group(1)), 64)
+    return 32
+
+def _parse_pg_array(value):
+    """Parse the text form of a PostgreSQL array into a list of strings"""
+    if not value or value in ('{}', 'NULL'):
+        return []
+    items, current, quoted, escaped = [], [], False, False
+    for char in value.strip()[1:-1]:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            items.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    items.append(''.join(current))
+    return items
+
+def _equi_depth_bounds(values, buckets=HISTOGRAM_BUCKETS):
+    """Histogram bounds splitting sorted values into buckets of equal row counts"""
+    if not values:
+        return []
+    positions = sorted({round(i * (len(values) - 1) / buckets) for i in range(buckets + 1)})
+    return [values[p] for p in positions]
+
+def _mysql_histogram_value(value):
+    """Bucket value of a MySQL histogram; strings are stored as base64:type<N>:<data>"""
+    if isinstance(value, str) and value.startswith("base64:"):
+        return base64.b64decode(value.split(":", 2)[2]).decode("utf-8", "replace")
+    return value
+
+def _mysql_histogram_stats(histogram):
+    """Column statistics from a MySQL 8 histogram, in the form of pg_stats"""
+    if isinstance(histogram, (str, bytes)):
+        histogram = json.loads(histogram)
+    buckets = histogram.get("buckets") or []
+    if not buckets:
+        return None
+    
+    null_frac = float(histogram.get("null-values") or 0)
+    if histogram.get("histogram-type") == "singleton":
+        # One bucket per value with its cumulative frequency, i.e. every value is a common one
+        cumulative = [float(bucket[1]) for bucket in buckets]
+        return {
+            "null_frac": null_frac,
+            "n_distinct": len(buckets),
+            "histogram_bounds": [],
+            "most_common_vals": [str(_mysql_histogram_value(bucket[0])) for bucket in buckets],
+            "most_common_freqs": [high - low for low, high in zip([0.0] + cumulative, cumulative)]
+        }
+    # Equi-height buckets are [lower, upper, cumulative frequency, distinct values]
+    return {
+        "null_frac": null_frac,
+        "n_distinct": sum(int(bucket[3]) for bucket in buckets),
+        "histogram_bounds": [str(_mysql_histogram_value(bucket[0])) for bucket in buckets] +
+                            [str(_mysql_histogram_value(buckets[-1][1]))],
+        "most_common_vals": [],
+        "most_common_freqs": []
+    }
+
+def _sample_key(db_type, columns):
+    """Integer column whose ranges a block sample seeks, or None"""
+    pk_columns = [col for col in columns if col.get("is_primary_key")]
+    if len(pk_columns) == 1 and "int" in str(pk_columns[0]["type"]).lower():
+        return pk_columns[0]["name"]
+    # Every SQLite table but WITHOUT ROWID ones has one
+    return "rowid" if db_type == 'sqlite' else None
+
+def _block_sample(conn, db_type, table_name, selected, key, row_count):
+    """
+    About STATS_SAMPLE_ROWS rows of a table, read without scanning it.
+    
+    Large tables with an integer key are read in STATS_SAMPLE_BLOCKS key
+    ranges starting at random points, each found with an index seek; other
+    tables are read from the start, up to the sample size.
+    """
+    quote = '`' if db_type == 'mysql' else '"'
+    table = f"{quote}{table_name}{quote}"
+    if key and row_count and row_count > STATS_SAMPLE_ROWS:
+        key_sql = key if key == "rowid" else f"{quote}{key}{quote}"
+        try:
+            low, high = conn.execute(text(f"SELECT MIN({key_sql}), MAX({key_sql}) FROM {table}")).fetchone()
+            if low is None:
+                return []
+            rng = random.Random(table_name)
+            statement = text(f"SELECT {selected} FROM {table} WHERE {key_sql} >= :start "
+                             f"ORDER BY {key_sql} LIMIT :limit")
+            sample = []
+            for _ in range(STATS_SAMPLE_BLOCKS):
+                sample.extend(conn.execute(statement, {"start": rng.randint(int(low), int(high)),
+                                                       "limit": STATS_SAMPLE_ROWS // STATS_SAMPLE_BLOCKS}).fetchall())
+            return sample
+        except Exception as e:
+            # e.g. a WITHOUT ROWID table
+            logger.debug(f"Could not sample key ranges of {table_name}: {str(e)}")
+            conn.rollback()
+    return conn.execute(text(f"SELECT {selected} FROM {table} LIMIT :limit"), {"limit": STATS_SAMPLE_ROWS}).fetchall()
+
+def extract_column_stats(conn, db_type, table_name, columns, row_count=None):
+    """
+    Collect value distribution statistics for the columns of a table.
+    
+    PostgreSQL statistics come from the pg_stats catalog (histogram bounds,
+    most common values, distinct count and null fraction), which ANALYZE
+    keeps current. MySQL 8 histograms (ANALYZE TABLE ... UPDATE HISTOGRAM)
+    are read from information_schema.COLUMN_STATISTICS. Other columns on
+    MySQL, and SQLite tables, get an equi-depth histogram built from one
+    block sample of about STATS_SAMPLE_ROWS rows, which seeks a few integer
+    key ranges instead of scanning the table. Dates and timestamps get the
+    minimum and maximum of the histogram or sample; use
+    extract_column_bounds for exact ones.
+    
+    Args:
+        conn: SQLAlchemy connection
+        db_type (str): Database type (postgresql, mysql, sqlite)
+        table_name (str): Table to describe
+        columns (list): Column dictionaries with name, type and is_primary_key
+        row_count (int, optional): Estimated rows, used to size the sample
+        
+    Returns:
+        dict: {column: {"null_frac", "n_distinct", "histogram_bounds",
+               "most_common_vals", "most_common_freqs", "min", "max"}}
+    """
+    stats = {}
+    quote = '`' if db_type == 'mysql' else '"'
+    
+    try:
+        if db_type == 'postgresql':
+            rows = conn.execute(text(
+                "SELECT attname, null_frac, n_distinct, histogram_bounds::text, "
+                "most_common_vals::text, most_common_freqs::text "
+                "FROM pg_stats WHERE schemaname = current_schema() AND tablename = :t"
+            ), {"t": table_name}).fetchall()
+            for name, null_frac, n_distinct, histogram, common_vals, common_freqs in rows:
+                stats[name] = {
+                    "null_frac": null_frac,
+                    "n_distinct": n_distinct,
+                    "histogram_bounds": _parse_pg_array(histogram),
+                    "most_common_vals": _parse_pg_array(common_vals),
+                    "most_common_freqs": [float(f) for f in _parse_pg_array(common_freqs)]
+                }
+        elif db_type in ('mysql', 'sqlite'):
+            if db_type == 'mysql':
+                try:
+                    rows = conn.execute(text(
+                        "SELECT COLUMN_NAME, HISTOGRAM FROM information_schema.COLUMN_STATISTICS "
+                        "WHERE SCHEMA_NAME = DATABASE() AND TABLE_NAME = :t"
+                    ), {"t": table_name}).fetchall()
+                except Exception as e:
+                    # Histograms exist from MySQL 8.0 onwards
+                    logger.debug(f"No column histograms for {table_name}: {str(e)}")
+                    conn.rollback()
+                    rows = []
+                for name, histogram in rows:
+                    column_stats = _mysql_histogram_stats(histogram)
+                    if column_stats:
+                        stats[name] = column_stats
+            
+            range_columns = [col["name"] for col in columns
+                             if is_range_type(col["type"]) and col["name"] not in stats]
+            if range_columns:
+                selected = ", ".join(f"{quote}{name}{quote}" for name in range_columns)
+                # One sampled pass serves every column
+                sample = _block_sample(conn, db_type, table_name, selected, _sample_key(db_type, columns),
+                                       row_count)
+                
+                for position, name in enumerate(range_columns):
+                    values = sorted(row[position] for row in sample if row[position] is not None)
+                    if not values:
+                        continue
+                    
+                    # Follow the PostgreSQL convention: a negative n_distinct is a fraction of the rows
+                    distinct = len(set(values))
+                    stats[name] = {
+                        "null_frac": 1 - len(values) / len(sample),
+                        "n_distinct": distinct if distinct < 0.1 * len(values) else -distinct / len(values),
+                        "histogram_bounds": [str(v) for v in _equi_depth_bounds(values)],
+                        "most_common_vals": [],
+                        "most_common_freqs": []
+                    }
+        
+        for col in columns:
+            column_stats = stats.get(col["name"], {})
+            # Without a histogram every value is a common one
+            bounds = column_stats.get("histogram_bounds") or sorted(column_stats.get("most_common_vals") or [])
+            if is_temporal_type(col["type"]) and bounds:
+                stats[col["name"]].update({"min": bounds[0], "max": bounds[-1]})
+    except Exception as e:
+        logger.warning(f"Could not collect column statistics for {table_name}: {str(e)}")
+        conn.rollback()
+    
+    return stats
+
+def extract_column_bounds(conn, db_type, table_name, column):
+    """
+    Exact minimum and maximum of one column.
+    
+    This reads the whole column unless it leads an index, so it is only run
+    for columns that need exact bounds, such as a chosen partition column.
+    
+    Args:
+        conn: SQLAlchemy connection
+        db_type (str): Database type (postgresql, mysql, sqlite)
+        table_name (str): Table of the column
+        column (str): Column name
+        
+    Returns:
+        dict: {"min", "max"} as strings, or None if the column is empty or unreadable
+    """
+    quote = '`' if db_type == 'mysql' else '"'
+    try:
+        low, high = conn.execute(text(
+            f"SELECT MIN({quote}{column}{quote}), MAX({quote}{column}{quote}) FROM {quote}{table_name}{quote}"
+        )).fetchone()
+    except Exception as e:
+        logger.warning(f"Could not read bounds of {table_name}.{column}: {str(e)}")
+        conn.rollback()
+        return None
+    
+    if low is None:
+        return None
+    return {"min": str(low), "max": str(high)}
+
+def refresh_partition_bounds(connection_url, schema, recommendations):
+    """
+    Replace the estimated bounds of the partition columns of PARTITION
+    recommendations with their exact minimum and maximum.
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL
+        schema (dict): Schema from extract_schema, updated in place
+        recommendations (list): Recommendations from recommend_changes
+        
+    Returns:
+        int: Number of columns whose bounds were refreshed
+    """
+    targets = sorted({(rec["table"], rec["partition_column"]) for rec in recommendations
+                      if rec.get("action") == "PARTITION" and rec.get("partition_column")
+                      and rec.get("table") in schema})
+    if not targets:
+        return 0
+    
+    db_type = detect_database_type(connection_url)
+    engine = create_engine(connection_url)
+    refreshed = 0
+    
+    with engine.connect() as conn:
+        for table_name, column in targets:
+            bounds = extract_column_bounds(conn, db_type, table_name, column)
+            if bounds:
+                schema[table_name].setdefault("column_stats", {}).setdefault(column, {}).update(bounds)
+                refreshed += 1
+    
+    logger.info(f"Refreshed exact bounds of {refreshed} partition columns")
+    return refreshed
+
+def extract_schema(connection_url, column_stats=True):
     """
     Extract the schema information from a database using SQLAlchemy inspection.
     
     Args:
         connection_url (str): SQLAlchemy connection URL
+        column_stats (bool): Whether to collect value distribution statistics per column
         
     Returns:
         dict: Dictionary with table names as keys and column/constraint information as values
@@ -16,33 +406,42 @@ def extract_schema(connection_url):
     try:
         engine = create_engine(connection_url)
         inspector = inspect(engine)
+        db_type = detect_database_type(connection_url)
         schema = {}
         
-        for table_name in inspector.get_table_names():
-            columns = inspector.get_columns(table_name)
-            pk_constraint = inspector.get_pk_constraint(table_name)
-            foreign_keys = inspector.get_foreign_keys(table_name)
-            indexes = inspector.get_indexes(table_name)
-            
-            # Extract column information in a more readable format
-            column_info = []
-            for col in columns:
-                column_info.append({
-                    "name": col["name"],
-                    "type": str(col["type"]),
-                    "nullable": col.get("nullable", True),
-                    "default": str(col.get("default", "None")),
-                    "is_primary_key": col.get("primary_key", False)
-                })
+        with engine.connect() as conn:
+            index_usage = extract_index_usage(conn, db_type)
             
-            # Store comprehensive table information
-            schema[table_name] = {
-                "columns": column_info,
-                "primary_key": pk_constraint,
-                "foreign_keys": foreign_keys,
-                "indexes": indexes,
-                "column_count": len(columns)
-            }
+            for table_name in inspector.get_table_names():
+                columns = inspector.get_columns(table_name)
+                pk_constraint = inspector.get_pk_constraint(table_name)
+                foreign_keys = inspector.get_foreign_keys(table_name)
+                indexes = inspector.get_indexes(table_name)
+                
+                # Extract column information in a more readable format
+                column_info = []
+                for col in columns:
+                    column_info.append({
+                        "name": col["name"],
+                        "type": str(col["type"]),
+                        "nullable": col.get("nullable", True),
+                        "default": str(col.get("default", "None")),
+                        "is_primary_key": col.get("primary_key", False)
+                    })
+                
+                # Store comprehensive table information
+                schema[table_name] = {
+                    "columns": column_info,
+                    "primary_key": pk_constraint,
+                    "foreign_keys": foreign_keys,
+                    "indexes": indexes,
+                    "column_count": len(columns),
+                    "row_count": estimate_row_count(conn, db_type, table_name),
+                    "index_usage": index_usage.get(table_name, {})
+                }
+                schema[table_name]["column_stats"] = extract_column_stats(
+                    conn, db_type, table_name, column_info, schema[table_name]["row_count"]
+                ) if column_stats else {}
         
         logger.info(f"Successfully extracted schema with {len(schema)} tables")
         return schema
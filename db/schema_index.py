@@ -0,0 +1,151 @@
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Schema indexes kept in memory, by snapshot fingerprint and by schema object
+SCHEMA_INDEX_CACHE_SIZE = 16
+
+_index_cache = OrderedDict()
+# Schema object id -> (schema, structure token, index) of the schemas indexed last
+_object_cache = OrderedDict()
+# Web requests look up indexes from several threads; indexes are built outside the lock
+_index_cache_lock = threading.Lock()
+
+def schema_fingerprint(schema):
+    """
+    Stable hash of a schema snapshot.
+    
+    Args:
+        schema (dict): Database schema information
+    
+    Returns:
+        str: Hex digest that changes whenever any part of the snapshot changes
+    """
+    return hashlib.sha1(json.dumps(schema, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class SchemaIndex:
+    """
+    Lookup tables over an extracted schema, built in one pass so plan
+    generation does not rescan column, foreign key and index lists.
+    
+    Attributes:
+        columns: table -> {column name: column dict}, in table order
+        primary_keys: table -> primary key column list
+        foreign_keys: table -> {referred table: [foreign keys of table]}
+        referenced_by: table -> {referencing table: [foreign keys referring to table]}
+        fk_columns: table -> set of constrained columns
+        indexed_columns: table -> set of columns in any index
+        index_columns: table -> list of index column tuples
+    """
+    
+    def __init__(self, schema, fingerprint=None):
+        """
+        Build the lookup tables.
+        
+        Args:
+            schema (dict): Database schema information
+            fingerprint (str, optional): schema_fingerprint of the snapshot
+        """
+        self.schema = schema
+        self.fingerprint = fingerprint
+        self.columns = {}
+        self.primary_keys = {}
+        self.foreign_keys = {}
+        self.referenced_by = {table: {} for table in schema}
+        self.fk_columns = {}
+        self.indexed_columns = {}
+        self.index_columns = {}
+        
+        for table, table_info in schema.items():
+            self.columns[table] = {col["name"]: col for col in table_info.get("columns", [])}
+            
+            pk_columns = (table_info.get("primary_key") or {}).get("constrained_columns") or [
+                col["name"] for col in table_info.get("columns", []) if col.get("is_primary_key")
+            ]
+            self.primary_keys[table] = list(pk_columns)
+            
+            self.foreign_keys[table] = {}
+            self.fk_columns[table] = set()
+            for fk in table_info.get("foreign_keys", []):
+                referred = fk.get("referred_table")
+                self.foreign_keys[table].setdefault(referred, []).append(fk)
+                self.referenced_by.setdefault(referred, {}).setdefault(table, []).append(fk)
+                self.fk_columns[table].update(fk.get("constrained_columns") or [])
+            
+            self.index_columns[table] = [tuple(idx.get("column_names") or []) for idx in table_info.get("indexes", [])]
+            self.indexed_columns[table] = {col for cols in self.index_columns[table] for col in cols}
+    
+    def column_names(self, table):
+        """Column names of a table in table order"""
+        return list(self.columns.get(table, {}))
+    
+    def column_type(self, table, column, default=""):
+        """Declared type of a column as a string, or default when the column is unknown"""
+        col = self.columns.get(table, {}).get(column)
+        return str(col["type"]) if col else default
+    
+    def foreign_key(self, table, referred_table):
+        """First foreign key from table to referred_table, or None"""
+        fks = self.foreign_keys.get(table, {}).get(referred_table)
+        return fks[0] if fks else None
+
+def _structure_token(schema):
+    """
+    Cheap summary of the parts of a schema a SchemaIndex is built from.
+    
+    It changes when tables are added or removed, or when a table's column,
+    key or index lists are replaced or change length, without serializing
+    the snapshot.
+    """
+    return tuple(
+        (table, id(info), id(info.get("primary_key")),
+         *((id(info.get(part)), len(info.get(part) or ())) for part in ("columns", "foreign_keys", "indexes")))
+        for table, info in schema.items()
+    )
+
+def get_schema_index(schema, fingerprint=None):
+    """
+    SchemaIndex of a schema snapshot, built once per snapshot.
+    
+    The same schema object gets its index back for the cost of a structure
+    check, so repeated generate_sql calls do not rebuild it. Snapshots
+    loaded repeatedly from the metadata store are different objects with
+    the same content; callers that already have their schema_fingerprint
+    pass it to share one index between them. Fingerprinting serializes the
+    whole snapshot, which costs more than building the index, so it is
+    never done here.
+    
+    Args:
+        schema (dict): Database schema information
+        fingerprint (str, optional): schema_fingerprint of the snapshot
+    
+    Returns:
+        SchemaIndex: Lookup tables for the snapshot
+    """
+    token = _structure_token(schema)
+    with _index_cache_lock:
+        entry = _object_cache.get(id(schema))
+        if entry is not None and entry[0] is schema and entry[1] == token:
+            _object_cache.move_to_end(id(schema))
+            return entry[2]
+        index = _index_cache.get(fingerprint) if fingerprint else None
+        if index is not None:
+            _index_cache.move_to_end(fingerprint)
+    
+    if index is None:
+        index = SchemaIndex(schema, fingerprint)
+        logger.debug(f"Built schema index for {len(schema)} tables")
+    with _index_cache_lock:
+        if fingerprint:
+            _index_cache[fingerprint] = index
+            if len(_index_cache) > SCHEMA_INDEX_CACHE_SIZE:
+                _index_cache.popitem(last=False)
+        # The entry keeps the schema alive, so its id cannot be reused while cached
+        _object_cache[id(schema)] = (schema, token, index)
+        if len(_object_cache) > SCHEMA_INDEX_CACHE_SIZE:
+            _object_cache.popitem(last=False)
+    return index
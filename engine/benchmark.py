@@ -8,13 +8,68 @@ This module provides tools for quickly benchmarking database performance:
 """
 
 import time
+import random
 import logging
-import statistics
+import threading
+import multiprocessing
 from sqlalchemy import create_engine, text
-from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from db.schema_extractor import detect_database_type
+from db.query_log_analyzer import (
+    STATEMENT_TYPE_PATTERN, bindable_template, fingerprint_id, fingerprint_query, iter_log_statements,
+    parameterize_query
+)
+from engine.bulk_loader import bulk_load
+from engine.latency_histogram import LatencyHistogram
+from engine.resource_sampler import ResourceSampler, DEFAULT_SAMPLE_INTERVAL
 
 logger = logging.getLogger("denode-benchmark")
 
+# A QPS step is saturated when it completes less than this share of its target rate
+SATURATION_THROUGHPUT_RATIO = 0.9
+
+# ... or when its p99 latency exceeds this multiple of the p99 at the lowest step
+SATURATION_LATENCY_FACTOR = 5
+
+# Requests still queued this many test durations after the last send are abandoned
+ARRIVAL_DRAIN_FACTOR = 1.0
+
+# Sessions replaying a workload concurrently
+DEFAULT_REPLAY_SESSIONS = 8
+
+# Spacing of replayed statements whose log line carries no timestamp
+DEFAULT_REPLAY_QPS = 100
+
+REPLAY_WRITE_TYPES = {"insert", "update", "delete"}
+
+# Statement types a replay sends; anything else (DDL, SET, transaction control)
+# could change the schema or auto-commit, so it is left out of the schedule
+REPLAY_STATEMENT_TYPES = {"select", "with"} | REPLAY_WRITE_TYPES
+
+# A client process busier than this share of a core is limiting the measured throughput
+HARNESS_CPU_WARNING_PCT = 90
+
+# Seconds client processes wait for each other to connect before giving up
+PROCESS_START_TIMEOUT = 60
+
+# How benchmarked queries consume their result: execute only, fetch every row,
+# stream rows through a server-side cursor, or stream them and count their bytes
+FETCH_MODES = ("execute", "fetch", "stream", "count")
+
+DEFAULT_FETCH_MODE = "fetch"
+
+# Rows per fetchmany call, and rows buffered from the server-side cursor, when streaming
+STREAM_BATCH_ROWS = 1000
+
+# Auto-incrementing primary key of the sample table per dialect
+SAMPLE_ID_COLUMN_TYPES = {
+    "postgresql": "BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+    "mysql": "BIGINT AUTO_INCREMENT PRIMARY KEY",
+    "sqlite": "INTEGER PRIMARY KEY"
+}
+
 class PerformanceBenchmark:
     """
     Database performance benchmarking utility that measures:
@@ -34,107 +89,484 @@ class PerformanceBenchmark:
         self.engine = create_engine(connection_url)
         self.results = {}
         
-    def time_query(self, query, iterations=5, warmup=1):
+    def time_query(self, query, iterations=5, warmup=1, fetch=DEFAULT_FETCH_MODE):
         """
         Measure the execution time of a query.
         
+        Each run is timed in three parts, all from the start of execution:
+        until execute returns, until the first row arrives, and until the
+        whole result is consumed and closed. With the "execute" mode rows
+        are never fetched, which makes large results look artificially fast.
+        
         Args:
             query (str): SQL query to benchmark
             iterations (int): Number of times to run the query for averaging
             warmup (int): Number of warmup runs (not counted in results)
+            fetch (str): Result handling, one of FETCH_MODES
             
         Returns:
-            dict: Timing statistics (min, max, avg, median)
+            dict: Full-fetch timing statistics (min, max, avg, median, stdev,
+                  p50, p90, p99, p99_9) in ms, the exported latency histogram,
+                  execute and first_row summaries, and rows (and bytes in
+                  "count" mode) per query
         """
-        logger.info(f"Benchmarking query performance with {iterations} iterations")
+        if fetch not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode: {fetch}")
+        logger.info(f"Benchmarking query performance with {iterations} iterations (fetch={fetch})")
         
-        execution_times = []
+        histogram = LatencyHistogram()
+        execute_histogram = LatencyHistogram()
+        first_row_histogram = LatencyHistogram()
+        total_rows = 0
+        total_bytes = 0
+        statement = text(query)
         
         with self.engine.connect() as conn:
             # Warmup runs
             for _ in range(warmup):
-                conn.execute(text(query))
+                _timed_fetch(conn, statement, fetch)
                 
             # Timed runs
             for i in range(iterations):
-                start_time = time.time()
-                conn.execute(text(query))
-                end_time = time.time()
-                execution_time = (end_time - start_time) * 1000  # Convert to ms
-                execution_times.append(execution_time)
-                logger.debug(f"Run {i+1}: {execution_time:.2f}ms")
+                executed, first_row, execution_time, rows, size = _timed_fetch(conn, statement, fetch)
+                histogram.record(execution_time)
+                execute_histogram.record(executed)
+                if first_row is not None:
+                    first_row_histogram.record(first_row)
+                total_rows += rows or 0
+                total_bytes += size or 0
+                logger.debug(f"Run {i+1}: {execution_time / 1e6:.2f}ms")
         
         # Calculate statistics
-        stats = {
-            "min": min(execution_times),
-            "max": max(execution_times),
-            "avg": statistics.mean(execution_times),
-            "median": statistics.median(execution_times),
-            "stdev": statistics.stdev(execution_times) if len(execution_times) > 1 else 0,
-            "iterations": iterations,
-            "unit": "ms"
-        }
+        stats = histogram.summary("ms")
+        stats["iterations"] = iterations
+        stats["fetch"] = fetch
+        stats["execute"] = execute_histogram.summary("ms")
+        stats["first_row"] = first_row_histogram.summary("ms") if first_row_histogram.count else None
+        stats["rows_per_query"] = total_rows / iterations if iterations and fetch != "execute" else None
+        stats["bytes_per_query"] = total_bytes / iterations if iterations and fetch == "count" else None
+        stats["histogram"] = histogram.export("ms")
         
         return stats
     
-    def run_throughput_test(self, query, duration=5, concurrent_clients=5):
+    def run_throughput_test(self, query, duration=5, concurrent_clients=5, use_processes=False,
+                            fetch=DEFAULT_FETCH_MODE, sample_resources=True, sample_interval=DEFAULT_SAMPLE_INTERVAL):
         """
         Test query throughput under concurrent load.
         
+        Thread clients share one interpreter, so with fast queries the GIL
+        caps throughput before the database does. Process clients each get
+        their own interpreter and connection, connect first and then start
+        together, and send back their histograms to be merged. The busiest
+        client's CPU use is reported so a harness-bound run can be spotted.
+        
+        Server-side counters (I/O, buffer hits, temp files, statement stats)
+        are sampled in the background for the length of the run, so a change
+        that cuts latency can be told apart from one that just moves load.
+        
         Args:
             query (str): SQL query to benchmark
             duration (int): Test duration in seconds
             concurrent_clients (int): Number of simultaneous clients
+            use_processes (bool): Run each client in its own process
+            fetch (str): Result handling, one of FETCH_MODES
+            sample_resources (bool): Sample server resource counters during the run
+            sample_interval (float): Seconds between resource samples
             
         Returns:
-            dict: Throughput statistics
+            dict: Throughput statistics with latency percentiles, rows fetched,
+                  the exported latency histogram and the resource report
+                  (None when not sampled)
+        """
+        if fetch not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode: {fetch}")
+        client_mode = "processes" if use_processes else "threads"
+        logger.info(f"Running throughput test with {concurrent_clients} concurrent clients ({client_mode}) "
+                    f"for {duration}s")
+        
+        sampler = ResourceSampler(self.engine, sample_interval) if sample_resources else None
+        if sampler:
+            sampler.start()
+        try:
+            if use_processes:
+                results = _run_process_clients(self.connection_url, query, duration, concurrent_clients, fetch)
+                client_cpu_pct = max(r["cpu_seconds"] / r["elapsed_seconds"] * 100 for r in results)
+            else:
+                stop_time = time.perf_counter_ns() + int(duration * 1e9)
+                
+                def run_client(client_id):
+                    """Run queries for a single client until time expires"""
+                    with self.engine.connect() as conn:
+                        queries_executed, rows_fetched, histogram = _throughput_loop(conn, query, stop_time, fetch)
+                    return {"client_id": client_id, "queries_executed": queries_executed, "rows_fetched": rows_fetched,
+                            "histogram": histogram}
+                
+                # Threads share one interpreter, so their CPU use is measured together
+                cpu_start = time.process_time()
+                wall_start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrent_clients) as executor:
+                    results = list(executor.map(run_client, range(concurrent_clients)))
+                client_cpu_pct = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start) * 100
+        finally:
+            resources = sampler.stop() if sampler else None
+        
+        # Aggregate results
+        total_queries = sum(r["queries_executed"] for r in results)
+        if resources:
+            resources["per_query"] = {name: total / total_queries if total_queries else 0.0
+                                      for name, total in resources["totals"].items()}
+        histogram = LatencyHistogram()
+        for r in results:
+            histogram.merge(r["histogram"])
+        latency = histogram.summary("ms")
+        
+        if client_cpu_pct > HARNESS_CPU_WARNING_PCT:
+            logger.warning(f"Benchmark client used {client_cpu_pct:.0f}% of a core; throughput may be limited "
+                           f"by the client rather than the database")
+        
+        throughput_stats = {
+            "queries_per_second": total_queries / duration,
+            "total_queries": total_queries,
+            "rows_fetched": sum(r["rows_fetched"] for r in results),
+            "fetch": fetch,
+            "concurrent_clients": concurrent_clients,
+            "client_mode": client_mode,
+            "client_cpu_pct": client_cpu_pct,
+            "harness_bound": client_cpu_pct > HARNESS_CPU_WARNING_PCT,
+            "duration_seconds": duration,
+            "avg_latency_ms": latency["avg"],
+            "median_latency_ms": latency["median"],
+            "min_latency_ms": latency["min"],
+            "max_latency_ms": latency["max"],
+            "stdev_latency_ms": latency["stdev"],
+            "p90_latency_ms": latency["p90"],
+            "p99_latency_ms": latency["p99"],
+            "p99_9_latency_ms": latency["p99_9"],
+            "histogram": histogram.export("ms"),
+            "resources": resources
+        }
+        
+        return throughput_stats
+    
+    def _run_open_loop(self, events, concurrent_clients, drain_seconds, run_request):
         """
-        logger.info(f"Running throughput test with {concurrent_clients} concurrent clients for {duration}s")
+        Serve scheduled requests from a fixed pool of connections.
         
-        results = []
-        stop_time = time.time() + duration
+        Connections take requests in schedule order and wait until each is
+        due. Latency runs from the intended send time, so a request that
+        waits for a free connection is charged for the wait. Requests still
+        waiting drain_seconds after the last one was due are abandoned and
+        recorded at the latency they had reached. A failing request is
+        rolled back and counted as an error.
+        
+        Args:
+            events (list): (offset_ns from start, key, payload) in offset order
+            concurrent_clients (int): Connections serving the requests
+            drain_seconds (float): Grace period after the last scheduled send
+            run_request (callable): Called with a connection and a payload
+            
+        Returns:
+            tuple: (key -> {latency, service, abandoned, errors}, elapsed seconds)
+        """
+        lock = threading.Lock()
+        next_slot = [0]
+        last_offset = events[-1][0] if events else 0
+        start_time = time.perf_counter_ns()
+        deadline = start_time + last_offset + int(drain_seconds * 1e9)
         
         def run_client(client_id):
-            """Run queries for a single client until time expires"""
-            client_count = 0
-            client_times = []
+            """Serve scheduled requests in order until the schedule or the drain period runs out"""
+            stats = {}
             
             with self.engine.connect() as conn:
-                while time.time() < stop_time:
-                    start_time = time.time()
-                    conn.execute(text(query))
-                    end_time = time.time()
-                    client_times.append((end_time - start_time) * 1000)  # Convert to ms
-                    client_count += 1
+                while True:
+                    with lock:
+                        if next_slot[0] >= len(events):
+                            break
+                        offset, key, payload = events[next_slot[0]]
+                        next_slot[0] += 1
                     
-            return {
-                "client_id": client_id,
-                "queries_executed": client_count,
-                "execution_times": client_times
-            }
+                    entry = stats.get(key)
+                    if entry is None:
+                        entry = stats[key] = {"latency": LatencyHistogram(), "service": LatencyHistogram(),
+                                              "abandoned": 0, "errors": 0}
+                    
+                    intended = start_time + offset
+                    now = time.perf_counter_ns()
+                    if now < intended:
+                        time.sleep((intended - now) / 1e9)
+                    elif now > deadline:
+                        entry["latency"].record(now - intended)
+                        entry["abandoned"] += 1
+                        continue
+                    
+                    sent = time.perf_counter_ns()
+                    try:
+                        run_request(conn, payload)
+                    except Exception as e:
+                        logger.debug(f"Client {client_id} request failed: {str(e)}")
+                        conn.rollback()
+                        entry["errors"] += 1
+                        continue
+                    end_time = time.perf_counter_ns()
+                    entry["latency"].record(end_time - intended)
+                    entry["service"].record(end_time - sent)
+                    
+            return stats
         
-        # Run concurrent clients
         with ThreadPoolExecutor(max_workers=concurrent_clients) as executor:
-            futures = [executor.submit(run_client, i) for i in range(concurrent_clients)]
-            for future in futures:
-                results.append(future.result())
+            results = list(executor.map(run_client, range(concurrent_clients)))
+        elapsed = (time.perf_counter_ns() - start_time) / 1e9
         
-        # Aggregate results
-        total_queries = sum(r["queries_executed"] for r in results)
-        all_times = [t for r in results for t in r["execution_times"]]
+        merged = {}
+        for stats in results:
+            for key, entry in stats.items():
+                if key not in merged:
+                    merged[key] = entry
+                    continue
+                merged[key]["latency"].merge(entry["latency"])
+                merged[key]["service"].merge(entry["service"])
+                merged[key]["abandoned"] += entry["abandoned"]
+                merged[key]["errors"] += entry["errors"]
         
-        throughput_stats = {
-            "queries_per_second": total_queries / duration,
-            "total_queries": total_queries,
+        return merged, elapsed
+    
+    def run_arrival_rate_test(self, query, target_qps, duration=5, concurrent_clients=5,
+                              arrival="poisson", seed=None, fetch=DEFAULT_FETCH_MODE):
+        """
+        Test query latency under an open-loop, constant arrival rate.
+        
+        Closed-loop clients wait for each query before sending the next, so
+        when the database slows down they send less and the queueing delay
+        never shows up in the latencies (coordinated omission). Here send
+        times are scheduled up front at the target rate, and latency is
+        measured from the intended send time. Requests still waiting after
+        the drain period are abandoned and recorded at the latency they had
+        reached, which understates rather than hides them.
+        
+        Each request consumes its result as the fetch mode asks and rolls
+        back, so connections never sit idle in a transaction between sends.
+        
+        Args:
+            query (str): SQL query to benchmark
+            target_qps (float): Requests scheduled per second
+            duration (int): Seconds over which requests are scheduled
+            concurrent_clients (int): Connections serving the requests
+            arrival (str): "poisson" for exponential or "fixed" for constant intervals
+            seed (int, optional): Seed of the Poisson arrival process
+            fetch (str): Result handling, one of FETCH_MODES
+            
+        Returns:
+            dict: Target and achieved rate, latency from intended send time,
+                  service time from actual send time, and abandoned requests
+        """
+        if arrival not in ("poisson", "fixed"):
+            raise ValueError(f"Unknown arrival process: {arrival}")
+        if fetch not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode: {fetch}")
+        logger.info(f"Running open-loop test at {target_qps} QPS ({arrival}) with "
+                    f"{concurrent_clients} connections for {duration}s")
+        
+        # Intended send times in ns from the start of the test
+        rng = random.Random(seed)
+        events = []
+        offset = 0.0
+        while True:
+            offset += rng.expovariate(target_qps) if arrival == "poisson" else 1.0 / target_qps
+            if offset >= duration:
+                break
+            events.append((int(offset * 1e9), None, None))
+        
+        statement = text(query)
+        
+        def run_request(conn, payload):
+            _timed_fetch(conn, statement, fetch)
+            conn.rollback()
+        
+        stats, elapsed = self._run_open_loop(events, concurrent_clients, duration * ARRIVAL_DRAIN_FACTOR, run_request)
+        
+        latency = LatencyHistogram()
+        service = LatencyHistogram()
+        abandoned = errors = 0
+        for entry in stats.values():
+            latency.merge(entry["latency"])
+            service.merge(entry["service"])
+            abandoned += entry["abandoned"]
+            errors += entry["errors"]
+        completed = service.count
+        
+        return {
+            "target_qps": target_qps,
+            "achieved_qps": completed / max(elapsed, duration),
+            "arrival": arrival,
+            "scheduled_requests": len(events),
+            "completed_requests": completed,
+            "abandoned_requests": abandoned,
+            "failed_requests": errors,
             "concurrent_clients": concurrent_clients,
+            "fetch": fetch,
             "duration_seconds": duration,
-            "avg_latency_ms": statistics.mean(all_times) if all_times else 0,
-            "median_latency_ms": statistics.median(all_times) if all_times else 0,
-            "min_latency_ms": min(all_times) if all_times else 0,
-            "max_latency_ms": max(all_times) if all_times else 0
+            "elapsed_seconds": elapsed,
+            "latency": latency.summary("ms"),
+            "service_time": service.summary("ms"),
+            "histogram": latency.export("ms")
         }
+    
+    def replay_workload(self, schedule, concurrent_sessions=DEFAULT_REPLAY_SESSIONS, rollback_writes=True):
+        """
+        Replay a production statement mix against the database.
         
-        return throughput_stats
+        Statements are sent open-loop at their scheduled offsets across a
+        pool of sessions, so a slower schema builds up queueing delay just
+        as production would. Latency is measured from the scheduled send
+        time and reported per fingerprint.
+        
+        Args:
+            schedule (dict): Schedule from build_replay_schedule or synthesize_replay_schedule
+            concurrent_sessions (int): Connections replaying the statements
+            rollback_writes (bool): Roll back INSERT/UPDATE/DELETE so the data is left unchanged
+            
+        Returns:
+            dict: Overall and per-fingerprint latency and service time, with
+                  completed, failed and abandoned statement counts, and the
+                  statements the schedule skipped
+        """
+        events = schedule["events"]
+        logger.info(f"Replaying {len(events)} statements over {schedule['duration_seconds']:.1f}s "
+                    f"with {concurrent_sessions} sessions")
+        
+        def run_statement(conn, statement):
+            if statement["params"]:
+                result = conn.execute(text(bindable_template(statement["sql"])), statement["params"])
+            else:
+                # Statements without literals are run as logged, so colons are not read as bind parameters
+                result = conn.exec_driver_sql(statement["sql"])
+            if result.returns_rows:
+                result.fetchall()
+            if statement["type"] in REPLAY_WRITE_TYPES and not rollback_writes:
+                conn.commit()
+            else:
+                conn.rollback()
+        
+        stats, elapsed = self._run_open_loop(
+            [(event["offset_ns"], event["fingerprint_id"], event) for event in events],
+            concurrent_sessions, max(schedule["duration_seconds"], 1) * ARRIVAL_DRAIN_FACTOR, run_statement
+        )
+        
+        latency = LatencyHistogram()
+        fingerprints = {}
+        for fp_id, entry in stats.items():
+            latency.merge(entry["latency"])
+            fingerprints[fp_id] = {
+                "fingerprint": schedule["fingerprints"].get(fp_id, {}).get("fingerprint", ""),
+                "type": schedule["fingerprints"].get(fp_id, {}).get("type", "other"),
+                "scheduled": entry["latency"].count + entry["errors"],
+                "completed": entry["service"].count,
+                "failed": entry["errors"],
+                "abandoned": entry["abandoned"],
+                "latency": entry["latency"].summary("ms"),
+                "service_time": entry["service"].summary("ms")
+            }
+        
+        completed = sum(fp["completed"] for fp in fingerprints.values())
+        return {
+            "statements": len(events),
+            "skipped_statements": schedule.get("skipped_statements", 0),
+            "completed": completed,
+            "failed": sum(fp["failed"] for fp in fingerprints.values()),
+            "abandoned": sum(fp["abandoned"] for fp in fingerprints.values()),
+            "concurrent_sessions": concurrent_sessions,
+            "speedup": schedule.get("speedup"),
+            "scheduled_seconds": schedule["duration_seconds"],
+            "elapsed_seconds": elapsed,
+            "achieved_qps": completed / elapsed if elapsed else 0,
+            "latency": latency.summary("ms"),
+            "fingerprints": dict(sorted(fingerprints.items(), key=lambda item: item[1]["latency"]["avg"]
+                                        * item[1]["scheduled"], reverse=True))
+        }
+    
+    def find_saturation_knee(self, query, qps_steps, duration=5, concurrent_clients=5, arrival="poisson",
+                             seed=None):
+        """
+        Sweep increasing arrival rates to find where the database saturates.
+        
+        A step is saturated when it completes less than
+        SATURATION_THROUGHPUT_RATIO of its target rate, or when its p99
+        latency exceeds SATURATION_LATENCY_FACTOR times the p99 of the first
+        step. The sweep stops at the first saturated step.
+        
+        Args:
+            query (str): SQL query to benchmark
+            qps_steps (list): Target rates to test, in ascending order
+            duration (int): Seconds per step
+            concurrent_clients (int): Connections serving the requests
+            arrival (str): "poisson" or "fixed" arrival intervals
+            seed (int, optional): Seed of the Poisson arrival process
+            
+        Returns:
+            dict: Results per step, the highest sustained rate (knee_qps)
+                  and the first saturated rate, None if none saturated
+        """
+        steps = []
+        knee_qps = None
+        saturated_qps = None
+        baseline_p99 = None
+        
+        for target_qps in sorted(qps_steps):
+            result = self.run_arrival_rate_test(query, target_qps, duration, concurrent_clients, arrival, seed)
+            p99 = result["latency"]["p99"]
+            if baseline_p99 is None:
+                baseline_p99 = p99
+            
+            reasons = []
+            if result["achieved_qps"] < SATURATION_THROUGHPUT_RATIO * target_qps:
+                reasons.append(f"achieved {result['achieved_qps']:.1f} of {target_qps} QPS")
+            if baseline_p99 and p99 > SATURATION_LATENCY_FACTOR * baseline_p99:
+                reasons.append(f"p99 {p99:.2f}ms is over {SATURATION_LATENCY_FACTOR}x the {baseline_p99:.2f}ms baseline")
+            
+            result["saturated"] = bool(reasons)
+            result["saturation_reasons"] = reasons
+            steps.append(result)
+            if reasons:
+                saturated_qps = target_qps
+                logger.info(f"Saturated at {target_qps} QPS: {'; '.join(reasons)}")
+                break
+            knee_qps = target_qps
+        
+        return {
+            "steps": steps,
+            "knee_qps": knee_qps,
+            "saturated_qps": saturated_qps
+        }
+    
+    def compare_saturation(self, before_query, after_query, qps_steps, duration=5, concurrent_clients=5,
+                           arrival="poisson", seed=None):
+        """
+        Compare the saturation knee of a query before and after a schema change.
+        
+        Both sweeps use the same seed, so they replay the same arrival times.
+        
+        Args:
+            before_query (str): Query to benchmark with original schema
+            after_query (str): Query to benchmark with modified schema
+            qps_steps (list): Target rates to test, in ascending order
+            duration (int): Seconds per step
+            concurrent_clients (int): Connections serving the requests
+            arrival (str): "poisson" or "fixed" arrival intervals
+            seed (int, optional): Seed of the Poisson arrival process
+            
+        Returns:
+            dict: Both sweeps and the change in sustained rate
+        """
+        seed = random.randrange(2 ** 32) if seed is None else seed
+        before = self.find_saturation_knee(before_query, qps_steps, duration, concurrent_clients, arrival, seed)
+        after = self.find_saturation_knee(after_query, qps_steps, duration, concurrent_clients, arrival, seed)
+        
+        return {
+            "before": before,
+            "after": after,
+            "knee_qps_change": (after["knee_qps"] or 0) - (before["knee_qps"] or 0)
+        }
     
     def compare_queries(self, queries, iterations=3):
         """
@@ -184,17 +616,22 @@ def create_sample_data(connection_url, table_name, row_count):
     """
     Create sample data for benchmarking.
     
+    Rows are generated lazily and loaded with the database's bulk path
+    (COPY, LOAD DATA or a single executemany transaction), so large row
+    counts load in constant memory.
+    
     Args:
         connection_url (str): SQLAlchemy connection URL
         table_name (str): Table name to create
         row_count (int): Number of rows to generate
         
     Returns:
-        bool: Success flag
+        dict: Load statistics from bulk_load (rows, seconds, rows_per_second, method)
     """
+    dialect = detect_database_type(connection_url)
     engine = create_engine(connection_url)
     
-    with engine.connect() as conn:
+    with engine.begin() as conn:
         # Drop table if exists
         conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
         
@@ -202,28 +639,309 @@ def create_sample_data(connection_url, table_name, row_count):
         conn.execute(text(
             f"""
             CREATE TABLE {table_name} (
-                id SERIAL PRIMARY KEY,
+                id {SAMPLE_ID_COLUMN_TYPES.get(dialect, "INTEGER PRIMARY KEY")},
                 name VARCHAR(100),
                 value INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
             """
         ))
+    
+    try:
+        return bulk_load(engine, table_name, ["name", "value"],
+                         ((f"name_{j}", j % 100) for j in range(row_count)), dialect)
+    finally:
+        engine.dispose()
+
+def _row_bytes(row):
+    """Approximate transfer size of a row: binary values as is, everything else as UTF-8 text"""
+    size = 0
+    for value in row:
+        if value is None:
+            continue
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            size += len(value)
+        else:
+            size += len(str(value).encode("utf-8"))
+    return size
+
+def _timed_fetch(conn, statement, fetch):
+    """
+    Execute a statement and consume its result as a fetch mode asks.
+    
+    Most drivers transfer the whole result inside execute unless a
+    server-side cursor is used, so only the streaming modes separate
+    execute and first-row time from the full fetch.
+    
+    Returns:
+        tuple: (execute ns, first row ns or None, total ns, rows, bytes), times
+               measured from the start of execution; rows is None in
+               "execute" mode and bytes is None outside "count" mode
+    """
+    streaming = fetch in ("stream", "count")
+    options = {"stream_results": True, "max_row_buffer": STREAM_BATCH_ROWS} if streaming else None
+    start = time.perf_counter_ns()
+    result = conn.execute(statement, execution_options=options)
+    executed = time.perf_counter_ns() - start
+    first_row = None
+    rows = None
+    size = 0 if fetch == "count" else None
+    
+    try:
+        if fetch != "execute" and result.returns_rows:
+            rows = 0
+            first = result.fetchone()
+            if first is not None:
+                first_row = time.perf_counter_ns() - start
+                rows = 1
+                if fetch == "count":
+                    size += _row_bytes(first)
+                if not streaming:
+                    rows += len(result.fetchall())
+                while streaming:
+                    batch = result.fetchmany(STREAM_BATCH_ROWS)
+                    if not batch:
+                        break
+                    rows += len(batch)
+                    if fetch == "count":
+                        size += sum(_row_bytes(row) for row in batch)
+    finally:
+        # Also releases a server-side cursor left open by "execute" mode
+        result.close()
+    
+    return executed, first_row, time.perf_counter_ns() - start, rows, size
+
+def _throughput_loop(conn, query, stop_time, fetch=DEFAULT_FETCH_MODE):
+    """
+    Run a query back to back on one connection until a perf_counter_ns deadline.
+    
+    Returns:
+        tuple: (queries executed, rows fetched, LatencyHistogram of their latencies)
+    """
+    queries_executed = 0
+    rows_fetched = 0
+    statement = text(query)
+    # One histogram per client, so recording needs no lock
+    histogram = LatencyHistogram()
+    start_time = time.perf_counter_ns()
+    while start_time < stop_time:
+        rows = _timed_fetch(conn, statement, fetch)[3]
+        end_time = time.perf_counter_ns()
+        histogram.record(end_time - start_time)
+        queries_executed += 1
+        rows_fetched += rows or 0
+        start_time = end_time
+    return queries_executed, rows_fetched, histogram
+
+def _throughput_process_client(connection_url, query, duration, barrier, client_id, fetch=DEFAULT_FETCH_MODE):
+    """
+    Throughput client run in its own process.
+    
+    The client connects before waiting on the barrier, so connection setup
+    is not part of the measured window, and returns its histogram in
+    to_dict form since results travel back by pickling.
+    """
+    engine = create_engine(connection_url)
+    try:
+        conn = engine.connect()
+    except Exception:
+        # Release the other clients instead of leaving them waiting for the timeout
+        barrier.abort()
+        raise
+    
+    try:
+        barrier.wait(PROCESS_START_TIMEOUT)
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter_ns()
+        queries_executed, rows_fetched, histogram = _throughput_loop(conn, query, wall_start + int(duration * 1e9),
+                                                                     fetch)
+        return {
+            "client_id": client_id,
+            "queries_executed": queries_executed,
+            "rows_fetched": rows_fetched,
+            "histogram": histogram.to_dict(),
+            "cpu_seconds": time.process_time() - cpu_start,
+            "elapsed_seconds": (time.perf_counter_ns() - wall_start) / 1e9
+        }
+    finally:
+        conn.close()
+        engine.dispose()
+
+def _run_process_clients(connection_url, query, duration, concurrent_clients, fetch=DEFAULT_FETCH_MODE):
+    """
+    Run throughput clients in separate processes and collect their results.
+    
+    Processes are spawned rather than forked, so no connection pool or
+    thread state of the parent leaks into the clients.
+    
+    Returns:
+        list: Client results with histograms restored to LatencyHistogram
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        barrier = manager.Barrier(concurrent_clients)
+        with ProcessPoolExecutor(max_workers=concurrent_clients, mp_context=context) as executor:
+            futures = [executor.submit(_throughput_process_client, connection_url, query, duration, barrier, i,
+                                       fetch)
+                       for i in range(concurrent_clients)]
+            results = [future.result() for future in futures]
+    
+    for result in results:
+        result["histogram"] = LatencyHistogram.from_dict(result["histogram"])
+    return results
+
+def _replay_statement(sql, params):
+    """Replay form of a statement: its bind template and parameters, or the raw SQL without literals"""
+    if params:
+        return {"sql": sql, "params": {f"p{n + 1}": value for n, value in enumerate(params)}}
+    return {"sql": sql, "params": None}
+
+def _statement_type(sql):
+    """Lower-case leading keyword of a statement (select, insert, update, delete, with) or 'other'"""
+    match = STATEMENT_TYPE_PATTERN.match(sql)
+    return match.group(1).lower() if match else "other"
+
+def build_replay_schedule(statements, speedup=1.0, limit=None):
+    """
+    Schedule logged statements for replay at their original relative timing.
+    
+    A statement starts at its log timestamp minus its logged duration, when
+    Postgres logged one, since the timestamp is written on completion.
+    Statements without a timestamp follow the previous one at
+    DEFAULT_REPLAY_QPS. Literals become bind parameters so the replay uses
+    the logged values through prepared statements. Only queries and
+    INSERT/UPDATE/DELETE are scheduled; DDL and other statements are
+    skipped and counted.
+    
+    Args:
+        statements (iterable): Statements from iter_log_statements
+        speedup (float): Factor by which the original timing is compressed
+        limit (int, optional): Maximum number of statements to schedule
         
-        # Insert data in batches
-        batch_size = 1000
-        for i in range(0, row_count, batch_size):
-            batch_end = min(i + batch_size, row_count)
-            values = []
-            for j in range(i, batch_end):
-                values.append(f"('name_{j}', {j % 100})")
-            
-            values_str = ", ".join(values)
-            conn.execute(text(
-                f"""
-                INSERT INTO {table_name} (name, value)
-                VALUES {values_str}
-                """
-            ))
-    
-    return True
\ No newline at end of file
+    Returns:
+        dict: events [{offset_ns, fingerprint_id, type, sql, params}] in send
+              order, fingerprints {id: {fingerprint, type, count}}, speedup,
+              duration_seconds of the schedule and skipped_statements
+    """
+    events = []
+    fingerprints = {}
+    skipped = 0
+    base = None
+    offset = 0.0
+    
+    for statement in statements:
+        if limit is not None and len(events) >= limit:
+            break
+        sql = statement["sql"].strip().rstrip(';')
+        if not sql:
+            continue
+        statement_type = _statement_type(sql)
+        if statement_type not in REPLAY_STATEMENT_TYPES:
+            skipped += 1
+            continue
+        
+        timestamp = None
+        if statement.get("timestamp"):
+            try:
+                timestamp = datetime.fromisoformat(statement["timestamp"].replace(" ", "T"))
+            except ValueError:
+                pass
+        if timestamp is not None:
+            base = base or timestamp
+            offset = (timestamp - base).total_seconds() - (statement.get("duration_ms") or 0) / 1000
+        elif events:
+            offset += 1.0 / DEFAULT_REPLAY_QPS
+        
+        fp_id = fingerprint_id(sql)
+        fp = fingerprints.get(fp_id)
+        if fp is None:
+            fp = fingerprints[fp_id] = {"fingerprint": fingerprint_query(sql), "type": statement_type, "count": 0}
+        fp["count"] += 1
+        
+        template, params = parameterize_query(sql)
+        event = {"offset": offset, "fingerprint_id": fp_id, "type": fp["type"]}
+        event.update(_replay_statement(template if params else sql, params))
+        events.append(event)
+    
+    # Start times derived from durations can precede the first timestamp or each other
+    events.sort(key=lambda event: event["offset"])
+    start = events[0]["offset"] if events else 0.0
+    for event in events:
+        event["offset_ns"] = int((event.pop("offset") - start) / speedup * 1e9)
+    
+    logger.info(f"Scheduled {len(events)} statements from {len(fingerprints)} fingerprints for replay, "
+                f"skipped {skipped} that are not queries or writes")
+    return {
+        "events": events,
+        "fingerprints": fingerprints,
+        "speedup": speedup,
+        "duration_seconds": events[-1]["offset_ns"] / 1e9 if events else 0.0,
+        "skipped_statements": skipped
+    }
+
+def load_replay_schedule(log_path, speedup=1.0, limit=None):
+    """
+    Schedule the statements of a query log for replay.
+    
+    Args:
+        log_path (str): Path to the query log file
+        speedup (float): Factor by which the original timing is compressed
+        limit (int, optional): Maximum number of statements to schedule
+        
+    Returns:
+        dict: Schedule from build_replay_schedule
+    """
+    with open(log_path, 'r') as f:
+        return build_replay_schedule(iter_log_statements(f), speedup, limit)
+
+def synthesize_replay_schedule(fingerprints, target_qps, duration, seed=None):
+    """
+    Schedule a statement mix drawn from fingerprinted workload statistics.
+    
+    For workloads whose raw log is no longer available, statements are
+    drawn in proportion to each fingerprint's logged frequency and bound to
+    its sampled parameter sets, with Poisson arrivals at the target rate.
+    Fingerprints that are not queries or writes are left out of the mix,
+    and their logged count is reported as skipped_statements.
+    
+    Args:
+        fingerprints (dict): Fingerprint id -> fingerprint from parse_query_logs
+        target_qps (float): Statements scheduled per second
+        duration (float): Seconds over which statements are scheduled
+        seed (int, optional): Seed for the arrival process and statement draws
+        
+    Returns:
+        dict: Schedule in the form of build_replay_schedule
+    """
+    rng = random.Random(seed)
+    fp_ids = [fp_id for fp_id, fp in fingerprints.items() if fp.get("template") or fp.get("example")]
+    skipped = sum(fingerprints[fp_id].get("count", 1) for fp_id in fp_ids
+                  if fingerprints[fp_id].get("type") not in REPLAY_STATEMENT_TYPES)
+    fp_ids = [fp_id for fp_id in fp_ids if fingerprints[fp_id].get("type") in REPLAY_STATEMENT_TYPES]
+    weights = [fingerprints[fp_id].get("count", 1) for fp_id in fp_ids]
+    events = []
+    offset = 0.0
+    
+    while fp_ids:
+        offset += rng.expovariate(target_qps)
+        if offset >= duration:
+            break
+        fp_id = rng.choices(fp_ids, weights)[0]
+        fp = fingerprints[fp_id]
+        samples = fp.get("parameter_samples") or []
+        event = {"offset_ns": int(offset * 1e9), "fingerprint_id": fp_id, "type": fp.get("type", "other")}
+        if samples:
+            event.update(_replay_statement(fp["template"], rng.choice(samples)))
+        else:
+            event.update(_replay_statement(fp["example"].strip().rstrip(';'), None))
+        events.append(event)
+    
+    return {
+        "events": events,
+        "fingerprints": {fp_id: {"fingerprint": fingerprints[fp_id].get("fingerprint", ""),
+                                 "type": fingerprints[fp_id].get("type", "other"),
+                                 "count": fingerprints[fp_id].get("count", 1)} for fp_id in fp_ids},
+        "speedup": None,
+        "duration_seconds": duration,
+        "skipped_statements": skipped
+    }
@@ -0,0 +1,225 @@
+import math
+import socket
+import logging
+
+from db.schema_extractor import detect_database_type
+from db.schema_index import schema_fingerprint
+from engine.resource_sampler import HEADLINE_COUNTERS
+
+logger = logging.getLogger(__name__)
+
+# One-sided p-value below which a latency shift is significant
+DEFAULT_SIGNIFICANCE = 0.05
+
+# Median or p99 latency increase, in percent, that counts as a regression once significant
+DEFAULT_REGRESSION_THRESHOLD_PCT = 5.0
+
+# Fewer latency samples per run than this are never called significant
+MIN_SAMPLES_FOR_SIGNIFICANCE = 20
+
+# Latency statistics compared between runs, and their keys in time_query results;
+# throughput results carry the same statistics as <key>_latency_ms
+COMPARED_LATENCIES = ("avg", "median", "p90", "p99", "p99_9")
+
+def _latency_metrics(result):
+    """Latency statistics in ms of a time_query or throughput result"""
+    if "median" in result:
+        return {key: result.get(key) for key in COMPARED_LATENCIES}
+    return {key: result.get(f"{key}_latency_ms") for key in COMPARED_LATENCIES}
+
+def _change_pct(before, after):
+    """Relative change in percent, or None when there is no baseline"""
+    if before is None or after is None or not before:
+        return None
+    return (after - before) / before * 100
+
+def benchmark_run_record(result, mode, query=None, label=None, schema=None, connection_url=None):
+    """
+    Benchmark result wrapped with the metadata needed to compare it later.
+    
+    The connection URL is only used to record the database type; it may
+    hold credentials and is never stored.
+    
+    Args:
+        result (dict): Result of time_query or run_throughput_test
+        mode (str): Benchmark mode (quick, throughput)
+        query (str, optional): Benchmarked query
+        label (str, optional): Free-form run label, e.g. a commit or release name
+        schema (dict, optional): Schema snapshot the run was measured against
+        connection_url (str, optional): Database connection URL
+    
+    Returns:
+        dict: Run record for MetadataStore.save_benchmark_run
+    """
+    return {
+        "label": label,
+        "mode": mode,
+        "query": query,
+        "host": socket.gethostname(),
+        "database_type": detect_database_type(connection_url) if connection_url else None,
+        "schema_fingerprint": schema_fingerprint(schema) if schema else None,
+        "concurrent_clients": result.get("concurrent_clients", 1),
+        "client_mode": result.get("client_mode"),
+        "fetch": result.get("fetch"),
+        "result": result
+    }
+
+def mann_whitney_histograms(baseline, candidate):
+    """
+    One-sided Mann-Whitney U test that candidate latencies tend to be higher.
+    
+    Works directly on exported histogram buckets: samples in the same bucket
+    are ties and get the bucket's mid-rank. The p-value uses the normal
+    approximation with tie and continuity corrections.
+    
+    Args:
+        baseline (list): Exported histogram buckets [{low, high, count}] of the baseline
+        candidate (list): Exported histogram buckets of the candidate
+    
+    Returns:
+        dict: Sample counts, U of the candidate, z, p_value and
+              probability_slower (chance a candidate sample exceeds a baseline one)
+    """
+    counts = {}
+    for side, buckets in enumerate((baseline, candidate)):
+        for bucket in buckets:
+            key = (bucket["low"], bucket["high"])
+            counts.setdefault(key, [0, 0])[side] += bucket["count"]
+    
+    n_before = sum(c[0] for c in counts.values())
+    n_after = sum(c[1] for c in counts.values())
+    total = n_before + n_after
+    if not n_before or not n_after:
+        return {"baseline_samples": n_before, "candidate_samples": n_after, "u": None, "z": None,
+                "p_value": None, "probability_slower": None}
+    
+    rank_sum = 0.0
+    ranked = 0
+    tie_term = 0
+    for key in sorted(counts):
+        before, after = counts[key]
+        tied = before + after
+        rank_sum += after * (ranked + (tied + 1) / 2)
+        tie_term += tied ** 3 - tied
+        ranked += tied
+    
+    u = rank_sum - n_after * (n_after + 1) / 2
+    mean = n_before * n_after / 2
+    variance = n_before * n_after / 12 * ((total + 1) - tie_term / (total * (total - 1)))
+    if variance > 0:
+        z = (u - mean - 0.5) / math.sqrt(variance)
+        p_value = 0.5 * math.erfc(z / math.sqrt(2))
+    else:
+        # Every sample fell into one bucket
+        z, p_value = 0.0, 1.0
+    
+    return {
+        "baseline_samples": n_before,
+        "candidate_samples": n_after,
+        "u": u,
+        "z": z,
+        "p_value": min(p_value, 1.0),
+        "probability_slower": u / (n_before * n_after)
+    }
+
+def compare_benchmark_runs(baseline, candidate, alpha=DEFAULT_SIGNIFICANCE,
+                           threshold_pct=DEFAULT_REGRESSION_THRESHOLD_PCT):
+    """
+    Compare two stored benchmark runs and decide whether the candidate regressed.
+    
+    A regression needs both a significant upward shift of the latency
+    distribution and a median or p99 increase above the threshold, so
+    neither noise nor a negligible but consistent slowdown fails a rollout.
+    Samples taken back to back on one connection are not fully independent,
+    so treat p-values near alpha with care and rerun when in doubt.
+    
+    Args:
+        baseline (dict): Stored run to compare against
+        candidate (dict): Stored run under test
+        alpha (float): Significance level of the one-sided test
+        threshold_pct (float): Median or p99 increase, in percent, that is a regression
+    
+    Returns:
+        dict: Latency and throughput changes, per-query server resource
+              changes when both runs sampled them, whether the schema changed,
+              the test result, regression flag, reasons and warnings about
+              runs that are not otherwise like for like
+    """
+    before = baseline["result"]
+    after = candidate["result"]
+    
+    latency = {}
+    before_metrics = _latency_metrics(before)
+    after_metrics = _latency_metrics(after)
+    for key in COMPARED_LATENCIES:
+        latency[key] = {
+            "before_ms": before_metrics[key],
+            "after_ms": after_metrics[key],
+            "change_pct": _change_pct(before_metrics[key], after_metrics[key])
+        }
+    
+    test = mann_whitney_histograms(before.get("histogram") or [], after.get("histogram") or [])
+    
+    warnings = []
+    for field, description in (("host", "hosts"), ("concurrent_clients", "client counts"),
+                               ("client_mode", "client modes"), ("fetch", "fetch modes"), ("query", "queries")):
+        if baseline.get(field) != candidate.get(field):
+            warnings.append(f"Runs used different {description}")
+    if min(test["baseline_samples"], test["candidate_samples"]) < MIN_SAMPLES_FOR_SIGNIFICANCE:
+        warnings.append(f"Fewer than {MIN_SAMPLES_FOR_SIGNIFICANCE} latency samples in a run; "
+                        f"significance not assessed")
+    
+    significant = (test["p_value"] is not None and test["p_value"] < alpha
+                   and min(test["baseline_samples"], test["candidate_samples"]) >= MIN_SAMPLES_FOR_SIGNIFICANCE)
+    
+    reasons = []
+    if significant:
+        for key in ("median", "p99"):
+            change = latency[key]["change_pct"]
+            if change is not None and change > threshold_pct:
+                reasons.append(f"{key} latency up {change:.1f}% (p={test['p_value']:.4f})")
+    
+    comparison = {
+        "baseline_id": baseline.get("run_id"),
+        "candidate_id": candidate.get("run_id"),
+        "baseline_label": baseline.get("label"),
+        "candidate_label": candidate.get("label"),
+        "schema_changed": baseline.get("schema_fingerprint") != candidate.get("schema_fingerprint"),
+        "latency": latency,
+        "mann_whitney": test,
+        "alpha": alpha,
+        "threshold_pct": threshold_pct,
+        "significant": significant,
+        "regression": bool(reasons),
+        "reasons": reasons,
+        "warnings": warnings
+    }
+    
+    if "queries_per_second" in before and "queries_per_second" in after:
+        comparison["throughput"] = {
+            "before_qps": before["queries_per_second"],
+            "after_qps": after["queries_per_second"],
+            "change_pct": _change_pct(before["queries_per_second"], after["queries_per_second"])
+        }
+    
+    before_resources = before.get("resources")
+    after_resources = after.get("resources")
+    if before_resources and after_resources and before_resources["dialect"] == after_resources["dialect"]:
+        comparison["resources"] = {
+            "buffer_hit_ratio": {"before": before_resources["buffer_hit_ratio"],
+                                 "after": after_resources["buffer_hit_ratio"]},
+            "per_query": {
+                name: {
+                    "before": before_resources["per_query"][name],
+                    "after": after_resources["per_query"][name],
+                    "change_pct": _change_pct(before_resources["per_query"][name],
+                                              after_resources["per_query"][name])
+                }
+                for name in HEADLINE_COUNTERS[before_resources["dialect"]]
+                if name in before_resources["per_query"] and name in after_resources["per_query"]
+            }
+        }
+    
+    logger.info(f"Compared benchmark runs {comparison['baseline_id']} and {comparison['candidate_id']}: "
+                f"p={test['p_value']}, regression={comparison['regression']}")
+    return comparison
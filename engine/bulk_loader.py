@@ -0,0 +1,220 @@
+import os
+import time
+import logging
+import tempfile
+from datetime import date, datetime
+from itertools import chain, islice
+
+from db.schema_extractor import detect_database_type
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany call, and per LOAD DATA file on MySQL
+BULK_BATCH_SIZE = 10000
+
+# Characters of CSV the COPY stream builds ahead of the driver's reads
+COPY_BUFFER_CHARS = 1 << 20
+
+# SQLite pragmas that trade crash safety for load speed; restored afterwards
+SQLITE_LOAD_PRAGMAS = {"synchronous": "OFF", "journal_mode": "MEMORY", "cache_size": "-262144"}
+
+def _csv_field(value, null):
+    """
+    One CSV field. Strings are always quoted, so an empty string is never
+    read back as NULL, and NULL is the unquoted null marker of the dialect.
+    """
+    if value is None:
+        return null
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _csv_lines(rows, null, counter):
+    """CSV lines of rows, counting them into counter[0] as they are produced"""
+    for row in rows:
+        counter[0] += 1
+        yield ",".join(_csv_field(value, null) for value in row) + "\n"
+
+class _CsvStream:
+    """
+    Read-only text file over lazily formatted CSV rows, so COPY can stream
+    any number of rows without building them in memory first.
+    """
+    
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = ""
+    
+    def read(self, size=-1):
+        target = COPY_BUFFER_CHARS if size is None or size < 0 else size
+        parts = [self.buffer]
+        length = len(self.buffer)
+        for line in self.lines:
+            parts.append(line)
+            length += len(line)
+            if length >= target:
+                break
+        data = "".join(parts)
+        self.buffer = data[target:]
+        return data[:target]
+
+def _quote(identifier, dialect):
+    """Identifier quoted for a dialect"""
+    quote = '`' if dialect == 'mysql' else '"'
+    return f"{quote}{identifier}{quote}"
+
+def _batches(rows, batch_size):
+    """Lists of up to batch_size rows, drawn lazily from an iterable"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _copy_postgresql(raw, table_sql, columns_sql, rows, counter):
+    """Stream rows through COPY FROM STDIN; False when the driver has no COPY support"""
+    cursor = raw.cursor()
+    copy_sql = f"COPY {table_sql} ({columns_sql}) FROM STDIN WITH (FORMAT csv)"
+    lines = _csv_lines(rows, "", counter)
+    if hasattr(cursor, "copy_expert"):
+        # psycopg2
+        cursor.copy_expert(copy_sql, _CsvStream(lines), size=COPY_BUFFER_CHARS)
+    elif hasattr(cursor, "copy"):
+        # psycopg 3
+        with cursor.copy(copy_sql) as copy:
+            for line in lines:
+                copy.write(line)
+    else:
+        return False
+    raw.commit()
+    return True
+
+def _load_data_mysql(raw, table_sql, columns_sql, rows, batch_size, counter):
+    """
+    Load rows through LOAD DATA LOCAL INFILE, one temporary CSV file per batch.
+    
+    The server and the driver both have to allow local_infile (for PyMySQL,
+    connect_args={"local_infile": True}). When the first batch is refused,
+    its rows are handed back for executemany.
+    """
+    cursor = raw.cursor()
+    for batch in _batches(rows, batch_size):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8", newline="") as f:
+                f.writelines(_csv_lines(batch, "NULL", [0]))
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}' INTO TABLE {table_sql} "
+                    f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                    f"LINES TERMINATED BY '\\n' ({columns_sql})"
+                )
+            except Exception as e:
+                if counter[0]:
+                    raise
+                logger.info(f"LOAD DATA LOCAL INFILE unavailable ({str(e)}), using multi-row inserts")
+                raw.rollback()
+                return batch
+            counter[0] += len(batch)
+        finally:
+            os.remove(path)
+    raw.commit()
+    return None
+
+def _executemany(raw, table_sql, columns, columns_sql, rows, batch_size, counter, paramstyle):
+    """Insert rows with the driver's executemany in one transaction"""
+    if paramstyle in ("qmark", "numeric"):
+        placeholders = ", ".join("?" for _ in columns)
+    else:
+        placeholders = ", ".join("%s" for _ in columns)
+    insert_sql = f"INSERT INTO {table_sql} ({columns_sql}) VALUES ({placeholders})"
+    cursor = raw.cursor()
+    for batch in _batches(rows, batch_size):
+        cursor.executemany(insert_sql, batch)
+        counter[0] += len(batch)
+    raw.commit()
+
+def bulk_load(engine, table, columns, rows, dialect=None, batch_size=BULK_BATCH_SIZE):
+    """
+    Load rows into a table with the fastest path the database offers.
+    
+    Rows are consumed lazily, so a generator of any length can be loaded
+    in constant memory:
+    - PostgreSQL: COPY FROM STDIN fed by a streamed CSV buffer
+    - MySQL: LOAD DATA LOCAL INFILE per batch, or multi-row executemany
+      when local_infile is disabled
+    - SQLite: executemany in a single transaction with durability pragmas
+      relaxed for the load and restored afterwards
+    - Other databases: executemany per batch
+    
+    Args:
+        engine: SQLAlchemy engine
+        table (str): Target table
+        columns (list): Column names, in the order of the row tuples
+        rows (iterable): Row tuples
+        dialect (str, optional): Database type, detected from the engine URL by default
+        batch_size (int): Rows per executemany call or LOAD DATA file
+    
+    Returns:
+        dict: rows loaded, seconds, rows_per_second and the method used
+    """
+    dialect = dialect or detect_database_type(str(engine.url))
+    table_sql = _quote(table, dialect)
+    columns_sql = ", ".join(_quote(c, dialect) for c in columns)
+    counter = [0]
+    started = time.perf_counter()
+    
+    raw = engine.raw_connection()
+    try:
+        method = "executemany"
+        paramstyle = engine.dialect.paramstyle
+        if dialect == "postgresql":
+            if _copy_postgresql(raw, table_sql, columns_sql, rows, counter):
+                method = "copy"
+            else:
+                _executemany(raw, table_sql, columns, columns_sql, rows, batch_size, counter, paramstyle)
+        elif dialect == "mysql":
+            iterator = iter(rows)
+            refused = _load_data_mysql(raw, table_sql, columns_sql, iterator, batch_size, counter)
+            if refused is None:
+                method = "load_data"
+            else:
+                _executemany(raw, table_sql, columns, columns_sql, chain(refused, iterator), batch_size, counter,
+                             paramstyle)
+        elif dialect == "sqlite":
+            cursor = raw.cursor()
+            previous = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in SQLITE_LOAD_PRAGMAS}
+            for name, value in SQLITE_LOAD_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            try:
+                _executemany(raw, table_sql, columns, columns_sql, rows, batch_size, counter, paramstyle)
+            except Exception:
+                # journal_mode cannot be changed inside an open transaction
+                raw.rollback()
+                raise
+            finally:
+                for name, value in previous.items():
+                    cursor.execute(f"PRAGMA {name} = {value}")
+        else:
+            _executemany(raw, table_sql, columns, columns_sql, rows, batch_size, counter, paramstyle)
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    
+    seconds = time.perf_counter() - started
+    stats = {
+        "rows": counter[0],
+        "seconds": seconds,
+        "rows_per_second": counter[0] / seconds if seconds else 0.0,
+        "method": method
+    }
+    logger.info(f"Loaded {stats['rows']} rows into {table} via {method} in {seconds:.2f}s "
+                f"({stats['rows_per_second']:.0f} rows/s)")
+    return stats
@@ -0,0 +1,430 @@
+import math
+import uuid
+import random
+import logging
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import create_engine, text
+
+from db.schema_extractor import detect_database_type, is_temporal_type
+from engine.bulk_loader import bulk_load, BULK_BATCH_SIZE
+from engine.experiment import clone_schema_sql, table_load_order
+
+logger = logging.getLogger(__name__)
+
+# Zipf exponent of generated value frequencies (YCSB's default); 0 gives uniform data
+DEFAULT_ZIPF_SKEW = 0.99
+
+# Rows of tables whose schema has no row count
+DEFAULT_TABLE_ROWS = 1000
+
+# Weight table size of the Zipf sampler; larger domains are spread over these ranks
+MAX_ZIPF_RANKS = 100000
+
+# Distinct values of columns without statistics, by value kind; other kinds get one per row
+DEFAULT_DOMAIN_SIZES = {"bool": 2, "date": 3650, "timestamp": 10 ** 6}
+
+# Origin of generated dates and timestamps
+DATA_EPOCH = date(2020, 1, 1)
+
+def _value_kind(col_type):
+    """Kind of Python value generated for a column type"""
+    col_type = str(col_type).lower()
+    if "bool" in col_type:
+        return "bool"
+    if is_temporal_type(col_type):
+        return "timestamp" if "time" in col_type else "date"
+    if "uuid" in col_type:
+        return "uuid"
+    if "int" in col_type and "interval" not in col_type and "point" not in col_type:
+        return "int"
+    if any(word in col_type for word in ("numeric", "decimal", "float", "double", "real")):
+        return "float"
+    return "string"
+
+def _max_length(col_type):
+    """Declared length of a character column, or None"""
+    col_type = str(col_type).lower()
+    if "char" not in col_type or "(" not in col_type:
+        return None
+    try:
+        return int(col_type.split("(", 1)[1].split(")")[0].split(",")[0])
+    except ValueError:
+        return None
+
+def _domain_value(index, kind, name, max_length=None):
+    """The index-th value of a column's generated domain"""
+    if kind == "int":
+        return index + 1
+    if kind == "float":
+        return index + (index % 100) / 100
+    if kind == "bool":
+        return index % 2 == 0
+    if kind == "date":
+        return DATA_EPOCH + timedelta(days=index)
+    if kind == "timestamp":
+        return datetime.combine(DATA_EPOCH, datetime.min.time()) + timedelta(minutes=index)
+    if kind == "uuid":
+        return str(uuid.UUID(int=index + 1))
+    value = f"{name}_{index}"
+    return value[-max_length:] if max_length and len(value) > max_length else value
+
+def _parse_value(value, kind):
+    """Python value of a statistics entry, which the extractor stores as text; None if unparseable"""
+    try:
+        if kind == "int":
+            return int(float(value))
+        if kind == "float":
+            return float(value)
+        if kind == "bool":
+            return str(value).lower() in ("t", "true", "1")
+        if kind == "date":
+            return date.fromisoformat(str(value)[:10])
+        if kind == "timestamp":
+            return datetime.fromisoformat(str(value).replace(" ", "T")[:19])
+        return str(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_number(value, kind):
+    """Numeric position of an orderable value, for interpolating between histogram bounds"""
+    if kind == "date":
+        return value.toordinal()
+    if kind == "timestamp":
+        return value.timestamp()
+    return value
+
+def _from_number(number, kind):
+    """Inverse of _to_number"""
+    if kind == "int":
+        return int(number)
+    if kind == "date":
+        return date.fromordinal(int(number))
+    if kind == "timestamp":
+        return datetime.fromtimestamp(int(number))
+    return round(number, 2)
+
+def _coprime_stride(n):
+    """Stride that visits every residue mod n, used to scatter popular values over the domain"""
+    stride = 2654435761 % n or 1
+    while math.gcd(stride, n) != 1:
+        stride += 1
+    return stride
+
+def _zipf_sampler(n, skew, rng):
+    """
+    Sampler of indexes in [0, n) whose frequencies follow a Zipf law.
+    
+    Ranks are mapped to indexes with a coprime stride, so the popular
+    values are scattered over the domain instead of being its first ones.
+    Domains larger than MAX_ZIPF_RANKS share the weight of a rank evenly
+    among a block of neighbouring indexes.
+    
+    Returns:
+        callable: count -> list of indexes
+    """
+    n = max(1, int(n))
+    if skew <= 0 or n == 1:
+        return lambda count: [int(rng.random() * n) for _ in range(count)]
+    
+    ranks = min(n, MAX_ZIPF_RANKS)
+    cum_weights = list(accumulate(1 / rank ** skew for rank in range(1, ranks + 1)))
+    population = range(ranks)
+    width = n / ranks
+    stride = _coprime_stride(n)
+    
+    def sample(count):
+        drawn = rng.choices(population, cum_weights=cum_weights, k=count)
+        if width > 1:
+            drawn = [int((rank + rng.random()) * width) for rank in drawn]
+        return [rank * stride % n for rank in drawn]
+    
+    return sample
+
+def _histogram_sampler(bounds, kind, rng):
+    """
+    Sampler of values spread like an equi-depth histogram: every bucket is
+    equally likely and values are uniform within it.
+    
+    Returns:
+        callable: count -> list of values
+    """
+    numbers = sorted(_to_number(bound, kind) for bound in bounds)
+    buckets = range(len(numbers) - 1)
+    
+    def sample(count):
+        values = []
+        for bucket in rng.choices(buckets, k=count):
+            low, high = numbers[bucket], numbers[bucket + 1]
+            values.append(_from_number(low + (high - low) * rng.random(), kind))
+        return values
+    
+    return sample
+
+def _domain_size(stats, kind, n_rows):
+    """
+    Distinct values a column should have besides its most common values,
+    following the PostgreSQL n_distinct convention
+    """
+    n_distinct = stats.get("n_distinct")
+    if n_distinct:
+        n_distinct = float(n_distinct)
+        size = -n_distinct * n_rows if n_distinct < 0 else n_distinct
+        return max(1, min(int(size), n_rows) - len(stats.get("most_common_vals") or []))
+    return DEFAULT_DOMAIN_SIZES.get(kind, n_rows)
+
+def _value_sampler(col, stats, n_rows, skew, rng):
+    """
+    Sampler of values for an ordinary column.
+    
+    Most common values are drawn with their captured frequencies. The rest
+    follow the histogram of orderable columns, or a Zipf distribution over
+    a domain sized by n_distinct.
+    
+    Returns:
+        callable: count -> list of values
+    """
+    kind = _value_kind(col["type"])
+    max_length = _max_length(col["type"])
+    
+    bounds = [v for v in (_parse_value(b, kind) for b in stats.get("histogram_bounds") or []) if v is not None]
+    if len(bounds) < 2 and stats.get("min") is not None and stats.get("max") is not None:
+        bounds = [v for v in (_parse_value(stats["min"], kind), _parse_value(stats["max"], kind)) if v is not None]
+    
+    if len(bounds) >= 2 and kind in ("int", "float", "date", "timestamp"):
+        rest = _histogram_sampler(bounds, kind, rng)
+    else:
+        indexes = _zipf_sampler(_domain_size(stats, kind, n_rows), skew, rng)
+        rest = lambda count: [_domain_value(i, kind, col["name"], max_length) for i in indexes(count)]
+    
+    common = [(v, float(f)) for v, f in zip((_parse_value(v, kind) for v in stats.get("most_common_vals") or []),
+                                             stats.get("most_common_freqs") or []) if v is not None]
+    if not common:
+        return rest
+    
+    common_values = [v for v, _ in common]
+    common_weights = list(accumulate(f for _, f in common))
+    common_share = min(common_weights[-1], 1.0)
+    
+    def sample(count):
+        is_common = [rng.random() < common_share for _ in range(count)]
+        drawn_common = iter(rng.choices(common_values, cum_weights=common_weights, k=sum(is_common)))
+        drawn_rest = iter(rest(count - sum(is_common)))
+        return [next(drawn_common) if flag else next(drawn_rest) for flag in is_common]
+    
+    return sample
+
+def _unique_columns(table_info):
+    """Columns whose values must be unique on their own: a single-column primary key or unique index/constraint"""
+    pk_columns = (table_info.get("primary_key") or {}).get("constrained_columns") or [
+        col["name"] for col in table_info.get("columns", []) if col.get("is_primary_key")
+    ]
+    unique_columns = {idx["column_names"][0] for idx in table_info.get("indexes", [])
+                      if idx.get("unique") and len(idx.get("column_names") or []) == 1}
+    unique_columns.update(uc["column_names"][0] for uc in table_info.get("unique_constraints", [])
+                          if len(uc.get("column_names") or []) == 1)
+    if len(pk_columns) == 1:
+        unique_columns.add(pk_columns[0])
+    return unique_columns
+
+def plan_row_counts(schema, scale_factor=1.0, rows=None):
+    """
+    Rows to generate per table.
+    
+    A table whose primary key or a unique column is a foreign key (a 1:1
+    extension of its parent) gets at most as many rows as the parent, since
+    each parent key can be referenced only once.
+    
+    Args:
+        schema (dict): Database schema information
+        scale_factor (float): Multiple of each table's extracted row count
+        rows (dict, optional): Table -> explicit row count, overriding the scale
+    
+    Returns:
+        dict: Table -> row count
+    """
+    counts = {}
+    for table, table_info in schema.items():
+        base = table_info.get("row_count") or DEFAULT_TABLE_ROWS
+        counts[table] = max(1, int(round(base * scale_factor)))
+    counts.update(rows or {})
+    
+    # Parents first, so chains of 1:1 tables are capped by the smallest
+    for table in table_load_order(schema):
+        table_info = schema[table]
+        unique_columns = _unique_columns(table_info)
+        for fk in table_info.get("foreign_keys", []):
+            constrained = fk.get("constrained_columns") or []
+            parent = fk.get("referred_table")
+            if (len(constrained) == 1 and constrained[0] in unique_columns and parent in schema
+                    and parent != table and counts[table] > counts[parent]):
+                logger.warning(f"{table}.{constrained[0]} is a unique foreign key; capping {table} at the "
+                               f"{counts[parent]} rows of {parent}")
+                counts[table] = counts[parent]
+    return counts
+
+def generate_table_rows(schema, table, row_counts, seed=0, skew=DEFAULT_ZIPF_SKEW, batch_size=BULK_BATCH_SIZE,
+                        deferred_tables=()):
+    """
+    Generate the rows of one table, a batch of columns at a time.
+    
+    Primary and unique key columns get sequential values, which fixes the
+    key of every row of every table in advance. Foreign keys therefore
+    reference existing parent keys, with Zipf-skewed popularity, whether
+    or not the parent is loaded yet. A primary or unique key that is also
+    a foreign key takes the parent keys in order instead, once each. Composite primary keys enumerate the
+    combinations of their columns' domains, so rows stay unique. Foreign
+    keys into deferred tables (cycles and self-references) are NULL where
+    the column allows it.
+    
+    Args:
+        schema (dict): Database schema information with optional column_stats
+        table (str): Table to generate
+        row_counts (dict): Table -> rows, from plan_row_counts
+        seed (int): Seed; every column draws from its own stream derived from it
+        skew (float): Zipf exponent for foreign keys and columns without statistics
+        batch_size (int): Rows generated per batch
+        deferred_tables (iterable): Referenced tables not loaded before this one
+    
+    Yields:
+        tuple: Row values in column order
+    """
+    table_info = schema[table]
+    columns = table_info.get("columns", [])
+    n_rows = row_counts[table]
+    column_stats = table_info.get("column_stats") or {}
+    pk_columns = (table_info.get("primary_key") or {}).get("constrained_columns") or [
+        col["name"] for col in columns if col.get("is_primary_key")
+    ]
+    unique_columns = _unique_columns(table_info)
+    foreign_keys = {fk["constrained_columns"][0]: fk for fk in table_info.get("foreign_keys", [])
+                    if len(fk.get("constrained_columns") or []) == 1 and fk.get("referred_table") in schema}
+    
+    def parent_key(fk):
+        """Key of the index-th row of the referenced table"""
+        parent = schema[fk["referred_table"]]
+        parent_column = (fk.get("referred_columns") or ["id"])[0]
+        parent_type = next((c["type"] for c in parent.get("columns", []) if c["name"] == parent_column), "INTEGER")
+        kind, max_length = _value_kind(parent_type), _max_length(parent_type)
+        return lambda index: _domain_value(index, kind, parent_column, max_length)
+    
+    # Composite primary keys walk the columns' domains like the digits of a number
+    radix = {}
+    if len(pk_columns) > 1:
+        place = 1
+        for name in pk_columns:
+            fk = foreign_keys.get(name)
+            size = row_counts.get(fk["referred_table"], n_rows) if fk else n_rows
+            radix[name] = (place, size)
+            place *= size
+        if place < n_rows:
+            logger.warning(f"Composite key of {table} has only {place} combinations for {n_rows} rows")
+    
+    samplers = []
+    for col in columns:
+        name = col["name"]
+        rng = random.Random(f"{seed}:{table}:{name}")
+        kind, max_length = _value_kind(col["type"]), _max_length(col["type"])
+        fk = foreign_keys.get(name)
+        stats = column_stats.get(name) or {}
+        null_frac = float(stats.get("null_frac") or 0) if col.get("nullable", True) and name not in pk_columns else 0
+        
+        if name in radix:
+            place, size = radix[name]
+            key = parent_key(fk) if fk else (lambda index, k=kind, n=name, m=max_length: _domain_value(index, k, n, m))
+            sampler = lambda start, count, key=key, place=place, size=size: [
+                key((start + i) // place % size) for i in range(count)
+            ]
+        elif fk and fk["referred_table"] in deferred_tables and col.get("nullable", True):
+            sampler = lambda start, count: [None] * count
+        elif fk and name in unique_columns:
+            # A unique foreign key takes each parent key once, in order
+            key = parent_key(fk)
+            sampler = lambda start, count, key=key: [key(start + i) for i in range(count)]
+        elif fk:
+            indexes = _zipf_sampler(row_counts.get(fk["referred_table"], DEFAULT_TABLE_ROWS), skew, rng)
+            key = parent_key(fk)
+            sampler = lambda start, count, indexes=indexes, key=key: [key(i) for i in indexes(count)]
+        elif name in unique_columns:
+            sampler = lambda start, count, k=kind, n=name, m=max_length: [
+                _domain_value(start + i, k, n, m) for i in range(count)
+            ]
+        else:
+            values = _value_sampler(col, stats, n_rows, skew, rng)
+            sampler = lambda start, count, values=values: values(count)
+        
+        if null_frac > 0:
+            sampler = (lambda start, count, inner=sampler, rng=rng, null_frac=null_frac: [
+                None if rng.random() < null_frac else value for value in inner(start, count)
+            ])
+        samplers.append(sampler)
+    
+    for start in range(0, n_rows, batch_size):
+        count = min(batch_size, n_rows - start)
+        yield from zip(*(sampler(start, count) for sampler in samplers))
+
+def generate_data(connection_url, schema, scale_factor=1.0, rows=None, seed=0, skew=DEFAULT_ZIPF_SKEW,
+                  create_tables=False, batch_size=BULK_BATCH_SIZE):
+    """
+    Fill a database with synthetic data shaped like an extracted schema.
+    
+    Tables are loaded parents first, each streamed from generate_table_rows
+    into bulk_load, so memory stays constant at any scale. Value
+    distributions follow the captured column statistics (most common values,
+    histograms, n_distinct and null fraction) where the schema has them.
+    A table that fails to load is reported and the rest are still loaded.
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL of the target database
+        schema (dict): Database schema information from extract_schema
+        scale_factor (float): Multiple of each table's extracted row count
+        rows (dict, optional): Table -> explicit row count
+        seed (int): Seed, so the same arguments produce the same data
+        skew (float): Zipf exponent for foreign keys and columns without statistics
+        create_tables (bool): Create the tables first with clone_schema_sql
+        batch_size (int): Rows generated and loaded per batch
+    
+    Returns:
+        dict: Load order, per-table bulk_load statistics or error, and the
+              total rows, seconds and rows_per_second
+    """
+    dialect = detect_database_type(connection_url)
+    engine = create_engine(connection_url)
+    order = table_load_order(schema)
+    row_counts = plan_row_counts(schema, scale_factor, rows)
+    tables = {}
+    started = time.perf_counter()
+    
+    try:
+        if create_tables:
+            with engine.begin() as conn:
+                for statement in clone_schema_sql(schema, dialect):
+                    conn.execute(text(statement))
+        
+        for position, table in enumerate(order):
+            columns = [col["name"] for col in schema[table].get("columns", [])]
+            if not columns:
+                continue
+            deferred = set(order[position:])
+            try:
+                tables[table] = bulk_load(engine, table, columns,
+                                          generate_table_rows(schema, table, row_counts, seed, skew, batch_size,
+                                                              deferred),
+                                          dialect, batch_size)
+            except Exception as e:
+                logger.error(f"Error generating data for {table}: {str(e)}")
+                tables[table] = {"error": str(e)}
+    finally:
+        engine.dispose()
+    
+    seconds = time.perf_counter() - started
+    total_rows = sum(stats.get("rows", 0) for stats in tables.values())
+    logger.info(f"Generated {total_rows} rows in {len(tables)} tables in {seconds:.1f}s")
+    return {
+        "order": order,
+        "tables": tables,
+        "rows": total_rows,
+        "seconds": seconds,
+        "rows_per_second": total_rows / seconds if seconds else 0.0
+    }
@@ -0,0 +1,520 @@
+import os
+import time
+import logging
+import tempfile
+import statistics
+from sqlalchemy import bindparam, create_engine, text
+
+from db.query_log_analyzer import bindable_template
+from db.schema_extractor import detect_database_type
+from engine.plan_generator import generate_sql
+from engine.plan_executor import execute_plans
+from engine.benchmark_history import DEFAULT_SIGNIFICANCE, MIN_SAMPLES_FOR_SIGNIFICANCE, mann_whitney_histograms
+
+logger = logging.getLogger(__name__)
+
+# Rows copied from each source table into the scratch database
+DEFAULT_SAMPLE_ROWS = 10000
+
+# Rows inserted into the scratch database per executemany call
+LOAD_BATCH_SIZE = 1000
+
+# Parent keys bound into one IN list when sampling a child table
+SAMPLE_KEY_BATCH_SIZE = 500
+
+# Fingerprints replayed against the scratch database, by log frequency; enough
+# iterations that a workload change can be called significant
+DEFAULT_REPLAY_TOP = 20
+DEFAULT_REPLAY_ITERATIONS = MIN_SAMPLES_FOR_SIGNIFICANCE
+
+WRITE_STATEMENT_TYPES = {"insert", "update", "delete"}
+READ_STATEMENT_TYPES = {"select", "with"}
+
+def default_scratch_url():
+    """Connection URL of a fresh SQLite database in a temporary directory"""
+    return f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='denode_scratch_'), 'scratch.db')}"
+
+def clone_schema_sql(schema, dialect="sqlite"):
+    """
+    Build DDL that recreates the extracted tables and their indexes.
+    
+    Foreign keys are left out, as a child sample may still reference rows
+    of other parents that were not sampled. Column types are copied as extracted, so the scratch database
+    should use the source dialect or SQLite, which accepts any type name.
+    
+    Args:
+        schema (dict): Database schema information
+        dialect (str): Scratch database type (postgresql, mysql, sqlite)
+    
+    Returns:
+        list: SQL statements
+    """
+    quote = '`' if dialect == 'mysql' else '"'
+    statements = []
+    
+    for table, table_info in schema.items():
+        column_defs = [
+            f"{quote}{col['name']}{quote} {col['type']}" + ("" if col.get("nullable", True) else " NOT NULL")
+            for col in table_info.get("columns", [])
+        ]
+        pk_columns = (table_info.get("primary_key") or {}).get("constrained_columns") or []
+        if pk_columns:
+            column_defs.append(f"PRIMARY KEY ({', '.join(f'{quote}{c}{quote}' for c in pk_columns)})")
+        statements.append(f"CREATE TABLE {quote}{table}{quote} (\n    " + ",\n    ".join(column_defs) + "\n)")
+        
+        for index in table_info.get("indexes", []):
+            columns = index.get("column_names") or []
+            # Expression indexes have no column names to recreate them from
+            if not columns or None in columns:
+                continue
+            unique = "UNIQUE " if index.get("unique") else ""
+            statements.append(f"CREATE {unique}INDEX {quote}{index['name']}{quote} ON {quote}{table}{quote} "
+                              f"({', '.join(f'{quote}{c}{quote}' for c in columns)})")
+    
+    return statements
+
+def table_load_order(schema):
+    """
+    Tables ordered so every table comes after the tables it references.
+    
+    Self-references are ignored. When only tables on foreign key cycles are
+    left, the first of them by name is placed next, breaking the cycle.
+    
+    Args:
+        schema (dict): Database schema information
+    
+    Returns:
+        list: Table names
+    """
+    parents = {
+        table: {fk.get("referred_table") for fk in table_info.get("foreign_keys", [])
+                if fk.get("referred_table") in schema and fk.get("referred_table") != table}
+        for table, table_info in schema.items()
+    }
+    order = []
+    placed = set()
+    while len(order) < len(schema):
+        ready = sorted(table for table in schema if table not in placed and parents[table] <= placed)
+        if not ready:
+            # Break the cycle at one table and let the rest follow their dependencies again
+            ready = [min(table for table in schema if table not in placed)]
+            logger.warning(f"Foreign key cycle; loading {ready[0]} before the tables it references")
+        order.extend(ready)
+        placed.update(ready)
+    return order
+
+def reset_scratch_database(conn, db_type):
+    """
+    Drop every table and view of a scratch database.
+    
+    PostgreSQL drops and recreates the public schema, so only point this at
+    a database that exists for experiments.
+    
+    Args:
+        conn: SQLAlchemy connection to the scratch database
+        db_type (str): Database type (postgresql, mysql, sqlite)
+    """
+    if db_type == 'postgresql':
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    elif db_type == 'mysql':
+        conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+        for name, table_type in conn.execute(text(
+            "SELECT table_name, table_type FROM information_schema.tables WHERE table_schema = DATABASE()"
+        )).fetchall():
+            kind = "VIEW" if table_type == "VIEW" else "TABLE"
+            conn.execute(text(f"DROP {kind} IF EXISTS `{name}`"))
+        conn.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+    else:
+        objects = conn.execute(text(
+            "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+        )).fetchall()
+        # Views first, they may depend on tables
+        for name, kind in sorted(objects, key=lambda o: o[1] != 'view'):
+            conn.execute(text(f'DROP {kind.upper()} IF EXISTS "{name}"'))
+    conn.commit()
+
+def _sampling_parent(table, table_info, schema, sampled_keys):
+    """
+    The foreign key a table's sample is drawn through, or None.
+    
+    Only single-column foreign keys to tables already sampled qualify. The
+    largest parent is preferred, as it is the one most likely to have been
+    cut down by sampling.
+    """
+    candidates = [fk for fk in table_info.get("foreign_keys", [])
+                  if fk.get("referred_table") != table
+                  and len(fk.get("constrained_columns") or []) == 1
+                  and (fk.get("referred_table"), (fk.get("referred_columns") or [None])[0]) in sampled_keys]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda fk: schema[fk["referred_table"]].get("row_count") or 0)
+
+def prepare_scratch_database(scratch_url, schema, source_url, sample_rows=DEFAULT_SAMPLE_ROWS):
+    """
+    Reset a scratch database, clone the schema into it and load sampled rows.
+    
+    Tables are sampled parents first. A table without a sampled parent gets
+    a random sample of about sample_rows rows, drawn with a random filter so
+    it is spread over the whole table rather than its first pages. A child
+    table is sampled through its largest parent: only rows referencing the
+    parent keys already loaded are copied, so joins along that foreign key
+    find their matches. Foreign keys to other parents may still point at
+    rows outside the sample.
+    
+    Args:
+        scratch_url (str): SQLAlchemy connection URL of the scratch database
+        schema (dict): Database schema information of the source
+        source_url (str): SQLAlchemy connection URL of the source database
+        sample_rows (int): Target rows per table
+    
+    Returns:
+        dict: Table -> rows loaded
+    """
+    scratch_type = detect_database_type(scratch_url)
+    source_type = detect_database_type(source_url)
+    source_quote = '`' if source_type == 'mysql' else '"'
+    scratch_quote = '`' if scratch_type == 'mysql' else '"'
+    random_value = {
+        'postgresql': "random()",
+        'mysql': "RAND()"
+    }.get(source_type, "(ABS(RANDOM()) / 9223372036854775807.0)")
+    
+    # Parent columns whose sampled values drive the sample of a child table
+    referenced = {}
+    for table_info in schema.values():
+        for fk in table_info.get("foreign_keys", []):
+            if len(fk.get("referred_columns") or []) == 1:
+                referenced.setdefault(fk.get("referred_table"), set()).add(fk["referred_columns"][0])
+    
+    loaded = {}
+    sampled_keys = {}
+    scratch_engine = create_engine(scratch_url)
+    source_engine = create_engine(source_url)
+    
+    with scratch_engine.connect() as scratch, source_engine.connect() as source:
+        reset_scratch_database(scratch, scratch_type)
+        for statement in clone_schema_sql(schema, scratch_type):
+            scratch.execute(text(statement))
+        scratch.commit()
+        
+        for table in table_load_order(schema):
+            table_info = schema[table]
+            columns = [col["name"] for col in table_info.get("columns", [])]
+            if not columns:
+                continue
+            
+            select = (f"SELECT {', '.join(f'{source_quote}{c}{source_quote}' for c in columns)} "
+                      f"FROM {source_quote}{table}{source_quote}")
+            parent_fk = _sampling_parent(table, table_info, schema, sampled_keys)
+            if parent_fk:
+                keys = sampled_keys[(parent_fk["referred_table"], parent_fk["referred_columns"][0])]
+                statement = text(
+                    f"{select} WHERE {source_quote}{parent_fk['constrained_columns'][0]}{source_quote} IN :keys "
+                    f"LIMIT :limit"
+                ).bindparams(bindparam("keys", expanding=True))
+                rows = []
+                for start in range(0, len(keys), SAMPLE_KEY_BATCH_SIZE):
+                    if len(rows) >= sample_rows:
+                        break
+                    rows.extend(source.execute(statement, {"keys": keys[start:start + SAMPLE_KEY_BATCH_SIZE],
+                                                           "limit": sample_rows - len(rows)}).fetchall())
+            else:
+                row_count = table_info.get("row_count")
+                fraction = min(1.0, sample_rows / row_count) if row_count else 1.0
+                rows = source.execute(text(f"{select} WHERE {random_value} < :fraction LIMIT :limit"),
+                                      {"fraction": fraction, "limit": sample_rows}).fetchall()
+            
+            for column in referenced.get(table, ()):
+                if column in columns:
+                    position = columns.index(column)
+                    sampled_keys[(table, column)] = list(dict.fromkeys(
+                        row[position] for row in rows if row[position] is not None))
+            
+            insert = text(
+                f"INSERT INTO {scratch_quote}{table}{scratch_quote} "
+                f"({', '.join(f'{scratch_quote}{c}{scratch_quote}' for c in columns)}) "
+                f"VALUES ({', '.join(f':c{i}' for i in range(len(columns)))})"
+            )
+            for start in range(0, len(rows), LOAD_BATCH_SIZE):
+                scratch.execute(insert, [{f"c{i}": value for i, value in enumerate(row)}
+                                         for row in rows[start:start + LOAD_BATCH_SIZE]])
+            scratch.commit()
+            loaded[table] = len(rows)
+    
+    scratch_engine.dispose()
+    source_engine.dispose()
+    logger.info(f"Loaded {sum(loaded.values())} sampled rows into {len(loaded)} scratch tables")
+    return loaded
+
+def replay_workload(connection_url, fingerprints, iterations=DEFAULT_REPLAY_ITERATIONS):
+    """
+    Time the given fingerprints against a database.
+    
+    Each execution binds one of the parameter sets sampled from the log
+    (cycling through them), or runs the logged example when there are none.
+    Writes run inside a transaction that is rolled back, so every iteration
+    sees the same data and the timing includes index maintenance.
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL
+        fingerprints (dict): Fingerprint id -> fingerprint from parse_query_logs
+        iterations (int): Timed executions per fingerprint
+    
+    Returns:
+        dict: Fingerprint id -> type, count, mean_ms, median_ms and timings_ms, or error
+    """
+    engine = create_engine(connection_url)
+    results = {}
+    
+    with engine.connect() as conn:
+        for fp_id, fp in fingerprints.items():
+            samples = fp.get("parameter_samples") or []
+            is_write = fp.get("type") in WRITE_STATEMENT_TYPES
+            timings = []
+            
+            try:
+                for i in range(iterations + 1):
+                    if samples:
+                        params = {f"p{n + 1}": v for n, v in enumerate(samples[i % len(samples)])}
+                        run = lambda: conn.execute(text(bindable_template(fp["template"])), params)
+                    else:
+                        # The raw example may contain colons that text() would read as bind parameters
+                        run = lambda: conn.exec_driver_sql(fp["example"])
+                    
+                    started = time.perf_counter()
+                    if is_write:
+                        trans = conn.begin()
+                        run()
+                        trans.rollback()
+                    else:
+                        run().fetchall()
+                        conn.rollback()
+                    # The first execution warms caches and is not counted
+                    if i:
+                        timings.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                logger.warning(f"Could not replay fingerprint {fp_id}: {str(e)}")
+                conn.rollback()
+                results[fp_id] = {"fingerprint": fp.get("fingerprint"), "error": str(e)}
+                continue
+            
+            results[fp_id] = {
+                "fingerprint": fp.get("fingerprint"),
+                "type": fp.get("type"),
+                "count": fp.get("count", 1),
+                "mean_ms": statistics.mean(timings),
+                "median_ms": statistics.median(timings),
+                "timings_ms": timings
+            }
+    
+    engine.dispose()
+    return results
+
+def _shift_p_value(before, after):
+    """
+    One-sided Mann-Whitney p-value of the shift between two timing samples.
+    
+    The test runs in the direction of the observed change, so a small
+    p-value backs up a speedup as well as a slowdown.
+    """
+    if not before or not after:
+        return None
+    before_buckets = [{"low": t, "high": t, "count": 1} for t in before]
+    after_buckets = [{"low": t, "high": t, "count": 1} for t in after]
+    if statistics.median(after) <= statistics.median(before):
+        return mann_whitney_histograms(after_buckets, before_buckets)["p_value"]
+    return mann_whitney_histograms(before_buckets, after_buckets)["p_value"]
+
+def compare_replays(before, after, alpha=DEFAULT_SIGNIFICANCE):
+    """
+    Compare two replays of the same fingerprints.
+    
+    Read and write totals weight each fingerprint's median time by its log
+    frequency. Fingerprints that failed in either replay are left out.
+    
+    The spread comes from per-iteration workload totals: iteration i binds
+    the same parameters in both replays, so the range of the paired
+    before/after ratios shows how stable the speedup is. A Mann-Whitney test
+    on the totals gives its p-value; a change is only called significant
+    with at least MIN_SAMPLES_FOR_SIGNIFICANCE iterations.
+    
+    Args:
+        before (dict): Replay from replay_workload before the change
+        after (dict): Replay from replay_workload after the change
+        alpha (float): p-value below which a change is significant
+    
+    Returns:
+        dict: Workload speedup, write overhead, their spread and p-values,
+              and per-fingerprint changes
+    """
+    totals = {"read_before": 0.0, "read_after": 0.0, "write_before": 0.0, "write_after": 0.0}
+    iteration_totals = {key: [] for key in totals}
+    fingerprints = []
+    
+    for fp_id, old in before.items():
+        new = after.get(fp_id)
+        if "error" in old or not new:
+            continue
+        if "error" in new:
+            fingerprints.append({"fingerprint_id": fp_id, "fingerprint": old["fingerprint"], "error": new["error"]})
+            continue
+        
+        kind = "write" if old["type"] in WRITE_STATEMENT_TYPES else "read"
+        totals[f"{kind}_before"] += old["count"] * old["median_ms"]
+        totals[f"{kind}_after"] += old["count"] * new["median_ms"]
+        for side, replay in (("before", old), ("after", new)):
+            runs = iteration_totals[f"{kind}_{side}"]
+            for i, timing in enumerate(replay.get("timings_ms") or []):
+                if i == len(runs):
+                    runs.append(0.0)
+                runs[i] += old["count"] * timing
+        fingerprints.append({
+            "fingerprint_id": fp_id,
+            "fingerprint": old["fingerprint"],
+            "type": kind,
+            "count": old["count"],
+            "before_ms": old["median_ms"],
+            "after_ms": new["median_ms"],
+            "speedup": old["median_ms"] / new["median_ms"] if new["median_ms"] else None,
+            "p_value": _shift_p_value(old.get("timings_ms"), new.get("timings_ms"))
+        })
+    
+    fingerprints.sort(key=lambda f: f.get("count", 0) * f.get("before_ms", 0), reverse=True)
+    
+    read_before, read_after = iteration_totals["read_before"], iteration_totals["read_after"]
+    write_before, write_after = iteration_totals["write_before"], iteration_totals["write_after"]
+    read_ratios = [old / new for old, new in zip(read_before, read_after) if new]
+    write_changes = [(new - old) / old * 100 for old, new in zip(write_before, write_after) if old]
+    read_p_value = _shift_p_value(read_before, read_after)
+    write_p_value = _shift_p_value(write_before, write_after)
+    
+    return {
+        "read_speedup": totals["read_before"] / totals["read_after"] if totals["read_after"] else None,
+        "read_speedup_range": [min(read_ratios), max(read_ratios)] if read_ratios else None,
+        "read_speedup_p_value": read_p_value,
+        "read_speedup_significant": (read_p_value is not None and read_p_value < alpha
+                                     and len(read_before) >= MIN_SAMPLES_FOR_SIGNIFICANCE),
+        "write_overhead_pct": ((totals["write_after"] - totals["write_before"]) / totals["write_before"] * 100
+                               if totals["write_before"] else None),
+        "write_overhead_range_pct": [min(write_changes), max(write_changes)] if write_changes else None,
+        "write_overhead_p_value": write_p_value,
+        "write_overhead_significant": (write_p_value is not None and write_p_value < alpha
+                                       and len(write_before) >= MIN_SAMPLES_FOR_SIGNIFICANCE),
+        "iterations": len(read_before) or len(write_before),
+        "totals_ms": totals,
+        "fingerprints": fingerprints
+    }
+
+def top_fingerprints(query_analysis, top=DEFAULT_REPLAY_TOP):
+    """The most frequent read and write fingerprints of a query analysis"""
+    fingerprints = query_analysis.get("fingerprints", {})
+    replayable = [(fp_id, fp) for fp_id, fp in fingerprints.items()
+                  if fp.get("type") in READ_STATEMENT_TYPES | WRITE_STATEMENT_TYPES]
+    replayable.sort(key=lambda item: item[1].get("count", 0), reverse=True)
+    return dict(replayable[:top])
+
+def measure_recommendation(recommendation, schema, query_analysis, source_url, scratch_url=None,
+                           top=DEFAULT_REPLAY_TOP, iterations=DEFAULT_REPLAY_ITERATIONS,
+                           sample_rows=DEFAULT_SAMPLE_ROWS, options=None):
+    """
+    Measure a recommendation by applying it to a scratch copy of the database.
+    
+    The scratch database is rebuilt from a sample of the source, the top
+    workload fingerprints are replayed, the recommendation's SQL plan is
+    applied and the fingerprints are replayed again.
+    
+    Args:
+        recommendation (dict): Recommendation from recommend_changes
+        schema (dict): Database schema information of the source
+        query_analysis (dict): Query analysis from parse_query_logs
+        source_url (str): SQLAlchemy connection URL of the source database
+        scratch_url (str, optional): Scratch database, a temporary SQLite file by default
+        top (int): Number of fingerprints to replay
+        iterations (int): Timed executions per fingerprint
+        sample_rows (int): Rows sampled per table
+        options (dict, optional): Plan options passed to generate_sql
+    
+    Returns:
+        dict: Measurement with speedup and write overhead, or error
+    """
+    scratch_url = scratch_url or default_scratch_url()
+    measurement = {
+        "action": recommendation.get("action"),
+        "table": recommendation.get("table"),
+        "reason": recommendation.get("reason"),
+        "scratch_dialect": detect_database_type(scratch_url),
+        "sample_rows": sample_rows
+    }
+    
+    if scratch_url == source_url:
+        measurement["error"] = "The scratch database must not be the source database"
+        return measurement
+    
+    try:
+        measurement["rows_loaded"] = prepare_scratch_database(scratch_url, schema, source_url, sample_rows)
+        fingerprints = top_fingerprints(query_analysis, top)
+        before = replay_workload(scratch_url, fingerprints, iterations)
+        
+        plan = generate_sql(recommendation, schema, dialect=measurement["scratch_dialect"], options=options)
+        if "error" in plan:
+            measurement["error"] = plan["error"]
+            return measurement
+        
+        execution = execute_plans(scratch_url, [plan], schema=schema)
+        measurement["apply_seconds"] = execution["elapsed_seconds"]
+        if execution["failed"] or execution["skipped"]:
+            failed = [step for step in execution["steps"] if step["status"] == "failed"]
+            measurement["error"] = f"Plan did not apply: {failed[0]['error'] if failed else 'steps skipped'}"
+            return measurement
+        
+        after = replay_workload(scratch_url, fingerprints, iterations)
+        measurement.update(compare_replays(before, after))
+    except Exception as e:
+        logger.error(f"Error measuring {recommendation.get('action')} on {recommendation.get('table')}: {str(e)}")
+        measurement["error"] = str(e)
+    
+    return measurement
+
+def measure_recommendations(recommendations, schema, query_analysis, source_url, scratch_url=None, store=None,
+                            db_name="default", **kwargs):
+    """
+    Measure each recommendation in isolation and record the results.
+    
+    The scratch database is rebuilt for every recommendation so each one is
+    measured against the original schema.
+    
+    Args:
+        recommendations (list): Recommendations from recommend_changes
+        schema (dict): Database schema information of the source
+        query_analysis (dict): Query analysis from parse_query_logs
+        source_url (str): SQLAlchemy connection URL of the source database
+        scratch_url (str, optional): Scratch database, a temporary SQLite file by default
+        store (MetadataStore, optional): Store to record the measurements in
+        db_name (str): Identifier for the database in the store
+        **kwargs: top, iterations, sample_rows and options for measure_recommendation
+    
+    Returns:
+        list: One measurement per recommendation
+    """
+    scratch_url = scratch_url or default_scratch_url()
+    measurements = []
+    
+    for recommendation in recommendations:
+        logger.info(f"Measuring {recommendation.get('action')} on {recommendation.get('table')}")
+        measurement = measure_recommendation(recommendation, schema, query_analysis, source_url, scratch_url,
+                                             **kwargs)
+        measurements.append(measurement)
+        
+        # Keep the measured effect next to the estimate it can confirm or refute
+        if "error" not in measurement:
+            recommendation["measured"] = {
+                key: measurement[key] for key in ("read_speedup", "read_speedup_range", "read_speedup_p_value",
+                                                  "read_speedup_significant", "write_overhead_pct",
+                                                  "write_overhead_range_pct", "write_overhead_p_value",
+                                                  "write_overhead_significant")
+            }
+    
+    if store:
+        store.save_measurements(measurements, db_name)
+    return measurements
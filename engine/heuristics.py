@@ -1,9 +1,27 @@
+import re
+import math
 import logging
 from collections import defaultdict
 
+from db.schema_extractor import is_temporal_type, estimate_column_width
+from engine.workload import build_workload_cost_model, estimate_savings
+
 logger = logging.getLogger(__name__)
 
-def recommend_changes(schema, query_analysis, performance_data=None):
+# Index advisor cost model, in units of one sequential row visit
+DEFAULT_ROW_COUNT = 100000
+DEFAULT_EQ_SELECTIVITY = 0.01
+DEFAULT_RANGE_SELECTIVITY = 0.3
+RANDOM_IO_FACTOR = 4  # heap fetch after an index lookup vs. a sequential row read
+INDEX_WRITE_FACTOR = 2  # maintaining one index entry vs. a row visit, per B-tree level
+INDEX_ENTRY_OVERHEAD_BYTES = 16  # tuple pointer and header per index entry
+MAX_INCLUDE_COLUMNS = 6
+
+# Join-plus-aggregate fingerprints must run this often to be worth materializing
+MATERIALIZE_MIN_EXECUTIONS = 10
+
+def recommend_changes(schema, query_analysis, performance_data=None, storage_budget_bytes=None,
+                      max_write_amplification=None):
     """
     Generate schema optimization recommendations based on query patterns and performance.
     
@@ -11,11 +29,14 @@ def recommend_changes(schema, query_analysis, performance_data=None):
         schema (dict): Database schema from schema_extractor
         query_analysis (dict): Query analysis from query_log_analyzer
         performance_data (dict, optional): Performance metrics from simulator
+        storage_budget_bytes (int, optional): Disk budget for new indexes
+        max_write_amplification (float, optional): Write amplification budget per table
         
     Returns:
         list: List of recommendations with rationale
     """
     recommendations = []
+    workload_model = build_workload_cost_model(query_analysis, performance_data) if performance_data else None
     
     # Track table stats
     table_stats = defaultdict(dict)
@@ -98,7 +119,42 @@ def recommend_changes(schema, query_analysis, performance_data=None):
             })
     
     # Apply heuristics for indexing
-    if performance_data:
+    if query_analysis.get("fingerprints"):
+        selected = advise_indexes(schema, query_analysis, workload_model=workload_model,
+                                  storage_budget_bytes=storage_budget_bytes,
+                                  max_write_amplification=max_write_amplification)
+        by_table = defaultdict(list)
+        for index in selected:
+            by_table[index["table"]].append(index)
+        
+        for table, indexes in by_table.items():
+            fingerprints = {fp for index in indexes for fp in index["fingerprints"]}
+            rec = {
+                "table": table,
+                "action": "INDEX",
+                "indexes": indexes,
+                "confidence": 80,
+                "reason": (
+                    f"Index advisor selected {len(indexes)} index(es) on '{table}' serving "
+                    f"{len(fingerprints)} query fingerprint(s): "
+                    f"{'; '.join(_describe_index(index) for index in indexes)}. "
+                    f"Estimated read benefit {sum(i['benefit'] for i in indexes):.0f} row visits against "
+                    f"{sum(i['write_cost'] for i in indexes):.0f} of write maintenance and "
+                    f"{sum(i['size_bytes'] for i in indexes) / 1048576:.1f} MB on disk."
+                )
+            }
+            index_only = {fp["fingerprint_id"] for index in indexes for fp in index["index_only_fingerprints"]}
+            if index_only:
+                rec["reason"] += (
+                    f" {len(index_only)} fingerprint(s) become index-only scans, avoiding about "
+                    f"{sum(i['heap_fetches_avoided'] for i in indexes):,} heap fetches."
+                )
+            if workload_model:
+                rec["estimated_savings"] = sum(index.get("estimated_savings", 0) for index in indexes)
+            recommendations.append(rec)
+    
+    elif performance_data:
+        indexed_tables = set()
         for query_key, perf_data in performance_data.items():
             explain_result = perf_data.get("explain_result", {})
             metrics = explain_result.get("metrics", {})
@@ -106,7 +162,8 @@ def recommend_changes(schema, query_analysis, performance_data=None):
             # Look for sequential scans, which might benefit from indexing
             seq_scans = metrics.get("sequential_scans", [])
             for table in seq_scans:
-                if table in schema:
+                if table in schema and table not in indexed_tables:
+                    indexed_tables.add(table)
                     recommendations.append({
                         "table": table,
                         "action": "INDEX",
@@ -117,31 +174,723 @@ def recommend_changes(schema, query_analysis, performance_data=None):
                         )
                     })
     
+    # Drop indexes that are never used or are covered by another index
+    redundant_by_table = defaultdict(list)
+    for finding in find_redundant_indexes(schema):
+        redundant_by_table[finding["table"]].append(finding)
+    
+    for table, findings in redundant_by_table.items():
+        redundant_only = all(set(f["reasons"]) & {"duplicate", "prefix"} for f in findings)
+        recommendations.append({
+            "table": table,
+            "action": "DROP_INDEX",
+            "indexes": findings,
+            "confidence": 85 if redundant_only else 65,
+            "reason": (
+                f"Table '{table}' maintains {len(findings)} index(es) that add write cost "
+                f"without serving reads: {'; '.join(_describe_redundant_index(f) for f in findings)}."
+            )
+        })
+    
+    # Materialize hot join-plus-aggregate queries
+    for candidate in find_materialization_candidates(schema, query_analysis):
+        view = candidate["view"]
+        recommendations.append({
+            "table": candidate["table"],
+            "action": "MATERIALIZE",
+            "related_tables": candidate["related_tables"],
+            "fingerprint_id": candidate["fingerprint_id"],
+            "view": view,
+            "confidence": candidate["confidence"],
+            "reason": (
+                f"Query joining '{candidate['table']}' with {', '.join(candidate['related_tables'])} and "
+                f"aggregating {', '.join(a['name'] for a in view['aggregates'])} runs "
+                f"{candidate['executions']} times against {candidate['writes']} writes to those tables. "
+                f"Consider materializing it grouped by {', '.join(k['name'] for k in view['keys'])}: "
+                f"{candidate['fingerprint'][:120]}"
+            )
+        })
+    
     # Apply heuristics for partitioning large tables
     for table_name, stats in table_stats.items():
         if table_name in schema and stats["access_count"] > 10:
-            # Check if table has a date/timestamp column that could be used for partitioning
-            has_date_column = False
-            for col in schema[table_name].get("columns", []):
-                col_type = col.get("type", "").lower()
-                if "date" in col_type or "time" in col_type:
-                    has_date_column = True
-                    break
+            # Partition on the date/time column the workload filters by range most often
+            partition_column, range_executions = choose_partition_column(schema, query_analysis, table_name)
             
-            if has_date_column and stats["read_write_ratio"] > 3:
+            if partition_column and stats["read_write_ratio"] > 3:
+                if range_executions:
+                    column_reason = (f"Queries filter '{partition_column}' by range {range_executions} times, "
+                                     f"so partition pruning applies to them.")
+                else:
+                    column_reason = f"No logged range filters; '{partition_column}' is its first date/time column."
                 recommendations.append({
                     "table": table_name,
                     "action": "PARTITION",
-                    "confidence": 70,
+                    "partition_column": partition_column,
+                    "confidence": 80 if range_executions else 70,
                     "reason": (
                         f"Table '{table_name}' is frequently accessed ({stats['access_count']} times) "
                         f"and has date/time columns. Consider partitioning this table to improve query "
-                        f"performance on time-based data."
+                        f"performance on time-based data. {column_reason}"
                     )
                 })
     
-    # Sort recommendations by confidence
-    recommendations.sort(key=lambda x: x["confidence"], reverse=True)
+    # Prioritize by workload time saved when performance data is available,
+    # otherwise fall back to heuristic confidence
+    if workload_model:
+        savings_unit = "ms" if workload_model["basis"] == "time_ms" else "cost"
+        for rec in recommendations:
+            if "estimated_savings" not in rec:
+                rec["estimated_savings"] = estimate_savings(rec, workload_model)
+            rec["savings_unit"] = savings_unit
+        recommendations.sort(key=lambda x: (x["estimated_savings"], x["confidence"]), reverse=True)
+    else:
+        recommendations.sort(key=lambda x: x["confidence"], reverse=True)
     
     logger.info(f"Generated {len(recommendations)} recommendations")
     return recommendations
+
+def _describe_index(index):
+    """One-line description of an advised index"""
+    description = f"({', '.join(index['columns'])})"
+    if index.get("include"):
+        description += f" covering {', '.join(index['include'])}"
+    return description
+
+def _table_row_count(schema, table):
+    """Row count of a table from extracted statistics, or the advisor default"""
+    return schema.get(table, {}).get("row_count") or DEFAULT_ROW_COUNT
+
+def _existing_index_columns(schema, table):
+    """Column lists of existing indexes on a table, including the primary key"""
+    existing = [tuple(idx.get("column_names") or []) for idx in schema[table].get("indexes", [])]
+    pk_columns = tuple(schema[table].get("primary_key", {}).get("constrained_columns") or [])
+    if pk_columns:
+        existing.append(pk_columns)
+    return [cols for cols in existing if cols]
+
+def _eq_selectivity(schema, table, column):
+    """Fraction of rows matched by an equality predicate on a column"""
+    n_rows = _table_row_count(schema, table)
+    stats = schema[table].get("column_stats", {}).get(column, {})
+    n_distinct = stats.get("n_distinct")
+    if n_distinct:
+        # Postgres reports negative n_distinct as a fraction of the row count
+        distinct = -n_distinct * n_rows if n_distinct < 0 else n_distinct
+        return 1 / max(distinct, 1)
+    if (schema[table].get("primary_key", {}).get("constrained_columns") or []) == [column]:
+        return 1 / max(n_rows, 1)
+    for idx in schema[table].get("indexes", []):
+        if idx.get("unique") and idx.get("column_names") == [column]:
+            return 1 / max(n_rows, 1)
+    return DEFAULT_EQ_SELECTIVITY
+
+def collect_workload_access(schema, query_analysis):
+    """
+    Summarize how the logged workload reads and writes each table.
+    
+    Args:
+        schema (dict): Database schema from schema_extractor
+        query_analysis (dict): Query analysis with fingerprints
+    
+    Returns:
+        tuple: (reads, writes) where reads maps table -> list of accesses with
+               equality, range, order and needed columns, and writes maps
+               table -> write counts split by inserts/deletes and updated columns
+    """
+    reads = defaultdict(list)
+    writes = defaultdict(lambda: {"rows": 0, "updates": []})
+    
+    for fp_id, fp in query_analysis.get("fingerprints", {}).items():
+        structure = fp.get("structure")
+        if not structure:
+            continue
+        tables = [t for t in structure["tables"] if t in schema]
+        
+        def _table_of(ref):
+            if ref["table"] in schema:
+                return ref["table"]
+            if ref["table"] is None:
+                owners = [t for t in tables
+                          if any(c["name"] == ref["column"] for c in schema[t].get("columns", []))]
+                return owners[0] if len(owners) == 1 else None
+            return None
+        
+        if fp["type"] in ("insert", "delete"):
+            for table in tables:
+                writes[table]["rows"] += fp["count"]
+        elif fp["type"] == "update" and tables:
+            writes[tables[0]]["updates"].append((fp["count"], set(structure.get("set_columns", []))))
+        
+        if fp["type"] not in ("select", "with", "update", "delete"):
+            continue
+        
+        for table in tables:
+            eq, rng = [], []
+            for pred in structure["predicates"]:
+                if _table_of(pred) != table:
+                    continue
+                if pred["op"] == "eq" and pred["column"] not in eq:
+                    eq.append(pred["column"])
+                elif pred["op"] == "range" and pred["column"] not in rng:
+                    rng.append(pred["column"])
+            
+            join_columns = [ref["column"] for ref in structure.get("join_columns", [])
+                            if len(tables) > 1 and _table_of(ref) == table]
+            
+            # Without filters of its own the table is the inner side of the join,
+            # probed by equality on its join columns
+            if not eq and not rng:
+                for column in dict.fromkeys(join_columns):
+                    reads[table].append({
+                        "fingerprint_id": fp_id,
+                        "count": fp["count"],
+                        "eq": [column],
+                        "range": [],
+                        "order": [],
+                        "needed": None
+                    })
+                continue
+            
+            order = [ref["column"] for ref in structure.get("order_by", []) if _table_of(ref) == table] \
+                if len(tables) == 1 else []
+            
+            needed = None
+            if not structure.get("select_star") and fp["type"] in ("select", "with"):
+                refs = structure.get("select_columns", []) + structure.get("group_by", []) + \
+                    structure.get("order_by", [])
+                needed = {ref["column"] for ref in refs if _table_of(ref) == table} | \
+                    set(eq) | set(rng) | set(join_columns)
+                # Columns we could not place on any table may belong to this one
+                if any(_table_of(ref) is None and ref["table"] is None for ref in refs):
+                    needed = None
+            
+            reads[table].append({
+                "fingerprint_id": fp_id,
+                "count": fp["count"],
+                "eq": eq,
+                "range": rng,
+                "order": order,
+                "needed": needed
+            })
+    
+    return reads, writes
+
+def _index_matched_rows(access, columns, n_rows, selectivity):
+    """
+    Rows an index returns for one table access, or None if the index cannot
+    be used for it. Only the leading columns matched by equality predicates,
+    plus at most one range column, narrow the search.
+    """
+    matched = 0
+    fraction = 1.0
+    for column in columns:
+        if column in access["eq"]:
+            fraction *= selectivity(column)
+            matched += 1
+        elif column in access["range"]:
+            fraction *= DEFAULT_RANGE_SELECTIVITY
+            matched += 1
+            break
+        else:
+            break
+    
+    return max(1.0, n_rows * fraction) if matched else None
+
+def _is_covering(access, columns, include):
+    """Whether an index holds every column an access reads, allowing an index-only scan"""
+    return access["needed"] is not None and access["needed"] <= set(columns) | set(include or [])
+
+def _index_access_cost(access, columns, include, n_rows, selectivity):
+    """
+    Cost of serving one table access through an index, or None if the index
+    cannot be used for it. Every matched row costs a random heap fetch unless
+    the index covers the access.
+    """
+    rows = _index_matched_rows(access, columns, n_rows, selectivity)
+    if rows is None:
+        return None
+    return math.log2(n_rows + 1) + rows * (1 if _is_covering(access, columns, include) else RANDOM_IO_FACTOR)
+
+def _candidate_indexes(access, selectivity):
+    """Single, composite and covering index candidates for one table access"""
+    eq = sorted(access["eq"], key=selectivity)
+    candidates = [((column,), ()) for column in eq + access["range"]]
+    
+    composite = tuple(eq + access["range"][:1])
+    if len(composite) > 1:
+        candidates.append((composite, ()))
+    ordered = ()
+    if access["order"] and eq:
+        ordered = tuple(eq + [c for c in access["order"] if c not in eq])
+        if len(ordered) > 1:
+            candidates.append((ordered, ()))
+    
+    # Covering variants of the filtering key and of the key that also yields the sort order
+    if access["needed"] is not None:
+        for key in dict.fromkeys((composite, ordered)):
+            include = tuple(sorted(access["needed"] - set(key)))
+            if key and 0 < len(include) <= MAX_INCLUDE_COLUMNS:
+                candidates.append((key, include))
+    
+    return candidates
+
+def advise_indexes(schema, query_analysis, workload_model=None, storage_budget_bytes=None,
+                   max_write_amplification=None):
+    """
+    Choose a small set of indexes that maximizes workload speedup under a disk
+    and write-amplification budget.
+    
+    Candidates (single column, composite and covering) are enumerated from the
+    predicates of every logged fingerprint. Each is scored by the read cost it
+    removes from the accesses it can serve, minus the cost of maintaining it
+    on every write to its table. Candidates are then picked greedily: after
+    each pick the remaining candidates are re-scored against the improved
+    access costs, so indexes that overlap with a chosen one lose their value.
+    Under a storage budget candidates are ranked by net benefit per byte, as
+    in the greedy knapsack approximation.
+    
+    Args:
+        schema (dict): Database schema from schema_extractor
+        query_analysis (dict): Query analysis with fingerprints
+        workload_model (dict, optional): Model from build_workload_cost_model
+        storage_budget_bytes (int, optional): Total size allowed for new indexes
+        max_write_amplification (float, optional): Allowed ratio of index
+            structures maintained per row write, after vs. before, per table
+    
+    Returns:
+        list: Selected indexes with columns, include, benefit, write_cost,
+              size_bytes, the fingerprints they serve, and the fingerprints
+              they turn into index-only scans with the heap fetches avoided
+    """
+    reads, writes = collect_workload_access(schema, query_analysis)
+    candidates = {}
+    best_cost = {}
+    
+    for table, accesses in reads.items():
+        n_rows = _table_row_count(schema, table)
+        existing = _existing_index_columns(schema, table)
+        column_types = {c["name"]: c.get("type", "") for c in schema[table].get("columns", [])}
+        
+        def selectivity(column, table=table):
+            return _eq_selectivity(schema, table, column)
+        
+        for position, access in enumerate(accesses):
+            # Baseline: a full scan, or the best index that already exists
+            costs = [n_rows] + [cost for cost in (_index_access_cost(access, cols, (), n_rows, selectivity)
+                                                  for cols in existing) if cost is not None]
+            best_cost[(table, position)] = min(costs)
+            
+            for columns, include in _candidate_indexes(access, selectivity):
+                if any(cols[:len(columns)] == columns and set(include) <= set(cols) for cols in existing):
+                    continue
+                if not all(c in column_types for c in columns + include):
+                    continue
+                key = (table, columns, include)
+                if key in candidates:
+                    continue
+                
+                write_count = writes[table]["rows"] + sum(
+                    count for count, set_columns in writes[table]["updates"]
+                    if set_columns & set(columns + include)
+                )
+                candidates[key] = {
+                    "table": table,
+                    "columns": list(columns),
+                    "include": list(include),
+                    "write_cost": write_count * (math.log2(n_rows + 1) + 1) * INDEX_WRITE_FACTOR,
+                    "size_bytes": int(n_rows * (sum(estimate_column_width(column_types[c]) for c in columns + include)
+                                                + INDEX_ENTRY_OVERHEAD_BYTES)),
+                    "selectivity": selectivity
+                }
+    
+    fingerprint_totals = {}
+    if workload_model:
+        for fp in workload_model.get("fingerprints", []):
+            fingerprint_totals[fp["fingerprint_id"]] = fp["total"] / max(len(fp.get("tables") or [1]), 1)
+    
+    selected = []
+    used_bytes = 0
+    new_per_table = defaultdict(int)
+    
+    while candidates:
+        best_key, best_score, best_gains = None, 0, None
+        
+        for key, candidate in candidates.items():
+            table = candidate["table"]
+            if storage_budget_bytes is not None and used_bytes + candidate["size_bytes"] > storage_budget_bytes:
+                continue
+            if max_write_amplification and (writes[table]["rows"] or writes[table]["updates"]):
+                structures = 1 + len(_existing_index_columns(schema, table))
+                if (structures + new_per_table[table] + 1) / structures > max_write_amplification:
+                    continue
+            
+            n_rows = _table_row_count(schema, table)
+            gains = {}
+            for position, access in enumerate(reads[table]):
+                cost = _index_access_cost(access, candidate["columns"], candidate["include"], n_rows,
+                                          candidate["selectivity"])
+                if cost is not None and cost < best_cost[(table, position)]:
+                    gains[position] = (best_cost[(table, position)] - cost, cost)
+            
+            benefit = sum(access_gain * reads[table][position]["count"]
+                          for position, (access_gain, _) in gains.items())
+            net = benefit - candidate["write_cost"]
+            if net <= 0:
+                continue
+            
+            score = net / max(candidate["size_bytes"], 1) if storage_budget_bytes is not None else net
+            if score > best_score:
+                best_key, best_score, best_gains = key, score, gains
+        
+        if best_key is None:
+            break
+        
+        candidate = candidates.pop(best_key)
+        table = candidate["table"]
+        index = {
+            "table": table,
+            "name": _index_name(table, candidate["columns"], candidate["include"]),
+            "columns": candidate["columns"],
+            "include": candidate["include"],
+            "benefit": 0.0,
+            "write_cost": candidate["write_cost"],
+            "size_bytes": candidate["size_bytes"],
+            "fingerprints": [],
+            "index_only_fingerprints": [],
+            "heap_fetches_avoided": 0
+        }
+        
+        fingerprints = query_analysis.get("fingerprints", {})
+        savings = 0.0
+        for position, (access_gain, cost) in best_gains.items():
+            access = reads[table][position]
+            index["benefit"] += access_gain * access["count"]
+            index["fingerprints"].append(access["fingerprint_id"])
+            
+            # Every row the index returns for a covered access is a heap fetch saved
+            if _is_covering(access, candidate["columns"], candidate["include"]):
+                rows = _index_matched_rows(access, candidate["columns"], _table_row_count(schema, table),
+                                           candidate["selectivity"])
+                fetches = int(rows * access["count"])
+                index["heap_fetches_avoided"] += fetches
+                index["index_only_fingerprints"].append({
+                    "fingerprint_id": access["fingerprint_id"],
+                    "fingerprint": fingerprints.get(access["fingerprint_id"], {}).get("fingerprint", ""),
+                    "heap_fetches_avoided": fetches
+                })
+            savings += fingerprint_totals.get(access["fingerprint_id"], 0) * access_gain / best_cost[(table, position)]
+            best_cost[(table, position)] = cost
+        if workload_model:
+            index["estimated_savings"] = savings
+        
+        # Candidates with the same key, or a key and covering set the new index
+        # already provides, would only duplicate it
+        chosen_columns = candidate["columns"] + candidate["include"]
+        for key in [k for k, c in candidates.items() if c["table"] == table and (
+                c["columns"] == candidate["columns"] or
+                (candidate["columns"][:len(c["columns"])] == c["columns"] and set(c["include"]) <= set(chosen_columns)))]:
+            del candidates[key]
+        
+        selected.append(index)
+        used_bytes += candidate["size_bytes"]
+        new_per_table[table] += 1
+    
+    logger.info(f"Index advisor selected {len(selected)} indexes ({used_bytes / 1048576:.1f} MB)")
+    return selected
+
+def _index_name(table, columns, include=None):
+    """Index name within the 63 character identifier limit of PostgreSQL"""
+    name = f"idx_{table}_{'_'.join(columns)}"
+    if include:
+        name += "_cov"
+    return name[:63]
+
+def _describe_redundant_index(finding):
+    """One-line description of why an index is redundant"""
+    details = []
+    if "duplicate" in finding["reasons"]:
+        details.append(f"duplicates {finding['covered_by']}")
+    if "prefix" in finding["reasons"]:
+        details.append(f"is a left prefix of {finding['covered_by']}")
+    if "unused" in finding["reasons"]:
+        details.append("has not been scanned since statistics were reset")
+    return f"{finding['name']} ({', '.join(finding['columns'])}) {' and '.join(details)}"
+
+def find_redundant_indexes(schema):
+    """
+    Find indexes that can be dropped without losing a read path.
+    
+    An index is redundant when another index (or the primary key) has the same
+    columns, or starts with all of its columns in the same order. It is unused
+    when the database reports zero scans for it. Unique indexes enforce
+    constraints and are never reported, and neither are partial or expression
+    indexes, whose usefulness does not follow from their column list. Unused
+    indexes that are the only index on a foreign key stay, because deletes and
+    key updates on the parent table rely on them (and MySQL requires them).
+    
+    Args:
+        schema (dict): Database schema from schema_extractor
+    
+    Returns:
+        list: Findings with table, name, columns, reasons, covered_by, scans
+              and size_bytes
+    """
+    findings = []
+    
+    for table, info in schema.items():
+        usage = info.get("index_usage", {})
+        indexes = [idx for idx in info.get("indexes", [])
+                   if idx.get("column_names") and None not in idx["column_names"]
+                   and not idx.get("dialect_options", {}).get("postgresql_where")]
+        
+        structures = list(indexes)
+        pk_columns = info.get("primary_key", {}).get("constrained_columns") or []
+        if pk_columns:
+            structures.append({
+                "name": info["primary_key"].get("name") or "PRIMARY KEY",
+                "column_names": pk_columns,
+                "unique": True
+            })
+        
+        fk_column_lists = [fk.get("constrained_columns") or [] for fk in info.get("foreign_keys", [])]
+        
+        # Unused indexes are dropped outright and cannot cover other indexes,
+        # except the ones kept for a foreign key
+        unused = set()
+        for idx in indexes:
+            columns = idx["column_names"]
+            supports_fk = any(columns[:len(fk)] == fk for fk in fk_column_lists if fk)
+            if not idx.get("unique") and not supports_fk and usage.get(idx["name"], {}).get("scans") == 0:
+                unused.add(idx["name"])
+        
+        for idx in indexes:
+            if idx.get("unique"):
+                continue
+            
+            columns = idx["column_names"]
+            reasons = []
+            covered_by = None
+            for other in structures:
+                if other is idx or other["name"] in unused:
+                    continue
+                other_columns = other["column_names"]
+                if other_columns == columns:
+                    # Of two identical plain indexes keep the first by name
+                    if other.get("unique") or other["name"] < idx["name"]:
+                        reasons.append("duplicate")
+                        covered_by = other["name"]
+                        break
+                elif other_columns[:len(columns)] == columns:
+                    reasons.append("prefix")
+                    covered_by = other["name"]
+                    break
+            
+            scans = usage.get(idx["name"], {}).get("scans")
+            if scans == 0 and (reasons or idx["name"] in unused):
+                reasons.append("unused")
+            
+            if reasons:
+                findings.append({
+                    "table": table,
+                    "name": idx["name"],
+                    "columns": columns,
+                    "unique": False,
+                    "reasons": reasons,
+                    "covered_by": covered_by,
+                    "scans": scans,
+                    "size_bytes": usage.get(idx["name"], {}).get("size_bytes")
+                })
+    
+    logger.info(f"Found {len(findings)} redundant or unused indexes")
+    return findings
+
+def _view_column_name(expression, taken):
+    """Column name for a view expression, unique among the names taken so far"""
+    name = re.sub(r'\W+', '_', expression.lower()).strip('_') or "expr"
+    base, suffix = name, 2
+    while name in taken:
+        name = f"{base}_{suffix}"
+        suffix += 1
+    taken.add(name)
+    return name
+
+def _predicate_column_type(schema, structure, table, column):
+    """Type of a predicate column, looking it up in the query's tables when unqualified"""
+    tables = [table] if table else structure.get("tables", [])
+    for name in tables:
+        for col in (schema or {}).get(name, {}).get("columns", []):
+            if col["name"].lower() == column.lower():
+                return col.get("type", "")
+    return None
+
+def build_materialized_view_definition(structure, schema=None):
+    """
+    Build a re-aggregable view definition from the structure of a join and
+    aggregate query.
+    
+    The grouping keys are the query's GROUP BY expressions plus the columns it
+    filters on, so the original query can be answered from the view by
+    filtering and re-aggregating its rows. Equality filters are keyed as is.
+    A range filter on a date/time column is keyed by its day, which still
+    answers day-aligned ranges; other range filters would make about one
+    group per row and are left out of the keys. AVG is stored as SUM and
+    COUNT, and a row count is always kept so groups can be maintained
+    incrementally.
+    
+    Args:
+        structure (dict): Statement structure from extract_query_structure
+        schema (dict, optional): Database schema, used to recognize date/time columns
+        
+    Returns:
+        dict: View definition with from_clause, keys, aggregates, the range
+              filters left out of the keys and whether rows can be
+              re-aggregated, or None if the query has no grouping key or FROM
+              clause
+    """
+    if not structure.get("from_clause"):
+        return None
+    
+    taken = set()
+    keys = []
+    unkeyed_filters = []
+    expressions = [(expression, None) for expression in structure.get("group_by_expressions", [])]
+    for pred in structure["predicates"]:
+        if pred["join"] or pred["op"] not in ("eq", "range") or not pred.get("expression"):
+            continue
+        if pred["op"] == "eq":
+            expressions.append((pred["expression"], None))
+        elif is_temporal_type(_predicate_column_type(schema, structure, pred["table"], pred["column"]) or ""):
+            expressions.append((pred["expression"], "day"))
+        elif pred["expression"] not in unkeyed_filters:
+            unkeyed_filters.append(pred["expression"])
+    
+    for expression, bucket in expressions:
+        existing = next((k for k in keys if k["expression"].lower() == expression.lower()), None)
+        if existing:
+            # Grouping by the exact value also answers a range on it
+            continue
+        ref = next((c for c in structure.get("group_by", []) + [
+            {"table": p["table"], "column": p["column"]} for p in structure["predicates"]
+        ] if c["column"].lower() == expression.split('.')[-1].lower()), {})
+        column_name = expression.split('.')[-1]
+        keys.append({
+            "expression": expression,
+            "name": _view_column_name(f"{column_name}_{bucket}" if bucket else column_name, taken),
+            "table": ref.get("table"),
+            "column": ref.get("column"),
+            "bucket": bucket
+        })
+    
+    if not keys:
+        return None
+    
+    aggregates = []
+    reaggregable = True
+    for aggregate in structure["aggregates"]:
+        function, argument = aggregate["function"], aggregate["argument"]
+        if aggregate["distinct"]:
+            # Distinct counts only answer queries that match a group exactly
+            reaggregable = False
+            aggregates.append({"expression": f"COUNT(DISTINCT {argument})",
+                               "name": _view_column_name(f"count_distinct_{argument.split('.')[-1]}", taken)})
+            continue
+        if argument == '*':
+            continue
+        parts = ["SUM", "COUNT"] if function == "AVG" else [function]
+        for part in parts:
+            if any(a["expression"] == f"{part}({argument})" for a in aggregates):
+                continue
+            aggregates.append({"expression": f"{part}({argument})",
+                               "name": _view_column_name(f"{part.lower()}_{argument.split('.')[-1]}", taken)})
+    
+    aggregates.append({"expression": "COUNT(*)", "name": _view_column_name("row_count", taken)})
+    
+    return {
+        "from_clause": structure["from_clause"],
+        "keys": keys,
+        "aggregates": aggregates,
+        "unkeyed_filters": unkeyed_filters,
+        "reaggregable": reaggregable
+    }
+
+def find_materialization_candidates(schema, query_analysis, min_executions=MATERIALIZE_MIN_EXECUTIONS):
+    """
+    Find frequently repeated queries that join tables and aggregate the result.
+    
+    Args:
+        schema (dict): Database schema from schema_extractor
+        query_analysis (dict): Query analysis with fingerprints
+        min_executions (int): Minimum number of logged executions
+        
+    Returns:
+        list: Candidates with the fact table, related tables, view definition,
+              execution and write counts and a confidence score
+    """
+    reads, writes = collect_workload_access(schema, query_analysis)
+    candidates = []
+    
+    for fp_id, fp in query_analysis.get("fingerprints", {}).items():
+        structure = fp.get("structure")
+        if (fp["type"] != "select" or fp["count"] < min_executions or not structure
+                or not structure.get("aggregates")):
+            continue
+        tables = [t for t in structure["tables"] if t in schema]
+        if len(tables) < 2:
+            continue
+        
+        view = build_materialized_view_definition(structure, schema)
+        if not view:
+            continue
+        
+        # The fact table is the one whose columns are aggregated
+        aggregated = [c["table"] for a in structure["aggregates"] for c in a["columns"] if c["table"] in tables]
+        fact_table = max(tables, key=lambda t: (aggregated.count(t), -tables.index(t)))
+        
+        write_count = sum(writes[t]["rows"] + sum(count for count, _ in writes[t]["updates"]) for t in tables)
+        read_share = fp["count"] / (fp["count"] + write_count)
+        
+        candidates.append({
+            "table": fact_table,
+            "related_tables": [t for t in tables if t != fact_table],
+            "fingerprint_id": fp_id,
+            "fingerprint": fp["fingerprint"],
+            "executions": fp["count"],
+            "writes": write_count,
+            "view": view,
+            "confidence": int(min(90, 50 + 40 * read_share))
+        })
+    
+    candidates.sort(key=lambda x: x["executions"], reverse=True)
+    logger.info(f"Found {len(candidates)} materialization candidates")
+    return candidates
+
+def choose_partition_column(schema, query_analysis, table):
+    """
+    Choose the date/time column of a table that logged queries filter by range
+    most often.
+    
+    Args:
+        schema (dict): Database schema from schema_extractor
+        query_analysis (dict): Query analysis with fingerprints
+        table (str): Table to partition
+        
+    Returns:
+        tuple: (column, range_executions), falling back to the first date/time
+               column with 0 executions, or (None, 0) if there is none
+    """
+    temporal = [col["name"] for col in schema[table].get("columns", []) if is_temporal_type(col.get("type", ""))]
+    if not temporal:
+        return None, 0
+    
+    reads, _ = collect_workload_access(schema, query_analysis)
+    range_executions = defaultdict(int)
+    for access in reads.get(table, []):
+        for column in access["range"]:
+            if column in temporal:
+                range_executions[column] += access["count"]
+    
+    if not range_executions:
+        return temporal[0], 0
+    column = max(temporal, key=lambda c: range_executions[c])
+    return column, range_executions[column]
@@ -0,0 +1,200 @@
+import math
+
+# Relative precision of recorded values, in significant decimal digits
+DEFAULT_SIGNIFICANT_FIGURES = 3
+
+# Percentiles reported by LatencyHistogram.summary
+REPORTED_PERCENTILES = (50, 90, 99, 99.9)
+
+NANOS_PER_UNIT = {"ns": 1, "us": 1_000, "ms": 1_000_000, "s": 1_000_000_000}
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram over integer nanoseconds.
+    
+    Values are counted in log-linear buckets: every power-of-two range is
+    split into the same number of linear sub-buckets, so any recorded value
+    is known to within the configured number of significant digits. Memory
+    depends only on that precision and the range of values seen, never on
+    the number of samples. Count, sum, sum of squares, min and max are kept
+    exactly, so the mean and standard deviation are exact too.
+    """
+    
+    def __init__(self, significant_figures=DEFAULT_SIGNIFICANT_FIGURES):
+        """
+        Create an empty histogram.
+        
+        Args:
+            significant_figures (int): Decimal digits of precision, 1 to 5
+        """
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count // 2
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.total_squares = 0
+        self.min = None
+        self.max = None
+    
+    def _bucket_index(self, value):
+        """Bucket holding a value"""
+        if value < self.sub_bucket_count:
+            return value
+        exponent = value.bit_length() - self.sub_bucket_bits
+        return exponent * self.sub_bucket_half + (value >> exponent)
+    
+    def _bucket_range(self, index):
+        """Lowest and highest value counted in a bucket"""
+        if index < self.sub_bucket_count:
+            return index, index
+        exponent = index // self.sub_bucket_half - 1
+        sub_bucket = index - exponent * self.sub_bucket_half
+        return sub_bucket << exponent, ((sub_bucket + 1) << exponent) - 1
+    
+    def record(self, value_ns, count=1):
+        """
+        Record a latency.
+        
+        Args:
+            value_ns (int): Latency in nanoseconds, e.g. a perf_counter_ns difference
+            count (int): Number of times the latency occurred
+        """
+        value_ns = max(0, int(value_ns))
+        index = self._bucket_index(value_ns)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value_ns * count
+        self.total_squares += value_ns * value_ns * count
+        self.min = value_ns if self.min is None else min(self.min, value_ns)
+        self.max = value_ns if self.max is None else max(self.max, value_ns)
+    
+    def merge(self, other):
+        """
+        Add the samples of another histogram with the same precision.
+        
+        Args:
+            other (LatencyHistogram): Histogram to add
+        
+        Returns:
+            LatencyHistogram: This histogram
+        """
+        if other.significant_figures != self.significant_figures:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+    
+    def mean(self):
+        """Exact mean in nanoseconds, or 0 when empty"""
+        return self.total / self.count if self.count else 0
+    
+    def stdev(self):
+        """Exact sample standard deviation in nanoseconds, or 0 below two samples"""
+        if self.count < 2:
+            return 0
+        variance = (self.total_squares - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0))
+    
+    def percentile(self, percentile):
+        """
+        Latency at or below which a share of the samples fall.
+        
+        Args:
+            percentile (float): Percentile between 0 and 100
+        
+        Returns:
+            int: Highest value equivalent to the bucket reaching the percentile,
+                 clamped to the exact min and max, or 0 when empty
+        """
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self._bucket_range(index)[1], self.min), self.max)
+        return self.max
+    
+    def summary(self, unit="ms"):
+        """
+        Summary statistics of the recorded latencies.
+        
+        Args:
+            unit (str): Unit of the returned values (ns, us, ms, s)
+        
+        Returns:
+            dict: count, min, max, avg, median, stdev and p50/p90/p99/p99_9
+        """
+        scale = NANOS_PER_UNIT[unit]
+        summary = {
+            "count": self.count,
+            "min": (self.min or 0) / scale,
+            "max": (self.max or 0) / scale,
+            "avg": self.mean() / scale,
+            "median": self.percentile(50) / scale,
+            "stdev": self.stdev() / scale,
+            "unit": unit
+        }
+        for percentile in REPORTED_PERCENTILES:
+            summary[f"p{percentile:g}".replace(".", "_")] = self.percentile(percentile) / scale
+        return summary
+    
+    def export(self, unit="ms"):
+        """
+        Non-empty buckets of the histogram, for plotting or storing.
+        
+        Args:
+            unit (str): Unit of the bucket bounds (ns, us, ms, s)
+        
+        Returns:
+            list: [{low, high, count, cumulative}] in ascending order, where
+                  cumulative is the share of samples up to the bucket
+        """
+        scale = NANOS_PER_UNIT[unit]
+        exported = []
+        seen = 0
+        for index in sorted(self.buckets):
+            low, high = self._bucket_range(index)
+            seen += self.buckets[index]
+            exported.append({
+                "low": low / scale,
+                "high": high / scale,
+                "count": self.buckets[index],
+                "cumulative": seen / self.count
+            })
+        return exported
+    
+    def to_dict(self):
+        """Lossless JSON-serialisable form, see from_dict"""
+        return {
+            "significant_figures": self.significant_figures,
+            "buckets": sorted(self.buckets.items()),
+            "count": self.count,
+            "total": self.total,
+            "total_squares": self.total_squares,
+            "min": self.min,
+            "max": self.max
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Histogram restored from to_dict output"""
+        histogram = cls(data["significant_figures"])
+        histogram.buckets = {int(index): count for index, count in data["buckets"]}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.total_squares = data["total_squares"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
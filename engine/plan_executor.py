@@ -0,0 +1,378 @@
+import re
+import time
+import uuid
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from sqlalchemy import create_engine
+
+from db.schema_extractor import detect_database_type
+from engine.plan_generator import MIGRATION_PROGRESS_TABLE
+
+logger = logging.getLogger(__name__)
+
+# Order in which plans touching the same table are applied: restructuring
+# first, then new access paths, and drops last so a replacement index exists
+# before the index it supersedes is removed
+ACTION_PHASES = ["NORMALIZE", "DENORMALIZE", "PARTITION", "INDEX", "MATERIALIZE", "DROP_INDEX"]
+
+DEFAULT_EXECUTION_CONCURRENCY = 4
+
+# Statements that open or close a transaction explicitly
+TRANSACTION_CONTROL = {"BEGIN", "BEGIN TRANSACTION", "START TRANSACTION", "COMMIT", "ROLLBACK", "END"}
+
+# Words ending a compound statement that do not close a BEGIN ... END block
+COMPOUND_END_SUFFIXES = {"IF", "LOOP", "WHILE", "REPEAT"}
+
+# Objects whose MySQL/SQLite definition has a BEGIN ... END body containing semicolons
+BLOCK_OBJECTS = {"TRIGGER", "PROCEDURE", "FUNCTION", "EVENT"}
+
+DOLLAR_QUOTE_PATTERN = re.compile(r'\$[A-Za-z_]*\$')
+WORD_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+NEXT_WORD_PATTERN = re.compile(r'\s*([A-Za-z_]+)')
+
+def split_sql_statements(sql):
+    """
+    Split a block of SQL into individual statements.
+    
+    Semicolons only end a statement outside string literals, quoted
+    identifiers, comments and PostgreSQL dollar quotes, and outside the
+    BEGIN ... END body of a MySQL or SQLite trigger, procedure or function.
+    Comments are dropped from the output.
+    
+    Args:
+        sql (str): One or more SQL statements
+    
+    Returns:
+        list: Statements without their terminating semicolon
+    """
+    statements = []
+    current = []
+    words = []
+    block_depth = 0
+    i = 0
+    
+    def _flush():
+        statement = "".join(current).strip()
+        if statement:
+            statements.append(statement)
+        current.clear()
+        words.clear()
+    
+    while i < len(sql):
+        char = sql[i]
+        
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = len(sql) if end == -1 else end + 2
+            continue
+        
+        if char in ("'", '"', '`'):
+            # Quotes are escaped by doubling, which reads as two adjacent literals
+            end = sql.find(char, i + 1)
+            end = len(sql) - 1 if end == -1 else end
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        
+        dollar = DOLLAR_QUOTE_PATTERN.match(sql, i) if char == "$" else None
+        if dollar:
+            end = sql.find(dollar.group(0), dollar.end())
+            end = len(sql) if end == -1 else end + len(dollar.group(0))
+            current.append(sql[i:end])
+            i = end
+            continue
+        
+        word = WORD_PATTERN.match(sql, i) if char.isalpha() or char == "_" else None
+        if word:
+            keyword = word.group(0).upper()
+            # CREATE [OR REPLACE] [DEFINER = ...] TRIGGER|PROCEDURE|FUNCTION|EVENT
+            in_block_object = words[:1] == ["CREATE"] and any(w in BLOCK_OBJECTS for w in words[1:5])
+            if in_block_object and keyword in ("BEGIN", "CASE"):
+                block_depth += 1
+            elif in_block_object and keyword == "END":
+                following = NEXT_WORD_PATTERN.match(sql, word.end())
+                if not following or following.group(1).upper() not in COMPOUND_END_SUFFIXES:
+                    block_depth = max(block_depth - 1, 0)
+            words.append(keyword)
+            current.append(word.group(0))
+            i = word.end()
+            continue
+        
+        if char == ";" and block_depth == 0:
+            _flush()
+        else:
+            current.append(char)
+        i += 1
+    
+    _flush()
+    return statements
+
+def _statement_sql_hash(statement):
+    """Hash of everything a statement would execute, to detect plans that changed between runs"""
+    payload = "\n".join([statement.get("sql", "")] + statement.get("setup_sql", []) + statement.get("batch_sql", []))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def _statement_tables(plan, statement, known_tables):
+    """Existing tables a statement reads or changes"""
+    tables = {plan["table"]} | set(statement.get("tables", []))
+    sql = statement.get("sql", "")
+    tables.update(table for table in known_tables if re.search(rf'\b{re.escape(table)}\b', sql))
+    if statement.get("name") == MIGRATION_PROGRESS_TABLE:
+        # Plans create the shared progress table independently; concurrent creation can race
+        tables.add(MIGRATION_PROGRESS_TABLE)
+    return tables
+
+def build_execution_dag(plans, schema=None):
+    """
+    Turn SQL plans into a dependency graph of executable steps.
+    
+    Statements of one plan run in order. A statement also waits for every
+    earlier statement that touches one of the same tables, with plans on the
+    same table ordered by ACTION_PHASES. Statements on disjoint tables are
+    independent, so index builds on different tables can run side by side.
+    
+    Args:
+        plans (list): Plans from generate_sql
+        schema (dict, optional): Database schema, used to find the tables a statement references
+    
+    Returns:
+        list: Steps in a valid execution order, each with its dependencies
+    """
+    known_tables = set(schema or {}) | {plan["table"] for plan in plans if plan.get("table")}
+    
+    def _phase(plan):
+        action = plan.get("action")
+        return ACTION_PHASES.index(action) if action in ACTION_PHASES else len(ACTION_PHASES)
+    
+    steps = []
+    step_ids = set()
+    last_step_on_table = {}
+    for plan in sorted((p for p in plans if p.get("statements") and "error" not in p), key=_phase):
+        previous = None
+        for index, statement in enumerate(plan["statements"]):
+            step_id = f"{plan['action'].lower()}:{plan['table']}:{index}:{statement.get('name', statement['type'])}"
+            if step_id in step_ids:
+                # Several plans with the same action on a table
+                step_id = f"{step_id}#{sum(1 for s in step_ids if s.startswith(step_id))}"
+            step_ids.add(step_id)
+            tables = _statement_tables(plan, statement, known_tables)
+            
+            depends_on = {last_step_on_table[table] for table in tables if table in last_step_on_table}
+            if previous:
+                depends_on.add(previous)
+            
+            steps.append({
+                "id": step_id,
+                "table": plan["table"],
+                "action": plan["action"],
+                "type": statement["type"],
+                "name": statement.get("name"),
+                "tables": sorted(tables),
+                "depends_on": sorted(depends_on),
+                "sql_hash": _statement_sql_hash(statement),
+                "estimated_seconds": statement.get("estimated_build_seconds") or 0,
+                "statement": statement
+            })
+            for table in tables:
+                last_step_on_table[table] = step_id
+            previous = step_id
+    
+    return steps
+
+def estimate_makespan(steps):
+    """
+    Estimate the duration of a DAG run from the statements' build estimates.
+    
+    Args:
+        steps (list): Steps from build_execution_dag
+    
+    Returns:
+        dict: critical_path_seconds with unlimited workers and serial_seconds
+            when every step runs one after another
+    """
+    finish = {}
+    for step in steps:
+        start = max((finish[dep] for dep in step["depends_on"]), default=0)
+        finish[step["id"]] = start + step["estimated_seconds"]
+    
+    return {
+        "critical_path_seconds": round(max(finish.values(), default=0), 1),
+        "serial_seconds": round(sum(step["estimated_seconds"] for step in steps), 1)
+    }
+
+def _is_transaction_control(statement):
+    """Whether a statement begins or ends a transaction itself"""
+    return " ".join(statement.upper().split()) in TRANSACTION_CONTROL
+
+def execute_statement(engine, statement):
+    """
+    Execute one plan statement.
+    
+    Statements that must run outside a transaction block (transactional
+    False) or that manage their own transaction with BEGIN/COMMIT run in
+    autocommit mode. Batched migrations with repeat_until_empty run their
+    setup once and then commit one batch at a time until the last batch
+    statement affects no rows. Everything else runs in one transaction.
+    
+    Args:
+        engine: SQLAlchemy engine of the target database
+        statement (dict): Plan statement from generate_sql
+    
+    Returns:
+        dict: Number of executed SQL statements and, for batched migrations, batches
+    """
+    executed = 0
+    
+    with engine.connect() as conn:
+        if statement.get("repeat_until_empty"):
+            with conn.begin():
+                for sql in statement.get("setup_sql", []):
+                    for part in split_sql_statements(sql):
+                        conn.exec_driver_sql(part)
+                        executed += 1
+            
+            batch = [part for sql in statement["batch_sql"] for part in split_sql_statements(sql)]
+            batches = 0
+            while True:
+                with conn.begin():
+                    for part in batch:
+                        result = conn.exec_driver_sql(part)
+                        executed += 1
+                batches += 1
+                if result.rowcount == 0:
+                    break
+                time.sleep(statement.get("throttle_ms", 0) / 1000)
+            
+            return {"statements": executed, "batches": batches}
+        
+        parts = split_sql_statements(statement["sql"])
+        if statement.get("transactional", True) and not any(_is_transaction_control(p) for p in parts):
+            with conn.begin():
+                for part in parts:
+                    conn.exec_driver_sql(part)
+                    executed += 1
+        else:
+            autocommit = conn.execution_options(isolation_level="AUTOCOMMIT")
+            for part in parts:
+                autocommit.exec_driver_sql(part)
+                executed += 1
+    
+    return {"statements": executed}
+
+def execute_plans(connection_url, plans, schema=None, store=None, db_name="default", run_id=None,
+                  concurrency=DEFAULT_EXECUTION_CONCURRENCY, dry_run=False):
+    """
+    Apply SQL plans to a database, running independent steps in parallel.
+    
+    Every step is checkpointed in the metadata store. Passing the run_id of
+    an earlier run resumes it: steps recorded as done are skipped unless
+    their SQL has changed since, and the rest run again (generated DDL is
+    guarded with IF [NOT] EXISTS and batched migrations resume from their
+    progress table). When a step fails, the steps that depend on it are
+    skipped while independent branches carry on.
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL
+        plans (list): Plans from generate_sql
+        schema (dict, optional): Database schema, used to find the tables a statement references
+        store (MetadataStore, optional): Store for step checkpoints
+        db_name (str): Identifier for the database in the store
+        run_id (str, optional): Run to resume, a new run when omitted
+        concurrency (int): Maximum number of steps running at once
+        dry_run (bool): Only build the DAG and estimate its duration
+    
+    Returns:
+        dict: Run summary with the status of every step
+    """
+    steps = build_execution_dag(plans, schema)
+    run_id = run_id or uuid.uuid4().hex[:12]
+    summary = {
+        "run_id": run_id,
+        "dry_run": dry_run,
+        "steps": [],
+        "estimate": estimate_makespan(steps)
+    }
+    
+    def _public(step, **fields):
+        record = {key: value for key, value in step.items() if key != "statement"}
+        record.update(fields)
+        return record
+    
+    if dry_run:
+        summary["steps"] = [_public(step, status="pending") for step in steps]
+        logger.info(f"Dry run {run_id}: {len(steps)} steps, critical path "
+                    f"{summary['estimate']['critical_path_seconds']}s")
+        return summary
+    
+    # SQLite serializes writers, so parallel DDL would only fail with "database is locked"
+    if detect_database_type(connection_url) == "sqlite":
+        concurrency = 1
+    
+    checkpoints = store.load_execution_steps(run_id, db_name) if store else {}
+    status = {}
+    results = {}
+    for step in steps:
+        previous = checkpoints.get(step["id"], {})
+        if previous.get("status") == "done" and previous.get("sql_hash") == step["sql_hash"]:
+            status[step["id"]] = "done"
+            results[step["id"]] = _public(step, status="done", resumed=True)
+    if status:
+        logger.info(f"Resuming run {run_id}: {len(status)} of {len(steps)} steps already done")
+    
+    def _checkpoint(step, step_status, **fields):
+        status[step["id"]] = step_status
+        results[step["id"]] = _public(step, status=step_status, **fields)
+        if store:
+            store.save_execution_step(run_id, step["id"], step_status,
+                                      {"sql_hash": step["sql_hash"], **fields}, db_name)
+    
+    def _run(step):
+        started = time.perf_counter()
+        outcome = execute_statement(engine, step["statement"])
+        return dict(outcome, elapsed_seconds=round(time.perf_counter() - started, 3))
+    
+    engine = create_engine(connection_url)
+    started = time.perf_counter()
+    running = {}
+    
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency))) as executor:
+        while True:
+            # Skip steps behind a failure, then start every step whose dependencies are done
+            for step in steps:
+                if step["id"] in status:
+                    continue
+                dep_status = [status.get(dep) for dep in step["depends_on"]]
+                if any(s in ("failed", "skipped") for s in dep_status):
+                    _checkpoint(step, "skipped", error="A dependency failed")
+                elif all(s == "done" for s in dep_status):
+                    _checkpoint(step, "running")
+                    running[executor.submit(_run, step)] = step
+            
+            if not running:
+                break
+            
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                try:
+                    _checkpoint(step, "done", **future.result())
+                    logger.info(f"Step {step['id']} done")
+                except Exception as e:
+                    logger.error(f"Step {step['id']} failed: {str(e)}")
+                    _checkpoint(step, "failed", error=str(e))
+    
+    engine.dispose()
+    
+    summary["steps"] = [results[step["id"]] for step in steps]
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    for step_status in ("done", "failed", "skipped"):
+        summary[step_status] = sum(1 for s in status.values() if s == step_status)
+    
+    logger.info(f"Run {run_id}: {summary['done']} done, {summary['failed']} failed, "
+                f"{summary['skipped']} skipped in {summary['elapsed_seconds']}s")
+    return summary
@@ -1,20 +1,67 @@
+import copy
+import json
+import math
 import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from db.schema_extractor import estimate_column_width
+from db.schema_index import SchemaIndex, get_schema_index, schema_fingerprint
 
 logger = logging.getLogger(__name__)
 
-def generate_sql(recommendation, schema):
+# Partition sizing
+DEFAULT_ROWS_PER_PARTITION = 10000000
+MAX_PARTITIONS = 120
+
+# Calendar units for range partitions: approximate length in days, PostgreSQL
+# interval, to_char() format of partition name suffixes, and pg_cron schedule
+PARTITION_UNITS = [
+    ("year", 365, "1 year", "YYYY", "0 0 1 12 *"),
+    ("quarter", 91, "3 months", 'YYYY_"q"Q', "0 0 1 * *"),
+    ("month", 30, "1 month", "YYYY_MM", "0 0 15 * *"),
+    ("day", 1, "1 day", "YYYY_MM_DD", "0 0 * * *"),
+]
+
+# Batched data migrations
+MIGRATION_PROGRESS_TABLE = "schema_migration_progress"
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_THROTTLE_MS = 100
+
+# Generated plans kept in memory, keyed by schema snapshot, dialect, options and recommendation
+PLAN_CACHE_SIZE = 512
+
+_plan_cache = OrderedDict()
+# Web requests generate plans from several threads; plans are built outside the lock
+_plan_cache_lock = threading.Lock()
+
+# Index build estimates: sequential read throughput of the table scan, sort and
+# insert rate of index entries, and per-row overheads of heap tuples and index entries
+TABLE_SCAN_BYTES_PER_SECOND = 200 * 1024 * 1024
+INDEX_BUILD_ROWS_PER_SECOND = 500000
+HEAP_TUPLE_OVERHEAD_BYTES = 24
+INDEX_ENTRY_OVERHEAD_BYTES = 16
+
+def generate_sql(recommendation, schema, dialect="postgresql", options=None, schema_index=None):
     """
     Generate SQL statements to implement the recommended changes.
     
     Args:
         recommendation (dict): Recommendation details from recommend_changes
         schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        options (dict, optional): Plan tuning: rows_per_partition, batch_size
+            and throttle_ms
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
         
     Returns:
         dict: SQL implementation plan with statements and explanation
     """
     table = recommendation.get("table")
     action = recommendation.get("action")
+    options = options or {}
+    schema_index = schema_index or get_schema_index(schema)
     
     if not table or not action or table not in schema:
         logger.warning(f"Invalid recommendation: {recommendation}")
@@ -29,24 +76,410 @@ def generate_sql(recommendation, schema):
     }
     
     if action == "DENORMALIZE":
-        sql_plan = generate_denormalization_sql(recommendation, schema)
+        sql_plan = generate_denormalization_sql(recommendation, schema, dialect, schema_index)
     elif action == "NORMALIZE":
-        sql_plan = generate_normalization_sql(recommendation, schema)
+        sql_plan = generate_normalization_sql(recommendation, schema, dialect, options, schema_index)
     elif action == "INDEX":
-        sql_plan = generate_index_sql(recommendation, schema)
+        sql_plan = generate_index_sql(recommendation, schema, dialect, schema_index)
     elif action == "PARTITION":
-        sql_plan = generate_partition_sql(recommendation, schema)
+        sql_plan = generate_partition_sql(recommendation, schema, dialect, options, schema_index)
+    elif action == "DROP_INDEX":
+        sql_plan = generate_drop_index_sql(recommendation, schema, dialect, schema_index)
+    elif action == "MATERIALIZE":
+        sql_plan = generate_materialized_view_sql(recommendation, schema, dialect)
     
     logger.info(f"Generated SQL plan for {action} on table {table}")
     return sql_plan
 
-def generate_denormalization_sql(recommendation, schema):
+def generate_all(recommendations, schema, dialect="postgresql", options=None):
+    """
+    Generate the SQL plans of a set of recommendations in one pass.
+    
+    The schema is indexed once for all plans, and plans are cached per
+    schema snapshot, so regenerating the plans of an unchanged snapshot
+    (e.g. on every page view) costs one fingerprint of the schema.
+    
+    Args:
+        recommendations (list): Recommendations from recommend_changes
+        schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        options (dict, optional): Plan tuning passed to generate_sql
+        
+    Returns:
+        list: One SQL plan per recommendation, in order
+    """
+    # Plans also depend on statistics, which may be refreshed in place, so the key covers the whole snapshot
+    fingerprint = schema_fingerprint(schema)
+    schema_index = get_schema_index(schema, fingerprint)
+    options_key = json.dumps(options or {}, sort_keys=True)
+    plans = []
+    
+    for recommendation in recommendations:
+        # Partition ranges extend to the current date, so plans expire daily
+        key = (fingerprint, dialect, options_key, date.today().isoformat(),
+               json.dumps(recommendation, sort_keys=True, default=str))
+        with _plan_cache_lock:
+            plan = _plan_cache.get(key)
+            if plan is not None:
+                _plan_cache.move_to_end(key)
+        if plan is None:
+            plan = generate_sql(recommendation, schema, dialect, options, schema_index)
+            with _plan_cache_lock:
+                _plan_cache[key] = plan
+                if len(_plan_cache) > PLAN_CACHE_SIZE:
+                    _plan_cache.popitem(last=False)
+        
+        # Callers may annotate their plans; the cached copy must stay pristine
+        plans.append(copy.deepcopy(plan))
+    
+    return plans
+
+def _keyset_column(schema, table, schema_index=None):
+    """Single-column primary key of a table and its type, or (None, None)"""
+    schema_index = schema_index or SchemaIndex({table: schema[table]})
+    pk_columns = schema_index.primary_keys[table]
+    if len(pk_columns) != 1:
+        return None, None
+    return pk_columns[0], schema_index.column_type(table, pk_columns[0])
+
+def _is_integer_type(col_type):
+    """Whether a column type is an integer type"""
+    return "int" in str(col_type).lower() or "serial" in str(col_type).lower()
+
+def _null_safe_equals(left, right, dialect, nullable=True):
+    """
+    Equality that also matches NULL to NULL, in a form an index on left can serve.
+    
+    MySQL's <=> and SQLite's IS use indexes directly. PostgreSQL cannot use a
+    btree for IS NOT DISTINCT FROM, so it gets = with an explicit IS NULL
+    arm, which the planner turns into index conditions. Columns that are
+    NOT NULL need neither.
+    """
+    if not nullable:
+        return f"{left} = {right}"
+    if dialect == "mysql":
+        return f"{left} <=> {right}"
+    if dialect == "sqlite":
+        return f"{left} IS {right}"
+    return f"({left} = {right} OR ({left} IS NULL AND {right} IS NULL))"
+
+def migration_progress_table_sql(dialect="postgresql"):
+    """
+    Statement creating the table that records how far each batched migration got.
+    
+    Args:
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        
+    Returns:
+        dict: Plan statement
+    """
+    name_type = "VARCHAR(200)"
+    return {
+        "type": "create_table",
+        "name": MIGRATION_PROGRESS_TABLE,
+        "sql": f"""CREATE TABLE IF NOT EXISTS {MIGRATION_PROGRESS_TABLE} (
+    migration_name {name_type} PRIMARY KEY,
+    last_key {"VARCHAR(255)" if dialect == "mysql" else "TEXT"},
+    batch_start {"VARCHAR(255)" if dialect == "mysql" else "TEXT"},
+    batch_end {"VARCHAR(255)" if dialect == "mysql" else "TEXT"},
+    batch_rows BIGINT NOT NULL DEFAULT 0,
+    rows_done BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);"""
+    }
+
+def batched_migration_sql(migration_name, table, key, key_type, batch_operations, dialect="postgresql",
+                          batch_size=DEFAULT_BATCH_SIZE, throttle_ms=DEFAULT_THROTTLE_MS):
+    """
+    Build a resumable migration that walks a table in primary key order.
+    
+    Each batch covers the next batch_size keys after the last one recorded in
+    the progress table, so it is found with an index range scan however far
+    the migration has progressed, and each batch commits on its own to bound
+    lock time and WAL/binlog bursts. After an interruption the migration
+    resumes from the recorded key.
+    
+    PostgreSQL runs the whole loop server-side in a DO block that commits and
+    sleeps between batches (it must run outside an explicit transaction).
+    Its variables carry a v_ prefix, as PL/pgSQL rejects names that are
+    also columns of a table referenced by the same statement.
+    MySQL and SQLite have no equivalent, so the statement carries a list of
+    batch_sql statements that the caller repeats, sleeping throttle_ms in
+    between, until the last one affects no rows.
+    
+    Args:
+        migration_name (str): Key of the migration in the progress table
+        table (str): Table to walk
+        key (str): Single-column primary key of the table
+        key_type (str): SQL type of the key
+        batch_operations (callable): Given SQL expressions for the first and
+            last key of a batch, returns the statements migrating that batch
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        batch_size (int): Rows per batch
+        throttle_ms (int): Pause between batches in milliseconds
+        
+    Returns:
+        dict: Plan statement
+    """
+    name = migration_name.replace("'", "''")
+    progress_where = f"migration_name = '{name}'"
+    
+    if dialect == "postgresql":
+        operations = "\n".join(
+            "        " + statement.replace("\n", "\n        ")
+            for statement in batch_operations("v_batch_start", "v_batch_end")
+        )
+        window = f"""SELECT min(k), max(k), count(*) INTO v_batch_start, v_batch_end, v_batch_rows
+            FROM (SELECT {key} AS k FROM {table}{{where}} ORDER BY {key} LIMIT {batch_size}) batch"""
+        sql = f"""DO $$
+DECLARE
+    v_last_key {key_type};
+    v_batch_start {key_type};
+    v_batch_end {key_type};
+    v_batch_rows BIGINT;
+BEGIN
+    INSERT INTO {MIGRATION_PROGRESS_TABLE} (migration_name) VALUES ('{name}')
+        ON CONFLICT (migration_name) DO NOTHING;
+    SELECT CAST(p.last_key AS {key_type}) INTO v_last_key FROM {MIGRATION_PROGRESS_TABLE} p WHERE {progress_where};
+    
+    LOOP
+        IF v_last_key IS NULL THEN
+            {window.format(where="")};
+        ELSE
+            {window.format(where=f" WHERE {key} > v_last_key")};
+        END IF;
+        EXIT WHEN v_batch_rows = 0;
+        
+{operations}
+        
+        UPDATE {MIGRATION_PROGRESS_TABLE}
+        SET last_key = CAST(v_batch_end AS TEXT), rows_done = rows_done + v_batch_rows, updated_at = now()
+        WHERE {progress_where};
+        v_last_key := v_batch_end;
+        COMMIT;
+        PERFORM pg_sleep({throttle_ms / 1000});
+    END LOOP;
+END $$;"""
+        return {
+            "type": "data_migration",
+            "name": migration_name,
+            "tables": [table],
+            "transactional": False,
+            "sql": sql
+        }
+    
+    if dialect == "mysql":
+        last_key = "CAST(last_key AS SIGNED)" if _is_integer_type(key_type) else "last_key"
+        setup = [f"INSERT IGNORE INTO {MIGRATION_PROGRESS_TABLE} (migration_name) VALUES ('{name}');"]
+        batch_sql = [
+            f"SELECT {last_key} INTO @last_key FROM {MIGRATION_PROGRESS_TABLE} WHERE {progress_where};",
+            f"""SELECT MIN(k), MAX(k), COUNT(*) INTO @batch_start, @batch_end, @batch_rows
+FROM (SELECT {key} AS k FROM {table} WHERE @last_key IS NULL OR {key} > @last_key
+      ORDER BY {key} LIMIT {batch_size}) batch;""",
+        ] + batch_operations("@batch_start", "@batch_end") + [
+            f"""UPDATE {MIGRATION_PROGRESS_TABLE}
+SET last_key = @batch_end, rows_done = rows_done + @batch_rows, updated_at = CURRENT_TIMESTAMP
+WHERE {progress_where} AND @batch_rows > 0;"""
+        ]
+    else:
+        cast = (lambda expr: f"CAST({expr} AS INTEGER)") if _is_integer_type(key_type) else (lambda expr: expr)
+        progress_value = lambda column: f"(SELECT {cast(column)} FROM {MIGRATION_PROGRESS_TABLE} WHERE {progress_where})"
+        window = (f"(SELECT {key} AS k FROM {table} WHERE {progress_value('last_key')} IS NULL "
+                  f"OR {key} > {progress_value('last_key')} ORDER BY {key} LIMIT {batch_size})")
+        setup = [f"INSERT OR IGNORE INTO {MIGRATION_PROGRESS_TABLE} (migration_name) VALUES ('{name}');"]
+        batch_sql = [
+            f"""UPDATE {MIGRATION_PROGRESS_TABLE}
+SET batch_start = (SELECT MIN(k) FROM {window}),
+    batch_end = (SELECT MAX(k) FROM {window}),
+    batch_rows = (SELECT COUNT(*) FROM {window})
+WHERE {progress_where};""",
+        ] + batch_operations(progress_value("batch_start"), progress_value("batch_end")) + [
+            f"""UPDATE {MIGRATION_PROGRESS_TABLE}
+SET last_key = batch_end, rows_done = rows_done + batch_rows, updated_at = CURRENT_TIMESTAMP
+WHERE {progress_where} AND batch_rows > 0;"""
+        ]
+    
+    body = "\n".join(batch_sql)
+    return {
+        "type": "data_migration",
+        "name": migration_name,
+        "tables": [table],
+        "setup_sql": setup,
+        "batch_sql": batch_sql,
+        "repeat_until_empty": True,
+        "throttle_ms": throttle_ms,
+        "sql": f"""{chr(10).join(setup)}
+
+-- Repeat the following batch until its last statement affects no rows,
+-- pausing {throttle_ms} ms between batches
+{body}"""
+    }
+
+def estimate_index_build(schema, table, columns, online=False, schema_index=None):
+    """
+    Estimate the disk size and build time of an index from table statistics.
+    
+    A build reads the whole table once and sorts one entry per row. PostgreSQL
+    builds CONCURRENTLY with two table scans and waits for running transactions
+    in between, so online builds count the scan twice.
+    
+    Args:
+        schema (dict): Database schema information
+        table (str): Indexed table
+        columns (list): Index key columns
+        online (bool): Whether the index is built without blocking writes
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
+        
+    Returns:
+        dict: size_bytes and build_seconds, both None without a row count
+    """
+    row_count = schema.get(table, {}).get("row_count")
+    if not row_count:
+        return {"size_bytes": None, "build_seconds": None}
+    
+    schema_index = schema_index or SchemaIndex({table: schema[table]})
+    entry_bytes = sum(estimate_column_width(schema_index.column_type(table, col)) for col in columns)
+    row_bytes = sum(estimate_column_width(col["type"]) for col in schema_index.columns[table].values())
+    
+    scans = 2 if online else 1
+    scan_seconds = scans * row_count * (row_bytes + HEAP_TUPLE_OVERHEAD_BYTES) / TABLE_SCAN_BYTES_PER_SECOND
+    sort_seconds = row_count * max(math.log2(row_count) / 20, 1) / INDEX_BUILD_ROWS_PER_SECOND
+    
+    return {
+        "size_bytes": int(row_count * (entry_bytes + INDEX_ENTRY_OVERHEAD_BYTES)),
+        "build_seconds": round(scan_seconds + sort_seconds, 1)
+    }
+
+def create_index_sql(name, table, columns, dialect="postgresql", unique=False, online=True, include=None):
+    """
+    CREATE INDEX statement that is safe to re-run and, when online, does not block writes.
+    
+    PostgreSQL builds online with CONCURRENTLY, which cannot run inside a
+    transaction block. MySQL builds online with ALGORITHM=INPLACE, LOCK=NONE
+    and has no IF NOT EXISTS for indexes. Indexes on objects the same plan
+    has just created have no concurrent writers and are built offline.
+    
+    Covering columns go into an INCLUDE clause on PostgreSQL, which keeps
+    them out of the search key. MySQL and SQLite have no INCLUDE, so they
+    are appended as trailing key columns, which keeps the key prefix usable
+    for the same predicates and sort orders.
+    
+    Args:
+        name (str): Index name
+        table (str): Indexed table or materialized view
+        columns (list): Index key columns
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        unique (bool): Whether to create a unique index
+        online (bool): Whether to build without blocking writes
+        include (list, optional): Non-key columns stored in the index so it covers queries
+        
+    Returns:
+        str: SQL statement
+    """
+    unique_sql = "UNIQUE " if unique else ""
+    include = [c for c in include or [] if c not in columns]
+    if dialect == "postgresql":
+        columns_str = ", ".join(columns)
+        if include:
+            columns_str += f") INCLUDE ({', '.join(include)}"
+    else:
+        columns_str = ", ".join(list(columns) + include)
+    if dialect == "mysql":
+        online_sql = " ALGORITHM=INPLACE LOCK=NONE" if online else ""
+        return f"CREATE {unique_sql}INDEX {name} ON {table} ({columns_str}){online_sql};"
+    concurrently = "CONCURRENTLY " if online and dialect == "postgresql" else ""
+    return f"CREATE {unique_sql}INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns_str});"
+
+def drop_index_sql(name, table, dialect="postgresql", online=True):
+    """
+    DROP INDEX statement that is safe to re-run and, when online, does not block queries.
+    
+    Args:
+        name (str): Index name
+        table (str): Table the index belongs to
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        online (bool): Whether to drop without blocking reads and writes
+        
+    Returns:
+        str: SQL statement
+    """
+    if dialect == "mysql":
+        online_sql = ", ALGORITHM=INPLACE, LOCK=NONE" if online else ""
+        return f"ALTER TABLE {table} DROP INDEX {name}{online_sql};"
+    concurrently = "CONCURRENTLY " if online and dialect == "postgresql" else ""
+    return f"DROP INDEX {concurrently}IF EXISTS {name};"
+
+def index_statement(name, table, columns, schema, dialect="postgresql", unique=False, online=True,
+                    comment=None, schema_index=None, include=None):
+    """
+    Plan statement that creates an index, annotated with its estimated size and build time.
+    
+    Args:
+        name (str): Index name
+        table (str): Indexed table
+        columns (list): Index key columns
+        schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        unique (bool): Whether to create a unique index
+        online (bool): Whether to build without blocking writes
+        comment (str, optional): Comment line appended to the SQL
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
+        include (list, optional): Non-key covering columns
+        
+    Returns:
+        dict: Plan statement
+    """
+    sql = create_index_sql(name, table, columns, dialect, unique, online, include)
+    if comment:
+        sql += f"\n-- {comment}"
+    
+    stored_columns = list(columns) + [c for c in include or [] if c not in columns]
+    estimate = estimate_index_build(schema, table, stored_columns, online and dialect == "postgresql", schema_index)
+    statement = {
+        "type": "index",
+        "name": name,
+        "sql": sql,
+        "estimated_size_bytes": estimate["size_bytes"],
+        "estimated_build_seconds": estimate["build_seconds"]
+    }
+    if online and dialect == "postgresql":
+        # CREATE INDEX CONCURRENTLY refuses to run inside a transaction block
+        statement["transactional"] = False
+    return statement
+
+def _covering_columns(include, pk_columns, table, dialect, schema_index):
+    """
+    Covering columns an index must store explicitly in a dialect.
+    
+    InnoDB secondary indexes already end in the primary key, and SQLite
+    indexes carry the rowid, which an INTEGER PRIMARY KEY aliases, so those
+    columns are covered without being listed.
+    """
+    if dialect == "mysql":
+        return [c for c in include if c not in pk_columns]
+    if dialect == "sqlite" and len(pk_columns) == 1:
+        pk = next(iter(pk_columns))
+        if schema_index.column_type(table, pk).upper() == "INTEGER":
+            return [c for c in include if c != pk]
+    return list(include)
+
+def summarize_index_estimates(plan):
+    """Add total estimated index size and build time of a plan's statements"""
+    estimates = [stmt for stmt in plan["statements"] if stmt.get("estimated_size_bytes") is not None]
+    if estimates:
+        plan["estimated_size_bytes"] = sum(stmt["estimated_size_bytes"] for stmt in estimates)
+        plan["estimated_build_seconds"] = round(sum(stmt["estimated_build_seconds"] for stmt in estimates), 1)
+    return plan
+
+def generate_denormalization_sql(recommendation, schema, dialect="postgresql", schema_index=None):
     """
     Generate SQL for denormalization operations.
     
     Args:
         recommendation (dict): Recommendation details
         schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
         
     Returns:
         dict: SQL plan for denormalization
@@ -67,7 +500,8 @@ def generate_denormalization_sql(recommendation, schema):
         return plan
     
     # Get table structure
-    table_columns = [col["name"] for col in schema[table].get("columns", [])]
+    schema_index = schema_index or get_schema_index(schema)
+    table_columns = schema_index.column_names(table)
     
     # Create a view first (safer approach)
     view_name = f"{table}_denormalized_view"
@@ -80,57 +514,51 @@ def generate_denormalization_sql(recommendation, schema):
             continue
             
         # Find foreign key relationship
-        fk_found = False
-        for fk in schema[table].get("foreign_keys", []):
-            if fk.get("referred_table") == related_table:
-                fk_found = True
+        fk = schema_index.foreign_key(table, related_table)
+        if fk:
+            constrained_columns = fk.get("constrained_columns", [])
+            referred_columns = fk.get("referred_columns", [])
+            
+            if constrained_columns and referred_columns:
+                join_condition = " AND ".join([
+                    f"{table}.{const_col} = {related_table}.{ref_col}" 
+                    for const_col, ref_col in zip(constrained_columns, referred_columns)
+                ])
+                
+                join_clauses.append(f"LEFT JOIN {related_table} ON {join_condition}")
+                
+                # Add columns from related table (excluding the join key)
+                related_columns = [
+                    col for col in schema_index.column_names(related_table)
+                    if col not in referred_columns
+                ]
+                
+                for col in related_columns:
+                    select_columns.append(f"{related_table}.{col} AS {related_table}_{col}")
+        
+        else:
+            # Try reverse relationship
+            fk = schema_index.foreign_key(related_table, table)
+            if fk:
                 constrained_columns = fk.get("constrained_columns", [])
                 referred_columns = fk.get("referred_columns", [])
                 
                 if constrained_columns and referred_columns:
                     join_condition = " AND ".join([
-                        f"{table}.{const_col} = {related_table}.{ref_col}" 
+                        f"{related_table}.{const_col} = {table}.{ref_col}" 
                         for const_col, ref_col in zip(constrained_columns, referred_columns)
                     ])
                     
                     join_clauses.append(f"LEFT JOIN {related_table} ON {join_condition}")
                     
-                    # Add columns from related table (excluding the join key)
+                    # Add columns from related table
                     related_columns = [
-                        col["name"] for col in schema[related_table].get("columns", [])
-                        if col["name"] not in referred_columns
+                        col for col in schema_index.column_names(related_table)
+                        if col not in constrained_columns
                     ]
                     
                     for col in related_columns:
                         select_columns.append(f"{related_table}.{col} AS {related_table}_{col}")
-                    
-                    break
-        
-        if not fk_found:
-            # Try reverse relationship
-            for fk in schema[related_table].get("foreign_keys", []):
-                if fk.get("referred_table") == table:
-                    constrained_columns = fk.get("constrained_columns", [])
-                    referred_columns = fk.get("referred_columns", [])
-                    
-                    if constrained_columns and referred_columns:
-                        join_condition = " AND ".join([
-                            f"{related_table}.{const_col} = {table}.{ref_col}" 
-                            for const_col, ref_col in zip(constrained_columns, referred_columns)
-                        ])
-                        
-                        join_clauses.append(f"LEFT JOIN {related_table} ON {join_condition}")
-                        
-                        # Add columns from related table
-                        related_columns = [
-                            col["name"] for col in schema[related_table].get("columns", [])
-                            if col["name"] not in constrained_columns
-                        ]
-                        
-                        for col in related_columns:
-                            select_columns.append(f"{related_table}.{col} AS {related_table}_{col}")
-                        
-                        break
     
     # Create view SQL
     if join_clauses:
@@ -152,11 +580,19 @@ FROM
         
         # Also provide materialized view/table option
         mat_view_name = f"{table}_denormalized"
-        mat_view_sql = f"""CREATE TABLE {mat_view_name} AS
+        pk_columns = schema[table].get("primary_key", {}).get("constrained_columns") or ["id"]
+        if dialect == "postgresql":
+            mat_view_sql = f"""CREATE MATERIALIZED VIEW {mat_view_name} AS
 SELECT * FROM {view_name};
 
+-- Refresh periodically with: REFRESH MATERIALIZED VIEW {mat_view_name};"""
+        else:
+            mat_view_sql = f"""CREATE TABLE {mat_view_name} AS
+SELECT * FROM {view_name};"""
+        mat_view_sql += f"""
+
 -- Create indexes on frequently queried columns
-CREATE INDEX idx_{mat_view_name}_id ON {mat_view_name} (id);
+{create_index_sql(f"idx_{mat_view_name}_{'_'.join(pk_columns)}", mat_view_name, pk_columns, dialect, online=False)}
 """
         
         plan["statements"].append({
@@ -179,18 +615,24 @@ The view preserves data integrity while the materialized table offers better rea
     
     return plan
 
-def generate_normalization_sql(recommendation, schema):
+def generate_normalization_sql(recommendation, schema, dialect="postgresql", options=None, schema_index=None):
     """
     Generate SQL for normalization operations.
     
     Args:
         recommendation (dict): Recommendation details
         schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        options (dict, optional): batch_size and throttle_ms of the data migration
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
         
     Returns:
         dict: SQL plan for normalization
     """
     table = recommendation.get("table")
+    options = options or {}
+    schema_index = schema_index or get_schema_index(schema)
+    key, key_type = _keyset_column(schema, table, schema_index)
     
     plan = {
         "table": table,
@@ -201,8 +643,7 @@ def generate_normalization_sql(recommendation, schema):
     }
     
     # Analyze columns to identify potential groupings
-    columns = schema[table].get("columns", [])
-    column_names = [col["name"] for col in columns]
+    column_names = schema_index.column_names(table)
     
     # Look for column naming patterns that suggest related data
     prefixes = {}
@@ -227,54 +668,111 @@ def generate_normalization_sql(recommendation, schema):
         id_column = f"{new_table_name}_id"
         
         # Generate CREATE TABLE statement
-        column_defs = [f"{id_column} SERIAL PRIMARY KEY"]
+        if dialect == "mysql":
+            column_defs = [f"{id_column} INT AUTO_INCREMENT PRIMARY KEY"]
+        elif dialect == "sqlite":
+            column_defs = [f"{id_column} INTEGER PRIMARY KEY AUTOINCREMENT"]
+        else:
+            column_defs = [f"{id_column} SERIAL PRIMARY KEY"]
         for col in cols:
             # Get column type from original schema
-            col_type = next((c["type"] for c in columns if c["name"] == col), "VARCHAR(255)")
+            col_type = schema_index.column_type(table, col, "VARCHAR(255)")
             column_defs.append(f"{col} {col_type}")
         
         column_def_str = ',\n    '.join(column_defs)
         create_table_sql = f"""CREATE TABLE {new_table_name} (
     {column_def_str}
 );"""
+        # Every batch looks up the values it extracts, so they are indexed before the migration
+        values_index = f"ux_{new_table_name}_values"
         
         # Add foreign key to original table
-        alter_table_sql = f"""ALTER TABLE {table} 
+        if dialect == "sqlite":
+            alter_table_sql = f"""ALTER TABLE {table}
+ADD COLUMN {id_column} INTEGER REFERENCES {new_table_name}({id_column});"""
+        else:
+            alter_table_sql = f"""ALTER TABLE {table} 
 ADD COLUMN {id_column} INTEGER,
 ADD CONSTRAINT fk_{table}_{new_table_name} 
 FOREIGN KEY ({id_column}) REFERENCES {new_table_name}({id_column});"""
         
-        # Data migration - create new records and link to original table
-        migration_sql = f"""-- Step 1: Insert distinct combinations into new table
-INSERT INTO {new_table_name} ({', '.join(cols)})
-SELECT DISTINCT {', '.join(cols)} FROM {table};
-
--- Step 2: Update foreign keys in original table
-UPDATE {table} t
-SET {id_column} = nt.{id_column}
-FROM {new_table_name} nt
-WHERE {' AND '.join([f't.{col} = nt.{col}' for col in cols])};
-
--- Step 3: Remove redundant columns from original table
-ALTER TABLE {table}
-{', '.join([f'DROP COLUMN {col}' for col in cols])};"""
-        
         plan["statements"].append({
             "type": "create_table",
             "name": new_table_name,
             "sql": create_table_sql
         })
         
+        plan["statements"].append({
+            "type": "index",
+            "name": values_index,
+            # NOT NULL columns lead, so their plain equality narrows the index scan
+            "sql": create_index_sql(values_index, new_table_name,
+                                    sorted(cols, key=lambda col: schema_index.columns[table][col].get("nullable", True)),
+                                    dialect, unique=True, online=False)
+        })
+        
         plan["statements"].append({
             "type": "alter_table",
             "name": table,
             "sql": alter_table_sql
         })
         
+        # Data migration - create new records and link to original table
+        def matches(table_ref, cols=cols):
+            return " AND ".join(
+                _null_safe_equals(f"nt.{col}", f"{table_ref}.{col}", dialect,
+                                  schema_index.columns[table][col].get("nullable", True))
+                for col in cols
+            )
+        
+        def normalize_batch(batch_start, batch_end, cols=cols, new_table_name=new_table_name, id_column=id_column):
+            insert_sql = f"""INSERT INTO {new_table_name} ({', '.join(cols)})
+SELECT DISTINCT {', '.join(f't.{col}' for col in cols)} FROM {table} t
+WHERE t.{key} BETWEEN {batch_start} AND {batch_end}
+  AND NOT EXISTS (SELECT 1 FROM {new_table_name} nt WHERE {matches('t', cols)});"""
+            if dialect == "postgresql":
+                update_sql = f"""UPDATE {table} t
+SET {id_column} = nt.{id_column}
+FROM {new_table_name} nt
+WHERE t.{key} BETWEEN {batch_start} AND {batch_end} AND {matches('t', cols)};"""
+            else:
+                update_sql = f"""UPDATE {table}
+SET {id_column} = (SELECT nt.{id_column} FROM {new_table_name} nt WHERE {matches(table, cols)} LIMIT 1)
+WHERE {key} BETWEEN {batch_start} AND {batch_end};"""
+            return [insert_sql, update_sql]
+        
+        if key:
+            if not any(st.get("name") == MIGRATION_PROGRESS_TABLE for st in plan["statements"]):
+                plan["statements"].append(migration_progress_table_sql(dialect))
+            migration = batched_migration_sql(
+                f"normalize_{table}_{prefix}", table, key, key_type, normalize_batch, dialect,
+                options.get("batch_size", DEFAULT_BATCH_SIZE), options.get("throttle_ms", DEFAULT_THROTTLE_MS)
+            )
+            migration["tables"] = [table, new_table_name]
+            plan["statements"].append(migration)
+        else:
+            # Without a single-column key the table cannot be walked in batches
+            plan["statements"].append({
+                "type": "data_migration",
+                "tables": [table, new_table_name],
+                "sql": f"""INSERT INTO {new_table_name} ({', '.join(cols)})
+SELECT DISTINCT {', '.join(cols)} FROM {table};
+
+UPDATE {table}
+SET {id_column} = (SELECT nt.{id_column} FROM {new_table_name} nt
+                   WHERE {matches(table)});"""
+            })
+        
+        # Remove redundant columns from original table once every batch is done
+        if dialect == "sqlite":
+            drop_sql = "\n".join(f"ALTER TABLE {table} DROP COLUMN {col};" for col in cols)
+        else:
+            drop_sql = f"""ALTER TABLE {table}
+{', '.join([f'DROP COLUMN {col}' for col in cols])};"""
         plan["statements"].append({
-            "type": "data_migration",
-            "tables": [table, new_table_name],
-            "sql": migration_sql
+            "type": "alter_table",
+            "name": table,
+            "sql": drop_sql
         })
     
     if not plan["statements"]:
@@ -285,7 +783,7 @@ ALTER TABLE {table}
 The normalization plan:
 1. Creates {len(extraction_candidates)} new tables to extract related columns
 2. Adds foreign keys to the original table
-3. Migrates data to maintain relationships
+3. Migrates data to maintain relationships, in primary key batches tracked in {MIGRATION_PROGRESS_TABLE}
 4. Removes redundant columns from the original table
 
 This plan is based on column naming patterns suggesting related data.
@@ -293,13 +791,18 @@ This plan is based on column naming patterns suggesting related data.
     
     return plan
 
-def generate_index_sql(recommendation, schema):
+def generate_index_sql(recommendation, schema, dialect="postgresql", schema_index=None):
     """
     Generate SQL for index creation.
     
+    Indexes are built online so the table stays writable during the build,
+    and every statement carries its estimated size and build time.
+    
     Args:
         recommendation (dict): Recommendation details
         schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
         
     Returns:
         dict: SQL plan for indexing
@@ -314,31 +817,36 @@ def generate_index_sql(recommendation, schema):
         "caution": "Indexes improve read performance but may slow down writes."
     }
     
-    # Check existing indexes
-    existing_indexes = schema[table].get("indexes", [])
-    existing_indexed_columns = set()
-    for idx in existing_indexes:
-        for col in idx.get("column_names", []):
-            existing_indexed_columns.add(col)
-    
-    # Get columns from the table
-    columns = schema[table].get("columns", [])
-    
-    # Identify potential index candidates
-    pk_columns = set()
-    for col in columns:
-        if col.get("is_primary_key", False):
-            pk_columns.add(col["name"])
-    
-    # Check foreign key columns
-    fk_columns = set()
-    for fk in schema[table].get("foreign_keys", []):
-        for col in fk.get("constrained_columns", []):
-            fk_columns.add(col)
+    # Existing indexes, primary key and foreign key columns of the table
+    schema_index = schema_index or get_schema_index(schema)
+    existing_indexed_columns = schema_index.indexed_columns[table]
+    columns = list(schema_index.columns[table].values())
+    pk_columns = set(schema_index.primary_keys[table])
+    fk_columns = schema_index.fk_columns[table]
     
     # Generate index candidates - focus on foreign keys and potential filter columns
     index_candidates = []
     
+    # Indexes chosen by the cost-based advisor replace the column-name heuristics
+    index_only = []
+    for index in recommendation.get("indexes", []):
+        reason = f"Serves {len(index['fingerprints'])} query fingerprint(s), benefit {index['benefit']:.0f}"
+        include = _covering_columns(index.get("include", []), pk_columns, table, dialect, schema_index)
+        if index.get("include"):
+            reason += f", covers {', '.join(index['include'])}"
+        if index.get("heap_fetches_avoided"):
+            reason += f", avoids ~{index['heap_fetches_avoided']:,} heap fetches"
+        index_candidates.append({
+            "name": index["name"],
+            "columns": index["columns"],
+            "include": include,
+            "reason": reason
+        })
+        index_only.extend((index["name"], fp) for fp in index.get("index_only_fingerprints", []))
+    if recommendation.get("indexes"):
+        fk_columns = set()
+        columns = []
+    
     # Foreign key indexes (if not already indexed)
     for col in fk_columns:
         if col not in existing_indexed_columns and col not in pk_columns:
@@ -379,15 +887,23 @@ def generate_index_sql(recommendation, schema):
     
     # Generate SQL statements
     for candidate in index_candidates:
-        columns_str = ", ".join(candidate["columns"])
-        index_sql = f"""CREATE INDEX {candidate["name"]} ON {table} ({columns_str});
--- {candidate["reason"]}"""
-        
-        plan["statements"].append({
-            "type": "index",
-            "name": candidate["name"],
-            "sql": index_sql
-        })
+        plan["statements"].append(index_statement(candidate["name"], table, candidate["columns"], schema,
+                                                  dialect, comment=candidate["reason"], schema_index=schema_index,
+                                                  include=candidate.get("include")))
+    summarize_index_estimates(plan)
+    
+    if dialect == "postgresql":
+        plan["caution"] += (
+            " CREATE INDEX CONCURRENTLY must run outside a transaction block. If a build fails "
+            "it leaves an INVALID index behind; drop it and re-run the statement."
+        )
+        if any(candidate.get("include") for candidate in index_candidates):
+            plan["caution"] += (
+                " INCLUDE needs PostgreSQL 11 or later. Index-only scans skip the heap only for pages "
+                "marked all-visible, so keep (auto)VACUUM current on this table."
+            )
+    elif dialect == "mysql":
+        plan["caution"] += " Online builds still take a brief metadata lock at the start and end."
     
     if not plan["statements"]:
         plan["explanation"] = "No additional indexes recommended. Existing indexes appear sufficient."
@@ -398,21 +914,371 @@ Recommended {len(plan["statements"])} new indexes for table '{table}':
 
 These indexes target foreign keys and columns commonly used in WHERE clauses or joins.
 """
+        if index_only:
+            lines = [f"- {fp['fingerprint'] or fp['fingerprint_id']} via {name} "
+                     f"(~{fp['heap_fetches_avoided']:,} heap fetches avoided)"
+                     for name, fp in index_only]
+            plan["explanation"] += f"""
+These query fingerprints become index-only scans, reading every column they need from the index:
+{chr(10).join(lines)}
+"""
+    
+    return plan
+
+def _view_key_sql(key, expression, dialect):
+    """SQL of a view grouping key over an expression, truncated to its bucket if it has one"""
+    if key.get("bucket") != "day":
+        return expression
+    if dialect == "postgresql":
+        return f"date_trunc('day', {expression})"
+    if dialect == "mysql":
+        return f"DATE({expression})"
+    return f"date({expression})"
+
+def generate_materialized_view_sql(recommendation, schema, dialect="postgresql"):
+    """
+    Generate SQL for a materialized join-plus-aggregate view.
+    
+    PostgreSQL gets a materialized view with a unique index on its grouping
+    keys, so it can be refreshed with REFRESH ... CONCURRENTLY without blocking
+    readers. MySQL and SQLite have no materialized views; they get a summary
+    table instead, kept current by triggers that recompute the affected group
+    whenever a row of the fact table changes.
+    
+    Args:
+        recommendation (dict): Recommendation details with the view definition
+        schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        
+    Returns:
+        dict: SQL plan for the materialized view
+    """
+    table = recommendation.get("table")
+    view = recommendation.get("view")
+    
+    plan = {
+        "table": table,
+        "action": "MATERIALIZE",
+        "statements": [],
+        "explanation": "",
+        "caution": ""
+    }
+    
+    if not view:
+        plan["error"] = "No view definition in recommendation"
+        return plan
+    
+    view_name = f"mv_{table}_{recommendation.get('fingerprint_id', '')[:8]}".rstrip('_')
+    key_names = ", ".join(k["name"] for k in view["keys"])
+    group_by = ", ".join(_view_key_sql(k, k["expression"], dialect) for k in view["keys"])
+    select_list = ",\n    ".join(
+        [f"{_view_key_sql(k, k['expression'], dialect)} AS {k['name']}" for k in view["keys"]] +
+        [f"{a['expression']} AS {a['name']}" for a in view["aggregates"]]
+    )
+    
+    def _definition(where=None):
+        where_sql = f"\nWHERE {where}" if where else ""
+        return f"""SELECT
+    {select_list}
+FROM {view['from_clause']}{where_sql}
+GROUP BY {group_by}"""
+    
+    if dialect == "postgresql":
+        plan["statements"].append({
+            "type": "materialized_view",
+            "name": view_name,
+            "sql": f"CREATE MATERIALIZED VIEW {view_name} AS\n{_definition()}\nWITH DATA;"
+        })
+        plan["statements"].append({
+            "type": "index",
+            "name": f"{view_name}_key",
+            "sql": create_index_sql(f"{view_name}_key", view_name, [k["name"] for k in view["keys"]],
+                                    dialect, unique=True, online=False)
+        })
+        plan["statements"].append({
+            "type": "refresh",
+            "name": view_name,
+            "sql": f"""REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name};
+-- Schedule this refresh to bound staleness, e.g. with pg_cron:
+-- SELECT cron.schedule('refresh_{view_name}', '*/5 * * * *', 'REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}');"""
+        })
+        plan["caution"] = (
+            "The materialized view is only as fresh as its last refresh. CONCURRENTLY keeps it readable "
+            "during a refresh but requires the unique index on the grouping keys."
+        )
+    else:
+        plan["statements"].append({
+            "type": "summary_table",
+            "name": view_name,
+            "sql": f"CREATE TABLE {view_name} AS\n{_definition()};"
+        })
+        plan["statements"].append({
+            "type": "index",
+            "name": f"{view_name}_key",
+            "sql": create_index_sql(f"{view_name}_key", view_name, [k["name"] for k in view["keys"]],
+                                    dialect, unique=True, online=False)
+        })
+        
+        # Row-level maintenance is exact when every grouping key comes from the fact table
+        maintainable = all(k["table"] == table and k["column"] for k in view["keys"])
+        null_safe_eq = "<=>" if dialect == "mysql" else "IS"
+        
+        def _recompute(row):
+            row_keys = [_view_key_sql(k, f"{row}.{k['column']}", dialect) for k in view["keys"]]
+            view_match = " AND ".join(f"{k['name']} {null_safe_eq} {row_key}"
+                                      for k, row_key in zip(view["keys"], row_keys))
+            base_match = " AND ".join(f"{_view_key_sql(k, k['expression'], dialect)} {null_safe_eq} {row_key}"
+                                      for k, row_key in zip(view["keys"], row_keys))
+            return f"""    DELETE FROM {view_name} WHERE {view_match};
+    INSERT INTO {view_name}
+{_definition(base_match)};"""
+        
+        if maintainable:
+            for event, suffix, rows in [("INSERT", "ai", ["NEW"]), ("UPDATE", "au", ["OLD", "NEW"]),
+                                        ("DELETE", "ad", ["OLD"])]:
+                body = "\n".join(_recompute(row) for row in rows)
+                for_each_row = " FOR EACH ROW" if dialect == "mysql" else ""
+                plan["statements"].append({
+                    "type": "trigger",
+                    "name": f"{view_name}_{suffix}",
+                    "sql": f"""CREATE TRIGGER {view_name}_{suffix} AFTER {event} ON {table}{for_each_row}
+BEGIN
+{body}
+END;"""
+                })
+        
+        plan["statements"].append({
+            "type": "refresh",
+            "name": view_name,
+            "sql": f"""DELETE FROM {view_name};
+INSERT INTO {view_name}
+{_definition()};"""
+        })
+        
+        related = ", ".join(recommendation.get("related_tables", []))
+        plan["caution"] = (
+            f"Triggers keep {view_name} current for changes to '{table}' at the cost of a group "
+            f"recomputation per modified row. Changes to {related} are not tracked; run the refresh "
+            f"statements after bulk changes to those tables."
+            if maintainable else
+            f"Grouping keys come from joined tables, so {view_name} cannot be maintained row by row. "
+            f"Run the refresh statements periodically to bound staleness."
+        )
+    
+    plan["explanation"] = f"""
+This plan materializes a recurring join-plus-aggregate query on '{table}' as {view_name},
+one row per ({key_names}) with {', '.join(a['name'] for a in view['aggregates'])}.
+
+Queries filter {view_name} on its key columns instead of joining and aggregating
+the base tables on every execution.{'' if view.get('reaggregable', True) else ' Distinct counts only answer queries that match a whole group.'}
+Averages are stored as sums and counts so rows can be re-aggregated across groups.
+"""
+    day_keys = [k["name"] for k in view["keys"] if k.get("bucket") == "day"]
+    if day_keys:
+        plan["explanation"] += (f"Date/time range filters are keyed by day ({', '.join(day_keys)}), so the view "
+                                f"answers ranges with day-aligned bounds exactly.\n")
+    if view.get("unkeyed_filters"):
+        plan["explanation"] += (f"Range filters on {', '.join(view['unkeyed_filters'])} are not grouping keys, "
+                                f"as they would leave about one group per row; queries using them still read "
+                                f"the base tables.\n")
     
     return plan
 
-def generate_partition_sql(recommendation, schema):
+def generate_drop_index_sql(recommendation, schema, dialect="postgresql", schema_index=None):
+    """
+    Generate SQL to drop unused and redundant indexes.
+    
+    Args:
+        recommendation (dict): Recommendation details with the indexes to drop
+        schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
+        
+    Returns:
+        dict: SQL plan for dropping indexes
+    """
+    table = recommendation.get("table")
+    
+    plan = {
+        "table": table,
+        "action": "DROP_INDEX",
+        "statements": [],
+        "explanation": "",
+        "caution": (
+            "Usage counters only cover the period since statistics were last reset "
+            "(or the server was restarted). Make sure that window includes periodic jobs "
+            "such as month-end reports before dropping an unused index."
+        )
+    }
+    
+    for index in recommendation.get("indexes", []):
+        estimate = estimate_index_build(schema, table, index["columns"], dialect == "postgresql", schema_index)
+        statement = {
+            "type": "drop_index",
+            "name": index["name"],
+            "sql": f"""{drop_index_sql(index['name'], table, dialect)}
+-- Reasons: {', '.join(index['reasons'])}
+-- To restore: {create_index_sql(index['name'], table, index['columns'], dialect)}""",
+            "estimated_size_bytes": index.get("size_bytes") or estimate["size_bytes"],
+            "estimated_build_seconds": estimate["build_seconds"]
+        }
+        if dialect == "postgresql":
+            # DROP INDEX CONCURRENTLY refuses to run inside a transaction block
+            statement["transactional"] = False
+        plan["statements"].append(statement)
+    
+    # Freed space, and the time a restore would take if a drop turns out to be wrong
+    summarize_index_estimates(plan)
+    
+    index_lines = []
+    for index in recommendation.get("indexes", []):
+        line = f"- {index['name']} ({', '.join(index['columns'])}): {', '.join(index['reasons'])}"
+        if index.get("covered_by"):
+            line += f", covered by {index['covered_by']}"
+        index_lines.append(line)
+    
+    plan["explanation"] = f"""
+Drops {len(plan["statements"])} indexes on table '{table}':
+{chr(10).join(index_lines)}
+
+Every index is updated on each insert and delete and on updates to its columns,
+so removing indexes that serve no reads reduces write latency and storage.
+"""
+    
+    return plan
+
+def _parse_date(value):
+    """Date of an ISO date or timestamp string, or None"""
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+def _unit_start(day, unit):
+    """First day of the calendar unit containing a date"""
+    if unit == "year":
+        return date(day.year, 1, 1)
+    if unit == "quarter":
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    if unit == "month":
+        return date(day.year, day.month, 1)
+    return day
+
+def _next_unit(day, unit):
+    """First day of the calendar unit after the one containing a date"""
+    day = _unit_start(day, unit)
+    if unit == "day":
+        return date.fromordinal(day.toordinal() + 1)
+    months = {"year": 12, "quarter": 3, "month": 1}[unit]
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def _partition_label(day, unit):
+    """Partition name suffix, matching the to_char() format of the unit"""
+    if unit == "year":
+        return f"{day.year}"
+    if unit == "quarter":
+        return f"{day.year}_q{(day.month - 1) // 3 + 1}"
+    if unit == "month":
+        return f"{day.year}_{day.month:02d}"
+    return f"{day.year}_{day.month:02d}_{day.day:02d}"
+
+def _range_label(start, end, unit):
+    """Partition name suffix of a range: its unit, or its first and last unit when it spans several"""
+    last = _unit_start(date.fromordinal(end.toordinal() - 1), unit)
+    if last == _unit_start(start, unit):
+        return _partition_label(start, unit)
+    return f"{_partition_label(start, unit)}_{_partition_label(last, unit)}"
+
+def plan_partition_ranges(column_stats, row_count, rows_per_partition=DEFAULT_ROWS_PER_PARTITION):
+    """
+    Plan range partition boundaries for a date/time column from its value
+    distribution.
+    
+    The number of partitions follows from the row count and the target rows
+    per partition. The calendar unit is the coarsest one no longer than the
+    average partition span, and boundaries are the equi-depth quantiles of
+    the column histogram snapped to unit starts, so skewed data still gets
+    partitions of similar size. A range spanning several units is labelled
+    with its first and last unit, e.g. 2024_q3_2025_q1. The ranges cover the
+    observed minimum up to the end of the unit containing the maximum or
+    today, whichever is later.
+    
+    Args:
+        column_stats (dict): Statistics of the column from extract_column_stats
+        row_count (int): Estimated rows in the table
+        rows_per_partition (int): Target rows per partition
+        
+    Returns:
+        dict: unit, ranges [{label, start, end, estimated_rows}] and whether
+              statistics were available
+    """
+    histogram = [d for d in (_parse_date(v) for v in column_stats.get("histogram_bounds", [])) if d]
+    observed = histogram + [d for d in (_parse_date(column_stats.get(k)) for k in ("min", "max")) if d]
+    observed += [d for d in (_parse_date(v) for v in column_stats.get("most_common_vals", [])) if d]
+    
+    if not observed:
+        # Without statistics cover the current and next year by quarter
+        today = date.today()
+        boundaries = [date(today.year, 1, 1)]
+        while len(boundaries) < 9:
+            boundaries.append(_next_unit(boundaries[-1], "quarter"))
+        return {
+            "unit": "quarter",
+            "from_statistics": False,
+            "ranges": [{"label": _partition_label(start, "quarter"), "start": start.isoformat(),
+                        "end": end.isoformat(), "estimated_rows": None}
+                       for start, end in zip(boundaries, boundaries[1:])]
+        }
+    
+    low, high = min(observed), max(observed)
+    partitions = max(1, min(MAX_PARTITIONS, math.ceil((row_count or 0) / rows_per_partition)))
+    span_days = (high - low).days + 1
+    unit = next((name for name, days, *_ in PARTITION_UNITS if days <= span_days / partitions), "day")
+    
+    histogram.sort()
+    # Cover up to the current unit too, so rows written until the maintenance job runs have a partition
+    boundaries = {_unit_start(low, unit), _next_unit(max(high, date.today()), unit)}
+    if histogram:
+        for i in range(1, partitions):
+            boundaries.add(_unit_start(histogram[round(i * (len(histogram) - 1) / partitions)], unit))
+    else:
+        # Only the range is known: one partition per unit
+        boundary = _unit_start(low, unit)
+        while boundary < max(high, date.today()):
+            boundaries.add(boundary)
+            boundary = _next_unit(boundary, unit)
+    boundaries = sorted(boundaries)
+    
+    ranges = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        estimated_rows = None
+        if len(histogram) > 1 and row_count:
+            # Each histogram bucket holds an equal share of the rows
+            buckets = sum(1 for a, b in zip(histogram, histogram[1:]) if start <= a < end)
+            estimated_rows = int(row_count * buckets / (len(histogram) - 1))
+        ranges.append({"label": _range_label(start, end, unit), "start": start.isoformat(),
+                       "end": end.isoformat(), "estimated_rows": estimated_rows})
+    
+    return {"unit": unit, "from_statistics": True, "ranges": ranges}
+
+def generate_partition_sql(recommendation, schema, dialect="postgresql", options=None, schema_index=None):
     """
     Generate SQL for table partitioning.
     
     Args:
         recommendation (dict): Recommendation details
         schema (dict): Database schema information
+        dialect (str): Target database type (postgresql, mysql, sqlite)
+        options (dict, optional): rows_per_partition, and batch_size and
+            throttle_ms of the data migration
+        schema_index (SchemaIndex, optional): Precomputed lookups for schema
         
     Returns:
         dict: SQL plan for partitioning
     """
     table = recommendation.get("table")
+    options = options or {}
     
     plan = {
         "table": table,
@@ -422,101 +1288,313 @@ def generate_partition_sql(recommendation, schema):
         "caution": "Partitioning requires careful planning and may need application changes."
     }
     
-    # Find date/time columns for partitioning
-    columns = schema[table].get("columns", [])
-    partition_column = None
+    if dialect == "sqlite":
+        plan["error"] = "SQLite does not support table partitioning"
+        return plan
+    
+    # Use the column chosen from workload range filters, else the first date/time column
+    schema_index = schema_index or get_schema_index(schema)
+    columns = list(schema_index.columns[table].values())
+    partition_column = recommendation.get("partition_column")
     
-    for col in columns:
-        col_name = col["name"]
-        col_type = str(col["type"]).lower()
-        
-        if "date" in col_type or "time" in col_type:
-            partition_column = col_name
-            break
+    if not partition_column:
+        for col in columns:
+            col_type = str(col["type"]).lower()
+            if "date" in col_type or "time" in col_type:
+                partition_column = col["name"]
+                break
     
     if not partition_column:
         plan["error"] = "No suitable date/time column found for partitioning"
         return plan
     
-    # Generate SQL for PostgreSQL partitioning
-    # Get all columns for new table creation
-    column_defs = []
-    for col in columns:
-        nullable = "NULL" if col.get("nullable", True) else "NOT NULL"
-        default = f"DEFAULT {col['default']}" if col.get("default") and col["default"] != "None" else ""
-        column_defs.append(f"{col['name']} {col['type']} {nullable} {default}".strip())
+    column_type = schema_index.column_type(table, partition_column).lower()
+    ranges_plan = plan_partition_ranges(schema[table].get("column_stats", {}).get(partition_column, {}),
+                                        schema[table].get("row_count"),
+                                        options.get("rows_per_partition", DEFAULT_ROWS_PER_PARTITION))
+    unit, ranges = ranges_plan["unit"], ranges_plan["ranges"]
+    _, _, unit_interval, label_format, cron_schedule = next(u for u in PARTITION_UNITS if u[0] == unit)
     
-    new_table_name = f"{table}_partitioned"
-    column_def_str = ',\n    '.join(column_defs)
-    partition_sql = f"""-- Step 1: Create new partitioned table
+    if dialect == "mysql":
+        # RANGE COLUMNS accepts DATE and DATETIME; TIMESTAMP needs an integer expression
+        if "timestamp" in column_type:
+            partition_by = f"RANGE (UNIX_TIMESTAMP({partition_column}))"
+            bound = lambda value: f"UNIX_TIMESTAMP('{value}')"
+        else:
+            partition_by = f"RANGE COLUMNS({partition_column})"
+            bound = lambda value: f"'{value}'"
+        partition_defs = ",\n    ".join(
+            [f"PARTITION p{r['label']} VALUES LESS THAN ({bound(r['end'])})" for r in ranges] +
+            ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"]
+        )
+        plan["statements"].append({
+            "type": "partition",
+            "name": table,
+            "sql": f"""-- Partitioning rebuilds the table; every unique key must include {partition_column}
+ALTER TABLE {table}
+PARTITION BY {partition_by} (
+    {partition_defs}
+);
+
+-- Split pmax before it receives data, e.g. for the next {unit}:
+-- ALTER TABLE {table} REORGANIZE PARTITION pmax INTO (
+--     PARTITION p<next> VALUES LESS THAN (...), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+"""
+        })
+        steps = f"""This partitioning plan:
+1. Rebuilds '{table}' partitioned by {unit} on the '{partition_column}' column
+2. Routes rows past the last boundary to a catch-all pmax partition"""
+        plan["caution"] = (
+            "ALTER TABLE ... PARTITION BY copies the whole table and blocks writes until it finishes. "
+            "For large tables run it through an online schema change tool such as gh-ost or "
+            "pt-online-schema-change, which copy in throttled chunks."
+        )
+    else:
+        # Generate SQL for PostgreSQL partitioning
+        # Get all columns for new table creation
+        column_defs = []
+        for col in columns:
+            nullable = "NULL" if col.get("nullable", True) else "NOT NULL"
+            default = f"DEFAULT {col['default']}" if col.get("default") and col["default"] != "None" else ""
+            column_defs.append(f"{col['name']} {col['type']} {nullable} {default}".strip())
+        
+        new_table_name = f"{table}_partitioned"
+        
+        # Unique keys of a partitioned table must include the partition column
+        unique_keys = []
+        widened_keys = []
+        pk_columns = schema_index.primary_keys.get(table, [])
+        candidates = [("PRIMARY KEY", pk_columns)] if pk_columns else []
+        candidates += [("UNIQUE", idx.get("column_names") or []) for idx in
+                       schema[table].get("indexes", []) + schema[table].get("unique_constraints", [])
+                       if idx.get("unique", True) and all(idx.get("column_names") or [None])]
+        for kind, key_columns in candidates:
+            key_columns = list(key_columns)
+            if partition_column not in key_columns:
+                widened_keys.append(f"({', '.join(key_columns)})")
+                key_columns.append(partition_column)
+            if all(key_columns != existing for _, existing in unique_keys):
+                unique_keys.append((kind, key_columns))
+        
+        # Foreign keys into the table are only kept when they can reference one of those keys
+        inbound = [(child, fk) for child, fks in schema_index.referenced_by.get(table, {}).items() for fk in fks]
+        blocking = [f"{child}.{fk.get('name') or '(' + ', '.join(fk['constrained_columns']) + ')'}"
+                    for child, fk in inbound
+                    if not any(sorted(fk.get("referred_columns") or []) == sorted(key_columns)
+                               for _, key_columns in unique_keys)]
+        if blocking:
+            plan["error"] = (
+                f"Table '{table}' is referenced by foreign keys {', '.join(blocking)} that do not include "
+                f"'{partition_column}'. A partitioned table can only be referenced through a unique key "
+                f"containing its partition column; rework or drop those foreign keys before partitioning."
+            )
+            return plan
+        
+        column_defs += [f"{kind} ({', '.join(key_columns)})" for kind, key_columns in unique_keys]
+        column_defs += [f"FOREIGN KEY ({', '.join(fk['constrained_columns'])}) "
+                        f"REFERENCES {fk['referred_table']} ({', '.join(fk['referred_columns'])})"
+                        for fk in schema[table].get("foreign_keys", []) if fk.get("referred_table") != table]
+        
+        # Inbound and self-referencing foreign keys still point at the original table after
+        # the rename, so they are recreated against the new one. Other tables get theirs NOT VALID
+        # and validated after the swap; a self-reference now sits on the partitioned table, which
+        # only accepts validated foreign keys before PostgreSQL 18
+        retarget_sql = "".join(
+            (f"\nALTER TABLE {child} DROP CONSTRAINT {fk['name']};" if child != table else "") +
+            f"\nALTER TABLE {child} ADD CONSTRAINT {fk['name']} FOREIGN KEY ({', '.join(fk['constrained_columns'])}) "
+            f"REFERENCES {table} ({', '.join(fk['referred_columns'])})" + (" NOT VALID;" if child != table else ";")
+            for child, fk in inbound
+        )
+        validate_sql = "".join(f"\nALTER TABLE {child} VALIDATE CONSTRAINT {fk['name']};"
+                               for child, fk in inbound if child != table)
+        column_def_str = ',\n    '.join(column_defs)
+        key, key_type = _keyset_column(schema, table, schema_index)
+        partitions_str = "\n\n".join(
+            f"""CREATE TABLE {table}_p{r['label']} PARTITION OF {new_table_name}
+    FOR VALUES FROM ('{r['start']}') TO ('{r['end']}');"""
+            for r in ranges
+        )
+        key_index = ("\n" + create_index_sql(f"idx_{new_table_name}_{key}", new_table_name, [key], dialect,
+                                              online=False)
+                     if key and key != partition_column else "")
+        plan["statements"].append({
+            "type": "partition",
+            "name": new_table_name,
+            "sql": f"""-- Step 1: Create new partitioned table
 CREATE TABLE {new_table_name} (
     {column_def_str}
 ) PARTITION BY RANGE ({partition_column});
 
--- Step 2: Create initial partitions (adjust ranges as needed)
-CREATE TABLE {new_table_name}_p2023_q1 PARTITION OF {new_table_name}
-    FOR VALUES FROM ('2023-01-01') TO ('2023-04-01');
-    
-CREATE TABLE {new_table_name}_p2023_q2 PARTITION OF {new_table_name}
-    FOR VALUES FROM ('2023-04-01') TO ('2023-07-01');
-    
-CREATE TABLE {new_table_name}_p2023_q3 PARTITION OF {new_table_name}
-    FOR VALUES FROM ('2023-07-01') TO ('2023-10-01');
-    
-CREATE TABLE {new_table_name}_p2023_q4 PARTITION OF {new_table_name}
-    FOR VALUES FROM ('2023-10-01') TO ('2024-01-01');
+-- Step 2: Create partitions covering the existing data, plus a default partition
+{partitions_str}
+
+CREATE TABLE {table}_pdefault PARTITION OF {new_table_name} DEFAULT;
 
 -- Step 3: Create indexes on partitioned table
-CREATE INDEX idx_{new_table_name}_{partition_column} ON {new_table_name} ({partition_column});
+{create_index_sql(f"idx_{new_table_name}_{partition_column}", new_table_name, [partition_column], dialect, online=False)}{key_index}"""
+        })
+        
+        # Step 4: Migrate data from original table
+        if key:
+            migration_name = f"partition_{table}"
+            progress_row = f"{MIGRATION_PROGRESS_TABLE} WHERE migration_name = '{migration_name}'"
+            copied_up_to = f"(SELECT CAST(last_key AS {key_type}) FROM {progress_row})"
+            plan["statements"].append(migration_progress_table_sql(dialect))
+            plan["statements"].append({
+                "type": "trigger",
+                "name": f"{table}_migration_sync",
+                "sql": f"""-- Mirror writes to keys the migration has already passed. Keys need not be
+-- monotonic: an insert or an update can land behind the last copied key, and an
+-- update can move a row across it. Reading the progress row FOR SHARE waits for a
+-- running batch, which locks it, so every write is either copied by the batch or
+-- sees the batch's last key.
+CREATE OR REPLACE FUNCTION {table}_migration_sync()
+RETURNS trigger AS $$
+DECLARE
+    v_copied_up_to {key_type};
+BEGIN
+    SELECT CAST(last_key AS {key_type}) INTO v_copied_up_to FROM {progress_row} FOR SHARE;
+    IF TG_OP <> 'INSERT' THEN
+        IF OLD.{key} <= v_copied_up_to THEN
+            DELETE FROM {new_table_name} WHERE {key} = OLD.{key};
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        IF NEW.{key} <= v_copied_up_to THEN
+            INSERT INTO {new_table_name} SELECT NEW.*;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
 
--- Step 4: Migrate data from original table
+CREATE TRIGGER {table}_migration_sync AFTER INSERT OR UPDATE OR DELETE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION {table}_migration_sync();"""
+            })
+            
+            def copy_batch(batch_start, batch_end):
+                return [
+                    # Writers wait in the sync trigger until the batch commits and then see it as copied;
+                    # writes that got there first are committed before the batch reads its rows
+                    f"PERFORM 1 FROM {progress_row} FOR UPDATE;",
+                    f"INSERT INTO {new_table_name} SELECT * FROM {table} WHERE {key} BETWEEN {batch_start} AND {batch_end};"
+                ]
+            
+            plan["statements"].append(batched_migration_sql(
+                migration_name, table, key, key_type, copy_batch, dialect,
+                options.get("batch_size", DEFAULT_BATCH_SIZE), options.get("throttle_ms", DEFAULT_THROTTLE_MS)
+            ))
+            plan["statements"].append({
+                "type": "swap",
+                "name": table,
+                "sql": f"""-- Step 5: Copy rows inserted since the last batch and swap the tables
+BEGIN;
+LOCK TABLE {table} IN EXCLUSIVE MODE;
+INSERT INTO {new_table_name} SELECT * FROM {table}
+WHERE {copied_up_to} IS NULL OR {key} > {copied_up_to};
+DROP TRIGGER {table}_migration_sync ON {table};
+ALTER TABLE {table} RENAME TO {table}_old;
+ALTER TABLE {new_table_name} RENAME TO {table};{retarget_sql}
+COMMIT;
+{validate_sql}
+DROP FUNCTION {table}_migration_sync();"""
+            })
+        else:
+            # Without a single-column key the table cannot be walked in batches
+            plan["statements"].append({
+                "type": "data_migration",
+                "tables": [table, new_table_name],
+                "sql": f"""-- Step 4: Migrate data from original table
 INSERT INTO {new_table_name} SELECT * FROM {table};
 
 -- Step 5: Rename tables to swap them
 ALTER TABLE {table} RENAME TO {table}_old;
-ALTER TABLE {new_table_name} RENAME TO {table};
-
--- Step 6: Create a function to manage partitions
+ALTER TABLE {new_table_name} RENAME TO {table};{retarget_sql}{validate_sql}"""
+            })
+        
+        partition_sql = f"""-- Step 6: Create a function to add the partition for the next {unit} ahead of time
 CREATE OR REPLACE FUNCTION manage_{table}_partitions()
 RETURNS VOID AS $$
 DECLARE
-    next_quarter DATE;
+    next_start DATE;
 BEGIN
-    -- Calculate the next quarter date
-    SELECT date_trunc('quarter', now()) + interval '3 months' INTO next_quarter;
-    
-    -- Create a new partition if it doesn't exist
-    EXECUTE format(
-        'CREATE TABLE IF NOT EXISTS %s_p%s PARTITION OF %s
-         FOR VALUES FROM (%L) TO (%L)',
-        '{table}',
-        to_char(next_quarter, 'YYYY_Q'),
-        '{table}',
-        next_quarter,
-        next_quarter + interval '3 months'
-    );
+    SELECT date_trunc('{unit}', now()) + interval '{unit_interval}' INTO next_start;
+    
+    BEGIN
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            '{table}_p' || to_char(next_start, '{label_format}'),
+            '{table}',
+            next_start,
+            next_start + interval '{unit_interval}'
+        );
+    EXCEPTION WHEN invalid_object_definition THEN
+        -- The range is already covered by an existing partition
+        NULL;
+    END;
 END;
 $$ LANGUAGE plpgsql;
 
--- Step 7: Create a trigger to run the partition management function
+-- Step 7: Schedule the partition management function
 CREATE EXTENSION IF NOT EXISTS pg_cron;
 
-SELECT cron.schedule('0 0 1 * *', 'SELECT manage_" + table + "_partitions()');
+SELECT cron.schedule('manage_{table}_partitions', '{cron_schedule}', 'SELECT manage_{table}_partitions()');
 """
+        plan["statements"].append({
+            "type": "function",
+            "name": f"manage_{table}_partitions",
+            "sql": partition_sql
+        })
+        
+        migration_step = (
+            f"3. Copies data from the original table in batches of {options.get('batch_size', DEFAULT_BATCH_SIZE)} "
+            f"rows by '{key}', resumable from {MIGRATION_PROGRESS_TABLE}, while a trigger mirrors "
+            f"writes to keys already copied\n4. Copies the remaining rows and swaps the tables under a short lock"
+            if key else
+            "3. Migrates data from the original table\n4. Renames tables to preserve the original name"
+        )
+        steps = f"""This partitioning plan:
+1. Creates a new table partitioned by {unit} on the '{partition_column}' column
+2. Sets up partitions covering the existing data, plus a DEFAULT partition for anything outside them
+{migration_step}
+5. Creates a maintenance function and schedule to automatically add future partitions"""
+        plan["caution"] = (
+            "Partitioning requires careful planning and may need application changes. "
+            "Rows in the DEFAULT partition make it impossible to attach a partition for their range "
+            "until they are moved, so keep future partitions created ahead of time. "
+            "Run the batched migration outside an explicit transaction block so it can commit per batch."
+        )
+        if widened_keys:
+            plan["caution"] += (
+                f" PostgreSQL requires unique keys of a partitioned table to include the partition column, so "
+                f"{', '.join(widened_keys)} only stay unique together with '{partition_column}' after the swap; "
+                f"enforce uniqueness of the original columns in the application if it matters."
+            )
+        if any(child != table for child, _ in inbound):
+            plan["caution"] += (
+                f" Foreign keys referencing '{table}' are recreated against the new table as NOT VALID "
+                f"and validated after the swap."
+            )
+        if any(child == table for child, _ in inbound):
+            plan["caution"] += (
+                f" Self-referencing foreign keys are recreated validated inside the swap, which scans "
+                f"'{table}' while it is locked."
+            )
     
-    plan["statements"].append({
-        "type": "partition",
-        "name": table,
-        "sql": partition_sql
-    })
     
+    range_lines = "\n".join(
+        f"- p{r['label']}: [{r['start']}, {r['end']})"
+        + (f", ~{r['estimated_rows']:,} rows" if r["estimated_rows"] is not None else "")
+        for r in ranges
+    )
+    source = ("Boundaries follow the column's value distribution"
+              if ranges_plan["from_statistics"] else
+              "No statistics were available for the column, so the ranges are a default guess")
     plan["explanation"] = f"""
-This partitioning plan:
-1. Creates a new table partitioned by the '{partition_column}' column
-2. Sets up initial quarterly partitions
-3. Migrates data from the original table
-4. Renames tables to preserve the original name
-5. Creates a maintenance function and schedule to automatically add future partitions
+{steps}
+
+{source}:
+{range_lines}
 
 Partitioning works best for tables with time-series data and queries that filter on the partition column.
 """
@@ -0,0 +1,239 @@
+import time
+import logging
+import threading
+from sqlalchemy import text
+
+from db.schema_extractor import detect_database_type
+
+logger = logging.getLogger(__name__)
+
+# Seconds between resource samples
+DEFAULT_SAMPLE_INTERVAL = 1.0
+
+# Cumulative per-database counters of pg_stat_database
+PG_DATABASE_COUNTERS = (
+    "xact_commit", "xact_rollback", "blks_read", "blks_hit", "tup_returned", "tup_fetched",
+    "tup_inserted", "tup_updated", "tup_deleted", "temp_files", "temp_bytes", "blk_read_time", "blk_write_time"
+)
+
+PG_DATABASE_GAUGES = ("numbackends",)
+
+# Cumulative counters summed over the database's pg_stat_statements entries,
+# reported with a statements_ prefix
+PG_STATEMENT_COUNTERS = (
+    "calls", "rows", "shared_blks_hit", "shared_blks_read", "shared_blks_dirtied", "shared_blks_written",
+    "temp_blks_read", "temp_blks_written"
+)
+
+# Column holding statement execution time, renamed in PostgreSQL 13
+PG_STATEMENT_TIME_COLUMNS = ("total_exec_time", "total_time")
+
+# Cumulative counters of MySQL SHOW GLOBAL STATUS
+MYSQL_STATUS_COUNTERS = (
+    "Questions", "Com_select", "Com_insert", "Com_update", "Com_delete", "Innodb_buffer_pool_read_requests",
+    "Innodb_buffer_pool_reads", "Innodb_data_read", "Innodb_data_written", "Innodb_rows_read",
+    "Created_tmp_tables", "Created_tmp_disk_tables", "Select_scan", "Sort_merge_passes", "Bytes_sent",
+    "Bytes_received"
+)
+
+MYSQL_STATUS_GAUGES = ("Threads_connected", "Threads_running")
+
+# Counters shown in summaries and compared between runs, per query executed
+HEADLINE_COUNTERS = {
+    "postgresql": ("blks_read", "blks_hit", "temp_bytes", "tup_returned", "tup_fetched",
+                   "statements_shared_blks_read", "statements_temp_blks_written"),
+    "mysql": ("Innodb_buffer_pool_reads", "Innodb_buffer_pool_read_requests", "Innodb_rows_read",
+              "Created_tmp_disk_tables", "Bytes_sent")
+}
+
+def _buffer_hit_ratio(dialect, deltas):
+    """Share of page reads served from the buffer cache, or None without reads"""
+    if dialect == "postgresql":
+        hits, reads = deltas.get("blks_hit", 0), deltas.get("blks_read", 0)
+        total = hits + reads
+    else:
+        total = deltas.get("Innodb_buffer_pool_read_requests", 0)
+        hits = total - deltas.get("Innodb_buffer_pool_reads", 0)
+    return hits / total if total else None
+
+class ResourceSampler:
+    """
+    Background thread polling server-side resource counters during a benchmark.
+    
+    PostgreSQL counters come from pg_stat_database and, when the extension
+    is installed, pg_stat_statements; MySQL counters from SHOW GLOBAL STATUS.
+    Both are server- or database-wide, so other sessions' work is included,
+    and so are the sampler's own few queries. Other databases are not sampled.
+    
+    Usage:
+        with ResourceSampler(engine) as sampler:
+            ... run the load ...
+        report = sampler.report
+    """
+    
+    def __init__(self, engine, interval=DEFAULT_SAMPLE_INTERVAL, dialect=None):
+        """
+        Prepare a sampler.
+        
+        Args:
+            engine: SQLAlchemy engine of the benchmarked database
+            interval (float): Seconds between samples
+            dialect (str, optional): Database type, detected from the engine URL by default
+        """
+        self.engine = engine
+        self.interval = interval
+        self.dialect = dialect or detect_database_type(str(engine.url))
+        self.supported = self.dialect in ("postgresql", "mysql")
+        self.statements_available = True
+        self.statement_time_column = None
+        self.samples = []
+        self.errors = []
+        self.report = None
+        self._conn = None
+        self._thread = None
+        self._stop = threading.Event()
+    
+    def _read_postgresql(self):
+        """Counters and gauges of the current database"""
+        columns = PG_DATABASE_COUNTERS + PG_DATABASE_GAUGES
+        row = self._conn.execute(text(
+            f"SELECT {', '.join(columns)} FROM pg_stat_database WHERE datname = current_database()"
+        )).fetchone()
+        values = dict(zip(columns, row))
+        counters = {name: float(values[name] or 0) for name in PG_DATABASE_COUNTERS}
+        gauges = {name: values[name] for name in PG_DATABASE_GAUGES}
+        
+        if self.statements_available:
+            counters.update(self._read_statements())
+        
+        return counters, gauges
+    
+    def _read_statements(self):
+        """Sums over the database's pg_stat_statements entries, or {} once the view proves unavailable"""
+        columns = [self.statement_time_column] if self.statement_time_column else PG_STATEMENT_TIME_COLUMNS
+        error = None
+        for column in columns:
+            sums = ", ".join(f"sum({name})" for name in PG_STATEMENT_COUNTERS + (column,))
+            try:
+                row = self._conn.execute(text(
+                    f"SELECT {sums} FROM pg_stat_statements "
+                    f"WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())"
+                )).fetchone()
+            except Exception as e:
+                error = e
+                continue
+            self.statement_time_column = column
+            return {f"statements_{name}": float(value or 0)
+                    for name, value in zip(PG_STATEMENT_COUNTERS + ("exec_time_ms",), row)}
+        
+        logger.info(f"pg_stat_statements not sampled: {str(error)}")
+        self.statements_available = False
+        return {}
+    
+    def _read_mysql(self):
+        """Global status counters and gauges"""
+        rows = self._conn.execute(text("SHOW GLOBAL STATUS")).fetchall()
+        status = {name: value for name, value in rows}
+        counters = {name: float(status[name]) for name in MYSQL_STATUS_COUNTERS if name in status}
+        gauges = {name: int(status[name]) for name in MYSQL_STATUS_GAUGES if name in status}
+        return counters, gauges
+    
+    def _take_sample(self):
+        """Read the counters once and append them to the samples"""
+        try:
+            read = self._read_postgresql if self.dialect == "postgresql" else self._read_mysql
+            counters, gauges = read()
+            self.samples.append({"time": time.perf_counter(), "counters": counters, "gauges": gauges})
+        except Exception as e:
+            logger.warning(f"Resource sample failed: {str(e)}")
+            self.errors.append(str(e))
+    
+    def _run(self):
+        """Sampling loop of the background thread"""
+        while not self._stop.wait(self.interval):
+            self._take_sample()
+    
+    def start(self):
+        """
+        Take a baseline sample and start sampling in the background.
+        
+        Returns:
+            ResourceSampler: This sampler
+        """
+        if not self.supported:
+            logger.info(f"Resource sampling is not supported for {self.dialect}")
+            return self
+        
+        try:
+            # Autocommit, so every read sees fresh statistics instead of a
+            # snapshot cached for the transaction
+            self._conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        except Exception as e:
+            logger.warning(f"Resource sampling disabled: {str(e)}")
+            self.errors.append(str(e))
+            return self
+        
+        self._take_sample()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """
+        Take a final sample, stop the thread and build the report.
+        
+        Returns:
+            dict: Report, see build_report, or None when nothing was sampled
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._take_sample()
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        
+        self.report = self.build_report() if len(self.samples) >= 2 else None
+        return self.report
+    
+    def build_report(self):
+        """
+        Time series and totals of the sampled counters.
+        
+        Returns:
+            dict: dialect, interval_seconds, series of per-interval rates,
+                  gauges and buffer hit ratio, totals of every counter over
+                  the run, the run's buffer_hit_ratio and any sampling errors
+        """
+        first = self.samples[0]
+        series = []
+        for previous, sample in zip(self.samples, self.samples[1:]):
+            seconds = sample["time"] - previous["time"]
+            deltas = {name: value - previous["counters"].get(name, value)
+                      for name, value in sample["counters"].items()}
+            series.append({
+                "elapsed_seconds": sample["time"] - first["time"],
+                "rates": {name: delta / seconds if seconds else 0.0 for name, delta in deltas.items()},
+                "gauges": sample["gauges"],
+                "buffer_hit_ratio": _buffer_hit_ratio(self.dialect, deltas)
+            })
+        
+        last = self.samples[-1]
+        totals = {name: value - first["counters"].get(name, value) for name, value in last["counters"].items()}
+        return {
+            "dialect": self.dialect,
+            "interval_seconds": self.interval,
+            "duration_seconds": last["time"] - first["time"],
+            "series": series,
+            "totals": totals,
+            "buffer_hit_ratio": _buffer_hit_ratio(self.dialect, totals),
+            "errors": self.errors
+        }
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
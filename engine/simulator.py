@@ -1,10 +1,50 @@
+import time
+import asyncio
 import logging
+import threading
+from contextlib import contextmanager
 from sqlalchemy import create_engine, text
 import re
+import math
+import hashlib
+
+from db.query_log_analyzer import fingerprint_id
+from db.schema_extractor import detect_database_type
+from engine.workload import is_scan_node
 
 logger = logging.getLogger(__name__)
 
-def run_explain(connection_url, query, analyze=True, buffers=True, verbose=False):
+# Postgres text plan node: "->  Seq Scan on orders o  (cost=0.00..35.50 rows=2550 width=4) (actual time=...)"
+PG_PLAN_NODE_PATTERN = re.compile(
+    r'^(?P<indent>\s*)(?:->\s+)?(?P<label>[A-Za-z][^(]*?)\s+'
+    r'\(cost=(?P<startup>[0-9.]+)\.\.(?P<total>[0-9.]+) rows=(?P<rows>\d+) width=\d+\)'
+    r'(?:\s+\(actual time=[0-9.]+\.\.(?P<actual>[0-9.]+) rows=\d+ loops=(?P<loops>\d+)\))?'
+)
+PG_NODE_TARGET_PATTERN = re.compile(r'^(?P<node_type>.+?)(?: using (?P<index>\S+))?(?: on (?P<relation>\S+)(?: \S+)?)?$')
+
+# Statement timeout applied to every EXPLAIN unless the caller overrides it
+DEFAULT_STATEMENT_TIMEOUT_MS = 30000
+
+# Maximum number of EXPLAIN statements running at once across all threads
+DEFAULT_EXPLAIN_CONCURRENCY = 4
+
+_explain_budget = threading.BoundedSemaphore(DEFAULT_EXPLAIN_CONCURRENCY)
+
+# Pause between attempts of an async task to take a slot of the EXPLAIN budget
+BUDGET_POLL_SECONDS = 0.005
+
+def set_explain_concurrency(limit):
+    """
+    Set the global budget of concurrently running EXPLAIN statements.
+    
+    Args:
+        limit (int): Maximum number of EXPLAIN statements in flight
+    """
+    global _explain_budget
+    _explain_budget = threading.BoundedSemaphore(max(1, int(limit)))
+
+def run_explain(connection_url, query, analyze=True, buffers=True, verbose=False, params=None,
+                timeout_ms=DEFAULT_STATEMENT_TIMEOUT_MS):
     """
     Run EXPLAIN on a query to analyze its performance characteristics.
     
@@ -14,60 +54,189 @@ def run_explain(connection_url, query, analyze=True, buffers=True, verbose=False
         analyze (bool): Whether to run ANALYZE with EXPLAIN (actual execution)
         buffers (bool): Whether to include buffer statistics
         verbose (bool): Whether to get verbose output
+        params (dict, optional): Bind parameter values for a :name style query
+        timeout_ms (int, optional): Statement timeout, None to run unbounded
         
     Returns:
         dict: Parsed EXPLAIN output with performance metrics
     """
     try:
         # Detect database type from connection URL to adapt EXPLAIN syntax
-        db_type = 'unknown'
-        if 'postgresql' in connection_url or 'postgres' in connection_url:
-            db_type = 'postgresql'
-        elif 'mysql' in connection_url:
-            db_type = 'mysql'
-        elif 'sqlite' in connection_url:
-            db_type = 'sqlite'
+        db_type = detect_database_type(connection_url)
         
         engine = create_engine(connection_url)
         
-        # Construct appropriate EXPLAIN command based on database type
-        explain_query = ""
-        if db_type == 'postgresql':
-            options = []
-            if analyze:
-                options.append("ANALYZE")
-            if buffers:
-                options.append("BUFFERS")
-            if verbose:
-                options.append("VERBOSE")
-            
-            options_str = ", ".join(options)
-            explain_query = f"EXPLAIN ({options_str}) {query}"
-        
-        elif db_type == 'mysql':
-            explain_query = f"EXPLAIN{'ANALYZE ' if analyze else ' '}{query}"
-        
-        elif db_type == 'sqlite':
-            explain_query = f"EXPLAIN QUERY PLAN {query}"
+        with _explain_budget:
+            with engine.connect() as conn:
+                return explain_on_connection(conn, db_type, query, analyze=analyze, buffers=buffers,
+                                             verbose=verbose, params=params, timeout_ms=timeout_ms)
+    
+    except Exception as e:
+        logger.error(f"Error running EXPLAIN: {str(e)}")
+        return {"error": str(e)}
+
+def build_explain_query(query, db_type, analyze=True, buffers=True, verbose=False):
+    """
+    Construct the EXPLAIN command appropriate for a database type.
+    
+    Args:
+        query (str): SQL query to analyze
+        db_type (str): Database type (postgresql, mysql, sqlite)
+        analyze (bool): Whether to run ANALYZE with EXPLAIN (actual execution)
+        buffers (bool): Whether to include buffer statistics
+        verbose (bool): Whether to get verbose output
         
-        else:
-            explain_query = f"EXPLAIN {query}"
+    Returns:
+        str: EXPLAIN statement
+    """
+    if db_type == 'postgresql':
+        options = []
+        if analyze:
+            options.append("ANALYZE")
+        if buffers:
+            options.append("BUFFERS")
+        if verbose:
+            options.append("VERBOSE")
         
-        logger.debug(f"Running explain query: {explain_query}")
+        options_str = ", ".join(options)
+        return f"EXPLAIN ({options_str}) {query}" if options else f"EXPLAIN {query}"
+    
+    elif db_type == 'mysql':
+        return f"EXPLAIN{' ANALYZE ' if analyze else ' '}{query}"
+    
+    elif db_type == 'sqlite':
+        return f"EXPLAIN QUERY PLAN {query}"
+    
+    return f"EXPLAIN {query}"
+
+def explain_on_connection(conn, db_type, query, analyze=True, buffers=True, verbose=False, params=None,
+                          timeout_ms=None):
+    """
+    Run EXPLAIN for a query on an already open connection.
+    
+    With a timeout, a statement cancelled by the server is reported as a
+    timed out result instead of raising, so batches keep going.
+    
+    Args:
+        conn: SQLAlchemy connection
+        db_type (str): Database type (postgresql, mysql, sqlite)
+        query (str): SQL query to analyze
+        analyze (bool): Whether to run ANALYZE with EXPLAIN (actual execution)
+        buffers (bool): Whether to include buffer statistics
+        verbose (bool): Whether to get verbose output
+        params (dict, optional): Bind parameter values for a :name style query
+        timeout_ms (int, optional): Statement timeout, None to run unbounded
         
-        # Execute the EXPLAIN query
-        with engine.connect() as conn:
-            result = conn.execute(text(explain_query))
+    Returns:
+        dict: Parsed EXPLAIN output with performance metrics
+    """
+    explain_query = build_explain_query(query, db_type, analyze=analyze, buffers=buffers, verbose=verbose)
+    logger.debug(f"Running explain query: {explain_query}")
+    
+    try:
+        with statement_timeout(conn, db_type, timeout_ms):
+            result = conn.execute(text(explain_query), params or {})
             explain_output = result.fetchall()
+    except Exception as e:
+        if timeout_ms and is_timeout_error(e, db_type):
+            logger.warning(f"EXPLAIN timed out after {timeout_ms}ms")
+            return timed_out_result(timeout_ms)
+        raise
+    
+    # Parse the results based on database type
+    return parse_explain_output(explain_output, db_type)
+
+@contextmanager
+def statement_timeout(conn, db_type, timeout_ms):
+    """
+    Bound the statements run inside the block by a per-dialect timeout.
+    
+    PostgreSQL uses SET LOCAL statement_timeout inside a transaction (or a
+    savepoint when one is already open) that is always rolled back, which
+    also discards any side effects of EXPLAIN ANALYZE. MySQL uses the
+    session MAX_EXECUTION_TIME and SQLite a progress handler that interrupts
+    the statement once the deadline passes.
+    
+    Args:
+        conn: SQLAlchemy connection
+        db_type (str): Database type (postgresql, mysql, sqlite)
+        timeout_ms (int): Timeout in milliseconds, None or 0 for no limit
+    """
+    if not timeout_ms:
+        yield
+        return
+    
+    timeout_ms = int(timeout_ms)
+    
+    if db_type == 'postgresql':
+        trans = conn.begin_nested() if conn.in_transaction() else conn.begin()
+        try:
+            conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            yield
+        finally:
+            trans.rollback()
+    
+    elif db_type == 'mysql':
+        conn.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {timeout_ms}"))
+        try:
+            yield
+        finally:
+            conn.execute(text("SET SESSION MAX_EXECUTION_TIME = DEFAULT"))
+    
+    elif db_type == 'sqlite':
+        dbapi_conn = conn.connection.dbapi_connection if hasattr(conn.connection, "dbapi_connection") \
+            else conn.connection.connection
+        deadline = time.perf_counter() + timeout_ms / 1000
+        dbapi_conn.set_progress_handler(lambda: int(time.perf_counter() > deadline), 1000)
+        try:
+            yield
+        finally:
+            dbapi_conn.set_progress_handler(None, 0)
+    
+    else:
+        yield
+
+def is_timeout_error(error, db_type):
+    """
+    Whether an exception was raised because a statement timeout fired.
+    
+    Args:
+        error (Exception): Exception raised by the driver or SQLAlchemy
+        db_type (str): Database type (postgresql, mysql, sqlite)
         
-        # Parse the results based on database type
-        parsed_result = parse_explain_output(explain_output, db_type)
-        
-        return parsed_result
+    Returns:
+        bool: True for statement timeouts
+    """
+    orig = getattr(error, "orig", error)
+    message = str(error).lower()
     
-    except Exception as e:
-        logger.error(f"Error running EXPLAIN: {str(e)}")
-        return {"error": str(e)}
+    if db_type == 'postgresql':
+        return getattr(orig, "pgcode", None) == '57014' or "statement timeout" in message
+    if db_type == 'mysql':
+        return (getattr(orig, "args", [None]) or [None])[0] == 3024 or "max_execution_time" in message \
+            or "maximum statement execution time exceeded" in message
+    if db_type == 'sqlite':
+        return "interrupted" in message
+    return isinstance(error, asyncio.TimeoutError)
+
+def timed_out_result(timeout_ms):
+    """
+    Parsed EXPLAIN result for a statement cancelled by its timeout.
+    
+    Args:
+        timeout_ms (int): Timeout that was exceeded
+        
+    Returns:
+        dict: Empty plan flagged as timed out
+    """
+    return {
+        "steps": [],
+        "metrics": {},
+        "nodes": [],
+        "raw_output": [],
+        "timed_out": True,
+        "timeout_ms": timeout_ms
+    }
 
 def parse_explain_output(explain_output, db_type):
     """
@@ -117,10 +286,16 @@ def parse_explain_output(explain_output, db_type):
         merge_joins = len(re.findall(r'Merge Join', full_text))
         if merge_joins > 0:
             result["metrics"]["merge_joins"] = merge_joins
+        
+        # Build the plan node list used for cost attribution
+        result["nodes"] = parse_postgres_plan_nodes(full_text)
+        if result["nodes"]:
+            result["metrics"]["total_cost"] = result["nodes"][0]["total_cost"]
     
     elif db_type == 'mysql':
         # Parse MySQL EXPLAIN output
-        result["steps"] = [dict(row) for row in explain_output]
+        result["steps"] = [dict(row._mapping) if hasattr(row, "_mapping") else dict(row)
+                           for row in explain_output]
         
         # Look for full table scans
         full_scans = [row for row in result["steps"] if row.get("type") == "ALL"]
@@ -131,6 +306,14 @@ def parse_explain_output(explain_output, db_type):
         index_usage = [row for row in result["steps"] if "index" in str(row.get("type")).lower()]
         if index_usage:
             result["metrics"]["index_usage"] = len(index_usage)
+        
+        # MySQL has no per-node cost in tabular EXPLAIN, so examined rows stand in for it
+        result["nodes"] = [{
+            "node_type": f"{row.get('select_type', 'SIMPLE')} {row.get('type') or 'NULL'}",
+            "relation": row.get("table"),
+            "index": row.get("key"),
+            "self_cost": float(row.get("rows") or 0)
+        } for row in result["steps"]]
     
     elif db_type == 'sqlite':
         # Parse SQLite EXPLAIN output
@@ -143,13 +326,94 @@ def parse_explain_output(explain_output, db_type):
         # Look for search operations
         searches = [row["detail"] for row in result["steps"] if "SEARCH" in row["detail"]]
         result["metrics"]["search_operations"] = len(searches)
+        
+        result["nodes"] = [parse_sqlite_plan_node(row["detail"]) for row in result["steps"]]
     
     # Add original explain output
     result["raw_output"] = explain_output
     
     return result
 
-def simulate_performance(connection_url, queries, schema=None):
+def parse_postgres_plan_nodes(plan_text):
+    """
+    Parse a Postgres text-format plan into a flat list of nodes.
+    
+    Each node carries its inclusive cost and its self cost (inclusive cost
+    minus the inclusive cost of its direct children), so that the cost of a
+    plan can be attributed to individual node types and relations.
+    
+    Args:
+        plan_text (str): EXPLAIN output joined into a single string
+        
+    Returns:
+        list: Plan nodes in plan order, root first
+    """
+    nodes = []
+    stack = []  # (depth, node) of open ancestors
+    
+    for line in plan_text.splitlines():
+        match = PG_PLAN_NODE_PATTERN.match(line)
+        if not match:
+            continue
+        
+        target = PG_NODE_TARGET_PATTERN.match(match.group('label').strip())
+        node_type = target.group('node_type') if target else match.group('label').strip()
+        relation = target.group('relation') if target else None
+        index = target.group('index') if target else None
+        if node_type == "Bitmap Index Scan":
+            relation, index = None, relation
+        
+        depth = len(match.group('indent'))
+        node = {
+            "node_type": node_type,
+            "relation": relation,
+            "index": index,
+            "depth": depth,
+            "startup_cost": float(match.group('startup')),
+            "total_cost": float(match.group('total')),
+            "plan_rows": int(match.group('rows')),
+            "self_cost": float(match.group('total'))
+        }
+        if match.group('actual'):
+            node["actual_total_ms"] = float(match.group('actual')) * int(match.group('loops'))
+        
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        if stack:
+            parent = stack[-1][1]
+            parent["self_cost"] = max(0.0, parent["self_cost"] - node["total_cost"])
+        
+        stack.append((depth, node))
+        nodes.append(node)
+    
+    return nodes
+
+def parse_sqlite_plan_node(detail):
+    """
+    Turn a SQLite EXPLAIN QUERY PLAN detail string into a plan node.
+    
+    Args:
+        detail (str): Detail column, e.g. "SEARCH orders USING INDEX idx (id=?)"
+        
+    Returns:
+        dict: Plan node with node_type, relation and index
+    """
+    words = detail.split()
+    node_type = words[0] if words else detail
+    relation = None
+    index = None
+    
+    if node_type in ("SCAN", "SEARCH") and len(words) > 1:
+        relation = words[2] if words[1] == "TABLE" and len(words) > 2 else words[1]
+        index_match = re.search(r'USING (?:COVERING |INTEGER PRIMARY KEY)?(?:INDEX )?(\S+)?', detail)
+        if index_match:
+            index = index_match.group(1) or "PRIMARY KEY"
+    elif node_type == "USE":
+        node_type = detail
+    
+    return {"node_type": node_type, "relation": relation, "index": index, "self_cost": 1.0}
+
+def simulate_performance(connection_url, queries, schema=None, timeout_ms=DEFAULT_STATEMENT_TIMEOUT_MS):
     """
     Simulate performance for a set of queries.
     
@@ -157,6 +421,7 @@ def simulate_performance(connection_url, queries, schema=None):
         connection_url (str): SQLAlchemy connection URL
         queries (list): List of query strings to analyze
         schema (dict, optional): Schema information for context
+        timeout_ms (int, optional): Statement timeout for each EXPLAIN
         
     Returns:
         dict: Performance analysis for each query
@@ -167,15 +432,18 @@ def simulate_performance(connection_url, queries, schema=None):
         query_key = f"query_{i+1}"
         try:
             # Run explain on the query
-            explain_result = run_explain(connection_url, query)
+            explain_result = run_explain(connection_url, query, timeout_ms=timeout_ms)
             
             # Add basic performance score
             performance_score = calculate_performance_score(explain_result)
             
             results[query_key] = {
                 "query": query,
+                "fingerprint_id": fingerprint_id(query),
                 "explain_result": explain_result,
-                "performance_score": performance_score
+                "performance_score": performance_score,
+                "plan_summary": summarize_plan(explain_result),
+                "timed_out": bool(explain_result.get("timed_out"))
             }
             
         except Exception as e:
@@ -187,6 +455,398 @@ def simulate_performance(connection_url, queries, schema=None):
     
     return results
 
+# Async driver used for each dialect by simulate_performance_async
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+def to_async_url(connection_url):
+    """
+    Rewrite a connection URL to use the asyncio driver of its dialect.
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL
+        
+    Returns:
+        str: Connection URL for create_async_engine
+    """
+    db_type = detect_database_type(connection_url)
+    scheme, sep, rest = connection_url.partition('://')
+    if db_type not in ASYNC_DRIVERS or scheme in ASYNC_DRIVERS.values():
+        return connection_url
+    return f"{ASYNC_DRIVERS[db_type]}{sep}{rest}"
+
+async def simulate_performance_async(connection_url, queries, schema=None, concurrency=8, connections=4,
+                                     timeout_ms=DEFAULT_STATEMENT_TIMEOUT_MS):
+    """
+    Simulate performance for a set of queries using asyncio.
+    
+    EXPLAIN requests are pipelined over a small connection pool, with a
+    semaphore bounding how many are in flight at once. Every request also
+    holds a slot of the global EXPLAIN budget shared with the threaded
+    paths. Requires the async driver for the dialect (asyncpg, aiomysql or
+    aiosqlite).
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL
+        queries (list): List of query strings to analyze
+        schema (dict, optional): Schema information for context
+        concurrency (int): Maximum EXPLAIN requests in flight
+        connections (int): Connection pool size
+        timeout_ms (int, optional): Statement timeout for each EXPLAIN
+        
+    Returns:
+        dict: Performance analysis for each query, as simulate_performance
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+    
+    db_type = detect_database_type(connection_url)
+    async_url = to_async_url(connection_url)
+    engine_options = {} if db_type == 'sqlite' else {"pool_size": connections, "max_overflow": 0}
+    engine = create_async_engine(async_url, **engine_options)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def _explain(conn, query):
+        explain_query = build_explain_query(query, db_type)
+        trans = await conn.begin()
+        try:
+            if timeout_ms and db_type == 'postgresql':
+                await conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+            elif timeout_ms and db_type == 'mysql':
+                await conn.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout_ms)}"))
+            result = await conn.execute(text(explain_query))
+            return parse_explain_output(result.fetchall(), db_type)
+        finally:
+            await trans.rollback()
+            if timeout_ms and db_type == 'mysql':
+                await conn.execute(text("SET SESSION MAX_EXECUTION_TIME = DEFAULT"))
+    
+    async def _simulate(query):
+        async with semaphore:
+            # The budget is a threading semaphore. Poll it rather than block a worker thread on it: a
+            # task cancelled while waiting then holds no slot, and nothing takes one after it is gone
+            budget = _explain_budget
+            while not budget.acquire(blocking=False):
+                await asyncio.sleep(BUDGET_POLL_SECONDS)
+            try:
+                async with engine.connect() as conn:
+                    # The client-side deadline also covers drivers without a server-side timeout
+                    deadline = timeout_ms / 1000 * 1.1 if timeout_ms else None
+                    explain_result = await asyncio.wait_for(_explain(conn, query), deadline)
+            except Exception as e:
+                if timeout_ms and (is_timeout_error(e, db_type) or isinstance(e, asyncio.TimeoutError)):
+                    logger.warning(f"EXPLAIN timed out after {timeout_ms}ms")
+                    explain_result = timed_out_result(timeout_ms)
+                else:
+                    logger.error(f"Error running EXPLAIN: {str(e)}")
+                    explain_result = {"error": str(e)}
+            finally:
+                budget.release()
+        
+        return {
+            "query": query,
+            "fingerprint_id": fingerprint_id(query),
+            "explain_result": explain_result,
+            "performance_score": calculate_performance_score(explain_result),
+            "plan_summary": summarize_plan(explain_result),
+            "timed_out": bool(explain_result.get("timed_out"))
+        }
+    
+    try:
+        simulated = await asyncio.gather(*[_simulate(query) for query in queries])
+    finally:
+        await engine.dispose()
+    
+    return {f"query_{i+1}": result for i, result in enumerate(simulated)}
+
+def plan_shape_hash(explain_result):
+    """
+    Hash the shape of a plan: node types, relations and indexes in plan
+    order, ignoring costs and row estimates.
+    
+    Args:
+        explain_result (dict): Parsed EXPLAIN output
+        
+    Returns:
+        str: 16 character hex digest, or None when the plan has no nodes
+    """
+    nodes = explain_result.get("nodes") or []
+    if not nodes:
+        return None
+    
+    shape = "|".join(
+        f"{node.get('depth', 0)}:{node['node_type']}:{node.get('relation') or ''}:{node.get('index') or ''}"
+        for node in nodes
+    )
+    return hashlib.md5(shape.encode('utf-8')).hexdigest()[:16]
+
+def plan_cost(explain_result):
+    """
+    Single comparable cost for a plan: actual time when available, then
+    planner total cost, then the summed self cost of the plan nodes.
+    
+    Args:
+        explain_result (dict): Parsed EXPLAIN output
+        
+    Returns:
+        float: Plan cost
+    """
+    metrics = explain_result.get("metrics", {})
+    if "execution_time_ms" in metrics:
+        return metrics["execution_time_ms"]
+    if "total_cost" in metrics:
+        return metrics["total_cost"]
+    return sum(node.get("self_cost", 0) for node in explain_result.get("nodes", []))
+
+def summarize_plan(explain_result):
+    """
+    Reduce a plan to what is compared across schema snapshots: its shape
+    hash, its cost and which relations are scanned in full or via an index.
+    
+    Args:
+        explain_result (dict): Parsed EXPLAIN output
+        
+    Returns:
+        dict: Plan summary, or None when EXPLAIN failed
+    """
+    if not explain_result or "error" in explain_result or explain_result.get("timed_out"):
+        return None
+    
+    nodes = explain_result.get("nodes", [])
+    return {
+        "plan_hash": plan_shape_hash(explain_result),
+        "cost": plan_cost(explain_result),
+        "scanned_relations": sorted({n["relation"] for n in nodes
+                                     if n.get("relation") and is_scan_node(n["node_type"]) and not n.get("index")}),
+        "indexed_relations": sorted({n["relation"] for n in nodes
+                                     if n.get("relation") and (n.get("index") or n["node_type"] == "Bitmap Heap Scan")})
+    }
+
+def detect_plan_regressions(before_plans, after_plans, cost_threshold=1.5):
+    """
+    Compare plan fingerprints of the same queries between two snapshots.
+    
+    A query is flagged when a relation it used to reach through an index is
+    now scanned in full, or when its cost grew by more than cost_threshold.
+    
+    Args:
+        before_plans (dict): Query fingerprint -> plan summary (baseline)
+        after_plans (dict): Query fingerprint -> plan summary (candidate)
+        cost_threshold (float): Cost ratio above which a change is a regression
+        
+    Returns:
+        list: Changed plans, regressions first, then by cost ratio
+    """
+    changes = []
+    
+    for fp_id, after in after_plans.items():
+        before = before_plans.get(fp_id)
+        if not before or (before.get("plan_hash") == after.get("plan_hash") and
+                          before.get("cost") == after.get("cost")):
+            continue
+        
+        flipped = sorted(set(before.get("indexed_relations", [])) & set(after.get("scanned_relations", [])))
+        before_cost = before.get("cost") or 0
+        after_cost = after.get("cost") or 0
+        cost_ratio = after_cost / before_cost if before_cost else (float('inf') if after_cost else 1.0)
+        
+        reasons = []
+        if flipped:
+            reasons.append(f"index to seq scan on {', '.join(flipped)}")
+        if cost_ratio > cost_threshold:
+            reasons.append(f"cost x{cost_ratio:.1f}")
+        
+        changes.append({
+            "query_fingerprint": fp_id,
+            "query": after.get("query") or before.get("query"),
+            "before_hash": before.get("plan_hash"),
+            "after_hash": after.get("plan_hash"),
+            "before_cost": before_cost,
+            "after_cost": after_cost,
+            "cost_ratio": cost_ratio,
+            "index_to_seq_scan": flipped,
+            "plan_changed": before.get("plan_hash") != after.get("plan_hash"),
+            "regression": bool(reasons),
+            "reasons": reasons
+        })
+    
+    changes.sort(key=lambda x: (x["regression"], x["cost_ratio"]), reverse=True)
+    return changes
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def simulate_parameterized(connection_url, fingerprints, sample_size=10, analyze=False,
+                           timeout_ms=DEFAULT_STATEMENT_TIMEOUT_MS):
+    """
+    Replay each fingerprint as a prepared statement over a sample of the
+    parameter values seen in the query log.
+    
+    On PostgreSQL the statement is PREPAREd once and every sample is explained
+    through EXPLAIN EXECUTE with custom plans forced, followed by the generic
+    plan the server would switch to after repeated executions. Other databases bind the sampled
+    values to the parameterized query. Each fingerprint's replay holds one
+    slot of the global EXPLAIN budget.
+    
+    Args:
+        connection_url (str): SQLAlchemy connection URL
+        fingerprints (dict): Fingerprints from parse_query_logs
+        sample_size (int): Maximum parameter sets replayed per fingerprint
+        analyze (bool): Whether to execute the statement for actual timings
+        timeout_ms (int, optional): Statement timeout for each EXPLAIN
+        
+    Returns:
+        dict: Per-fingerprint plan variance and cost percentiles
+    """
+    db_type = detect_database_type(connection_url)
+    engine = create_engine(connection_url)
+    results = {}
+    
+    with engine.connect() as conn:
+        for fp_id, fp in fingerprints.items():
+            samples = fp.get("parameter_samples", [])[:sample_size]
+            if fp.get("type") not in ("select", "with") or not samples:
+                continue
+            
+            try:
+                with _explain_budget:
+                    if db_type == 'postgresql':
+                        replay = _replay_prepared_postgres(conn, fp_id, fp["template"], samples, analyze,
+                                                           timeout_ms)
+                    else:
+                        replay = {"custom": [
+                            explain_on_connection(conn, db_type, fp["template"], analyze=analyze, buffers=False,
+                                                  params={f"p{i + 1}": v for i, v in enumerate(values)},
+                                                  timeout_ms=timeout_ms)
+                            for values in samples
+                        ]}
+            except Exception as e:
+                logger.error(f"Error replaying fingerprint {fp_id}: {str(e)}")
+                conn.rollback()
+                results[fp_id] = {"fingerprint": fp.get("fingerprint"), "error": str(e)}
+                continue
+            
+            timed_out = sum(1 for r in replay["custom"] if r.get("timed_out"))
+            completed = [r for r in replay["custom"] if not r.get("timed_out")]
+            if not completed:
+                results[fp_id] = {"fingerprint": fp.get("fingerprint"), "samples": 0, "timed_out": timed_out}
+                continue
+            
+            costs = [plan_cost(r) for r in completed]
+            shapes = {}
+            for r in completed:
+                shape = plan_shape_hash(r)
+                shapes[shape] = shapes.get(shape, 0) + 1
+            
+            p50 = _percentile(costs, 50)
+            p95 = _percentile(costs, 95)
+            result = {
+                "fingerprint": fp.get("fingerprint"),
+                "samples": len(costs),
+                "p50_cost": p50,
+                "p95_cost": p95,
+                "min_cost": min(costs),
+                "max_cost": max(costs),
+                "cost_spread": p95 / p50 if p50 else 0,
+                "plan_shapes": shapes,
+                "plan_variance": len(shapes) > 1,
+                "timed_out": timed_out
+            }
+            if "custom_plans_forced" in replay:
+                result["custom_plans_forced"] = replay["custom_plans_forced"]
+            
+            generic = replay.get("generic")
+            if generic and "error" not in generic and not generic.get("timed_out"):
+                generic_cost = plan_cost(generic)
+                result["generic_plan_cost"] = generic_cost
+                result["generic_plan_shape"] = plan_shape_hash(generic)
+                # A generic plan noticeably worse than most custom plans will
+                # hurt once the server stops re-planning per execution
+                result["generic_plan_regression"] = bool(p95) and generic_cost > p95 * 1.5
+            
+            results[fp_id] = result
+    
+    logger.info(f"Replayed {len(results)} fingerprints with sampled parameters")
+    return results
+
+def _replay_prepared_postgres(conn, fp_id, template, samples, analyze, timeout_ms=None):
+    """
+    Explain every parameter sample through a server-side prepared statement.
+    
+    Args:
+        conn: SQLAlchemy connection
+        fp_id (str): Fingerprint identifier, used to name the statement
+        template (str): Query with :p1..:pN placeholders
+        samples (list): Parameter value lists
+        analyze (bool): Whether to execute the statement for actual timings
+        timeout_ms (int, optional): Statement timeout for each EXPLAIN
+        
+    Returns:
+        dict: 'custom' plans per sample, whether they were forced to be
+              custom plans, and the forced 'generic' plan
+    """
+    statement_name = f"denode_fp_{fp_id}"
+    param_count = len(samples[0])
+    prepared_sql = re.sub(r':p(\d+)\b', r'$\1', template)
+    execute_args = ", ".join(f":p{i + 1}" for i in range(param_count))
+    execute_sql = f"EXECUTE {statement_name}({execute_args})"
+    
+    replay = {"custom": []}
+    conn.execute(text(f"PREPARE {statement_name} AS {prepared_sql}"))
+    try:
+        # Re-plan every sample for its own values: after five executions the
+        # server may switch to the generic plan and hide the very flip we
+        # are looking for
+        replay["custom_plans_forced"] = _set_plan_cache_mode(conn, "force_custom_plan")
+        for values in samples:
+            params = {f"p{i + 1}": v for i, v in enumerate(values)}
+            replay["custom"].append(
+                explain_on_connection(conn, 'postgresql', execute_sql, analyze=analyze, buffers=False,
+                                      params=params, timeout_ms=timeout_ms)
+            )
+        
+        # plan_cache_mode exists from PostgreSQL 12 onwards
+        if replay["custom_plans_forced"] and _set_plan_cache_mode(conn, "force_generic_plan"):
+            try:
+                params = {f"p{i + 1}": v for i, v in enumerate(samples[0])}
+                replay["generic"] = explain_on_connection(conn, 'postgresql', execute_sql, analyze=False,
+                                                          buffers=False, params=params, timeout_ms=timeout_ms)
+            except Exception as e:
+                logger.debug(f"Generic plan unavailable for {fp_id}: {str(e)}")
+                conn.rollback()
+    except Exception:
+        # The failed statement aborted the transaction; roll it back so the
+        # cleanup below can run and the original error propagates
+        conn.rollback()
+        raise
+    finally:
+        try:
+            conn.execute(text(f"DEALLOCATE {statement_name}"))
+            if replay.get("custom_plans_forced"):
+                conn.execute(text("RESET plan_cache_mode"))
+        except Exception as e:
+            logger.warning(f"Cleanup of prepared statement {statement_name} failed: {str(e)}")
+            conn.rollback()
+    
+    return replay
+
+def _set_plan_cache_mode(conn, mode):
+    """SET plan_cache_mode, or roll back and return False on servers before PostgreSQL 12"""
+    try:
+        conn.execute(text(f"SET plan_cache_mode = {mode}"))
+        return True
+    except Exception as e:
+        logger.debug(f"plan_cache_mode unavailable: {str(e)}")
+        conn.rollback()
+        return False
+
 def calculate_performance_score(explain_result):
     """
     Calculate a simple performance score based on EXPLAIN results.
@@ -198,6 +858,10 @@ def calculate_performance_score(explain_result):
     Returns:
         float: Performance score
     """
+    # A query that hit its statement timeout is as bad as it gets
+    if explain_result.get("timed_out"):
+        return 100
+    
     score = 50  # Start with a baseline score
     
     metrics = explain_result.get("metrics", {})
@@ -209,10 +873,10 @@ def calculate_performance_score(explain_result):
             score -= 20
         elif exec_time < 50:
             score -= 10
-        elif exec_time > 500:
-            score += 30
         elif exec_time > 1000:
             score += 50
+        elif exec_time > 500:
+            score += 30
     
     # Penalize sequential scans
     if "sequential_scans" in metrics:
@@ -0,0 +1,216 @@
+import logging
+from collections import defaultdict
+
+from db.query_log_analyzer import fingerprint_id, extract_query_structure
+
+logger = logging.getLogger(__name__)
+
+# Plan node types that read a whole relation (MySQL nodes end in access type "ALL")
+SCAN_NODE_TYPES = {"Seq Scan", "Parallel Seq Scan", "SCAN"}
+
+# Plan node types that combine relations
+JOIN_NODE_TYPES = {"Hash Join", "Merge Join", "Nested Loop", "Hash"}
+
+def is_scan_node(node_type):
+    """Whether a plan node type reads its whole relation"""
+    return node_type in SCAN_NODE_TYPES or node_type.endswith(" ALL")
+
+def is_join_node(node_type):
+    """Whether a plan node type combines relations"""
+    return node_type in JOIN_NODE_TYPES
+
+def resolve_relation(relation, aliases):
+    """
+    Table a plan node reads. SQLite and MySQL plans name a relation by its
+    alias in the query ("SCAN o"), Postgres by the table itself.
+    
+    Args:
+        relation (str): Relation of a plan node
+        aliases (dict): Lower-cased alias or table name -> table, from extract_query_structure
+    
+    Returns:
+        str: Table name, or the relation unchanged when it is not an alias
+    """
+    if not relation:
+        return relation
+    return aliases.get(relation.lower(), relation)
+
+def build_workload_cost_model(query_analysis, performance_data):
+    """
+    Weight the cost of every simulated query by how often its fingerprint
+    appears in the query log, and aggregate it per table and per plan node.
+    
+    The unit cost of a fingerprint is its measured execution time when
+    EXPLAIN ANALYZE produced one, otherwise the average duration recorded in
+    the log. When any simulated fingerprint has no time at all, the whole
+    model falls back to planner cost units so totals stay comparable; a
+    statement that timed out then costs as much as the costliest one that
+    finished.
+    
+    Args:
+        query_analysis (dict): Query analysis from parse_query_logs
+        performance_data (dict): Results from simulate_performance
+    
+    Returns:
+        dict: Ranked cost breakdown by fingerprint, table and node type
+    """
+    fingerprints = query_analysis.get("fingerprints", {})
+    entries = []
+    
+    for query_key, perf_data in (performance_data or {}).items():
+        explain_result = perf_data.get("explain_result")
+        if not explain_result or "error" in explain_result:
+            continue
+        
+        fp_id = perf_data.get("fingerprint_id") or fingerprint_id(perf_data.get("query", ""))
+        fp_info = fingerprints.get(fp_id, {})
+        metrics = explain_result.get("metrics", {})
+        
+        # A timed out statement took at least as long as its timeout
+        unit_time_ms = metrics.get("execution_time_ms")
+        if explain_result.get("timed_out"):
+            unit_time_ms = explain_result["timeout_ms"]
+        if unit_time_ms is None and fp_info.get("timed_count"):
+            unit_time_ms = fp_info["total_duration_ms"] / fp_info["timed_count"]
+        
+        # Plan nodes may name relations by alias; charge their cost to the table
+        structure = fp_info.get("structure")
+        if not structure or "aliases" not in structure:
+            structure = extract_query_structure(fp_info.get("example") or perf_data.get("query", ""))
+        nodes = [dict(node, relation=resolve_relation(node.get("relation"), structure["aliases"]))
+                 for node in explain_result.get("nodes", [])]
+        unit_cost = metrics.get("total_cost")
+        if unit_cost is None:
+            unit_cost = sum(node.get("self_cost", 0) for node in nodes)
+        
+        entries.append({
+            "query_key": query_key,
+            "fingerprint_id": fp_id,
+            "fingerprint": fp_info.get("fingerprint", perf_data.get("query", "")),
+            "count": fp_info.get("count", 1),
+            "tables": fp_info.get("tables", []),
+            "unit_time_ms": unit_time_ms,
+            "unit_cost": unit_cost,
+            "timed_out": bool(explain_result.get("timed_out")),
+            "nodes": nodes
+        })
+    
+    basis = "time_ms" if entries and all(e["unit_time_ms"] is not None for e in entries) else "cost"
+    
+    # A timed out statement has no plan to cost, but it was at least as
+    # expensive as the costliest statement that finished
+    if basis == "cost":
+        floor = max((e["unit_cost"] or 0 for e in entries if not e["timed_out"]), default=0)
+        for entry in entries:
+            if entry["timed_out"]:
+                entry["unit_cost"] = max(entry["unit_cost"] or 0, floor)
+    
+    by_table = defaultdict(float)
+    by_node_type = defaultdict(float)
+    by_table_node = defaultdict(lambda: defaultdict(float))
+    table_fingerprints = defaultdict(set)
+    ranked_fingerprints = []
+    
+    for entry in entries:
+        unit = entry["unit_time_ms"] if basis == "time_ms" else entry["unit_cost"]
+        total = entry["count"] * (unit or 0)
+        ranked_fingerprints.append({
+            "fingerprint_id": entry["fingerprint_id"],
+            "fingerprint": entry["fingerprint"],
+            "count": entry["count"],
+            "unit": unit,
+            "total": total,
+            "tables": entry["tables"],
+            "timed_out": entry["timed_out"]
+        })
+        
+        # Attribute the fingerprint total to plan nodes by their share of self cost
+        node_cost = sum(node.get("self_cost", 0) for node in entry["nodes"])
+        if not entry["nodes"] or node_cost <= 0:
+            for table in entry["tables"]:
+                share = total / len(entry["tables"])
+                by_table[table] += share
+                by_table_node[table]["unattributed"] += share
+                table_fingerprints[table].add(entry["fingerprint_id"])
+            by_node_type["unattributed"] += total
+            continue
+        
+        for node in entry["nodes"]:
+            share = total * node.get("self_cost", 0) / node_cost
+            if share <= 0:
+                continue
+            by_node_type[node["node_type"]] += share
+            
+            # Join/sort/aggregate nodes belong to every table the query touches
+            node_tables = [node["relation"]] if node.get("relation") else entry["tables"]
+            for table in node_tables:
+                by_table[table] += share / len(node_tables)
+                by_table_node[table][node["node_type"]] += share / len(node_tables)
+                table_fingerprints[table].add(entry["fingerprint_id"])
+    
+    grand_total = sum(f["total"] for f in ranked_fingerprints)
+    
+    def _share(value):
+        return value / grand_total * 100 if grand_total else 0
+    
+    for fp in ranked_fingerprints:
+        fp["share"] = _share(fp["total"])
+    ranked_fingerprints.sort(key=lambda x: x["total"], reverse=True)
+    
+    model = {
+        "basis": basis,
+        "total": grand_total,
+        "fingerprints": ranked_fingerprints,
+        "by_table": sorted([
+            {
+                "table": table,
+                "total": total,
+                "share": _share(total),
+                "fingerprints": len(table_fingerprints[table]),
+                "node_types": dict(by_table_node[table])
+            }
+            for table, total in by_table.items()
+        ], key=lambda x: x["total"], reverse=True),
+        "by_node_type": sorted([
+            {"node_type": node_type, "total": total, "share": _share(total)}
+            for node_type, total in by_node_type.items()
+        ], key=lambda x: x["total"], reverse=True)
+    }
+    
+    logger.info(f"Built workload cost model over {len(entries)} fingerprints ({basis})")
+    return model
+
+def estimate_savings(recommendation, workload_model):
+    """
+    Estimate how much workload cost a recommendation would remove.
+    
+    Savings are a fixed fraction of the cost attributed to the plan nodes the
+    action targets: scans for INDEX and PARTITION, joins for DENORMALIZE.
+    MATERIALIZE removes most of the cost of the fingerprint it precomputes.
+    
+    Args:
+        recommendation (dict): Recommendation from recommend_changes
+        workload_model (dict): Model from build_workload_cost_model
+    
+    Returns:
+        float: Estimated saving in the model's basis unit
+    """
+    tables = {entry["table"]: entry for entry in workload_model.get("by_table", [])}
+    action = recommendation.get("action")
+    
+    def _node_cost(table, predicate):
+        node_costs = tables.get(table, {}).get("node_types", {})
+        return sum(cost for node_type, cost in node_costs.items() if predicate(node_type))
+    
+    table = recommendation.get("table")
+    if action == "INDEX":
+        return 0.9 * _node_cost(table, is_scan_node)
+    if action == "PARTITION":
+        return 0.5 * _node_cost(table, is_scan_node)
+    if action == "DENORMALIZE":
+        join_tables = [table] + recommendation.get("related_tables", [])
+        return 0.5 * sum(_node_cost(t, is_join_node) for t in join_tables)
+    if action == "MATERIALIZE":
+        return 0.9 * sum(fp["total"] for fp in workload_model.get("fingerprints", [])
+                         if fp["fingerprint_id"] == recommendation.get("fingerprint_id"))
+    return 0.0
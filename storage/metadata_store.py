@@ -12,6 +12,16 @@ class MetadataStore:
     Provides both JSON file and SQLite database storage options.
     """
     
+    # Payload column of each snapshot table
+    DATA_COLUMNS = {
+        "schema_snapshots": "schema_snapshot_data",
+        "query_analysis": "analysis_data",
+        "recommendations": "recommendations",
+        "performance_data": "performance_data",
+        "measurements": "measurement_data",
+        "database_info": "info_data"
+    }
+    
     def __init__(self, base_path="./metadata", use_sqlite=True):
         """
         Initialize the metadata store.
@@ -64,6 +74,82 @@ class MetadataStore:
         )
         ''')
         
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS performance_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            db_name TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            performance_data TEXT NOT NULL
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS measurements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            db_name TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            measurement_data TEXT NOT NULL
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS database_info (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            db_name TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            info_data TEXT NOT NULL
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan_fingerprints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            db_name TEXT NOT NULL,
+            snapshot_id TEXT,
+            timestamp TEXT NOT NULL,
+            query_fingerprint TEXT NOT NULL,
+            plan_hash TEXT,
+            plan_data TEXT NOT NULL
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_plan_fingerprints_snapshot
+        ON plan_fingerprints (db_name, snapshot_id)
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan_executions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            db_name TEXT NOT NULL,
+            run_id TEXT NOT NULL,
+            step_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            step_data TEXT NOT NULL
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_plan_executions_run
+        ON plan_executions (db_name, run_id)
+        ''')
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS benchmark_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            db_name TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            label TEXT,
+            run_data TEXT NOT NULL
+        )
+        ''')
+        
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_benchmark_runs_label
+        ON benchmark_runs (db_name, label)
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -133,6 +219,72 @@ class MetadataStore:
             logger.error(f"Error saving recommendations: {str(e)}")
             return False
     
+    def save_performance_data(self, performance_data, db_name="default"):
+        """
+        Save query simulation results.
+        
+        Args:
+            performance_data (dict): Results from simulate_performance
+            db_name (str): Identifier for the database
+            
+        Returns:
+            bool: Success flag
+        """
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            if self.use_sqlite:
+                return self._save_to_sqlite("performance_data", db_name, timestamp, performance_data)
+            else:
+                return self._save_to_json(performance_data, db_name, "performance_data", timestamp)
+        except Exception as e:
+            logger.error(f"Error saving performance data: {str(e)}")
+            return False
+    
+    def save_measurements(self, measurements, db_name="default"):
+        """
+        Save measured before/after effects of recommendations.
+        
+        Args:
+            measurements (list): Measurements from measure_recommendations
+            db_name (str): Identifier for the database
+            
+        Returns:
+            bool: Success flag
+        """
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            if self.use_sqlite:
+                return self._save_to_sqlite("measurements", db_name, timestamp, measurements)
+            else:
+                return self._save_to_json(measurements, db_name, "measurements", timestamp)
+        except Exception as e:
+            logger.error(f"Error saving measurements: {str(e)}")
+            return False
+    
+    def save_database_info(self, info, db_name="default"):
+        """
+        Save facts about the source database, such as its type.
+        
+        Args:
+            info (dict): Database facts, e.g. {"db_type": "postgresql"}
+            db_name (str): Identifier for the database
+            
+        Returns:
+            bool: Success flag
+        """
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            if self.use_sqlite:
+                return self._save_to_sqlite("database_info", db_name, timestamp, info)
+            else:
+                return self._save_to_json(info, db_name, "database_info", timestamp)
+        except Exception as e:
+            logger.error(f"Error saving database info: {str(e)}")
+            return False
+    
     def _save_to_json(self, data, db_name, data_type, timestamp):
         """
         Save data to a JSON file.
@@ -180,12 +332,12 @@ class MetadataStore:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # JSON serialize the data
-        json_data = json.dumps(data)
+        # JSON serialize the data (raw EXPLAIN rows are not JSON types)
+        json_data = json.dumps(data, default=str)
         
         # Insert into the appropriate table
         cursor.execute(f'''
-        INSERT INTO {table} (db_name, timestamp, {table.rstrip('s')}_data)
+        INSERT INTO {table} (db_name, timestamp, {self.DATA_COLUMNS[table]})
         VALUES (?, ?, ?)
         ''', (db_name, timestamp, json_data))
         
@@ -252,6 +404,63 @@ class MetadataStore:
             logger.error(f"Error loading recommendations: {str(e)}")
             return None
     
+    def load_latest_performance_data(self, db_name="default"):
+        """
+        Load the latest query simulation results for a database.
+        
+        Args:
+            db_name (str): Database identifier
+            
+        Returns:
+            dict: Performance data or None if not found
+        """
+        try:
+            if self.use_sqlite:
+                return self._load_latest_from_sqlite("performance_data", db_name)
+            else:
+                return self._load_latest_from_json(db_name, "performance_data")
+        except Exception as e:
+            logger.error(f"Error loading performance data: {str(e)}")
+            return None
+    
+    def load_latest_measurements(self, db_name="default"):
+        """
+        Load the latest recommendation measurements for a database.
+        
+        Args:
+            db_name (str): Database identifier
+            
+        Returns:
+            list: Measurements or None if not found
+        """
+        try:
+            if self.use_sqlite:
+                return self._load_latest_from_sqlite("measurements", db_name)
+            else:
+                return self._load_latest_from_json(db_name, "measurements")
+        except Exception as e:
+            logger.error(f"Error loading measurements: {str(e)}")
+            return None
+    
+    def load_database_info(self, db_name="default"):
+        """
+        Load the latest facts saved about a database.
+        
+        Args:
+            db_name (str): Database identifier
+            
+        Returns:
+            dict: Database facts or None if not found
+        """
+        try:
+            if self.use_sqlite:
+                return self._load_latest_from_sqlite("database_info", db_name)
+            else:
+                return self._load_latest_from_json(db_name, "database_info")
+        except Exception as e:
+            logger.error(f"Error loading database info: {str(e)}")
+            return None
+    
     def _load_latest_from_json(self, db_name, data_type):
         """
         Load the latest data from JSON files.
@@ -302,7 +511,7 @@ class MetadataStore:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        data_column = f"{table.rstrip('s')}_data"
+        data_column = self.DATA_COLUMNS[table]
         
         # Get the latest record
         cursor.execute(f'''
@@ -322,6 +531,309 @@ class MetadataStore:
         
         return None
     
+    def list_schema_snapshots(self, db_name="default"):
+        """
+        List stored schema snapshots for a database, oldest first.
+        
+        Args:
+            db_name (str): Database identifier
+            
+        Returns:
+            list: Snapshots with snapshot_id and timestamp
+        """
+        if self.use_sqlite:
+            conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+            rows = conn.execute('''
+            SELECT id, timestamp FROM schema_snapshots
+            WHERE db_name = ?
+            ORDER BY timestamp
+            ''', (db_name,)).fetchall()
+            conn.close()
+            return [{"snapshot_id": str(row[0]), "timestamp": row[1]} for row in rows]
+        
+        db_dir = os.path.join(self.base_path, db_name)
+        if not os.path.exists(db_dir):
+            return []
+        
+        # JSON snapshots are identified by the timestamp in their filename
+        files = sorted(f for f in os.listdir(db_dir) if f.startswith("schema_") and f.endswith(".json"))
+        return [{"snapshot_id": f[len("schema_"):-len(".json")], "timestamp": f[len("schema_"):-len(".json")]}
+                for f in files]
+    
+    def save_plan_fingerprints(self, plans, db_name="default", snapshot_id=None):
+        """
+        Save the plan fingerprint of each simulated query against a schema snapshot.
+        
+        Args:
+            plans (list): Plan summaries with query_fingerprint and plan_hash
+            db_name (str): Identifier for the database
+            snapshot_id (str, optional): Schema snapshot, defaults to the latest
+            
+        Returns:
+            bool: Success flag
+        """
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            if snapshot_id is None:
+                snapshots = self.list_schema_snapshots(db_name)
+                snapshot_id = snapshots[-1]["snapshot_id"] if snapshots else None
+            
+            if not self.use_sqlite:
+                return self._save_to_json({"snapshot_id": snapshot_id, "plans": plans},
+                                          db_name, "plans", timestamp)
+            
+            conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+            conn.executemany('''
+            INSERT INTO plan_fingerprints (db_name, snapshot_id, timestamp, query_fingerprint, plan_hash, plan_data)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(db_name, snapshot_id, timestamp, plan["query_fingerprint"], plan.get("plan_hash"),
+                   json.dumps(plan, default=str)) for plan in plans])
+            conn.commit()
+            conn.close()
+            
+            logger.info(f"Saved {len(plans)} plan fingerprints for {db_name} (snapshot {snapshot_id})")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving plan fingerprints: {str(e)}")
+            return False
+    
+    def load_plan_fingerprints(self, db_name="default", snapshot_id=None, on_date=None):
+        """
+        Load the plan fingerprints recorded for a snapshot or as of a date.
+        
+        When several plans exist for the same query, the most recent one wins.
+        
+        Args:
+            db_name (str): Database identifier
+            snapshot_id (str, optional): Schema snapshot to load plans for
+            on_date (str, optional): Load plans recorded up to this date (YYYY-MM-DD)
+            
+        Returns:
+            dict: Query fingerprint -> plan summary
+        """
+        try:
+            records = []
+            if self.use_sqlite:
+                query = "SELECT timestamp, snapshot_id, plan_data FROM plan_fingerprints WHERE db_name = ?"
+                args = [db_name]
+                if snapshot_id is not None:
+                    query += " AND snapshot_id = ?"
+                    args.append(str(snapshot_id))
+                if on_date is not None:
+                    query += " AND substr(timestamp, 1, 10) <= ?"
+                    args.append(on_date)
+                
+                conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+                rows = conn.execute(query + " ORDER BY timestamp", args).fetchall()
+                conn.close()
+                records = [(row[0], row[1], json.loads(row[2])) for row in rows]
+            else:
+                db_dir = os.path.join(self.base_path, db_name)
+                files = sorted(f for f in os.listdir(db_dir) if f.startswith("plans_")) if os.path.exists(db_dir) else []
+                for file_name in files:
+                    with open(os.path.join(db_dir, file_name), 'r') as f:
+                        data = json.load(f)
+                    timestamp = file_name[len("plans_"):-len(".json")]
+                    if snapshot_id is not None and str(data["snapshot_id"]) != str(snapshot_id):
+                        continue
+                    if on_date is not None and timestamp[:10] > on_date:
+                        continue
+                    records.extend((timestamp, data["snapshot_id"], plan) for plan in data["plans"])
+            
+            plans = {}
+            for timestamp, snapshot, plan in records:
+                plans[plan["query_fingerprint"]] = dict(plan, recorded_at=timestamp, snapshot_id=snapshot)
+            return plans
+        except Exception as e:
+            logger.error(f"Error loading plan fingerprints: {str(e)}")
+            return {}
+    
+    def save_execution_step(self, run_id, step_id, status, details=None, db_name="default"):
+        """
+        Checkpoint the status of one step of a plan execution run.
+        
+        Args:
+            run_id (str): Execution run identifier
+            step_id (str): Step identifier within the run
+            status (str): Step status (running, done, failed, skipped)
+            details (dict, optional): Step details such as SQL hash, timing and error
+            db_name (str): Identifier for the database
+            
+        Returns:
+            bool: Success flag
+        """
+        timestamp = datetime.now().isoformat()
+        record = dict(details or {}, status=status, timestamp=timestamp)
+        
+        try:
+            if self.use_sqlite:
+                conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+                conn.execute('''
+                INSERT INTO plan_executions (db_name, run_id, step_id, status, timestamp, step_data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', (db_name, run_id, step_id, status, timestamp, json.dumps(record, default=str)))
+                conn.commit()
+                conn.close()
+                return True
+            
+            # One JSON file per run, holding the latest record of each step
+            db_dir = os.path.join(self.base_path, db_name)
+            if not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            file_path = os.path.join(db_dir, f"execution_{run_id}.json")
+            steps = {}
+            if os.path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    steps = json.load(f)
+            steps[step_id] = record
+            with open(file_path, 'w') as f:
+                json.dump(steps, f, indent=2, default=str)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving execution step: {str(e)}")
+            return False
+    
+    def load_execution_steps(self, run_id, db_name="default"):
+        """
+        Load the latest checkpoint of every step of a plan execution run.
+        
+        Args:
+            run_id (str): Execution run identifier
+            db_name (str): Identifier for the database
+            
+        Returns:
+            dict: Step identifier -> latest step record
+        """
+        try:
+            if self.use_sqlite:
+                conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+                rows = conn.execute('''
+                SELECT step_id, step_data FROM plan_executions
+                WHERE db_name = ? AND run_id = ?
+                ORDER BY id
+                ''', (db_name, run_id)).fetchall()
+                conn.close()
+                return {row[0]: json.loads(row[1]) for row in rows}
+            
+            file_path = os.path.join(self.base_path, db_name, f"execution_{run_id}.json")
+            if not os.path.exists(file_path):
+                return {}
+            with open(file_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading execution steps: {str(e)}")
+            return {}
+    
+    def save_benchmark_run(self, run, db_name="default"):
+        """
+        Save a benchmark run with its metadata.
+        
+        Args:
+            run (dict): Run record with label, host, schema fingerprint and result
+            db_name (str): Identifier for the database
+            
+        Returns:
+            str: Identifier of the stored run, or None on failure
+        """
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            if self.use_sqlite:
+                conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+                cursor = conn.execute('''
+                INSERT INTO benchmark_runs (db_name, timestamp, label, run_data)
+                VALUES (?, ?, ?, ?)
+                ''', (db_name, timestamp, run.get("label"), json.dumps(run, default=str)))
+                run_id = str(cursor.lastrowid)
+                conn.commit()
+                conn.close()
+            else:
+                # JSON runs are identified by the timestamp in their filename
+                if not self._save_to_json(run, db_name, "benchmark", timestamp):
+                    return None
+                run_id = timestamp.replace(':', '-')
+            
+            logger.info(f"Saved benchmark run {run_id} for {db_name}")
+            return run_id
+        except Exception as e:
+            logger.error(f"Error saving benchmark run: {str(e)}")
+            return None
+    
+    def load_benchmark_run(self, run_id, db_name="default"):
+        """
+        Load a stored benchmark run.
+        
+        Args:
+            run_id (str): Run identifier returned by save_benchmark_run
+            db_name (str): Identifier for the database
+            
+        Returns:
+            dict: Run record with run_id and timestamp, or None if not found
+        """
+        try:
+            if self.use_sqlite:
+                conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+                row = conn.execute('''
+                SELECT timestamp, run_data FROM benchmark_runs
+                WHERE db_name = ? AND id = ?
+                ''', (db_name, int(run_id))).fetchone()
+                conn.close()
+                if row is None:
+                    return None
+                timestamp, run = row[0], json.loads(row[1])
+            else:
+                file_path = os.path.join(self.base_path, db_name, f"benchmark_{run_id}.json")
+                if not os.path.exists(file_path):
+                    return None
+                with open(file_path, 'r') as f:
+                    run = json.load(f)
+                timestamp = run_id
+            
+            return dict(run, run_id=str(run_id), timestamp=timestamp)
+        except Exception as e:
+            logger.error(f"Error loading benchmark run: {str(e)}")
+            return None
+    
+    def list_benchmark_runs(self, db_name="default", label=None):
+        """
+        List stored benchmark runs, oldest first.
+        
+        Args:
+            db_name (str): Identifier for the database
+            label (str, optional): Only list runs with this label
+            
+        Returns:
+            list: Run records with run_id and timestamp
+        """
+        try:
+            runs = []
+            if self.use_sqlite:
+                query = "SELECT id, timestamp, run_data FROM benchmark_runs WHERE db_name = ?"
+                args = [db_name]
+                if label is not None:
+                    query += " AND label = ?"
+                    args.append(label)
+                
+                conn = sqlite3.connect(os.path.join(self.base_path, "metadata.db"))
+                rows = conn.execute(query + " ORDER BY id", args).fetchall()
+                conn.close()
+                runs = [dict(json.loads(row[2]), run_id=str(row[0]), timestamp=row[1]) for row in rows]
+            else:
+                db_dir = os.path.join(self.base_path, db_name)
+                files = sorted(f for f in os.listdir(db_dir) if f.startswith("benchmark_")) if os.path.exists(db_dir) else []
+                for file_name in files:
+                    with open(os.path.join(db_dir, file_name), 'r') as f:
+                        run = json.load(f)
+                    if label is not None and run.get("label") != label:
+                        continue
+                    run_id = file_name[len("benchmark_"):-len(".json")]
+                    runs.append(dict(run, run_id=run_id, timestamp=run_id))
+            return runs
+        except Exception as e:
+            logger.error(f"Error listing benchmark runs: {str(e)}")
+            return []
+    
     def list_databases(self):
         """
         List all databases with stored metadata.
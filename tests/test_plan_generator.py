@@ -0,0 +1,112 @@
+import copy
+import re
+
+from db import schema_index
+from engine.plan_generator import MIGRATION_PROGRESS_TABLE, generate_sql, migration_progress_table_sql
+
+SCHEMA = {
+    "customers": {
+        "row_count": 50000,
+        "columns": [
+            {"name": "id", "type": "INTEGER", "nullable": False},
+            {"name": "name", "type": "TEXT", "nullable": False},
+            {"name": "address_street", "type": "TEXT", "nullable": True},
+            {"name": "address_city", "type": "TEXT", "nullable": False}
+        ],
+        "primary_key": {"constrained_columns": ["id"]},
+        "foreign_keys": [],
+        "indexes": []
+    },
+    "events": {
+        "row_count": 100000,
+        "columns": [
+            {"name": "id", "type": "INTEGER", "nullable": False},
+            {"name": "parent_id", "type": "INTEGER", "nullable": True},
+            {"name": "parent_created_at", "type": "TIMESTAMP", "nullable": True},
+            {"name": "created_at", "type": "TIMESTAMP", "nullable": False}
+        ],
+        "primary_key": {"constrained_columns": ["id"]},
+        "foreign_keys": [{"name": "fk_events_parent", "constrained_columns": ["parent_id", "parent_created_at"],
+                          "referred_table": "events", "referred_columns": ["id", "created_at"]}],
+        "indexes": [{"name": "ux_events_id_created_at", "column_names": ["id", "created_at"], "unique": True}],
+        "column_stats": {"created_at": {"min": "2024-01-01", "max": "2024-06-30"}}
+    }
+}
+
+def _declared_variables(sql):
+    """Names declared in the DECLARE sections of PL/pgSQL blocks"""
+    names = set()
+    for block in re.findall(r"DECLARE\n(.*?)\nBEGIN", sql, re.DOTALL):
+        names.update(line.split()[0].lower() for line in block.splitlines() if line.strip())
+    return names
+
+def _table_columns(create_sql):
+    """Column names of a CREATE TABLE statement"""
+    body = create_sql[create_sql.index("(") + 1:create_sql.rindex(")")]
+    return {line.split()[0].lower() for line in body.splitlines() if line.strip()}
+
+def _postgres_migrations(recommendation):
+    plan = generate_sql(recommendation, SCHEMA, "postgresql")
+    assert "error" not in plan
+    return [st for st in plan["statements"] if st["type"] in ("data_migration", "trigger")]
+
+def test_plpgsql_variables_do_not_shadow_columns():
+    progress_columns = _table_columns(migration_progress_table_sql("postgresql")["sql"])
+    for recommendation in ({"action": "NORMALIZE", "table": "customers"},
+                           {"action": "PARTITION", "table": "events", "partition_column": "created_at"}):
+        table_columns = {col["name"] for col in SCHEMA[recommendation["table"]]["columns"]}
+        statements = _postgres_migrations(recommendation)
+        assert any(MIGRATION_PROGRESS_TABLE in st["sql"] for st in statements)
+        for statement in statements:
+            variables = _declared_variables(statement["sql"])
+            assert not variables & (progress_columns | table_columns), statement["sql"]
+
+def test_partition_sync_trigger_mirrors_inserts_behind_the_copied_key():
+    plan = generate_sql({"action": "PARTITION", "table": "events", "partition_column": "created_at"},
+                        SCHEMA, "postgresql")
+    trigger = next(st["sql"] for st in plan["statements"] if st["type"] == "trigger")
+    migration = next(st["sql"] for st in plan["statements"] if st["type"] == "data_migration")
+    
+    assert "AFTER INSERT OR UPDATE OR DELETE ON events" in trigger
+    assert "IF NEW.id <= v_copied_up_to THEN" in trigger
+    assert "IF OLD.id <= v_copied_up_to THEN" in trigger
+    # Batches hold the progress row the trigger reads, so no write slips between them
+    assert "FOR SHARE" in trigger and f"FROM {MIGRATION_PROGRESS_TABLE} WHERE migration_name = " \
+        "'partition_events' FOR UPDATE" in migration
+
+def test_partition_recreates_self_reference_validated():
+    plan = generate_sql({"action": "PARTITION", "table": "events", "partition_column": "created_at"},
+                        SCHEMA, "postgresql")
+    swap = next(st["sql"] for st in plan["statements"] if st["type"] == "swap")
+    
+    assert ("ALTER TABLE events ADD CONSTRAINT fk_events_parent FOREIGN KEY (parent_id, parent_created_at) "
+            "REFERENCES events (id, created_at);") in swap
+    assert "NOT VALID" not in swap and "VALIDATE CONSTRAINT fk_events_parent" not in swap
+
+def test_normalize_indexes_and_matches_extracted_values_with_equality():
+    plan = generate_sql({"action": "NORMALIZE", "table": "customers"}, SCHEMA, "postgresql")
+    types = [st["type"] for st in plan["statements"]]
+    index = plan["statements"][types.index("index")]["sql"]
+    migration = plan["statements"][types.index("data_migration")]["sql"]
+    
+    assert types.index("index") < types.index("data_migration")
+    assert "CREATE UNIQUE INDEX" in index and "(address_city, address_street)" in index
+    assert "IS NOT DISTINCT FROM" not in migration
+    assert "nt.address_city = t.address_city" in migration
+    assert ("(nt.address_street = t.address_street OR (nt.address_street IS NULL AND t.address_street IS NULL))"
+            in migration)
+
+def test_generate_sql_reuses_the_index_of_an_unchanged_schema(monkeypatch):
+    built = []
+    build = schema_index.SchemaIndex
+    monkeypatch.setattr(schema_index, "SchemaIndex", lambda *args: built.append(args) or build(*args))
+    schema = copy.deepcopy(SCHEMA)
+    recommendation = {"action": "INDEX", "table": "customers", "columns": ["name"], "reason": "lookups"}
+    
+    generate_sql(recommendation, schema, "postgresql")
+    generate_sql(recommendation, schema, "postgresql")
+    assert len(built) == 1
+    
+    schema["customers"]["columns"].append({"name": "email", "type": "TEXT", "nullable": True})
+    plan = generate_sql(dict(recommendation, columns=["email"]), schema, "postgresql")
+    assert len(built) == 2 and "error" not in plan
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from db.query_log_analyzer import bindable_template, parameterize_query
+
+def test_bindable_template_binds_placeholders_followed_by_casts():
+    template, params = parameterize_query("SELECT * FROM orders WHERE placed_at > '2024-01-01'::date "
+                                          "AND status::text = 'shipped' AND id = 7")
+    compiled = text(bindable_template(template)).compile(dialect=postgresql.dialect())
+    
+    assert params == ["2024-01-01", "shipped", 7]
+    assert sorted(compiled.params) == ["p1", "p2", "p3"]
+    assert str(compiled) == ("SELECT * FROM orders WHERE placed_at > %(p1)s::date "
+                             "AND status::text = %(p2)s AND id = %(p3)s")
@@ -0,0 +1,42 @@
+import base64
+import sqlite3
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from db import schema_extractor
+from db.schema_extractor import _mysql_histogram_stats, extract_schema
+
+def test_mysql_histograms_in_pg_stats_form():
+    equi_height = _mysql_histogram_stats('{"buckets": [[1, 10, 0.5, 10], [11, 40, 0.9, 25]], '
+                                         '"null-values": 0.1, "histogram-type": "equi-height"}')
+    assert equi_height["histogram_bounds"] == ["1", "11", "40"]
+    assert equi_height["n_distinct"] == 35 and equi_height["null_frac"] == 0.1
+    
+    encoded = [f"base64:type254:{base64.b64encode(value).decode()}" for value in (b"card", b"cash")]
+    singleton = _mysql_histogram_stats({"buckets": [[encoded[0], 0.25], [encoded[1], 0.75]],
+                                        "null-values": 0.25, "histogram-type": "singleton"})
+    assert singleton["most_common_vals"] == ["card", "cash"]
+    assert singleton["most_common_freqs"] == [0.25, 0.5]
+
+def test_sqlite_stats_come_from_a_bounded_block_sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(schema_extractor, "STATS_SAMPLE_ROWS", 1000)
+    path = tmp_path / "stats.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, kind INTEGER)")
+    conn.executemany("INSERT INTO events VALUES (?, ?)", [(i, None if i % 4 == 0 else i % 7) for i in range(1, 20001)])
+    conn.commit()
+    conn.close()
+    
+    sampled = []
+    block_sample = schema_extractor._block_sample
+    monkeypatch.setattr(schema_extractor, "_block_sample",
+                        lambda *args: sampled.append(block_sample(*args)) or sampled[-1])
+    
+    schema = extract_schema(f"sqlite:///{path}")
+    assert len(sampled) == 1 and len(sampled[0]) <= 1000
+    stats = schema["events"]["column_stats"]["kind"]
+    assert stats["n_distinct"] == 7
+    assert stats["null_frac"] == pytest.approx(0.25, abs=0.05)
+    assert extract_schema(f"sqlite:///{path}", column_stats=False)["events"]["column_stats"] == {}
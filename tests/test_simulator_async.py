@@ -0,0 +1,98 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+
+from engine import simulator
+from engine.simulator import simulate_performance, simulate_performance_async, to_async_url
+
+QUERIES = [
+    "SELECT * FROM orders WHERE customer_id = 7",
+    "SELECT * FROM orders WHERE status = 'shipped'",
+    "SELECT c.name, COUNT(*) FROM customers c JOIN orders o ON o.customer_id = c.id GROUP BY c.name",
+    "SELECT * FROM missing_table"
+]
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    """Temporary SQLite database with two related tables and one index"""
+    path = tmp_path / "simulate.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers (id),
+                             status TEXT, amount NUMERIC);
+        CREATE INDEX idx_orders_customer_id ON orders (customer_id);
+    """)
+    conn.executemany("INSERT INTO customers VALUES (?, ?)", [(i, f"customer {i}") for i in range(1, 51)])
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)",
+                     [(i, i % 50 + 1, "shipped" if i % 3 else "pending", i * 1.5) for i in range(1, 501)])
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+def _comparable(results):
+    """Results with raw EXPLAIN rows as plain tuples, which differ in type between drivers"""
+    comparable = {}
+    for key, result in results.items():
+        result = dict(result)
+        if "explain_result" in result and "raw_output" in result["explain_result"]:
+            result["explain_result"] = dict(result["explain_result"],
+                                            raw_output=[tuple(row) for row in result["explain_result"]["raw_output"]])
+        comparable[key] = result
+    return comparable
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///tmp/x.db") == "sqlite+aiosqlite:///tmp/x.db"
+    assert to_async_url("sqlite+aiosqlite:///tmp/x.db") == "sqlite+aiosqlite:///tmp/x.db"
+    assert to_async_url("postgresql://u@h/db") == "postgresql+asyncpg://u@h/db"
+
+def test_async_matches_sync(sqlite_url):
+    expected = simulate_performance(sqlite_url, QUERIES)
+    actual = asyncio.run(simulate_performance_async(sqlite_url, QUERIES, concurrency=3, connections=2))
+    
+    assert list(actual) == [f"query_{i + 1}" for i in range(len(QUERIES))]
+    assert _comparable(actual) == _comparable(expected)
+    assert actual["query_1"]["explain_result"]["metrics"]["search_operations"] == 1
+    assert "error" in actual["query_4"]["explain_result"]
+
+def test_async_waits_for_the_global_explain_budget(sqlite_url, monkeypatch):
+    budget = simulator.threading.BoundedSemaphore(1)
+    monkeypatch.setattr(simulator, "_explain_budget", budget)
+    results = {}
+    
+    # Hold the only slot, as a threaded EXPLAIN would
+    budget.acquire()
+    worker = simulator.threading.Thread(
+        target=lambda: results.update(asyncio.run(simulate_performance_async(sqlite_url, QUERIES[:3] * 4))))
+    worker.start()
+    worker.join(0.5)
+    assert worker.is_alive() and not results
+    
+    budget.release()
+    worker.join(10)
+    assert len(results) == 12
+    # Every slot was handed back
+    assert budget.acquire(blocking=False)
+
+def test_cancelled_waiter_does_not_take_a_budget_slot(sqlite_url, monkeypatch):
+    budget = simulator.threading.BoundedSemaphore(1)
+    monkeypatch.setattr(simulator, "_explain_budget", budget)
+    
+    async def cancel_while_waiting():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(simulate_performance_async(sqlite_url, QUERIES[:1]), 0.2)
+    
+    budget.acquire()
+    release = simulator.threading.Timer(0.4, budget.release)
+    release.start()
+    asyncio.run(cancel_while_waiting())
+    release.join()
+    
+    # The slot handed back after the cancellation is free and stays free
+    simulator.threading.Event().wait(0.2)
+    assert budget.acquire(blocking=False)
+    budget.release()
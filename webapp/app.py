@@ -16,8 +16,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from db.schema_extractor import extract_schema
 from db.query_log_analyzer import parse_query_logs, analyze_query_patterns
 from engine.heuristics import recommend_changes
-from engine.plan_generator import generate_sql
-from engine.benchmark import PerformanceBenchmark
+from engine.plan_generator import generate_all
+from engine.benchmark import PerformanceBenchmark, DEFAULT_FETCH_MODE
+from engine.resource_sampler import HEADLINE_COUNTERS
+from engine.benchmark_history import (benchmark_run_record, compare_benchmark_runs, DEFAULT_SIGNIFICANCE,
+                                      DEFAULT_REGRESSION_THRESHOLD_PCT)
 from storage.metadata_store import MetadataStore
 
 logging.basicConfig(level=logging.DEBUG,
@@ -135,6 +138,16 @@ def get_store():
     return MetadataStore(base_path=user_path)
 
 
+def _plan_dialect(store, db_name):
+    """Database type to generate SQL plans for: the one saved at extraction, else the session's"""
+    info = store.load_database_info(db_name) or {}
+    if info.get("db_type") in ("postgresql", "mysql", "sqlite"):
+        return info["db_type"]
+    if session.get("current_db") == db_name and session.get("db_type") in ("postgresql", "mysql", "sqlite"):
+        return session["db_type"]
+    return "postgresql"
+
+
 def pro_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -340,9 +353,10 @@ def extract():
             else:
                 from db.schema_extractor import detect_database_type
                 db_type = detect_database_type(db_url)
-                result  = extract_schema(db_url)
+                result  = extract_schema(db_url, column_stats=not request.form.get("skip_column_stats"))
                 store   = get_store()
                 if store.save_schema(result, db_name):
+                    store.save_database_info({"db_type": db_type}, db_name)
                     conn = get_users_db()
                     conn.execute("UPDATE users SET schema_count = schema_count + 1 WHERE id = ?",
                                  (current_user.id,))
@@ -465,12 +479,14 @@ def generate_sql_page(db_name, table, action):
         if not recs:
             return render_template("error.html", error="Recommendations not found.",
                                    title="Recommendations Not Found", db_name=name)
-        rec = next((r for r in recs if r["table"] == table and r["action"] == action), None)
-        if not rec:
+        position = next((i for i, r in enumerate(recs) if r["table"] == table and r["action"] == action), None)
+        if position is None:
             return render_template("error.html",
                                    error=f"No recommendation for table '{table}' / action '{action}'.",
                                    title="Recommendation Not Found", db_name=name)
-        return render_template("sql_plan.html", db_name=name, plan=generate_sql(rec, schema))
+        # Plans are cached per schema snapshot, so page views after the first do not regenerate them
+        plans = generate_all(recs, schema, dialect=_plan_dialect(store, name))
+        return render_template("sql_plan.html", db_name=name, plan=plans[position])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -480,6 +496,7 @@ def generate_sql_page(db_name, table, action):
 def benchmark():
     result  = None
     error   = None
+    run_id  = None
     db_name = request.args.get("db_name", session.get("current_db"))
     mode    = request.args.get("mode", "quick")
     db_url  = os.environ.get("DATABASE_URL", "")
@@ -497,7 +514,8 @@ def benchmark():
                     query  = request.form.get("query", "SELECT 1")
                     result = b.time_query(query,
                                           iterations=int(request.form.get("iterations", 5)),
-                                          warmup=int(request.form.get("warmup", 1)))
+                                          warmup=int(request.form.get("warmup", 1)),
+                                          fetch=request.form.get("fetch", DEFAULT_FETCH_MODE))
                 elif mode == "compare":
                     q1 = request.form.get("query1", "SELECT 1")
                     q2 = request.form.get("query2", "SELECT 1")
@@ -512,14 +530,23 @@ def benchmark():
                     query  = request.form.get("query", "SELECT 1")
                     result = b.run_throughput_test(query,
                                                    duration=int(request.form.get("duration", 5)),
-                                                   concurrent_clients=int(request.form.get("clients", 5)))
+                                                   concurrent_clients=int(request.form.get("clients", 5)),
+                                                   use_processes=bool(request.form.get("processes")))
+                if mode in ("quick", "throughput"):
+                    store  = get_store()
+                    run    = benchmark_run_record(result, mode, query=query,
+                                                  label=request.form.get("label") or None,
+                                                  schema=store.load_latest_schema(db_name) if db_name else None,
+                                                  connection_url=db_url)
+                    run_id = store.save_benchmark_run(run, db_name or "default")
                 flash("Benchmark completed.", "success")
         except Exception as e:
             logger.error(f"Benchmark error: {e}")
             error = f"Error running benchmark: {e}"
 
     return render_template("benchmark.html", db_name=db_name, db_url=db_url,
-                           query=query, mode=mode, result=result, error=error)
+                           query=query, mode=mode, result=result, error=error, run_id=run_id,
+                           resource_counters=HEADLINE_COUNTERS)
 
 
 # ── API ───────────────────────────────────────────────────────────────────────
@@ -554,6 +581,32 @@ def api_get_recommendations(db_name):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/benchmark_runs/<path:db_name>")
+@login_required
+def api_list_benchmark_runs(db_name):
+    try:
+        from urllib.parse import unquote
+        return jsonify(get_store().list_benchmark_runs(unquote(db_name), label=request.args.get("label")))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/benchmark_runs/<path:db_name>/compare")
+@login_required
+def api_compare_benchmark_runs(db_name):
+    try:
+        from urllib.parse import unquote
+        store = get_store()
+        db_name = unquote(db_name)
+        baseline  = store.load_benchmark_run(request.args.get("baseline", ""), db_name)
+        candidate = store.load_benchmark_run(request.args.get("candidate", ""), db_name)
+        if not baseline or not candidate:
+            return jsonify({"error": "Benchmark run not found"}), 404
+        return jsonify(compare_benchmark_runs(baseline, candidate,
+                                              alpha=float(request.args.get("alpha", DEFAULT_SIGNIFICANCE)),
+                                              threshold_pct=float(request.args.get("threshold", DEFAULT_REGRESSION_THRESHOLD_PCT))))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/sql_plan", methods=["POST"])
 @login_required
 def api_generate_sql():
@@ -571,10 +624,10 @@ def api_generate_sql():
             return jsonify({"error": "Schema not found"}), 404
         if not recs:
             return jsonify({"error": "Recommendations not found"}), 404
-        rec = next((r for r in recs if r["table"] == table and r["action"] == action), None)
-        if not rec:
+        position = next((i for i, r in enumerate(recs) if r["table"] == table and r["action"] == action), None)
+        if position is None:
             return jsonify({"error": "Recommendation not found"}), 404
-        return jsonify(generate_sql(rec, schema))
+        return jsonify(generate_all(recs, schema, dialect=_plan_dialect(store, db_name))[position])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 